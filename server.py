@@ -8,47 +8,332 @@
 - Получения справки по синтаксису PlantUML
 - Просмотра доступных тем оформления
 
+Инструменты генерации асинхронные: рендеринг выполняется в ограниченном пуле
+потоков (RENDER_MAX_CONCURRENCY) и не блокирует другие запросы. При отмене
+вызова клиентом дочерний процесс PlantUML завершается.
+
+Вызовы инструментов генерации замеряются по этапам (лексинг, растеризация,
+кодирование, запись, PlantUML, AST): замеры возвращаются в поле timings_ms
+и копятся для get_render_stats.
+
+Скриншоты и диаграммы можно получить без записи на диск (return_mode
+'inline' — MCP ImageContent, 'base64' — поле ответа) с лимитом размера
+INLINE_IMAGE_MAX_KB.
+
+Кодировщик выбирается профилем (encoder_profile: fast, balanced, smallest);
+по умолчанию 'auto' подбирает самый компактный профиль, укладывающийся в
+latency_budget_ms для размера изображения. Выбранный профиль и время
+кодирования возвращаются в полях encoder_profile и encode_ms. Для
+скриншотов кода lossless_palette пробует PNG с палитрой или lossless WebP и
+оставляет его, если он меньше и совпадает с исходником пиксель в пиксель.
+
+Перед рендерингом размер растра и пиковая память оцениваются по исходнику
+(render_budget): запросы сверх RENDER_MAX_MEGAPIXELS и RENDER_MAX_MEMORY_MB
+отклоняются или выполняются на пониженном detail_level (budget_policy).
+
+Строки кода длиннее max_line_columns колонок (минифицированный JS, JSON)
+переносятся или обрезаются до лексинга (long_lines), поэтому ширина
+скриншота ограничена; затронутые строки возвращаются в поле long_lines.
+
 Инструменты MCP:
     generate_code_screenshot
         Создаёт скриншот кода из строки.
     generate_file_screenshot
-        Создаёт скриншот кода из файла (⚠️ лимит 200 строк).
+        Создаёт скриншот кода из файла (большие файлы рендерятся полосами).
     generate_entity_screenshot
         Извлекает и создаёт скриншот конкретной функции/класса/метода (✨ без лимита).
+    generate_entity_screenshots_batch
+        Создаёт скриншоты нескольких сущностей файла параллельно (шаблоны имён).
+    find_code_entity
+        Находит функцию/класс/метод в проекте по имени без пути к файлу.
     generate_architecture_diagram
         Генерирует UML диаграмму из PlantUML кода.
     generate_diagram_from_file
         Генерирует UML диаграмму из .puml файла.
+    generate_diagrams_batch
+        Генерирует пакет UML диаграмм через один процесс PlantUML.
+    estimate_render_cost
+        Оценивает размер, память и время рендеринга до рендеринга.
     get_plantuml_guide
         Возвращает справку по синтаксису PlantUML.
     list_plantuml_themes
         Возвращает список доступных тем оформления.
+    get_render_stats
+        Возвращает перцентили времени инструментов и этапов, статистику кешей.
 """
 
+import base64
 import logging
 import os
 
 from mcp.server.fastmcp import FastMCP
+from mcp.types import ImageContent
 
-from src.code_to_image import create_code_screenshot
-from src.code_extractor import extract_code_entity, list_entities, EntityNotFoundError
+from src.code_to_image import (
+    create_code_screenshot,
+    create_code_screenshot_bytes,
+    create_code_screenshot_variants,
+    create_code_screenshots_batch,
+)
+from src.config import (
+    ENCODE_LATENCY_BUDGET_MS,
+    INLINE_IMAGE_MAX_KB,
+    LONG_LINE_POLICY,
+    MAX_LINE_COLUMNS,
+    RENDER_BUDGET_POLICY,
+    RENDER_MAX_MEGAPIXELS,
+    RENDER_MAX_MEMORY_MB,
+    TILED_MAX_FILE_LINES,
+)
+from src.code_extractor import (
+    EntityNotFoundError,
+    extract_code_entity,
+    get_symbol_index_cache_stats,
+    list_entities,
+    resolve_entity_patterns,
+)
 from src.diagram_renderer import (
+    DIAGRAM_OUTPUT_MODES,
+    QUALITY_LEVELS,
     JavaNotFoundError,
     PlantUMLRenderError,
     PlantUMLSyntaxError,
     ensure_java_environment,
     render_diagram_from_string,
+    render_diagram_to_bytes,
+    render_diagram_variants,
+    render_diagrams_batch,
 )
 from src.font_manager import list_available_fonts
+from src.image_utils import ENCODER_PROFILES, ImageProcessingError
+from src.long_lines import LONG_LINE_POLICIES, MIN_LINE_COLUMNS
+from src.project_index import get_project_index
+from src.render_budget import (
+    BUDGET_POLICIES,
+    RenderBudgetError,
+    check_render_budget,
+    estimate_code_render,
+    estimate_diagram_render,
+    fit_render_budget,
+)
+from src.render_cache import get_render_cache
+from src.render_executor import offload_to_executor
+from src.render_stats import (
+    get_render_stats as collect_render_stats,
+    instrument_tool,
+)
+from src.resource_cache import get_resource_cache_stats
+from src.tiled_renderer import render_code_tiled
 from src.guide_manager import get_guide, list_guides, list_themes
 
 logger = logging.getLogger(__name__)
 
+# Файлы длиннее рендерятся полосами (tiled_renderer)
 MAX_FILE_LINES = 200
 
+FILE_OUTPUT_MODES = ("auto", "single", "stitched", "pages")
+
+# 'file' — запись в output_path, 'inline' — MCP ImageContent, 'base64' — поле ответа
+RETURN_MODES = ("file", "inline", "base64")
+
 mcp = FastMCP("Code Screenshot Tool")
 
 
+def _check_return_mode(return_mode: str) -> dict | None:
+    """Возвращает ответ с ошибкой для неизвестного режима возврата."""
+    if return_mode in RETURN_MODES:
+        return None
+    return {
+        "success": False,
+        "error": f"Неизвестный режим возврата: {return_mode}",
+        "suggestion": f"Используйте один из режимов: {', '.join(RETURN_MODES)}",
+    }
+
+
+def _check_variant_levels(variant_levels: list[str] | None, return_mode: str) -> dict | None:
+    """Возвращает ответ с ошибкой для неизвестных уровней вариантов."""
+    if not variant_levels:
+        return None
+    unknown = [level for level in variant_levels if level.capitalize() not in QUALITY_LEVELS]
+    if unknown:
+        return {
+            "success": False,
+            "error": f"Неизвестные уровни вариантов: {', '.join(unknown)}",
+            "suggestion": f"Используйте уровни: {', '.join(QUALITY_LEVELS)}",
+        }
+    if return_mode != "file":
+        return {
+            "success": False,
+            "error": "Варианты разных плотностей записываются только в файлы",
+            "suggestion": "Используйте return_mode='file' с output_path",
+        }
+    return None
+
+
+def _check_diagram_output_mode(output_mode: str) -> dict | None:
+    """Возвращает ответ с ошибкой для неизвестного режима вывода диаграммы."""
+    if output_mode in DIAGRAM_OUTPUT_MODES:
+        return None
+    return {
+        "success": False,
+        "error": f"Неизвестный режим вывода диаграммы: {output_mode}",
+        "suggestion": f"Используйте один из режимов: {', '.join(DIAGRAM_OUTPUT_MODES)}",
+    }
+
+
+def _check_budget_policy(budget_policy: str) -> dict | None:
+    """Возвращает ответ с ошибкой для неизвестной политики бюджета."""
+    if budget_policy in BUDGET_POLICIES:
+        return None
+    return {
+        "success": False,
+        "error": f"Неизвестная политика бюджета: {budget_policy}",
+        "suggestion": f"Используйте одну из политик: {', '.join(BUDGET_POLICIES)}",
+    }
+
+
+def _check_long_lines(long_lines: str, max_line_columns: int) -> dict | None:
+    """Возвращает ответ с ошибкой для неизвестной политики длинных строк."""
+    if long_lines not in LONG_LINE_POLICIES:
+        return {
+            "success": False,
+            "error": f"Неизвестная политика длинных строк: {long_lines}",
+            "suggestion": f"Используйте одну из политик: {', '.join(LONG_LINE_POLICIES)}",
+        }
+    if long_lines != "off" and max_line_columns < MIN_LINE_COLUMNS:
+        return {
+            "success": False,
+            "error": f"max_line_columns={max_line_columns} меньше минимума {MIN_LINE_COLUMNS}",
+            "suggestion": f"Укажите max_line_columns не меньше {MIN_LINE_COLUMNS}",
+        }
+    return None
+
+
+def _fit_budget(
+    estimate_for,
+    detail_level: str,
+    budget_policy: str,
+    variant_levels: list[str] | None = None,
+) -> dict:
+    """Подбирает уровень детализации под бюджет рендеринга (см. fit_render_budget).
+
+    С variant_levels проверяется наибольший уровень вариантов и без понижения:
+    набор вариантов, заказанный клиентом, не меняется молча.
+
+    Raises:
+        RenderBudgetError: Если запрос не укладывается в бюджет.
+    """
+    if variant_levels:
+        detail_level = max(variant_levels, key=lambda level: QUALITY_LEVELS[level.capitalize()])
+        if budget_policy == "downgrade":
+            budget_policy = "reject"
+    return fit_render_budget(estimate_for, detail_level, budget_policy)
+
+
+def _budget_error(error: RenderBudgetError) -> dict:
+    """Ответ с ошибкой для запроса сверх бюджета рендеринга."""
+    return {
+        "success": False,
+        "error": str(error),
+        "suggestion": (
+            "Уменьшите detail_level или объём исходника, для кода используйте "
+            "image_format='png' или 'jpeg'; оценку заранее даёт estimate_render_cost"
+        ),
+        "exceeded": error.exceeded,
+        "estimate": error.estimate,
+    }
+
+
+def _budget_fields(budget: dict) -> dict:
+    """Поле ответа о понижении уровня бюджетом (есть только при понижении)."""
+    if not budget["downgraded"]:
+        return {}
+    estimate = budget["estimate"]
+    return {
+        "render_budget": {
+            "requested_level": budget["requested_level"],
+            "detail_level": budget["detail_level"],
+            "megapixels": estimate["megapixels"],
+            "peak_memory_mb": estimate["peak_memory_mb"],
+        }
+    }
+
+
+def _palette_fields(screenshot: dict) -> dict:
+    """Поля ответа о палитре (есть только при lossless_palette)."""
+    return {
+        key: screenshot[key]
+        for key in ("palette_applied", "color_count")
+        if key in screenshot
+    }
+
+
+def _long_line_fields(screenshot: dict) -> dict:
+    """Поле ответа о перенесённых и обрезанных строках (есть только при них)."""
+    if "long_lines" not in screenshot:
+        return {}
+    return {"long_lines": screenshot["long_lines"]}
+
+
+def _screenshot_error(error: Exception) -> dict:
+    """Ответ с ошибкой оценки или рендеринга скриншота кода (шрифт, параметры)."""
+    logger.error(f"❌ Ошибка генерации: {error}")
+    return {
+        "success": False,
+        "error": str(error),
+        "suggestion": "Проверьте корректность параметров и доступность шрифта",
+        "available_fonts": list_available_fonts(),
+    }
+
+
+def _check_encoder_profile(encoder_profile: str) -> dict | None:
+    """Возвращает ответ с ошибкой для неизвестного профиля кодировщика."""
+    if encoder_profile.lower() == "auto" or encoder_profile.lower() in ENCODER_PROFILES:
+        return None
+    return {
+        "success": False,
+        "error": f"Неизвестный профиль кодировщика: {encoder_profile}",
+        "suggestion": f"Используйте один из профилей: auto, {', '.join(ENCODER_PROFILES)}",
+    }
+
+
+def _image_response(result: dict, return_mode: str, max_inline_kb: int) -> dict | list:
+    """Превращает результат с байтами изображения в ответ инструмента.
+
+    'inline' возвращает MCP ImageContent и метаданные, 'base64' — метаданные
+    с полем image_base64. Результаты без байтов (файл, ошибка) не меняются.
+    """
+    data = result.pop("data", None)
+    if data is None:
+        return result
+
+    if len(data) > max_inline_kb * 1024:
+        logger.warning(
+            f"⚠️ Изображение {result['file_size_kb']}KB превышает лимит ответа {max_inline_kb}KB"
+        )
+        return {
+            "success": False,
+            "error": (
+                f"Изображение ({result['file_size_kb']} KB) превышает лимит ответа "
+                f"{max_inline_kb} KB"
+            ),
+            "suggestion": (
+                "Уменьшите detail_level, используйте image_format='webp' "
+                "или сохраните результат в файл (return_mode='file')"
+            ),
+            "file_size_kb": result["file_size_kb"],
+            "max_inline_kb": max_inline_kb,
+        }
+
+    encoded = base64.b64encode(data).decode("ascii")
+    logger.info(f"📤 Изображение возвращено в ответе: {return_mode}, {result['file_size_kb']}KB")
+    if return_mode == "base64":
+        result["image_base64"] = encoded
+        return result
+
+    return [ImageContent(type="image", data=encoded, mimeType=result["mime_type"]), result]
+
+
 def _generate_screenshot_from_code(
     code: str,
     language: str,
@@ -59,12 +344,57 @@ def _generate_screenshot_from_code(
     line_numbers: bool,
     font_name: str,
     format: str,
+    return_mode: str = "file",
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    lossless_palette: bool = False,
+    variant_levels: list[str] | None = None,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
 ) -> dict:
-    """Генерирует скриншот из кода (внутренняя функция)."""
+    """Генерирует скриншот из кода (внутренняя функция).
+
+    Вне режима 'file' изображение кодируется в памяти и возвращается в поле
+    data (см. _image_response), output_path не используется. С variant_levels
+    код рендерится один раз и сохраняется в нескольких плотностях
+    (create_code_screenshot_variants).
+    """
     logger.info(f"📥 Получен запрос generate_code_screenshot")
     logger.debug(f"📝 Параметры: language={language}, style={style}, font={font_name}")
 
     try:
+        if return_mode != "file":
+            screenshot = create_code_screenshot_bytes(
+                code_string=code,
+                language=language,
+                style=style,
+                font_size=font_size,
+                scale_factor=scale_factor,
+                line_numbers=line_numbers,
+                font_name=font_name,
+                format=format,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+                lossless_palette=lossless_palette,
+                long_lines=long_lines,
+                max_line_columns=max_line_columns,
+            )
+            return {
+                "success": True,
+                "file_size_kb": screenshot["file_size_kb"],
+                "format": screenshot["format"],
+                "mime_type": screenshot["mime_type"],
+                "dimensions": screenshot["dimensions"],
+                "scale_factor": scale_factor,
+                "font_used": font_name,
+                "encoder_profile": screenshot["encoder_profile"],
+                "encode_ms": screenshot["encode_ms"],
+                **_palette_fields(screenshot),
+                **_long_line_fields(screenshot),
+                "cache_hit": screenshot["cache_hit"],
+                "data": screenshot["data"],
+            }
+
         if not os.path.isabs(output_path):
             logger.error(f"🚫 Путь не абсолютный: {output_path}")
             return {
@@ -78,7 +408,37 @@ def _generate_screenshot_from_code(
             os.makedirs(output_dir, exist_ok=True)
             logger.debug(f"🗂️ Создана директория: {output_dir}")
 
-        create_code_screenshot(
+        if variant_levels:
+            scales = [QUALITY_LEVELS[level.capitalize()] for level in variant_levels]
+            variants = create_code_screenshot_variants(
+                code_string=code,
+                language=language,
+                output_file=output_path,
+                scales=scales,
+                style=style,
+                font_size=font_size,
+                line_numbers=line_numbers,
+                font_name=font_name,
+                format=format,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+                lossless_palette=lossless_palette,
+                long_lines=long_lines,
+                max_line_columns=max_line_columns,
+            )
+            logger.info(f"📤 Отправлен результат: вариантов {len(variants['variants'])}")
+            return {
+                "success": True,
+                "output_path": variants["variants"][0]["path"],
+                "manifest_path": variants["manifest_path"],
+                "variants": variants["variants"],
+                "format": variants["format"],
+                "font_used": font_name,
+                **_long_line_fields(variants),
+                "cache_hit": False,
+            }
+
+        screenshot = create_code_screenshot(
             code_string=code,
             language=language,
             output_file=output_path,
@@ -88,12 +448,20 @@ def _generate_screenshot_from_code(
             line_numbers=line_numbers,
             font_name=font_name,
             format=format,
+            encoder_profile=encoder_profile,
+            latency_budget_ms=latency_budget_ms,
+            lossless_palette=lossless_palette,
+            long_lines=long_lines,
+            max_line_columns=max_line_columns,
         )
 
         file_size = os.path.getsize(output_path)
         file_size_kb = round(file_size / 1024, 2)
 
-        logger.info(f"📤 Отправлен результат: success=True, size={file_size_kb}KB")
+        logger.info(
+            f"📤 Отправлен результат: success=True, size={file_size_kb}KB, "
+            f"cache_hit={screenshot['cache_hit']}"
+        )
 
         return {
             "success": True,
@@ -102,30 +470,40 @@ def _generate_screenshot_from_code(
             "format": format,
             "scale_factor": scale_factor,
             "font_used": font_name,
+            "encoder_profile": screenshot["encoder_profile"],
+            "encode_ms": screenshot["encode_ms"],
+            **_palette_fields(screenshot),
+            **_long_line_fields(screenshot),
+            "cache_hit": screenshot["cache_hit"],
         }
 
     except Exception as e:
-        logger.error(f"❌ Ошибка генерации: {e}")
-        return {
-            "success": False,
-            "error": str(e),
-            "suggestion": "Проверьте корректность параметров и доступность шрифта",
-            "available_fonts": list_available_fonts(),
-        }
+        return _screenshot_error(e)
 
 
 @mcp.tool()
+@offload_to_executor
+@instrument_tool
 def generate_code_screenshot(
     code: str,
     language: str,
-    output_path: str,
+    output_path: str = "",
     detail_level: str = "High",
     image_format: str = "webp",
     style: str = "monokai",
     font_size: int = 18,
     line_numbers: bool = True,
     font_name: str = "JetBrainsMono",
-) -> dict:
+    return_mode: str = "file",
+    max_inline_kb: int = INLINE_IMAGE_MAX_KB,
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    lossless_palette: bool = False,
+    variant_levels: list[str] | None = None,
+    budget_policy: str = RENDER_BUDGET_POLICY,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+) -> dict | list:
     """Создаёт скриншот кода из строки.
 
     Args:
@@ -138,33 +516,97 @@ def generate_code_screenshot(
         font_size: Базовый размер шрифта (умножается на detail_level).
         line_numbers: Показывать нумерацию строк.
         font_name: Имя шрифта (JetBrainsMono, FiraCode, CascadiaCode, Consolas).
+        return_mode: Способ возврата изображения ('file', 'inline', 'base64').
+            'inline' — MCP ImageContent в ответе, 'base64' — поле image_base64;
+            в обоих случаях файл не записывается и output_path не нужен.
+        max_inline_kb: Предельный размер изображения для 'inline' и 'base64'.
+        encoder_profile: Профиль кодировщика ('auto', 'fast', 'balanced', 'smallest').
+            'auto' выбирает самый компактный профиль, укладывающийся в latency_budget_ms.
+        latency_budget_ms: Бюджет времени на кодирование для 'auto' (мс).
+        lossless_palette: Пробовать PNG с палитрой (до 256 цветов) или lossless
+            WebP; применяется, если он меньше и совпадает пиксель в пиксель.
+        variant_levels: Уровни детализации вариантов (например ['Low', 'Medium',
+            'High']): код рендерится один раз в наибольшем из них, остальные
+            получаются уменьшением; файлы <имя>@<масштаб>x.<формат> и манифест
+            <имя>.manifest.json. Только для return_mode 'file', detail_level
+            при этом не используется.
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'):
+            размер и память оцениваются до растеризации; 'downgrade' понижает
+            detail_level до уровня, укладывающегося в RENDER_MAX_MEGAPIXELS и
+            RENDER_MAX_MEMORY_MB (поле render_budget в ответе), 'reject'
+            отклоняет запрос сверх бюджета.
+        long_lines: Политика строк длиннее max_line_columns колонок
+            ('wrap', 'truncate', 'off'): 'wrap' переносит строку (продолжения
+            помечаются '→' в колонке номеров), 'truncate' обрезает её с '…';
+            затронутые строки возвращаются в поле long_lines.
+        max_line_columns: Предел ширины строки в колонках (не меньше 20).
 
     Returns:
-        Словарь с информацией о созданном изображении.
+        Словарь с информацией о созданном изображении
+        (для 'inline' — изображение и словарь).
     """
-    # Конвертируем detail_level в scale_factor через QUALITY_LEVELS
-    from src.diagram_renderer import QUALITY_LEVELS
+    mode_error = (
+        _check_return_mode(return_mode)
+        or _check_encoder_profile(encoder_profile)
+        or _check_variant_levels(variant_levels, return_mode)
+        or _check_budget_policy(budget_policy)
+        or _check_long_lines(long_lines, max_line_columns)
+    )
+    if mode_error:
+        return mode_error
 
-    level_key = detail_level.capitalize()
-    scale_factor = QUALITY_LEVELS.get(level_key, 3.0)  # Fallback на High
+    # Конвертируем detail_level в scale_factor через QUALITY_LEVELS с учётом бюджета
+    try:
+        budget = _fit_budget(
+            lambda scale: estimate_code_render(
+                code,
+                scale,
+                font_name=font_name,
+                font_size=font_size,
+                line_numbers=line_numbers,
+                format=image_format,
+                long_lines=long_lines,
+                max_line_columns=max_line_columns,
+            ),
+            detail_level,
+            budget_policy,
+            variant_levels,
+        )
+    except RenderBudgetError as e:
+        return _budget_error(e)
+    except Exception as e:
+        # Оценка загружает шрифт: ошибка возвращается так же, как при рендеринге
+        return _screenshot_error(e)
 
-    return _generate_screenshot_from_code(
+    result = _generate_screenshot_from_code(
         code=code,
         language=language,
         output_path=output_path,
         style=style,
         font_size=font_size,
-        scale_factor=scale_factor,
+        scale_factor=budget["scale_factor"],
         line_numbers=line_numbers,
         font_name=font_name,
         format=image_format,
+        return_mode=return_mode,
+        encoder_profile=encoder_profile,
+        latency_budget_ms=latency_budget_ms,
+        lossless_palette=lossless_palette,
+        variant_levels=variant_levels,
+        long_lines=long_lines,
+        max_line_columns=max_line_columns,
     )
+    if result.get("success"):
+        result.update(_budget_fields(budget))
+    return _image_response(result, return_mode, max_inline_kb)
 
 
 @mcp.tool()
+@offload_to_executor
+@instrument_tool
 def generate_file_screenshot(
     file_path: str,
-    output_path: str,
+    output_path: str = "",
     language: str | None = None,
     detail_level: str = "High",
     image_format: str = "webp",
@@ -172,10 +614,21 @@ def generate_file_screenshot(
     font_size: int = 18,
     line_numbers: bool = True,
     font_name: str = "JetBrainsMono",
-) -> dict:
+    output_mode: str = "auto",
+    return_mode: str = "file",
+    max_inline_kb: int = INLINE_IMAGE_MAX_KB,
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    lossless_palette: bool = False,
+    budget_policy: str = RENDER_BUDGET_POLICY,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+) -> dict | list:
     """Создаёт скриншот кода из файла.
 
-    ⚠️ ВАЖНО: Файл ограничен 200 строками.
+    Файлы длиннее 200 строк рендерятся полосами с ограниченной памятью
+    (до TILED_MAX_FILE_LINES строк): в одно PNG, дописываемое по мере
+    готовности, или в набор страниц <имя>_page_001.<формат>.
 
     CRITICAL RULES FOR AI MODELS:
     1. NEVER hardcode colors or use !theme/!include directives in diagram_code
@@ -194,12 +647,56 @@ def generate_file_screenshot(
         font_size: Базовый размер шрифта (умножается на detail_level).
         line_numbers: Показывать нумерацию строк.
         font_name: Имя шрифта (JetBrainsMono, FiraCode, CascadiaCode, Consolas).
+        output_mode: Режим вывода ('auto', 'single', 'stitched', 'pages').
+            'auto' — одно изображение для файлов до 200 строк, для больших
+            склейка в PNG (image_format='png') или страницы в остальных форматах;
+            склейка больше TILED_STITCH_MAX_MEGAPIXELS заменяется страницами
+            (поле stitch_fallback). Явная 'stitched' сверх предела отклоняется.
+        return_mode: Способ возврата изображения ('file', 'inline', 'base64').
+            'inline' — MCP ImageContent в ответе, 'base64' — поле image_base64;
+            в обоих случаях файл не записывается и output_path не нужен
+            (доступно только для output_mode 'single').
+        max_inline_kb: Предельный размер изображения для 'inline' и 'base64'.
+        encoder_profile: Профиль кодировщика ('auto', 'fast', 'balanced', 'smallest').
+            'auto' выбирает самый компактный профиль, укладывающийся в latency_budget_ms.
+        latency_budget_ms: Бюджет времени на кодирование для 'auto' (мс).
+        lossless_palette: Пробовать PNG с палитрой (до 256 цветов) или lossless
+            WebP; применяется, если он меньше и совпадает пиксель в пиксель.
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'):
+            размер и память оцениваются до растеризации; 'downgrade' понижает
+            detail_level до уровня, укладывающегося в RENDER_MAX_MEGAPIXELS и
+            RENDER_MAX_MEMORY_MB (поле render_budget в ответе), 'reject'
+            отклоняет запрос сверх бюджета. Бюджет проверяется для 'single' и
+            'stitched'; страницы ('pages', а также 'auto', где склейка сверх
+            предела заменяется страницами) бюджетом не ограничиваются.
+        long_lines: Политика строк длиннее max_line_columns колонок
+            ('wrap', 'truncate', 'off'): 'wrap' переносит строку (продолжения
+            помечаются '→' в колонке номеров), 'truncate' обрезает её с '…';
+            затронутые строки возвращаются в поле long_lines.
+        max_line_columns: Предел ширины строки в колонках (не меньше 20).
 
     Returns:
-        Словарь с информацией о созданном изображении.
+        Словарь с информацией о созданном изображении (для 'pages' — список страниц,
+        для 'inline' — изображение и словарь).
     """
     logger.info(f"📥 Получен запрос generate_file_screenshot: {file_path}")
 
+    if output_mode not in FILE_OUTPUT_MODES:
+        return {
+            "success": False,
+            "error": f"Неизвестный режим вывода: {output_mode}",
+            "suggestion": f"Используйте один из режимов: {', '.join(FILE_OUTPUT_MODES)}",
+        }
+
+    mode_error = (
+        _check_return_mode(return_mode)
+        or _check_encoder_profile(encoder_profile)
+        or _check_budget_policy(budget_policy)
+        or _check_long_lines(long_lines, max_line_columns)
+    )
+    if mode_error:
+        return mode_error
+
     try:
         if not os.path.isabs(file_path):
             logger.error(f"🚫 Путь к файлу не абсолютный: {file_path}")
@@ -229,16 +726,45 @@ def generate_file_screenshot(
         with open(file_path, "r", encoding="utf-8") as f:
             lines = f.readlines()
 
-        if len(lines) > MAX_FILE_LINES:
+        max_allowed = MAX_FILE_LINES if output_mode == "single" else TILED_MAX_FILE_LINES
+        if len(lines) > max_allowed:
             logger.warning(
-                f"⚠️ Файл содержит {len(lines)} строк, превышает лимит {MAX_FILE_LINES}"
+                f"⚠️ Файл содержит {len(lines)} строк, превышает лимит {max_allowed}"
             )
             return {
                 "success": False,
-                "error": f"Файл содержит {len(lines)} строк, что превышает лимит {MAX_FILE_LINES}",
-                "suggestion": "Используйте generate_code_screenshot для фрагмента кода или файл меньшего размера",
+                "error": f"Файл содержит {len(lines)} строк, что превышает лимит {max_allowed}",
+                "suggestion": "Используйте generate_entity_screenshot для отдельных функций и классов",
                 "lines_in_file": len(lines),
-                "max_allowed": MAX_FILE_LINES,
+                "max_allowed": max_allowed,
+            }
+
+        # В режиме auto слишком большая склейка заменяется страницами
+        stitch_fallback = output_mode == "auto"
+        if output_mode == "auto":
+            if len(lines) <= MAX_FILE_LINES:
+                output_mode = "single"
+            else:
+                output_mode = "stitched" if image_format.lower() == "png" else "pages"
+
+        if return_mode != "file" and output_mode != "single":
+            return {
+                "success": False,
+                "error": (
+                    f"Файл из {len(lines)} строк рендерится полосами, "
+                    "это возможно только с записью в файл"
+                ),
+                "suggestion": (
+                    "Используйте return_mode='file' с output_path или "
+                    "generate_entity_screenshot для отдельных функций и классов"
+                ),
+            }
+
+        if output_mode == "stitched" and image_format.lower() != "png":
+            return {
+                "success": False,
+                "error": "Склейка полос поддерживается только для PNG",
+                "suggestion": "Используйте image_format='png' или output_mode='pages'",
             }
 
         code = "".join(lines)
@@ -278,31 +804,102 @@ def generate_file_screenshot(
             language = ext_to_lang.get(ext.lower(), "text")
             logger.debug(f"🔍 Определён язык по расширению: {language}")
 
-        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS
-        from src.diagram_renderer import QUALITY_LEVELS
-
-        level_key = detail_level.capitalize()
-        scale_factor = QUALITY_LEVELS.get(level_key, 3.0)  # Fallback на High
-
-        result = _generate_screenshot_from_code(
-            code=code,
-            language=language,
-            output_path=output_path,
-            style=style,
-            font_size=font_size,
-            scale_factor=scale_factor,
-            line_numbers=line_numbers,
-            font_name=font_name,
-            format=image_format,
+        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS; бюджет
+        # ограничивает одно изображение и явную склейку, страницы не ограничены
+        budgeted = output_mode == "single" or (
+            output_mode == "stitched" and not stitch_fallback
         )
+        try:
+            budget = _fit_budget(
+                lambda scale: estimate_code_render(
+                    code,
+                    scale,
+                    font_name=font_name,
+                    font_size=font_size,
+                    line_numbers=line_numbers,
+                    format=image_format,
+                    long_lines=long_lines,
+                    max_line_columns=max_line_columns,
+                ),
+                detail_level,
+                budget_policy if budgeted else "off",
+            )
+        except RenderBudgetError as e:
+            return _budget_error(e)
+        except Exception as e:
+            # Оценка загружает шрифт: ошибка возвращается так же, как при рендеринге
+            return _screenshot_error(e)
+        scale_factor = budget["scale_factor"]
+
+        if output_mode == "single":
+            result = _generate_screenshot_from_code(
+                code=code,
+                language=language,
+                output_path=output_path,
+                style=style,
+                font_size=font_size,
+                scale_factor=scale_factor,
+                line_numbers=line_numbers,
+                font_name=font_name,
+                format=image_format,
+                return_mode=return_mode,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+                lossless_palette=lossless_palette,
+                long_lines=long_lines,
+                max_line_columns=max_line_columns,
+            )
+        else:
+            if not os.path.isabs(output_path):
+                logger.error(f"🚫 Путь не абсолютный: {output_path}")
+                return {
+                    "success": False,
+                    "error": "Путь должен быть абсолютным",
+                    "suggestion": f"Используйте абсолютный путь, например: /path/to/{output_path}",
+                }
+
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+
+            result = render_code_tiled(
+                code,
+                language,
+                output_path,
+                output_mode,
+                style=style,
+                font_size=font_size,
+                scale_factor=scale_factor,
+                line_numbers=line_numbers,
+                font_name=font_name,
+                format=image_format,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+                lossless_palette=lossless_palette,
+                long_lines=long_lines,
+                max_line_columns=max_line_columns,
+                stitch_fallback=stitch_fallback,
+            )
+            result["font_used"] = font_name
+            logger.info(
+                f"📤 Отправлен результат: success=True, size={result['file_size_kb']}KB"
+            )
 
         if result.get("success"):
             result["source_file"] = file_path
             result["lines_processed"] = len(lines)
             result["language_detected"] = language
+            result.update(_budget_fields(budget))
 
-        return result
+        return _image_response(result, return_mode, max_inline_kb)
 
+    except ImageProcessingError as e:
+        logger.error(f"❌ Ошибка полосового рендеринга: {e}")
+        return {
+            "success": False,
+            "error": str(e),
+            "suggestion": "Используйте output_mode='pages' или 'auto', либо уменьшите detail_level",
+        }
     except UnicodeDecodeError:
         logger.error(f"🌐 Ошибка кодировки файла: {file_path}")
         return {
@@ -320,10 +917,12 @@ def generate_file_screenshot(
 
 
 @mcp.tool()
+@offload_to_executor
+@instrument_tool
 def generate_entity_screenshot(
     file_path: str,
     entity_name: str,
-    output_path: str,
+    output_path: str = "",
     include_decorators: bool = True,
     detail_level: str = "High",
     image_format: str = "webp",
@@ -331,7 +930,16 @@ def generate_entity_screenshot(
     font_size: int = 18,
     line_numbers: bool = True,
     font_name: str = "JetBrainsMono",
-) -> dict:
+    return_mode: str = "file",
+    max_inline_kb: int = INLINE_IMAGE_MAX_KB,
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    lossless_palette: bool = False,
+    variant_levels: list[str] | None = None,
+    budget_policy: str = RENDER_BUDGET_POLICY,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+) -> dict | list:
     """Извлекает и создаёт скриншот конкретной функции/класса/метода из Python файла.
 
     ✨ УМНЫЙ ИНСТРУМЕНТ для точечной работы с большими файлами без ограничения на размер.
@@ -339,6 +947,8 @@ def generate_entity_screenshot(
 
     Use this to extract specific functions or classes from large files without reading
     the whole file into context. Supports format 'ClassName.method_name' for methods.
+    If you don't know the file, pass the PROJECT ROOT directory as file_path and a
+    reference like 'package.module:Class.method' or just 'Class.method'.
 
     ВАЖНО (ограничение): Этот инструмент поддерживает ТОЛЬКО Python-исходники
     (файлы с расширением ``.py``). Для парсинга используется модуль ``ast``,
@@ -349,11 +959,13 @@ def generate_entity_screenshot(
     передайте его в ``generate_code_screenshot``.
 
     Args:
-        file_path: АБСОЛЮТНЫЙ путь к Python файлу.
+        file_path: АБСОЛЮТНЫЙ путь к Python файлу или к корню проекта
+            (тогда сущность ищется по индексу проекта).
         entity_name: Имя сущности для извлечения:
             - "function_name" для функции
             - "ClassName" для класса целиком
             - "ClassName.method_name" для метода класса
+            - "package.module:Class.method" при поиске по корню проекта
         output_path: АБСОЛЮТНЫЙ путь к выходному файлу.
         include_decorators: Включать декораторы (@tool, @pytest.fixture, etc) в скриншот.
         detail_level: Уровень детализации ('Low', 'Medium', 'High', 'Ultra', 'Extreme').
@@ -362,16 +974,75 @@ def generate_entity_screenshot(
         font_size: Базовый размер шрифта (умножается на detail_level).
         line_numbers: Показывать нумерацию строк.
         font_name: Имя шрифта (JetBrainsMono, FiraCode, CascadiaCode, Consolas).
+        return_mode: Способ возврата изображения ('file', 'inline', 'base64').
+            'inline' — MCP ImageContent в ответе, 'base64' — поле image_base64;
+            в обоих случаях файл не записывается и output_path не нужен.
+        max_inline_kb: Предельный размер изображения для 'inline' и 'base64'.
+        encoder_profile: Профиль кодировщика ('auto', 'fast', 'balanced', 'smallest').
+            'auto' выбирает самый компактный профиль, укладывающийся в latency_budget_ms.
+        latency_budget_ms: Бюджет времени на кодирование для 'auto' (мс).
+        lossless_palette: Пробовать PNG с палитрой (до 256 цветов) или lossless
+            WebP; применяется, если он меньше и совпадает пиксель в пиксель.
+        variant_levels: Уровни детализации вариантов (например ['Low', 'Medium',
+            'High']): код рендерится один раз в наибольшем из них, остальные
+            получаются уменьшением; файлы <имя>@<масштаб>x.<формат> и манифест
+            <имя>.manifest.json. Только для return_mode 'file', detail_level
+            при этом не используется.
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'):
+            размер и память оцениваются до растеризации; 'downgrade' понижает
+            detail_level до уровня, укладывающегося в RENDER_MAX_MEGAPIXELS и
+            RENDER_MAX_MEMORY_MB (поле render_budget в ответе), 'reject'
+            отклоняет запрос сверх бюджета.
+        long_lines: Политика строк длиннее max_line_columns колонок
+            ('wrap', 'truncate', 'off'): 'wrap' переносит строку (продолжения
+            помечаются '→' в колонке номеров), 'truncate' обрезает её с '…';
+            затронутые строки возвращаются в поле long_lines.
+        max_line_columns: Предел ширины строки в колонках (не меньше 20).
 
     Returns:
-        Словарь с информацией о созданном изображении и метаданами сущности.
+        Словарь с информацией о созданном изображении и метаданами сущности
+        (для 'inline' — изображение и словарь).
     """
 
     logger.info(
         f"📥 Получен запрос generate_entity_screenshot: {entity_name} из {file_path}"
     )
 
+    mode_error = (
+        _check_return_mode(return_mode)
+        or _check_encoder_profile(encoder_profile)
+        or _check_variant_levels(variant_levels, return_mode)
+        or _check_budget_policy(budget_policy)
+        or _check_long_lines(long_lines, max_line_columns)
+    )
+    if mode_error:
+        return mode_error
+
     try:
+        entity_reference = None
+        if os.path.isdir(file_path):
+            # Корень проекта: находим файл по индексу сущностей
+            locations = get_project_index(file_path).find(entity_name)
+            if len(locations) != 1:
+                logger.error(
+                    f"🔍 Сущность '{entity_name}' в проекте: найдено {len(locations)}"
+                )
+                return {
+                    "success": False,
+                    "error": (
+                        f"Сущность '{entity_name}' не найдена в проекте"
+                        if not locations
+                        else f"Имя '{entity_name}' неоднозначно"
+                    ),
+                    "suggestion": (
+                        "Укажите ссылку с модулем: 'package.module:Class.method'"
+                    ),
+                    "candidates": [location.reference for location in locations],
+                }
+            entity_reference = locations[0].reference
+            file_path = locations[0].path
+            entity_name = locations[0].qualname
+
         # Извлекаем код сущности через AST
         extracted_code = extract_code_entity(
             file_path=file_path,
@@ -381,11 +1052,28 @@ def generate_entity_screenshot(
 
         logger.debug(f"✅ Извлечено {len(extracted_code)} символов кода")
 
-        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS
-        from src.diagram_renderer import QUALITY_LEVELS
-
-        level_key = detail_level.capitalize()
-        scale_factor = QUALITY_LEVELS.get(level_key, 3.0)  # Fallback на High
+        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS с учётом бюджета
+        try:
+            budget = _fit_budget(
+                lambda scale: estimate_code_render(
+                    extracted_code,
+                    scale,
+                    font_name=font_name,
+                    font_size=font_size,
+                    line_numbers=line_numbers,
+                    format=image_format,
+                    long_lines=long_lines,
+                    max_line_columns=max_line_columns,
+                ),
+                detail_level,
+                budget_policy,
+                variant_levels,
+            )
+        except RenderBudgetError as e:
+            return _budget_error(e)
+        except Exception as e:
+            # Оценка загружает шрифт: ошибка возвращается так же, как при рендеринге
+            return _screenshot_error(e)
 
         # Генерируем скриншот извлечённого кода
         result = _generate_screenshot_from_code(
@@ -394,20 +1082,30 @@ def generate_entity_screenshot(
             output_path=output_path,
             style=style,
             font_size=font_size,
-            scale_factor=scale_factor,
+            scale_factor=budget["scale_factor"],
             line_numbers=line_numbers,
             font_name=font_name,
             format=image_format,
+            return_mode=return_mode,
+            encoder_profile=encoder_profile,
+            latency_budget_ms=latency_budget_ms,
+            lossless_palette=lossless_palette,
+            variant_levels=variant_levels,
+            long_lines=long_lines,
+            max_line_columns=max_line_columns,
         )
 
         # Добавляем метаданные об извлечении
         if result.get("success"):
             result["entity_extracted"] = entity_name
             result["source_file"] = file_path
+            if entity_reference:
+                result["entity_reference"] = entity_reference
             result["decorators_included"] = include_decorators
             result["extraction_method"] = "AST"
+            result.update(_budget_fields(budget))
 
-        return result
+        return _image_response(result, return_mode, max_inline_kb)
 
     except EntityNotFoundError as e:
         logger.error(f"🔍 Сущность не найдена: {e}")
@@ -457,13 +1155,287 @@ def generate_entity_screenshot(
 
 
 @mcp.tool()
+@offload_to_executor
+@instrument_tool
+def generate_entity_screenshots_batch(
+    file_path: str,
+    entities: list[str],
+    output_dir: str,
+    include_decorators: bool = True,
+    detail_level: str = "High",
+    image_format: str = "webp",
+    style: str = "monokai",
+    font_size: int = 18,
+    line_numbers: bool = True,
+    font_name: str = "JetBrainsMono",
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    lossless_palette: bool = False,
+    budget_policy: str = RENDER_BUDGET_POLICY,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+) -> dict:
+    """Создаёт скриншоты нескольких функций/классов/методов Python файла за один вызов.
+
+    Файл разбирается один раз, скриншоты рендерятся параллельно на всех ядрах.
+    Ошибка в одной сущности не прерывает пакет: результат возвращается для
+    каждой сущности отдельно.
+
+    Use this instead of calling generate_entity_screenshot once per entity when
+    documenting a module. Glob patterns are supported: 'Order.*' selects all
+    methods of Order, 'test_*' selects matching top-level functions/classes.
+
+    ВАЖНО: Поддерживаются только Python-исходники (``.py``), как и у
+    generate_entity_screenshot.
+
+    Args:
+        file_path: АБСОЛЮТНЫЙ путь к Python файлу.
+        entities: Имена сущностей или шаблоны:
+            - "function_name", "ClassName", "ClassName.method_name"
+            - "Order.*" (все методы класса), "handle_*" (функции/классы по шаблону)
+        output_dir: АБСОЛЮТНЫЙ путь к папке для изображений
+            (файлы называются <имя сущности>.<формат>).
+        include_decorators: Включать декораторы (@tool, @pytest.fixture, etc) в скриншот.
+        detail_level: Уровень детализации ('Low', 'Medium', 'High', 'Ultra', 'Extreme').
+        image_format: Формат изображения ('webp', 'png', 'jpeg').
+        style: Стиль подсветки (monokai, dracula, github-dark, vim).
+        font_size: Базовый размер шрифта (умножается на detail_level).
+        line_numbers: Показывать нумерацию строк.
+        font_name: Имя шрифта (JetBrainsMono, FiraCode, CascadiaCode, Consolas).
+        encoder_profile: Профиль кодировщика ('auto', 'fast', 'balanced', 'smallest').
+        latency_budget_ms: Бюджет времени на кодирование одного скриншота для 'auto' (мс).
+        lossless_palette: Пробовать PNG с палитрой (до 256 цветов) или lossless
+            WebP; применяется, если он меньше и совпадает пиксель в пиксель.
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'),
+            как у generate_entity_screenshot; применяется к каждой сущности
+            отдельно, сущность сверх бюджета возвращается как ошибка.
+        long_lines: Политика строк длиннее max_line_columns колонок
+            ('wrap', 'truncate', 'off'), как у generate_entity_screenshot.
+        max_line_columns: Предел ширины строки в колонках (не меньше 20).
+
+    Returns:
+        Словарь со сводкой (total, succeeded, failed) и списком results,
+        где у каждого результата есть поле entity.
+    """
+    logger.info(
+        f"📥 Получен запрос generate_entity_screenshots_batch: {len(entities)} "
+        f"имён из {file_path}"
+    )
+
+    profile_error = (
+        _check_encoder_profile(encoder_profile)
+        or _check_budget_policy(budget_policy)
+        or _check_long_lines(long_lines, max_line_columns)
+    )
+    if profile_error:
+        return profile_error
+
+    for path in (file_path, output_dir):
+        if not os.path.isabs(path):
+            logger.error(f"🚫 Путь не абсолютный: {path}")
+            return {
+                "success": False,
+                "error": "Пути должны быть абсолютными",
+                "suggestion": f"Используйте абсолютный путь, например: /path/to/{path}",
+            }
+
+    try:
+        resolved = resolve_entity_patterns(file_path, entities)
+    except FileNotFoundError:
+        logger.error(f"❌ Файл не найден: {file_path}")
+        return {
+            "success": False,
+            "error": f"Файл не найден: {file_path}",
+            "suggestion": "Проверьте правильность пути к файлу",
+        }
+    except SyntaxError as e:
+        logger.error(f"💥 Синтаксическая ошибка в Python файле: {e}")
+        return {
+            "success": False,
+            "error": "Синтаксическая ошибка в Python файле",
+            "details": str(e),
+            "suggestion": "Исправьте синтаксические ошибки в исходном файле",
+        }
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    results: list[dict] = []
+    jobs = []
+    job_entities = []
+    job_slots = []
+    job_budgets = []
+    for pattern, names in resolved.items():
+        if not names:
+            results.append(
+                {
+                    "entity": pattern,
+                    "success": False,
+                    "error": f"Шаблон '{pattern}' не совпал ни с одной сущностью",
+                }
+            )
+        for name in names:
+            if name in job_entities:
+                continue
+            try:
+                code = extract_code_entity(file_path, name, include_decorators)
+            except EntityNotFoundError as e:
+                results.append({"entity": name, "success": False, "error": str(e)})
+                continue
+
+            # Бюджет проверяется для каждой сущности, как в generate_entity_screenshot
+            try:
+                budget = _fit_budget(
+                    lambda scale: estimate_code_render(
+                        code,
+                        scale,
+                        font_name=font_name,
+                        font_size=font_size,
+                        line_numbers=line_numbers,
+                        format=image_format,
+                        long_lines=long_lines,
+                        max_line_columns=max_line_columns,
+                    ),
+                    detail_level,
+                    budget_policy,
+                )
+            except RenderBudgetError as e:
+                results.append({"entity": name, **_budget_error(e)})
+                continue
+            except Exception as e:
+                results.append({"entity": name, **_screenshot_error(e)})
+                continue
+
+            job_entities.append(name)
+            job_slots.append(len(results))
+            job_budgets.append(budget)
+            results.append({"entity": name})
+            jobs.append(
+                {
+                    "code_string": code,
+                    "language": "python",
+                    "output_file": os.path.join(output_dir, f"{name}.{image_format}"),
+                    "style": style,
+                    "font_size": font_size,
+                    "scale_factor": budget["scale_factor"],
+                    "line_numbers": line_numbers,
+                    "font_name": font_name,
+                    "format": image_format,
+                    "encoder_profile": encoder_profile,
+                    "latency_budget_ms": latency_budget_ms,
+                    "lossless_palette": lossless_palette,
+                    "long_lines": long_lines,
+                    "max_line_columns": max_line_columns,
+                }
+            )
+
+    # Результаты в порядке запрошенных имён
+    rendered = create_code_screenshots_batch(jobs)
+    for slot, budget, result in zip(job_slots, job_budgets, rendered):
+        results[slot].update(result)
+        if result.get("success"):
+            results[slot].update(_budget_fields(budget))
+
+    succeeded = sum(1 for result in results if result["success"])
+    logger.info(
+        f"📤 Пакет скриншотов сущностей готов: успешно {succeeded}, "
+        f"с ошибками {len(results) - succeeded}"
+    )
+
+    return {
+        "success": bool(results) and succeeded == len(results),
+        "source_file": file_path,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+
+@mcp.tool()
+@offload_to_executor
+@instrument_tool
+def find_code_entity(project_root: str, query: str, limit: int = 20) -> dict:
+    """Находит функцию/класс/метод в Python проекте без пути к файлу.
+
+    Use this instead of listing directories to locate code. The first call on a
+    project builds a persistent index (changed files are re-parsed incrementally);
+    subsequent lookups take well under a millisecond.
+
+    Args:
+        project_root: АБСОЛЮТНЫЙ путь к корню проекта.
+        query: Ссылка на сущность:
+            - "package.module:Class.method" или "package.module.Class.method"
+            - "Class.method", "ClassName", "function_name"
+        limit: Максимальное число результатов.
+
+    Returns:
+        Словарь со списком matches (reference, file_path, kind, lines).
+        Ссылку reference можно передать в generate_entity_screenshot вместе
+        с корнем проекта.
+    """
+    logger.info(f"📥 Получен запрос find_code_entity: {query} в {project_root}")
+
+    if not os.path.isabs(project_root):
+        logger.error(f"🚫 Путь не абсолютный: {project_root}")
+        return {
+            "success": False,
+            "error": "Путь к проекту должен быть абсолютным",
+            "suggestion": f"Используйте абсолютный путь, например: /path/to/{project_root}",
+        }
+
+    try:
+        index = get_project_index(project_root)
+        matches = index.find(query, limit=limit)
+    except NotADirectoryError:
+        logger.error(f"❌ Не директория: {project_root}")
+        return {
+            "success": False,
+            "error": f"Путь указывает не на директорию: {project_root}",
+            "suggestion": "Укажите корень проекта",
+        }
+    except Exception as e:
+        logger.error(f"❌ Ошибка индекса проекта: {e}")
+        return {
+            "success": False,
+            "error": str(e),
+            "suggestion": "Проверьте доступность директории проекта",
+        }
+
+    logger.info(f"📤 Найдено сущностей: {len(matches)}")
+
+    result = {
+        "success": bool(matches),
+        "query": query,
+        "matches": [location.to_dict() for location in matches],
+        "index": index.get_stats(),
+    }
+    if not matches:
+        result["error"] = f"Сущность '{query}' не найдена в проекте"
+        result["suggestion"] = (
+            "Проверьте имя; для методов используйте формат 'ClassName.method_name'"
+        )
+    return result
+
+
+@mcp.tool()
+@offload_to_executor
+@instrument_tool
 def generate_architecture_diagram(
     diagram_code: str,
-    output_path: str,
+    output_path: str = "",
     detail_level: str = "High",
     image_format: str = "png",
     theme_name: str = "default",
-) -> dict:
+    optimize_size: bool = False,
+    return_mode: str = "file",
+    max_inline_kb: int = INLINE_IMAGE_MAX_KB,
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    variant_levels: list[str] | None = None,
+    include_svg: bool = False,
+    output_mode: str = "auto",
+    budget_policy: str = RENDER_BUDGET_POLICY,
+) -> dict | list:
     """Генерирует UML диаграмму из PlantUML кода.
 
     ⚠️ CRITICAL RULES (READ CAREFULLY):
@@ -484,14 +1456,58 @@ def generate_architecture_diagram(
         detail_level: Уровень детализации ('Low', 'Medium', 'High', 'Ultra', 'Extreme').
         image_format: Формат изображения ('png', 'svg', 'eps', 'pdf', 'webp').
         theme_name: Имя темы оформления из списка list_plantuml_themes (например: 'dark_gold').
+        optimize_size: Пережать PNG в фоне ради меньшего размера файла (без потерь);
+            file_size_kb в ответе тогда — размер до пережатия (см. file_size_note).
+        return_mode: Способ возврата изображения ('file', 'inline', 'base64').
+            'inline' — MCP ImageContent в ответе, 'base64' — поле image_base64;
+            в обоих случаях файл не записывается и output_path не нужен
+            (только форматы 'png' и 'webp').
+        max_inline_kb: Предельный размер изображения для 'inline' и 'base64'.
+        encoder_profile: Профиль кодировщика ('auto', 'fast', 'balanced', 'smallest').
+            'auto' выбирает самый компактный профиль, укладывающийся в latency_budget_ms.
+        latency_budget_ms: Бюджет времени на кодирование для 'auto' (мс).
+        variant_levels: Уровни детализации вариантов (например ['Medium', 'High',
+            'Ultra']): PlantUML запускается один раз в наибольшем DPI, остальные
+            уровни получаются уменьшением; файлы <имя>@<масштаб>x.<формат>
+            (png или webp) и манифест <имя>.manifest.json. detail_level при
+            этом не используется.
+        include_svg: Вместе с variant_levels сохранить и <имя>.svg.
+        output_mode: Режим вывода растра ('auto', 'single', 'deep_zoom').
+            'auto' пишет диаграммы больше DEEP_ZOOM_MIN_MEGAPIXELS плитками
+            Deep Zoom (<имя>.dzi и папка <имя>_files) для просмотрщиков вроде
+            OpenSeadragon, 'deep_zoom' — всегда плитками, 'single' — одним файлом.
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'):
+            размер растра и память оцениваются по числу элементов и связей до
+            запуска PlantUML; 'downgrade' понижает detail_level до уровня,
+            укладывающегося в RENDER_MAX_MEGAPIXELS и RENDER_MAX_MEMORY_MB
+            (поле render_budget в ответе), 'reject' отклоняет запрос сверх
+            бюджета. Плитки Deep Zoom ограничиваются только памятью.
 
     Returns:
-        Словарь с информацией о созданной диаграмме.
+        Словарь с информацией о созданной диаграмме
+        (для 'inline' — изображение и словарь).
     """
     logger.info("📥 Получен запрос generate_architecture_diagram")
 
+    mode_error = (
+        _check_return_mode(return_mode)
+        or _check_encoder_profile(encoder_profile)
+        or _check_variant_levels(variant_levels, return_mode)
+        or _check_diagram_output_mode(output_mode)
+        or _check_budget_policy(budget_policy)
+    )
+    if mode_error:
+        return mode_error
+
+    if return_mode != "file" and image_format not in ("png", "webp"):
+        return {
+            "success": False,
+            "error": f"Формат {image_format} нельзя вернуть изображением в ответе",
+            "suggestion": "Используйте image_format='png' или 'webp', либо return_mode='file'",
+        }
+
     try:
-        if not os.path.isabs(output_path):
+        if return_mode == "file" and not os.path.isabs(output_path):
             logger.error(f"🚫 Путь не абсолютный: {output_path}")
             return {
                 "success": False,
@@ -515,23 +1531,67 @@ def generate_architecture_diagram(
                 },
             }
 
-        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS
-        from src.diagram_renderer import QUALITY_LEVELS
-
-        level_key = detail_level.capitalize()
-        scale_factor = QUALITY_LEVELS.get(level_key, 3.0)  # Fallback на High
-
-        result = render_diagram_from_string(
-            diagram_code=diagram_code,
-            output_path=output_path,
-            format=image_format,
-            theme_name=theme_name,
-            scale_factor=scale_factor,
+        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS с учётом бюджета
+        estimate_format, estimate_mode = image_format, output_mode
+        if return_mode != "file":
+            estimate_mode = "single"
+        elif variant_levels:
+            estimate_format = os.path.splitext(output_path)[1].lstrip(".") or "png"
+            estimate_mode = "single"
+        budget = _fit_budget(
+            lambda scale: estimate_diagram_render(
+                diagram_code, scale, estimate_format, estimate_mode
+            ),
+            detail_level,
+            budget_policy,
+            variant_levels,
         )
+        scale_factor = budget["scale_factor"]
+
+        if return_mode != "file":
+            result = render_diagram_to_bytes(
+                diagram_code=diagram_code,
+                format=image_format,
+                theme_name=theme_name,
+                scale_factor=scale_factor,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+            )
+            if result.get("success"):
+                result.update(_budget_fields(budget))
+            return _image_response(result, return_mode, max_inline_kb)
+
+        if variant_levels:
+            result = render_diagram_variants(
+                diagram_code=diagram_code,
+                output_path=output_path,
+                scales=[QUALITY_LEVELS[level.capitalize()] for level in variant_levels],
+                theme_name=theme_name,
+                include_svg=include_svg,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+            )
+        else:
+            result = render_diagram_from_string(
+                diagram_code=diagram_code,
+                output_path=output_path,
+                format=image_format,
+                theme_name=theme_name,
+                scale_factor=scale_factor,
+                optimize=optimize_size,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+                output_mode=output_mode,
+            )
+
+        if result.get("success"):
+            result.update(_budget_fields(budget))
 
         logger.info(f"📤 Отправлен результат: success={result.get('success')}")
         return result
 
+    except RenderBudgetError as e:
+        return _budget_error(e)
     except PlantUMLSyntaxError as e:
         logger.error(f"💥 Синтаксическая ошибка PlantUML: {e}")
         return {
@@ -575,12 +1635,21 @@ def generate_architecture_diagram(
 
 
 @mcp.tool()
+@offload_to_executor
+@instrument_tool
 def generate_diagram_from_file(
     file_path: str,
     output_path: str,
     detail_level: str = "High",
     image_format: str = "png",
     theme_name: str = "default",
+    optimize_size: bool = False,
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    variant_levels: list[str] | None = None,
+    include_svg: bool = False,
+    output_mode: str = "auto",
+    budget_policy: str = RENDER_BUDGET_POLICY,
 ) -> dict:
     """Генерирует UML диаграмму из сохранённого .puml файла.
 
@@ -595,12 +1664,42 @@ def generate_diagram_from_file(
         detail_level: Уровень детализации ('Low', 'Medium', 'High', 'Ultra', 'Extreme').
         image_format: Формат изображения ('png', 'svg', 'eps', 'pdf', 'webp').
         theme_name: Имя темы оформления (default или None).
+        optimize_size: Пережать PNG в фоне ради меньшего размера файла (без потерь);
+            file_size_kb в ответе тогда — размер до пережатия (см. file_size_note).
+        encoder_profile: Профиль кодировщика WebP ('auto', 'fast', 'balanced', 'smallest');
+            PNG пишется без перекодирования.
+        latency_budget_ms: Бюджет времени на кодирование для 'auto' (мс).
+        variant_levels: Уровни детализации вариантов (например ['Medium', 'High',
+            'Ultra']): PlantUML запускается один раз в наибольшем DPI, остальные
+            уровни получаются уменьшением; файлы <имя>@<масштаб>x.<формат>
+            (png или webp) и манифест <имя>.manifest.json. detail_level при
+            этом не используется.
+        include_svg: Вместе с variant_levels сохранить и <имя>.svg.
+        output_mode: Режим вывода растра ('auto', 'single', 'deep_zoom').
+            'auto' пишет диаграммы больше DEEP_ZOOM_MIN_MEGAPIXELS плитками
+            Deep Zoom (<имя>.dzi и папка <имя>_files) для просмотрщиков вроде
+            OpenSeadragon, 'deep_zoom' — всегда плитками, 'single' — одним файлом.
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'):
+            размер растра и память оцениваются по числу элементов и связей до
+            запуска PlantUML; 'downgrade' понижает detail_level до уровня,
+            укладывающегося в RENDER_MAX_MEGAPIXELS и RENDER_MAX_MEMORY_MB
+            (поле render_budget в ответе), 'reject' отклоняет запрос сверх
+            бюджета. Плитки Deep Zoom ограничиваются только памятью.
 
     Returns:
         Словарь с информацией о созданной диаграмме.
     """
     logger.info(f"📥 Получен запрос generate_diagram_from_file: {file_path}")
 
+    profile_error = (
+        _check_encoder_profile(encoder_profile)
+        or _check_variant_levels(variant_levels, "file")
+        or _check_diagram_output_mode(output_mode)
+        or _check_budget_policy(budget_policy)
+    )
+    if profile_error:
+        return profile_error
+
     try:
         # Проверка существования файла
         if not os.path.isabs(file_path):
@@ -643,29 +1742,57 @@ def generate_diagram_from_file(
                 },
             }
 
-        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS
-        from src.diagram_renderer import QUALITY_LEVELS
-
-        level_key = detail_level.capitalize()
-        scale_factor = QUALITY_LEVELS.get(level_key, 3.0)  # Fallback на High
+        # Конвертируем detail_level в scale_factor через QUALITY_LEVELS с учётом бюджета
+        if variant_levels:
+            estimate_format = os.path.splitext(output_path)[1].lstrip(".") or "png"
+            estimate_mode = "single"
+        else:
+            estimate_format, estimate_mode = image_format, output_mode
+        budget = _fit_budget(
+            lambda scale: estimate_diagram_render(
+                diagram_code, scale, estimate_format, estimate_mode
+            ),
+            detail_level,
+            budget_policy,
+            variant_levels,
+        )
+        scale_factor = budget["scale_factor"]
 
         # Генерируем диаграмму
-        result = render_diagram_from_string(
-            diagram_code=diagram_code,
-            output_path=output_path,
-            format=image_format,
-            theme_name=theme_name,
-            scale_factor=scale_factor,
-        )
+        if variant_levels:
+            result = render_diagram_variants(
+                diagram_code=diagram_code,
+                output_path=output_path,
+                scales=[QUALITY_LEVELS[level.capitalize()] for level in variant_levels],
+                theme_name=theme_name,
+                include_svg=include_svg,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+            )
+        else:
+            result = render_diagram_from_string(
+                diagram_code=diagram_code,
+                output_path=output_path,
+                format=image_format,
+                theme_name=theme_name,
+                scale_factor=scale_factor,
+                optimize=optimize_size,
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+                output_mode=output_mode,
+            )
 
         # Добавляем метаданные об источнике
         if result.get("success"):
             result["source_file"] = file_path
             result["code_length"] = len(diagram_code)
+            result.update(_budget_fields(budget))
 
         logger.info(f"📤 Отправлен результат: success={result.get('success')}")
         return result
 
+    except RenderBudgetError as e:
+        return _budget_error(e)
     except UnicodeDecodeError:
         logger.error(f"🌐 Ошибка кодировки файла: {file_path}")
         return {
@@ -707,6 +1834,310 @@ def generate_diagram_from_file(
         }
 
 
+@mcp.tool()
+@offload_to_executor
+@instrument_tool
+def generate_diagrams_batch(
+    diagrams: list[dict],
+    detail_level: str = "High",
+    image_format: str = "png",
+    theme_name: str = "default",
+    encoder_profile: str = "auto",
+    latency_budget_ms: int = ENCODE_LATENCY_BUDGET_MS,
+    budget_policy: str = RENDER_BUDGET_POLICY,
+) -> dict:
+    """Генерирует пакет UML диаграмм из PlantUML кода за один вызов.
+
+    Use this when you need many diagrams at once (e.g. documenting a service):
+    all diagrams are streamed through one PlantUML process instead of starting
+    Java for each one. An error in one diagram does not fail the whole batch.
+    The same CRITICAL RULES as for generate_architecture_diagram apply.
+
+    ⚠️ ВАЖНО: Требуется Java (JRE 8+).
+
+    Args:
+        diagrams: Список диаграмм. Каждый элемент — словарь с ключами
+            'diagram_code' и 'output_path' (АБСОЛЮТНЫЙ путь) и необязательными
+            'detail_level', 'image_format', 'theme_name' (переопределяют общие)
+            и 'optimize_size' (фоновое пережатие PNG).
+        detail_level: Уровень детализации по умолчанию ('Low', 'Medium', 'High', 'Ultra', 'Extreme').
+        image_format: Формат изображения по умолчанию ('png', 'svg', 'eps', 'pdf', 'webp').
+        theme_name: Имя темы оформления по умолчанию из списка list_plantuml_themes.
+        encoder_profile: Профиль кодировщика WebP ('auto', 'fast', 'balanced', 'smallest').
+        latency_budget_ms: Бюджет времени на кодирование одной диаграммы для 'auto' (мс).
+        budget_policy: Политика бюджета рендеринга ('downgrade', 'reject', 'off'),
+            как у generate_architecture_diagram; применяется к каждой диаграмме
+            отдельно, диаграмма сверх бюджета возвращается как ошибка.
+
+    Returns:
+        Словарь со сводкой (total, succeeded, failed) и результатом для каждой диаграммы.
+    """
+    logger.info(f"📥 Получен запрос generate_diagrams_batch: {len(diagrams)} диаграмм")
+
+    profile_error = _check_encoder_profile(encoder_profile) or _check_budget_policy(
+        budget_policy
+    )
+    if profile_error:
+        return profile_error
+
+    try:
+        try:
+            ensure_java_environment()
+        except JavaNotFoundError as e:
+            logger.error("☕ Java не найдена в системе")
+            return {
+                "success": False,
+                "error": "Java не найдена в системе",
+                "details": str(e),
+                "suggestion": "Установите JRE (Java Runtime Environment) версии 8 или выше",
+                "install_instructions": {
+                    "macOS": "brew install openjdk",
+                    "Windows": "https://adoptium.net/",
+                    "Linux": "sudo apt-get install default-jre",
+                },
+            }
+
+        items = []
+        budgets = []
+        invalid = {}
+        for index, diagram in enumerate(diagrams):
+            output_path = diagram.get("output_path", "")
+            if not diagram.get("diagram_code") or not os.path.isabs(output_path):
+                logger.error(f"🚫 Некорректный элемент пакета #{index}: {output_path}")
+                invalid[index] = {
+                    "success": False,
+                    "index": index,
+                    "output_path": output_path,
+                    "error": "Нужны diagram_code и абсолютный output_path",
+                    "suggestion": f"Используйте абсолютный путь, например: /path/to/{output_path}",
+                }
+                continue
+
+            item_format = diagram.get("image_format", image_format)
+            try:
+                budget = _fit_budget(
+                    lambda scale: estimate_diagram_render(
+                        diagram["diagram_code"], scale, item_format
+                    ),
+                    diagram.get("detail_level", detail_level),
+                    budget_policy,
+                )
+            except RenderBudgetError as e:
+                invalid[index] = {
+                    **_budget_error(e),
+                    "index": index,
+                    "output_path": output_path,
+                }
+                continue
+
+            budgets.append(budget)
+            items.append(
+                {
+                    "diagram_code": diagram["diagram_code"],
+                    "output_path": output_path,
+                    "format": item_format,
+                    "theme_name": diagram.get("theme_name", theme_name),
+                    "scale_factor": budget["scale_factor"],
+                    "optimize": diagram.get("optimize_size", False),
+                    "encoder_profile": encoder_profile,
+                    "latency_budget_ms": latency_budget_ms,
+                }
+            )
+
+        batch = render_diagrams_batch(items)
+
+        # Возвращаем результаты в исходном порядке, включая отклонённые элементы
+        results = []
+        rendered = iter(zip(batch["results"], budgets))
+        for index in range(len(diagrams)):
+            if index in invalid:
+                results.append(invalid[index])
+            else:
+                result, budget = next(rendered)
+                result["index"] = index
+                if result["success"]:
+                    result.update(_budget_fields(budget))
+                results.append(result)
+
+        for result in results:
+            if not result["success"] and "PlantUML" in result.get("error", ""):
+                result["suggestion"] = (
+                    "Проверьте синтаксис PlantUML. ПОДСКАЗКА: Вызовите инструмент "
+                    "get_plantuml_guide с нужным типом диаграммы для получения справки."
+                )
+
+        failed = batch["failed"] + len(invalid)
+
+        logger.info(
+            f"📤 Отправлен результат пакета: успешно {batch['succeeded']}, с ошибками {failed}"
+        )
+        return {
+            "success": failed == 0,
+            "total": len(diagrams),
+            "succeeded": batch["succeeded"],
+            "failed": failed,
+            "results": results,
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Неожиданная ошибка: {e}")
+        return {
+            "success": False,
+            "error": str(e),
+            "suggestion": "Проверьте корректность параметров и доступность ресурсов",
+        }
+
+
+@mcp.tool()
+def estimate_render_cost(
+    source: str = "",
+    file_path: str = "",
+    kind: str = "code",
+    detail_level: str = "High",
+    image_format: str | None = None,
+    font_size: int = 18,
+    line_numbers: bool = True,
+    font_name: str = "JetBrainsMono",
+    output_mode: str = "auto",
+    budget_policy: str = RENDER_BUDGET_POLICY,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+) -> dict:
+    """Оценивает размер, память и время рендеринга без рендеринга.
+
+    Use this before requesting Ultra/Extreme or very large inputs: the estimate
+    shows whether the request fits the server budget and which detail_level
+    would be used.
+
+    Для кода размеры точные (строки, самая длинная строка и метрики шрифта),
+    для диаграмм — оценка по числу элементов и связей PlantUML.
+
+    Args:
+        source: Исходный код или PlantUML код.
+        file_path: АБСОЛЮТНЫЙ путь к файлу с исходником (вместо source).
+        kind: Что оценивать ('code' — скриншот кода, 'diagram' — диаграмма PlantUML).
+        detail_level: Уровень детализации ('Low', 'Medium', 'High', 'Ultra', 'Extreme').
+        image_format: Формат результата (по умолчанию 'webp' для кода, 'png' для диаграмм).
+        font_size: Базовый размер шрифта кода.
+        line_numbers: Колонка номеров строк кода.
+        font_name: Имя шрифта кода.
+        output_mode: Режим вывода растра диаграммы ('auto', 'single', 'deep_zoom').
+        budget_policy: Политика бюджета ('downgrade', 'reject', 'off'), с которой
+            будет выполнен запрос.
+        long_lines: Политика длинных строк кода ('wrap', 'truncate', 'off').
+        max_line_columns: Предел ширины строки кода в колонках.
+
+    Returns:
+        Словарь с оценкой запрошенного уровня (estimate), оценками всех
+        уровней (levels), пределами бюджета и уровнем, который будет
+        использован (detail_level_used, None — запрос будет отклонён).
+    """
+    logger.info(f"📥 Получен запрос estimate_render_cost: kind={kind}, level={detail_level}")
+
+    if kind not in ("code", "diagram"):
+        return {
+            "success": False,
+            "error": f"Неизвестный вид оценки: {kind}",
+            "suggestion": "Используйте kind='code' или kind='diagram'",
+        }
+
+    mode_error = (
+        _check_budget_policy(budget_policy)
+        or _check_diagram_output_mode(output_mode)
+        or _check_long_lines(long_lines, max_line_columns)
+    )
+    if mode_error:
+        return mode_error
+
+    if file_path:
+        if not os.path.isabs(file_path) or not os.path.isfile(file_path):
+            logger.error(f"❌ Файл не найден: {file_path}")
+            return {
+                "success": False,
+                "error": f"Файл не найден или путь не абсолютный: {file_path}",
+                "suggestion": "Укажите абсолютный путь к существующему файлу",
+            }
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except UnicodeDecodeError:
+            return {
+                "success": False,
+                "error": "Не удалось прочитать файл как текст",
+                "suggestion": "Убедитесь, что файл сохранён в UTF-8 кодировке",
+            }
+
+    if kind == "code":
+        image_format = image_format or "webp"
+
+        def estimate_for(scale: float) -> dict:
+            return estimate_code_render(
+                source,
+                scale,
+                font_name=font_name,
+                font_size=font_size,
+                line_numbers=line_numbers,
+                format=image_format,
+                long_lines=long_lines,
+                max_line_columns=max_line_columns,
+            )
+
+    else:
+        image_format = image_format or "png"
+
+        def estimate_for(scale: float) -> dict:
+            return estimate_diagram_render(source, scale, image_format, output_mode)
+
+    try:
+        levels = {level: estimate_for(scale) for level, scale in QUALITY_LEVELS.items()}
+    except Exception as e:
+        logger.error(f"❌ Ошибка оценки: {e}")
+        return {
+            "success": False,
+            "error": str(e),
+            "suggestion": "Проверьте корректность параметров и доступность шрифта",
+        }
+
+    level_key = detail_level.capitalize()
+    if level_key not in QUALITY_LEVELS:
+        level_key = "High"
+    by_scale = {QUALITY_LEVELS[level]: estimate for level, estimate in levels.items()}
+    try:
+        detail_level_used = fit_render_budget(
+            by_scale.__getitem__, level_key, budget_policy
+        )["detail_level"]
+    except RenderBudgetError:
+        detail_level_used = None
+
+    logger.info(
+        f"📤 Оценка {kind}: {levels[level_key]['megapixels']} MP, "
+        f"{levels[level_key]['peak_memory_mb']} MB, уровень {detail_level_used}"
+    )
+
+    return {
+        "success": True,
+        "kind": kind,
+        "estimate": levels[level_key],
+        "levels": {
+            level: {
+                "dimensions": estimate["dimensions"],
+                "megapixels": estimate["megapixels"],
+                "peak_memory_mb": estimate["peak_memory_mb"],
+                "estimated_total_ms": estimate["estimated_ms"]["total"],
+                "within_budget": not check_render_budget(estimate),
+            }
+            for level, estimate in levels.items()
+        },
+        "budget": {
+            "policy": budget_policy,
+            "max_megapixels": RENDER_MAX_MEGAPIXELS,
+            "max_memory_mb": RENDER_MAX_MEMORY_MB,
+        },
+        "within_budget": not check_render_budget(levels[level_key]),
+        "detail_level_used": detail_level_used,
+    }
+
+
 @mcp.tool()
 def get_plantuml_guide(
     diagram_type: str,
@@ -770,5 +2201,35 @@ def list_plantuml_themes() -> dict:
     }
 
 
+@mcp.tool()
+def get_render_stats() -> dict:
+    """Возвращает статистику времени рендеринга и кешей.
+
+    Перцентили p50/p95/p99 считаются по последним RENDER_STATS_WINDOW вызовам
+    каждого инструмента отдельно для каждого уровня детализации, с разбивкой
+    по этапам (lex, rasterize, encode, write, plantuml_cold, plantuml_layout,
+    ast_index и др.).
+
+    Returns:
+        Словарь с перцентилями по инструментам и этапам и счётчиками кешей.
+    """
+    logger.info("📊 Запрос статистики рендеринга")
+
+    render_caches = {}
+    for namespace in ("screenshots", "diagrams"):
+        cache = get_render_cache(namespace)
+        render_caches[namespace] = cache.get_stats() if cache is not None else None
+
+    return {
+        "success": True,
+        **collect_render_stats(),
+        "caches": {
+            "resources": get_resource_cache_stats(),
+            "render": render_caches,
+            "symbol_index": get_symbol_index_cache_stats(),
+        },
+    }
+
+
 if __name__ == "__main__":
     mcp.run()
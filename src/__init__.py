@@ -2,10 +2,22 @@
 
 Модули:
     code_to_image - генерация скриншотов кода
+    code_rasterizer - растеризация токенов Pygments напрямую в Pillow
+    config - настройки через переменные окружения
     diagram_renderer - рендеринг PlantUML диаграмм
+    plantuml_pool - пул постоянных процессов PlantUML
+    render_cache - кеш результатов рендеринга (память + диск)
+    render_executor - асинхронное выполнение рендеринга в пуле потоков
+    render_processes - пул процессов для параллельного рендеринга скриншотов
+    render_stats - замеры времени этапов рендеринга и перцентили
+    project_index - постоянный индекс сущностей Python проекта
+    resource_cache - LRU кеш лексеров, стилей и шрифтов Pygments
+    tiled_renderer - полосовой рендеринг скриншотов больших файлов
+    parallel_renderer - параллельная растеризация больших файлов по фрагментам
     font_manager - управление шрифтами
     font_initializer - инициализация шрифтов для PlantUML
     image_utils - утилиты для обработки изображений
+    java_runtime - однократная проба Java окружения
     guide_manager - управление гайдами по PlantUML
 """
 
@@ -3,15 +3,58 @@
 
 Позволяет точечно извлекать функции, классы и методы из больших файлов
 без необходимости читать весь файл целиком.
+
+Файл разбирается один раз: за один обход AST строится индекс сущностей
+(квалифицированное имя -> диапазон строк). Индексы кешируются в LRU по
+(путь, mtime, размер), поэтому повторные извлечения из того же файла
+сводятся к поиску в словаре. Изменённый файл получает новый ключ и
+разбирается заново.
+
+Классы:
+    SymbolSpan
+        Диапазон строк одной сущности.
+    SymbolIndex
+        Индекс сущностей файла с исходными строками.
+    EntityNotFoundError
+        Запрашиваемая сущность не найдена в файле.
+
+Функции:
+    extract_code_entity(file_path, entity_name, include_decorators) -> str
+        Извлекает исходный код функции, класса или метода.
+    list_entities(file_path) -> dict
+        Возвращает функции, классы и методы верхнего уровня.
+    resolve_entity_patterns(file_path, patterns) -> dict[str, list[str]]
+        Раскрывает glob шаблоны имён ("Order.*") в имена сущностей.
+    get_symbol_index(file_path) -> SymbolIndex
+        Возвращает закешированный индекс сущностей файла.
+    get_symbol_index_cache_stats() -> dict
+        Возвращает счётчики кеша индексов.
+    clear_symbol_index_cache() -> None
+        Очищает кеш индексов.
 """
 
 import ast
+import fnmatch
 import logging
+import os
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Literal
+
+from src.config import SYMBOL_INDEX_CACHE_SIZE
+from src.render_stats import stage
+from src.resource_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
+SymbolKind = Literal["function", "class", "method"]
+
+_DEFINITION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+_symbol_indexes = LRUCache("symbol_indexes", SYMBOL_INDEX_CACHE_SIZE)
+
 
 class EntityNotFoundError(Exception):
     """Исключение, когда запрашиваемая сущность не найдена в файле."""
@@ -19,14 +62,211 @@ class EntityNotFoundError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class SymbolSpan:
+    """Диапазон строк одной сущности.
+
+    Attributes:
+        qualname: Квалифицированное имя ("Order.validate").
+        kind: Вид сущности: function, class или method.
+        lineno: Строка определения (def/class), 1-based.
+        decorator_lineno: Строка первого декоратора (или lineno без декораторов).
+        end_lineno: Последняя строка сущности.
+    """
+
+    qualname: str
+    kind: SymbolKind
+    lineno: int
+    decorator_lineno: int
+    end_lineno: int
+
+    def start_line(self, include_decorators: bool) -> int:
+        return self.decorator_lineno if include_decorators else self.lineno
+
+
+@dataclass
+class SymbolIndex:
+    """Индекс сущностей файла.
+
+    Attributes:
+        source_lines: Строки исходного кода (с переводами строк).
+        symbols: Квалифицированное имя -> диапазон строк.
+        first_by_name: Короткое имя -> первая сущность в порядке ast.walk.
+        first_class_by_name: Короткое имя класса -> первый класс в порядке ast.walk.
+        top_level: Имена функций и классов верхнего уровня в порядке объявления.
+        methods: Квалифицированное имя класса -> методы из тела класса.
+    """
+
+    source_lines: list[str]
+    symbols: dict[str, SymbolSpan] = field(default_factory=dict)
+    first_by_name: dict[str, str] = field(default_factory=dict)
+    first_class_by_name: dict[str, str] = field(default_factory=dict)
+    top_level: list[str] = field(default_factory=list)
+    methods: dict[str, list[str]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, source_code: str, filename: str = "<unknown>") -> "SymbolIndex":
+        """Строит индекс за один обход AST.
+
+        Обход в ширину повторяет порядок ast.walk, поэтому при одинаковых
+        именах находится та же сущность, что и раньше.
+
+        Raises:
+            SyntaxError: Если исходный код содержит синтаксические ошибки.
+        """
+        tree = ast.parse(source_code, filename=filename)
+        index = cls(source_lines=source_code.splitlines(keepends=True))
+        top_level_ids = {id(node) for node in tree.body}
+
+        queue: deque[tuple[ast.AST, str, bool]] = deque([(tree, "", False)])
+        while queue:
+            node, prefix, in_class_body = queue.popleft()
+
+            if isinstance(node, _DEFINITION_NODES):
+                qualname = f"{prefix}{node.name}"
+                if isinstance(node, ast.ClassDef):
+                    kind = "class"
+                    index.first_class_by_name.setdefault(node.name, qualname)
+                    index.methods.setdefault(
+                        qualname,
+                        [item.name for item in node.body if isinstance(item, _FUNCTION_NODES)],
+                    )
+                else:
+                    kind = "method" if in_class_body else "function"
+
+                index.first_by_name.setdefault(node.name, qualname)
+                index.symbols.setdefault(
+                    qualname,
+                    SymbolSpan(
+                        qualname=qualname,
+                        kind=kind,
+                        lineno=node.lineno,
+                        decorator_lineno=_get_start_line(node, True),
+                        end_lineno=node.end_lineno,
+                    ),
+                )
+                if id(node) in top_level_ids:
+                    index.top_level.append(node.name)
+
+                member_ids = (
+                    {id(item) for item in node.body}
+                    if isinstance(node, ast.ClassDef)
+                    else set()
+                )
+                for child in ast.iter_child_nodes(node):
+                    queue.append((child, f"{qualname}.", id(child) in member_ids))
+            else:
+                for child in ast.iter_child_nodes(node):
+                    queue.append((child, prefix, False))
+
+        return index
+
+    def get_source(self, span: SymbolSpan, include_decorators: bool = True) -> str:
+        """Возвращает исходный код сущности."""
+        start_line = span.start_line(include_decorators)
+        return "".join(self.source_lines[start_line - 1 : span.end_lineno])
+
+    def find(self, entity_name: str) -> SymbolSpan:
+        """Находит сущность по имени ("name" или "ClassName.method_name").
+
+        Полное квалифицированное имя ("Outer.Inner.method") тоже принимается.
+
+        Raises:
+            EntityNotFoundError: Если сущность не найдена.
+        """
+        if "." in entity_name:
+            class_name, method_name = entity_name.split(".", 1)
+            logger.debug(f"🔍 Поиск метода '{method_name}' в классе '{class_name}'")
+            try:
+                return self._find_class_method(class_name, method_name)
+            except EntityNotFoundError:
+                if entity_name in self.symbols:
+                    return self.symbols[entity_name]
+                raise
+
+        logger.debug(f"🔍 Поиск функции/класса '{entity_name}' верхнего уровня")
+        qualname = self.first_by_name.get(entity_name)
+        if qualname is None:
+            error_msg = (
+                f"Сущность '{entity_name}' не найдена в файле.\n"
+                f"Доступные сущности верхнего уровня: {', '.join(self.top_level)}"
+            )
+            logger.error(f"❌ {error_msg}")
+            raise EntityNotFoundError(error_msg)
+        return self.symbols[qualname]
+
+    def _find_class_method(self, class_name: str, method_name: str) -> SymbolSpan:
+        class_qualname = self.first_class_by_name.get(class_name)
+        if class_qualname is None:
+            error_msg = (
+                f"Класс '{class_name}' не найден.\n"
+                f"Доступные классы: {', '.join(self.first_class_by_name)}"
+            )
+            logger.error(f"❌ {error_msg}")
+            raise EntityNotFoundError(error_msg)
+
+        available_methods = self.methods[class_qualname]
+        if method_name not in available_methods:
+            error_msg = (
+                f"Метод '{method_name}' не найден в классе '{class_name}'.\n"
+                f"Доступные методы: {', '.join(available_methods)}"
+            )
+            logger.error(f"❌ {error_msg}")
+            raise EntityNotFoundError(error_msg)
+
+        return self.symbols[f"{class_qualname}.{method_name}"]
+
+
+def get_symbol_index(file_path: str | Path) -> SymbolIndex:
+    """Возвращает закешированный индекс сущностей файла.
+
+    Args:
+        file_path: Путь к Python файлу.
+
+    Returns:
+        Индекс, построенный для текущей версии файла (по mtime и размеру).
+
+    Raises:
+        FileNotFoundError: Если файл не существует.
+        SyntaxError: Если файл содержит синтаксические ошибки Python.
+    """
+    path = Path(file_path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Файл не найден: {file_path}") from None
+
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    return _symbol_indexes.get_or_create(key, lambda: _build_symbol_index(path))
+
+
+def _build_symbol_index(path: Path) -> SymbolIndex:
+    with open(path, "r", encoding="utf-8") as f:
+        source_code = f.read()
+
+    index = SymbolIndex.build(source_code, filename=str(path))
+    logger.debug(f"📇 Построен индекс {path.name}: {len(index.symbols)} сущностей")
+    return index
+
+
+def get_symbol_index_cache_stats() -> dict:
+    """Возвращает счётчики кеша индексов сущностей."""
+    return _symbol_indexes.get_stats()
+
+
+def clear_symbol_index_cache() -> None:
+    """Очищает кеш индексов сущностей."""
+    _symbol_indexes.clear()
+
+
 def extract_code_entity(
     file_path: str, entity_name: str, include_decorators: bool = True
 ) -> str:
     """
     Извлекает исходный код функции, класса или метода из Python файла.
 
-    Использует AST для точного поиска сущности и возвращает её исходный код,
-    включая декораторы (если указано).
+    Использует индекс сущностей (AST) для точного поиска и возвращает
+    исходный код, включая декораторы (если указано).
 
     Args:
         file_path: Абсолютный путь к Python файлу.
@@ -50,152 +290,64 @@ def extract_code_entity(
     """
     logger.debug(f"🔍 Извлечение '{entity_name}' из {file_path}")
 
-    # Проверка существования файла
-    path = Path(file_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Файл не найден: {file_path}")
-
-    # Чтение файла
-    with open(path, "r", encoding="utf-8") as f:
-        source_code = f.read()
-        source_lines = source_code.splitlines(keepends=True)
-
-    # Парсинг в AST
     try:
-        tree = ast.parse(source_code, filename=str(path))
+        with stage("ast_index"):
+            index = get_symbol_index(file_path)
     except SyntaxError as e:
         logger.error(f"❌ Синтаксическая ошибка в {file_path}: {e}")
         raise
 
-    # Определяем, ищем ли метод класса (формат "ClassName.method_name")
-    if "." in entity_name:
-        class_name, method_name = entity_name.split(".", 1)
-        logger.debug(f"🔍 Поиск метода '{method_name}' в классе '{class_name}'")
-        return _extract_class_method(
-            tree, source_lines, class_name, method_name, include_decorators
-        )
-    else:
-        # Ищем функцию или класс верхнего уровня
-        logger.debug(f"🔍 Поиск функции/класса '{entity_name}' верхнего уровня")
-        return _extract_top_level_entity(
-            tree, source_lines, entity_name, include_decorators
-        )
+    span = index.find(entity_name)
+    start_line = span.start_line(include_decorators)
+    logger.info(
+        f"✅ Найдена сущность '{entity_name}' (строки {start_line}-{span.end_lineno})"
+    )
+    return index.get_source(span, include_decorators)
 
 
-def _extract_top_level_entity(
-    tree: ast.Module,
-    source_lines: list[str],
-    entity_name: str,
-    include_decorators: bool,
-) -> str:
-    """
-    Извлекает функцию или класс верхнего уровня.
+def resolve_entity_patterns(
+    file_path: str, patterns: list[str]
+) -> dict[str, list[str]]:
+    """Раскрывает glob шаблоны имён в имена сущностей.
+
+    Шаблон без точки сопоставляется с функциями и классами верхнего уровня,
+    шаблон с точкой — с методами в формате "ClassName.method_name". Имя без
+    символов шаблона (*, ?, [) возвращается как есть, даже если его нет.
 
     Args:
-        tree: AST дерево модуля.
-        source_lines: Строки исходного кода.
-        entity_name: Имя функции или класса.
-        include_decorators: Включать декораторы.
+        file_path: Путь к Python файлу.
+        patterns: Имена и шаблоны, например ["calculate_total", "Order.*"].
 
     Returns:
-        Исходный код сущности.
+        Словарь {шаблон: [имена в порядке объявления]}.
 
     Raises:
-        EntityNotFoundError: Если сущность не найдена.
-    """
-    for node in ast.walk(tree):
-        # Ищем только определения верхнего уровня
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-            if node.name == entity_name:
-                # Нашли! Извлекаем код
-                start_line = _get_start_line(node, include_decorators)
-                end_line = node.end_lineno
-
-                logger.info(
-                    f"✅ Найдена сущность '{entity_name}' (строки {start_line}-{end_line})"
-                )
-
-                # Извлекаем строки (AST использует 1-based индексацию)
-                code = "".join(source_lines[start_line - 1 : end_line])
-                return code
-
-    # Не нашли - формируем список доступных сущностей
-    available = _list_available_entities(tree)
-    error_msg = (
-        f"Сущность '{entity_name}' не найдена в файле.\n"
-        f"Доступные сущности верхнего уровня: {', '.join(available)}"
-    )
-    logger.error(f"❌ {error_msg}")
-    raise EntityNotFoundError(error_msg)
-
+        FileNotFoundError: Если файл не существует.
+        SyntaxError: Если файл содержит синтаксические ошибки Python.
 
-def _extract_class_method(
-    tree: ast.Module,
-    source_lines: list[str],
-    class_name: str,
-    method_name: str,
-    include_decorators: bool,
-) -> str:
+    Example:
+        >>> resolve_entity_patterns("models.py", ["Order.*"])
+        {'Order.*': ['Order.validate', 'Order.save']}
     """
-    Извлекает метод из класса.
-
-    Args:
-        tree: AST дерево модуля.
-        source_lines: Строки исходного кода.
-        class_name: Имя класса.
-        method_name: Имя метода.
-        include_decorators: Включать декораторы.
-
-    Returns:
-        Исходный код метода.
+    index = get_symbol_index(file_path)
+    top_level = list(dict.fromkeys(index.top_level))
+    methods = [
+        f"{name}.{method}"
+        for name in top_level
+        if index.symbols[name].kind == "class"
+        for method in index.methods[name]
+    ]
 
-    Raises:
-        EntityNotFoundError: Если класс или метод не найдены.
-    """
-    # Ищем класс
-    class_node = None
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef) and node.name == class_name:
-            class_node = node
-            break
-
-    if class_node is None:
-        available_classes = [
-            node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)
+    resolved = {}
+    for pattern in patterns:
+        if not any(char in pattern for char in "*?["):
+            resolved[pattern] = [pattern]
+            continue
+        candidates = methods if "." in pattern else top_level
+        resolved[pattern] = [
+            name for name in candidates if fnmatch.fnmatchcase(name, pattern)
         ]
-        error_msg = (
-            f"Класс '{class_name}' не найден.\n"
-            f"Доступные классы: {', '.join(available_classes)}"
-        )
-        logger.error(f"❌ {error_msg}")
-        raise EntityNotFoundError(error_msg)
-
-    # Ищем метод внутри класса
-    for node in class_node.body:
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            if node.name == method_name:
-                start_line = _get_start_line(node, include_decorators)
-                end_line = node.end_lineno
-
-                logger.info(
-                    f"✅ Найден метод '{class_name}.{method_name}' (строки {start_line}-{end_line})"
-                )
-
-                code = "".join(source_lines[start_line - 1 : end_line])
-                return code
-
-    # Метод не найден
-    available_methods = [
-        node.name
-        for node in class_node.body
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
-    ]
-    error_msg = (
-        f"Метод '{method_name}' не найден в классе '{class_name}'.\n"
-        f"Доступные методы: {', '.join(available_methods)}"
-    )
-    logger.error(f"❌ {error_msg}")
-    raise EntityNotFoundError(error_msg)
+    return resolved
 
 
 def _get_start_line(node: ast.AST, include_decorators: bool) -> int:
@@ -217,23 +369,6 @@ def _get_start_line(node: ast.AST, include_decorators: bool) -> int:
         return node.lineno
 
 
-def _list_available_entities(tree: ast.Module) -> list[str]:
-    """
-    Возвращает список доступных сущностей верхнего уровня в модуле.
-
-    Args:
-        tree: AST дерево модуля.
-
-    Returns:
-        Список имён функций и классов.
-    """
-    entities = []
-    for node in tree.body:  # Только верхний уровень
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-            entities.append(node.name)
-    return entities
-
-
 def list_entities(file_path: str) -> dict[str, list[str]]:
     """
     Возвращает структурированный список всех сущностей в файле.
@@ -260,31 +395,18 @@ def list_entities(file_path: str) -> dict[str, list[str]]:
     """
     logger.debug(f"📋 Список сущностей в {file_path}")
 
-    path = Path(file_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Файл не найден: {file_path}")
-
-    with open(path, "r", encoding="utf-8") as f:
-        source_code = f.read()
-
-    tree = ast.parse(source_code, filename=str(path))
+    index = get_symbol_index(file_path)
 
     functions = []
     classes = []
     methods = {}
 
-    for node in tree.body:
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            functions.append(node.name)
-        elif isinstance(node, ast.ClassDef):
-            classes.append(node.name)
-            # Собираем методы класса
-            class_methods = [
-                method.name
-                for method in node.body
-                if isinstance(method, (ast.FunctionDef, ast.AsyncFunctionDef))
-            ]
-            methods[node.name] = class_methods
+    for name in index.top_level:
+        if index.symbols[name].kind == "class":
+            classes.append(name)
+            methods[name] = list(index.methods[name])
+        else:
+            functions.append(name)
 
     logger.info(f"✅ Найдено: {len(functions)} функций, {len(classes)} классов")
 
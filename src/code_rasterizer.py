@@ -0,0 +1,282 @@
+"""Растеризация потока токенов Pygments напрямую в PIL Image.
+
+Заменяет связку ImageFormatter -> PNG байты -> Image.open: токены рисуются
+сразу на холсте Pillow, без промежуточного zlib сжатия и буферов. Разметка
+(отступы, высота строки, колонка номеров строк с разделителем) повторяет
+ImageFormatter, поэтому изображения совпадают попиксельно.
+
+Разметка и отрисовка разделены: iter_lines() раскладывает токены по строкам
+лениво, а draw_lines() рисует любой диапазон строк, поэтому большой файл
+можно растеризовать полосами (см. tiled_renderer).
+
+Классы:
+    CodeLayout
+        Геометрия холста: отступы, высота строки, колонка номеров.
+
+Функции:
+    rasterize_tokens(tokens, style, fonts, **options) -> Image
+        Рисует поток токенов и возвращает PIL Image.
+    iter_lines(tokens, style, fonts) -> Iterator[tuple[list, int]]
+        Лениво раскладывает токены по строкам.
+    draw_lines(image, lines, layout, first_line, origin_y, **options) -> None
+        Рисует строки на холсте начиная с заданной вертикали.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+from PIL import Image, ImageDraw
+from pygments.formatters.img import FontManager
+from pygments.style import StyleMeta
+from pygments.token import _TokenType
+
+logger = logging.getLogger(__name__)
+
+# Параметры колонки номеров строк (значения по умолчанию ImageFormatter)
+LINE_NUMBER_CHARS = 2
+LINE_NUMBER_PAD = 6
+
+DEFAULT_BACKGROUND = "#fff"
+DEFAULT_FOREGROUND = "#000"
+
+# Фрагмент строки: (смещение x, текст, шрифт, цвет, фон)
+Run = tuple[int, str, object, str, str | None]
+
+
+@dataclass(frozen=True)
+class CodeLayout:
+    """Геометрия холста кода.
+
+    Attributes:
+        image_pad: Отступ вокруг кода в пикселях.
+        line_height: Высота строки (высота символа + line_pad).
+        line_number_width: Ширина колонки номеров строк (0 без номеров).
+    """
+
+    image_pad: int
+    line_height: int
+    line_number_width: int
+
+    @classmethod
+    def create(
+        cls,
+        fonts: FontManager,
+        image_pad: int,
+        line_pad: int,
+        line_numbers: bool,
+        line_number_chars: int = LINE_NUMBER_CHARS,
+    ) -> "CodeLayout":
+        char_width, char_height = fonts.get_char_size()
+        line_number_width = (
+            char_width * line_number_chars + LINE_NUMBER_PAD * 2 if line_numbers else 0
+        )
+        return cls(image_pad, char_height + line_pad, line_number_width)
+
+    @property
+    def text_x(self) -> int:
+        return self.image_pad + self.line_number_width
+
+    def image_width(self, max_line_width: int) -> int:
+        return self.text_x + max_line_width + self.image_pad
+
+
+def _resolve_token_styles(style: StyleMeta, fonts: FontManager):
+    """Возвращает функцию, отдающую (font, fg, bg) для типа токена с кешированием."""
+    styles = dict(style)
+    resolved: dict[_TokenType, tuple] = {}
+
+    def resolve(ttype: _TokenType) -> tuple:
+        cached = resolved.get(ttype)
+        if cached is not None:
+            return cached
+
+        base = ttype
+        while base not in styles:
+            base = base.parent
+        token_style = styles[base]
+
+        cached = (
+            fonts.get_font(token_style["bold"], token_style["italic"]),
+            f"#{token_style['color']}" if token_style["color"] else DEFAULT_FOREGROUND,
+            f"#{token_style['bgcolor']}" if token_style["bgcolor"] else None,
+        )
+        resolved[ttype] = cached
+        return cached
+
+    return resolve
+
+
+def iter_lines(
+    tokens: Iterable[tuple[_TokenType, str]], style: StyleMeta, fonts: FontManager
+) -> Iterator[tuple[list[Run], int]]:
+    """Лениво раскладывает поток токенов по строкам.
+
+    Args:
+        tokens: Поток (тип токена, текст), например lexer.get_tokens(code).
+        style: Класс стиля Pygments.
+        fonts: Набор шрифтов Pygments.
+
+    Yields:
+        Пары (фрагменты строки, ширина строки в пикселях).
+    """
+    resolve = _resolve_token_styles(style, fonts)
+    runs: list[Run] = []
+    linelength = 0
+
+    for ttype, value in tokens:
+        font, fg, bg = resolve(ttype)
+        for line in value.expandtabs(4).splitlines(True):
+            text = line.rstrip("\n")
+            if text:
+                runs.append((linelength, text, font, fg, bg))
+                linelength += fonts.get_text_size(text)[0]
+            if line.endswith("\n"):
+                yield runs, linelength
+                runs = []
+                linelength = 0
+
+    if runs:
+        yield runs, linelength
+
+
+def paint_line_number_column(
+    image: Image.Image,
+    layout: CodeLayout,
+    line_number_bg: str | None,
+    line_number_fg: str | None,
+) -> None:
+    """Рисует фон колонки номеров строк и разделитель на всю высоту холста."""
+    if not layout.line_number_width or line_number_fg is None:
+        return
+
+    draw = ImageDraw.Draw(image)
+    rect_width = layout.text_x - LINE_NUMBER_PAD
+    if line_number_bg is not None and image.mode != "RGBA":
+        draw.rectangle([(0, 0), (rect_width, image.height)], fill=line_number_bg)
+    draw.line([(rect_width, 0), (rect_width, image.height)], fill=line_number_fg)
+
+
+def draw_lines(
+    image: Image.Image,
+    lines: list[list[Run]],
+    layout: CodeLayout,
+    first_line: int,
+    origin_y: int,
+    line_numbers: bool = True,
+    line_number_fg: str | None = "#888888",
+    line_number_chars: int = LINE_NUMBER_CHARS,
+    fonts: FontManager | None = None,
+    line_labels: Sequence[str] | None = None,
+) -> None:
+    """Рисует строки на холсте начиная с заданной вертикали.
+
+    Args:
+        image: Холст.
+        lines: Фрагменты строк (из iter_lines()).
+        layout: Геометрия холста.
+        first_line: Номер первой строки (с 1) для колонки номеров.
+        origin_y: Вертикаль верхней границы первой строки на холсте.
+        line_numbers: Рисовать номера строк.
+        line_number_fg: Цвет номеров строк.
+        line_number_chars: Ширина номера строки в символах.
+        fonts: Набор шрифтов (обязателен при line_numbers=True).
+        line_labels: Подписи колонки номеров для всех строк изображения
+            (индекс — номер строки минус 1); None — номера по порядку.
+    """
+    draw = ImageDraw.Draw(image)
+
+    for offset, runs in enumerate(lines):
+        y = origin_y + offset * layout.line_height
+        for x, text, font, fg, bg in runs:
+            x += layout.text_x
+            if bg:
+                text_right, text_bottom = font.getbbox(text)[2:]
+                draw.rectangle([x, y, x + text_right, y + text_bottom], fill=bg)
+            draw.text((x, y), text, font=font, fill=fg)
+
+    if line_numbers and lines:
+        number_font = fonts.get_font(False, False)
+        for offset in range(len(lines)):
+            if line_labels is None:
+                label = str(first_line + offset)
+            else:
+                label = line_labels[first_line - 1 + offset]
+            draw.text(
+                (layout.image_pad, origin_y + offset * layout.line_height),
+                label.rjust(line_number_chars),
+                font=number_font,
+                fill=line_number_fg,
+            )
+
+
+def new_canvas(
+    size: tuple[int, int], style: StyleMeta, transparent: bool = False
+) -> Image.Image:
+    """Создаёт холст с фоном стиля (RGBA с прозрачным фоном при transparent)."""
+    if transparent:
+        return Image.new("RGBA", size, (0, 0, 0, 0))
+    return Image.new("RGB", size, style.background_color or DEFAULT_BACKGROUND)
+
+
+def rasterize_tokens(
+    tokens: Iterable[tuple[_TokenType, str]],
+    style: StyleMeta,
+    fonts: FontManager,
+    image_pad: int = 10,
+    line_pad: int = 2,
+    line_numbers: bool = True,
+    line_number_bg: str | None = None,
+    line_number_fg: str | None = "#888888",
+    transparent: bool = False,
+    line_labels: Sequence[str] | None = None,
+) -> Image.Image:
+    """Рисует поток токенов Pygments и возвращает PIL Image.
+
+    Args:
+        tokens: Поток (тип токена, текст), например lexer.get_tokens(code).
+        style: Класс стиля Pygments.
+        fonts: Набор шрифтов Pygments (обычный, жирный, курсив).
+        image_pad: Отступ вокруг кода в пикселях.
+        line_pad: Дополнительный межстрочный интервал в пикселях.
+        line_numbers: Рисовать колонку номеров строк.
+        line_number_bg: Цвет фона колонки номеров (None — фон стиля).
+        line_number_fg: Цвет номеров и разделителя (None — колонка без фона).
+        transparent: Прозрачный фон (изображение RGBA).
+        line_labels: Подписи колонки номеров по строкам (см. long_lines).
+
+    Returns:
+        PIL Image в режиме RGB (RGBA при transparent=True).
+    """
+    layout = CodeLayout.create(fonts, image_pad, line_pad, line_numbers)
+    if line_number_bg is None:
+        line_number_bg = style.background_color
+
+    lines = []
+    max_line_width = 0
+    for runs, width in iter_lines(tokens, style, fonts):
+        lines.append(runs)
+        max_line_width = max(max_line_width, width)
+
+    size = (
+        layout.image_width(max_line_width),
+        len(lines) * layout.line_height + image_pad * 2,
+    )
+
+    image = new_canvas(size, style, transparent)
+    paint_line_number_column(image, layout, line_number_bg, line_number_fg)
+    draw_lines(
+        image,
+        lines,
+        layout,
+        first_line=1,
+        origin_y=image_pad,
+        line_numbers=line_numbers,
+        line_number_fg=line_number_fg,
+        fonts=fonts,
+        line_labels=line_labels,
+    )
+
+    logger.debug(f"🖌️ Растеризовано строк: {len(lines)}, размер: {size[0]}x{size[1]}")
+
+    return image
@@ -8,22 +8,38 @@
     create_code_image(code_string, language, **options) -> Image
         Создаёт изображение фрагмента кода и возвращает PIL Image.
     create_code_screenshot(code_string, language, output_file, **options) -> dict
-        LEGACY: генерирует изображение и сохраняет в файл.
+        Генерирует изображение и сохраняет в файл (с кешем результатов).
+    create_code_screenshot_bytes(code_string, language, **options) -> dict
+        Генерирует изображение в памяти без записи в выходной файл.
+    create_code_screenshots_batch(jobs) -> list[dict]
+        Генерирует пакет скриншотов параллельно в процессах.
+    create_code_screenshot_variants(code_string, language, output_file, scales, **options) -> dict
+        Рендерит один раз в наибольшем масштабе и сохраняет варианты @1x/@2x/@3x.
 """
 
-import io
+import json
 import logging
 from pathlib import Path
 from typing import Literal
 
+import PIL
 import pygments
 from PIL import Image
-from pygments.formatters import ImageFormatter
-from pygments.lexers import get_lexer_by_name
-from pygments.styles import get_style_by_name
 
-from src.font_manager import get_font_path
-from src.image_utils import save_image
+from src.code_rasterizer import rasterize_tokens
+from src.config import ENCODE_LATENCY_BUDGET_MS, LONG_LINE_POLICY, MAX_LINE_COLUMNS
+from src.long_lines import LongLines, apply_long_line_policy
+from src.parallel_renderer import rasterize_parallel, should_rasterize_parallel
+from src.render_cache import RenderCache, detach_shared_file, get_render_cache
+from src.render_processes import map_in_processes
+from src.render_stats import stage
+from src.resource_cache import get_fonts, get_lexer, get_style
+from src.image_utils import (
+    IMAGE_MIME_TYPES,
+    downsample_image,
+    encode_image_with_info,
+    save_image,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -43,9 +59,18 @@ def create_code_image(
     line_pad: int = 10,
     line_number_bg: str | None = None,
     line_number_fg: str = "#888888",
+    parallel: bool | None = None,
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+    line_labels: list[str] | None = None,
 ) -> Image.Image:
     """Создаёт изображение фрагмента кода и возвращает PIL Image объект.
 
+    Большой код (от PARALLEL_RENDER_MIN_LINES строк) растеризуется фрагментами
+    в пуле процессов, результат совпадает с последовательной растеризацией.
+    Строки длиннее max_line_columns колонок переносятся или обрезаются до
+    лексинга (long_lines), поэтому ширина изображения ограничена.
+
     Args:
         code_string: Строка с исходным кодом.
         language: Язык программирования (для лексера Pygments).
@@ -59,6 +84,11 @@ def create_code_image(
         line_pad: Отступ между номерами строк и кодом (по умолчанию 10).
         line_number_bg: Цвет фона номеров строк (по умолчанию из стиля).
         line_number_fg: Цвет текста номеров строк (по умолчанию '#888888').
+        parallel: Параллельная растеризация (None — по размеру кода и пулу).
+        long_lines: Политика длинных строк ('wrap', 'truncate', 'off').
+        max_line_columns: Предел ширины строки в колонках.
+        line_labels: Подписи колонки номеров для кода, уже подготовленного
+            apply_long_line_policy (используются с long_lines='off').
 
     Returns:
         PIL Image объект с отрендеренным кодом.
@@ -68,65 +98,67 @@ def create_code_image(
     """
     logger.info(f"🎨 Генерация изображения кода для языка: {language}")
 
-    # Получаем лексер для языка программирования
-    try:
-        lexer = get_lexer_by_name(language, stripall=True)
-    except pygments.util.ClassNotFound:
-        logger.warning(
-            f"🎯 Лексер для языка '{language}' не найден, используется 'text'"
-        )
-        lexer = get_lexer_by_name("text", stripall=True)
+    if long_lines != "off":
+        prepared = apply_long_line_policy(code_string, long_lines, max_line_columns)
+        code_string, line_labels = prepared.code, prepared.line_labels
 
-    # Загружаем стиль Pygments
-    style_inst = get_style_by_name(style)
+    # Лексер, стиль и шрифты берутся из кеша ресурсов процесса
+    lexer = get_lexer(language)
+    style_inst = get_style(style)
     logger.debug(f"🎭 Применён стиль: {style}")
 
-    # Настройка прозрачности
-    if transparent:
-        style_inst.background_color = None
-        logger.debug("🔍 Применена прозрачность фона")
-
     # Применяем масштабирование к размерам
     logger.debug(f"🖼️ Масштабирование: {scale_factor}x")
     scaled_font_size = int(font_size * scale_factor)
     scaled_pad = int(pad * scale_factor)
     scaled_line_pad = int(line_pad * scale_factor)
 
-    # Получаем путь к шрифту
-    try:
-        font_path = get_font_path(font_name)
-        logger.info(f"📦 Загружен шрифт: {font_path}")
-    except (ValueError, FileNotFoundError) as e:
-        logger.warning(f"🎯 {e}, используется fallback: Consolas")
-        font_path = "Consolas"
-
-    # Фон номеров строк
-    if line_number_bg is None:
-        line_number_bg = style_inst.background_color
-
     logger.debug(
-        f"🔧 Параметры форматтера: font_size={scaled_font_size}, "
-        f"line_numbers={line_numbers}, pad={scaled_pad}"
+        f"🔧 Параметры растеризации: font_size={scaled_font_size}, "
+        f"line_numbers={line_numbers}, pad={scaled_pad}, transparent={transparent}"
     )
 
-    # Создаём форматтер для генерации изображения
-    formatter = ImageFormatter(
-        style=style_inst,
-        full=True,
-        font_name=font_path,
-        font_size=scaled_font_size,
-        image_pad=scaled_pad,
-        line_numbers=line_numbers,
-        line_pad=scaled_line_pad,
-        line_number_bg=line_number_bg,
-        line_number_fg=line_number_fg,
-        image_format="PNG",  # Pygments всегда генерирует PNG
-    )
+    if parallel is None:
+        parallel = should_rasterize_parallel(code_string.count("\n") + 1)
 
     try:
-        # Генерируем байты изображения
-        image_bytes = pygments.highlight(code_string, lexer, formatter, outfile=None)
-        img = Image.open(io.BytesIO(image_bytes))
+        if parallel:
+            # Фрагменты лексируются и растеризуются в пуле процессов
+            with stage("rasterize"):
+                img = rasterize_parallel(
+                    code_string,
+                    language,
+                    style=style,
+                    font_name=font_name,
+                    font_size=scaled_font_size,
+                    image_pad=scaled_pad,
+                    line_pad=scaled_line_pad,
+                    line_numbers=line_numbers,
+                    line_number_bg=line_number_bg,
+                    line_number_fg=line_number_fg,
+                    transparent=transparent,
+                    line_labels=line_labels,
+                )
+        else:
+            fonts = get_fonts(font_name, scaled_font_size)
+
+            with stage("lex"):
+                tokens = list(lexer.get_tokens(code_string))
+
+            # Токены рисуются сразу на холсте Pillow, без промежуточного PNG
+            with stage("rasterize"):
+                img = rasterize_tokens(
+                    tokens,
+                    style=style_inst,
+                    fonts=fonts,
+                    image_pad=scaled_pad,
+                    line_pad=scaled_line_pad,
+                    line_numbers=line_numbers,
+                    line_number_bg=line_number_bg,
+                    line_number_fg=line_number_fg,
+                    transparent=transparent,
+                    line_labels=line_labels,
+                )
 
         logger.info(
             f"✅ Изображение сгенерировано: {img.width}x{img.height}px, "
@@ -145,8 +177,9 @@ def create_code_screenshot(
 ) -> dict:
     """Создаёт скриншот фрагмента кода и сохраняет в файл.
 
-    LEGACY функция для обратной совместимости. Использует create_code_image()
-    и image_utils для сохранения.
+    Использует create_code_image() и image_utils для сохранения. Результаты
+    кешируются (раздел "screenshots": память + диск) по хешу кода и всех
+    параметров рендеринга; признак попадания возвращается в поле cache_hit.
 
     Args:
         code_string: Строка с исходным кодом.
@@ -166,6 +199,17 @@ def create_code_screenshot(
             - line_number_fg: Цвет текста номеров (по умолчанию '#888888').
             - quality: Качество для JPEG/WEBP (по умолчанию 95).
             - optimize: Оптимизация для PNG (по умолчанию True).
+            - encoder_profile: Профиль кодировщика (fast, balanced, smallest
+              или auto; по умолчанию 'smallest').
+            - latency_budget_ms: Бюджет на кодирование для 'auto'
+              (по умолчанию ENCODE_LATENCY_BUDGET_MS).
+            - lossless_palette: PNG с палитрой или lossless WebP, если он
+              меньше обычного и совпадает пиксель в пиксель (по умолчанию False).
+            - long_lines: Политика длинных строк: wrap, truncate или off
+              (по умолчанию LONG_LINE_POLICY); затронутые строки
+              возвращаются в поле long_lines.
+            - max_line_columns: Предел ширины строки в колонках
+              (по умолчанию MAX_LINE_COLUMNS).
 
     Returns:
         Словарь с информацией о результате сохранения.
@@ -173,6 +217,131 @@ def create_code_screenshot(
     Raises:
         ValueError: Если язык не поддерживается (используется fallback 'text').
     """
+    # Один и тот же вид пути в ответе при попадании и при промахе
+    output_path = Path(output_file).resolve()
+    cache = get_render_cache("screenshots")
+    if cache is None:
+        result = _render_code_screenshot(code_string, language, output_path, options)
+        result["cache_hit"] = False
+        return result
+
+    key = _screenshot_cache_key(code_string, language, options)
+    cached = cache.fetch(key, output_path)
+    if cached is not None:
+        cached["output_path"] = str(output_path)
+        cached["cache_hit"] = True
+        return cached
+
+    # Файл мог остаться жёсткой ссылкой на запись кеша от прошлого попадания
+    detach_shared_file(output_path)
+
+    result = _render_code_screenshot(code_string, language, output_path, options)
+    cache.store(key, result["output_path"], result)
+    result["cache_hit"] = False
+    return result
+
+
+def create_code_screenshots_batch(jobs: list[dict]) -> list[dict]:
+    """Генерирует пакет скриншотов параллельно в процессах.
+
+    Кеш проверяется в текущем процессе, промахи рендерятся в пуле процессов
+    (render_processes) и сохраняются в кеш. Ошибка одного скриншота не
+    прерывает пакет.
+
+    Args:
+        jobs: Список словарей с ключами code_string, language, output_file
+            и параметрами create_code_screenshot.
+
+    Returns:
+        Результаты в порядке jobs: как у create_code_screenshot или
+        {"success": False, "error": ...}.
+    """
+    cache = get_render_cache("screenshots")
+    results: list[dict | None] = [None] * len(jobs)
+    pending = []
+
+    for index, job in enumerate(jobs):
+        options = dict(job)
+        code_string = options.pop("code_string")
+        language = options.pop("language")
+        output_path = Path(options.pop("output_file")).resolve()
+
+        key = None
+        if cache is not None:
+            key = _screenshot_cache_key(code_string, language, options)
+            cached = cache.fetch(key, output_path)
+            if cached is not None:
+                cached["output_path"] = str(output_path)
+                cached["cache_hit"] = True
+                results[index] = cached
+                continue
+            detach_shared_file(output_path)
+
+        pending.append((index, key, (code_string, language, output_path, options)))
+
+    logger.info(
+        f"📦 Пакет скриншотов: {len(jobs)} шт., из кеша {len(jobs) - len(pending)}"
+    )
+
+    rendered = map_in_processes(
+        _render_code_screenshot, [(args, {}) for _, _, args in pending]
+    )
+    for (index, key, _), (result, error) in zip(pending, rendered):
+        if error is not None:
+            logger.error(f"❌ Ошибка скриншота #{index} в пакете: {error}")
+            results[index] = {"success": False, "error": str(error)}
+            continue
+        if key is not None:
+            cache.store(key, result["output_path"], result)
+        result["cache_hit"] = False
+        results[index] = result
+
+    return results
+
+
+def _screenshot_cache_key(code_string: str, language: str, options: dict) -> str:
+    """Строит ключ кеша из кода и всех параметров, влияющих на изображение."""
+    return RenderCache.make_key(
+        "code_screenshot",
+        pygments.__version__,
+        PIL.__version__,
+        code_string,
+        language,
+        options.get("style", "monokai"),
+        options.get("font_name", "JetBrainsMono"),
+        options.get("font_size", 18),
+        options.get("pad", 25),
+        float(options.get("scale_factor", 3.0)),
+        options.get("transparent", False),
+        options.get("line_numbers", True),
+        options.get("line_pad", 10),
+        options.get("line_number_bg", None),
+        options.get("line_number_fg", "#888888"),
+        options.get("format", "webp").lower(),
+        options.get("quality", 95),
+        options.get("long_lines", LONG_LINE_POLICY),
+        options.get("max_line_columns", MAX_LINE_COLUMNS),
+        *_encoder_key(options),
+    )
+
+
+def _encoder_key(options: dict) -> tuple:
+    """Часть ключа кеша о кодировщике (бюджет важен только для 'auto')."""
+    profile = options.get("encoder_profile", "smallest").lower()
+    palette = bool(options.get("lossless_palette", False))
+    if profile != "auto":
+        return (profile, palette)
+    return (profile, palette, options.get("latency_budget_ms") or ENCODE_LATENCY_BUDGET_MS)
+
+
+def _render_code_image(
+    code_string: str, language: str, options: dict
+) -> tuple[Image.Image, str, LongLines]:
+    """Рендерит изображение скриншота и определяет формат сохранения.
+
+    Returns:
+        (изображение, формат сохранения, результат политики длинных строк).
+    """
     # Извлекаем параметры
     style = options.get("style", "monokai")
     font_name = options.get("font_name", "JetBrainsMono")
@@ -185,9 +354,16 @@ def create_code_screenshot(
     line_number_bg = options.get("line_number_bg", None)
     line_number_fg = options.get("line_number_fg", "#888888")
 
+    # Длинные строки готовятся здесь, чтобы вернуть затронутые строки в ответе
+    prepared = apply_long_line_policy(
+        code_string,
+        options.get("long_lines", LONG_LINE_POLICY),
+        options.get("max_line_columns", MAX_LINE_COLUMNS),
+    )
+
     # Генерируем изображение через новую функцию
     img = create_code_image(
-        code_string=code_string,
+        code_string=prepared.code,
         language=language,
         style=style,
         font_name=font_name,
@@ -199,10 +375,11 @@ def create_code_screenshot(
         line_pad=line_pad,
         line_number_bg=line_number_bg,
         line_number_fg=line_number_fg,
+        long_lines="off",
+        line_labels=prepared.line_labels,
     )
 
     # Определяем формат для сохранения
-    output_path = Path(output_file)
     save_format = options.get("format", "webp").lower()
 
     # Если формат не совместим с прозрачностью, меняем на PNG
@@ -212,24 +389,243 @@ def create_code_screenshot(
         )
         save_format = "png"
 
+    return img, save_format, prepared
+
+
+def _screenshot_metadata(
+    language: str,
+    options: dict,
+    save_format: str,
+    size_bytes: int,
+    encoded: dict,
+    long_lines: LongLines,
+) -> dict:
+    """Поля ответа о скриншоте, общие для файла и байтов в памяти.
+
+    Args:
+        encoded: Результат save_image или encode_image_with_info
+            (dimensions, encoder_profile, encode_ms, для lossless_palette —
+            palette_applied и color_count).
+        long_lines: Результат политики длинных строк (поле long_lines есть,
+            только если строки переносились или обрезались).
+    """
+    metadata = {
+        "format": save_format,
+        "file_size_kb": round(size_bytes / 1024, 2),
+        "dimensions": encoded["dimensions"],
+        "scale_factor": options.get("scale_factor", 3.0),
+        "language": language,
+        "style": options.get("style", "monokai"),
+        "encoder_profile": encoded["encoder_profile"],
+        "encode_ms": encoded["encode_ms"],
+    }
+    if "palette_applied" in encoded:
+        metadata["palette_applied"] = encoded["palette_applied"]
+        metadata["color_count"] = encoded["color_count"]
+    if long_lines.affected:
+        metadata["long_lines"] = long_lines.report()
+    return metadata
+
+
+def _render_code_screenshot(
+    code_string: str, language: str, output_path: Path, options: dict
+) -> dict:
+    """Рендерит и сохраняет скриншот без кеша."""
+    img, save_format, long_lines = _render_code_image(code_string, language, options)
+
     # Сохраняем через image_utils
     save_result = save_image(
         image=img,
         output_path=output_path,
         format=save_format,  # type: ignore
         quality=options.get("quality", 95),
+        encoder_profile=options.get("encoder_profile", "smallest"),
+        latency_budget_ms=options.get("latency_budget_ms"),
+        lossless_palette=options.get("lossless_palette", False),
     )
 
     return {
         "success": True,
         "output_path": save_result["path"],
-        "format": save_result["format"],
-        "file_size_kb": round(save_result["size_bytes"] / 1024, 2),
-        "dimensions": save_result["dimensions"],
-        "scale_factor": scale_factor,
+        **_screenshot_metadata(
+            language,
+            options,
+            save_format,
+            save_result["size_bytes"],
+            save_result,
+            long_lines,
+        ),
+    }
+
+
+def create_code_screenshot_bytes(code_string: str, language: str, **options) -> dict:
+    """Создаёт скриншот фрагмента кода в памяти, без записи в выходной файл.
+
+    Использует тот же кеш, что create_code_screenshot: байты совпадают с
+    файлом, сохранённым с теми же параметрами.
+
+    Args:
+        code_string: Строка с исходным кодом.
+        language: Язык программирования (для лексера Pygments).
+        **options: Параметры create_code_screenshot.
+
+    Returns:
+        Метаданные как у create_code_screenshot (без output_path) и поля
+        data (байты изображения) и mime_type.
+    """
+    cache = get_render_cache("screenshots")
+    key = None
+    if cache is not None:
+        key = _screenshot_cache_key(code_string, language, options)
+        cached = cache.fetch_bytes(key)
+        if cached is not None:
+            data, metadata = cached
+            metadata.pop("output_path", None)
+            return {
+                **metadata,
+                "data": data,
+                "mime_type": IMAGE_MIME_TYPES[metadata["format"]],
+                "cache_hit": True,
+            }
+
+    img, save_format, long_lines = _render_code_image(code_string, language, options)
+    encoded = encode_image_with_info(
+        img,
+        save_format,  # type: ignore
+        options.get("quality", 95),
+        options.get("encoder_profile", "smallest"),
+        options.get("latency_budget_ms"),
+        options.get("lossless_palette", False),
+    )
+    data = encoded["data"]
+    metadata = {
+        "success": True,
+        **_screenshot_metadata(
+            language, options, save_format, len(data), encoded, long_lines
+        ),
+    }
+
+    if key is not None:
+        cache.store_bytes(key, data, metadata)
+
+    logger.info(f"🧮 Скриншот закодирован в памяти: {metadata['file_size_kb']} KB")
+    return {
+        **metadata,
+        "data": data,
+        "mime_type": IMAGE_MIME_TYPES[save_format],
+        "cache_hit": False,
+    }
+
+
+def _variant_label(scale: float) -> str:
+    """Суффикс плотности варианта: 2.0 -> '2x', 1.5 -> '1.5x'."""
+    return f"{scale:g}x"
+
+
+def create_code_screenshot_variants(
+    code_string: str,
+    language: str,
+    output_file: str | Path,
+    scales: list[float],
+    **options,
+) -> dict:
+    """Рендерит код один раз и сохраняет варианты для нескольких плотностей.
+
+    Лексинг и растеризация выполняются один раз в наибольшем масштабе,
+    меньшие варианты получаются уменьшением (downsample_image): Image.reduce
+    для целого отношения масштабов (3x -> 1x), Lanczos для дробного
+    (3x -> 2x). Отступы и размер шрифта при этом масштабируются вместе с
+    изображением, поэтому размеры могут отличаться от отдельного рендера на
+    несколько пикселей. Кеш результатов не используется.
+
+    Файлы называются <имя>@<масштаб>x.<формат>, рядом пишется манифест
+    <имя>.manifest.json со списком вариантов.
+
+    Args:
+        code_string: Строка с исходным кодом.
+        language: Язык программирования (для лексера Pygments).
+        output_file: Путь-шаблон: от него берутся папка, имя и расширение.
+        scales: Масштабы вариантов (scale_factor), например [1.0, 2.0, 3.0].
+        **options: Параметры create_code_screenshot (scale_factor игнорируется).
+
+    Returns:
+        Словарь с manifest_path и variants: [{scale, path, dimensions,
+        file_size_kb, encoder_profile, encode_ms}] по убыванию масштаба.
+
+    Raises:
+        ValueError: Если список масштабов пуст или содержит масштаб <= 0.
+    """
+    if not scales or min(scales) <= 0:
+        raise ValueError(f"Некорректные масштабы вариантов: {scales}")
+
+    output_path = Path(output_file)
+    ordered = sorted(set(scales), reverse=True)
+    largest = ordered[0]
+    img, save_format, long_lines = _render_code_image(
+        code_string, language, {**options, "scale_factor": largest}
+    )
+
+    variants = []
+    for scale in ordered:
+        with stage("resample"):
+            variant = downsample_image(img, largest / scale)
+        variant_path = output_path.with_name(
+            f"{output_path.stem}@{_variant_label(scale)}.{save_format}"
+        )
+        save_result = save_image(
+            image=variant,
+            output_path=variant_path,
+            format=save_format,  # type: ignore
+            quality=options.get("quality", 95),
+            encoder_profile=options.get("encoder_profile", "smallest"),
+            latency_budget_ms=options.get("latency_budget_ms"),
+            lossless_palette=options.get("lossless_palette", False),
+        )
+        variants.append(
+            {
+                "scale": scale,
+                "path": save_result["path"],
+                "dimensions": save_result["dimensions"],
+                "file_size_kb": round(save_result["size_bytes"] / 1024, 2),
+                "encoder_profile": save_result["encoder_profile"],
+                "encode_ms": save_result["encode_ms"],
+            }
+        )
+
+    manifest_path = output_path.with_name(f"{output_path.stem}.manifest.json")
+    manifest = {
+        "language": language,
+        "style": options.get("style", "monokai"),
+        "format": save_format,
+        "rendered_scale": largest,
+        "variants": [
+            {
+                "scale": item["scale"],
+                "path": item["path"],
+                "dimensions": item["dimensions"],
+            }
+            for item in variants
+        ],
+    }
+    with stage("write"), open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    labels = ", ".join(_variant_label(scale) for scale in ordered)
+    logger.info(
+        f"✅ Варианты скриншота: {labels} (рендер в {_variant_label(largest)})"
+    )
+
+    result = {
+        "success": True,
+        "format": save_format,
         "language": language,
-        "style": style,
+        "style": options.get("style", "monokai"),
+        "manifest_path": str(manifest_path.absolute()),
+        "variants": variants,
     }
+    if long_lines.affected:
+        result["long_lines"] = long_lines.report()
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+"""Конфигурация сервера через переменные окружения.
+
+Все параметры имеют значения по умолчанию и могут быть переопределены
+переменными окружения (например, в секции ``env`` конфигурации MCP клиента).
+
+Константы:
+    PLANTUML_POOL_SIZE
+        Максимальное число одновременно запущенных процессов PlantUML (0 — пул отключён).
+    PLANTUML_WORKER_MAX_RENDERS
+        Количество диаграмм, после которого процесс PlantUML перезапускается.
+    PLANTUML_RENDER_TIMEOUT
+        Таймаут рендеринга одной диаграммы в секундах.
+    JAVA_RUNTIME_RECHECK_INTERVAL
+        Через сколько секунд описание Java перепроверяется в фоне.
+    RENDER_CACHE_ENABLED
+        Включает дисковый кеш результатов рендеринга.
+    RENDER_CACHE_DIR
+        Директория дискового кеша.
+    RENDER_CACHE_MAX_MB
+        Предельный размер каждого раздела кеша (LRU вытеснение).
+    RENDER_CACHE_HARDLINK
+        Отдавать попадания жёсткой ссылкой вместо копирования.
+    RENDER_CACHE_MEMORY_MB
+        Размер уровня кеша в памяти на раздел (0 — только диск).
+    RENDER_MAX_CONCURRENCY
+        Число потоков пула, выполняющего рендеринг для асинхронных инструментов.
+    RESOURCE_CACHE_SIZE
+        Размер LRU кешей лексеров, стилей и шрифтов Pygments (на каждый вид).
+    TILED_TILE_LINES
+        Число строк в одной полосе (странице) при рендеринге больших файлов.
+    TILED_MAX_FILE_LINES
+        Максимальный размер файла в строках для полосового рендеринга.
+    TILED_STITCH_MAX_MEGAPIXELS
+        Предел склейки полос в мегапикселях (больше Pillow не открывает без
+        предупреждения или отказывается открывать).
+    SYMBOL_INDEX_CACHE_SIZE
+        Число файлов, для которых хранятся индексы сущностей (AST).
+    RENDER_PROCESS_WORKERS
+        Число процессов для параллельного рендеринга скриншотов (1 — без процессов).
+    PROJECT_INDEX_DIR
+        Директория постоянных индексов сущностей проектов.
+    PROJECT_INDEX_REFRESH_INTERVAL
+        Через сколько секунд поиск заново проверяет изменения в дереве проекта.
+    PARALLEL_RENDER_MIN_LINES
+        Размер кода в строках, начиная с которого растеризация идёт в пуле процессов.
+    PARALLEL_CHUNK_LINES
+        Минимальный размер фрагмента в строках при параллельной растеризации.
+    INLINE_IMAGE_MAX_KB
+        Предельный размер изображения, возвращаемого в ответе без записи на диск.
+    RENDER_STATS_WINDOW
+        Число последних замеров, по которым считаются перцентили get_render_stats.
+    ENCODE_LATENCY_BUDGET_MS
+        Бюджет времени кодирования для автоматического выбора профиля кодировщика.
+    DEEP_ZOOM_MIN_MEGAPIXELS
+        Размер диаграммы в мегапикселях, начиная с которого растр пишется плитками Deep Zoom.
+    DEEP_ZOOM_TILE_SIZE
+        Размер плитки Deep Zoom в пикселях (без перекрытия).
+    DEEP_ZOOM_OVERLAP
+        Перекрытие соседних плиток Deep Zoom в пикселях.
+    RENDER_MAX_MEGAPIXELS
+        Бюджет площади растра в мегапикселях (0 — без ограничения).
+    RENDER_MAX_MEMORY_MB
+        Бюджет оценённой пиковой памяти рендеринга в мегабайтах (0 — без ограничения).
+    RENDER_BUDGET_POLICY
+        Политика бюджета по умолчанию: downgrade, reject или off.
+    LONG_LINE_POLICY
+        Политика длинных строк кода по умолчанию: wrap, truncate или off.
+    MAX_LINE_COLUMNS
+        Предел ширины строки кода в колонках для переноса или обрезки.
+    LONG_LINE_MAX_ROWS
+        Сколько строк переноса допускается для одной исходной строки (остаток обрезается).
+"""
+
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    """Читает целочисленную переменную окружения с fallback на значение по умолчанию."""
+    raw_value = os.getenv(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+
+    try:
+        return int(raw_value)
+    except ValueError:
+        logger.warning(
+            f"🎯 Некорректное значение {name}={raw_value!r}, используется {default}"
+        )
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Читает булеву переменную окружения (1/0, true/false, yes/no, on/off)."""
+    raw_value = os.getenv(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+
+    normalized = raw_value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+
+    logger.warning(
+        f"🎯 Некорректное значение {name}={raw_value!r}, используется {default}"
+    )
+    return default
+
+
+def _env_choice(name: str, default: str, choices: tuple[str, ...]) -> str:
+    """Читает строковую переменную окружения из допустимого набора значений."""
+    raw_value = os.getenv(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+
+    normalized = raw_value.strip().lower()
+    if normalized in choices:
+        return normalized
+
+    logger.warning(
+        f"🎯 Некорректное значение {name}={raw_value!r}, используется {default}"
+    )
+    return default
+
+
+def _env_path(name: str, default: Path) -> Path:
+    """Читает путь из переменной окружения."""
+    raw_value = os.getenv(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    return Path(raw_value.strip()).expanduser()
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Пул PlantUML процессов
+PLANTUML_POOL_SIZE = _env_int("PLANTUML_POOL_SIZE", 2)
+PLANTUML_WORKER_MAX_RENDERS = _env_int("PLANTUML_WORKER_MAX_RENDERS", 200)
+PLANTUML_RENDER_TIMEOUT = _env_int("PLANTUML_RENDER_TIMEOUT", 30)
+
+# Описание Java окружения
+JAVA_RUNTIME_RECHECK_INTERVAL = _env_int("JAVA_RUNTIME_RECHECK_INTERVAL", 300)
+
+# Кеш результатов рендеринга
+RENDER_CACHE_ENABLED = _env_bool("RENDER_CACHE_ENABLED", True)
+RENDER_CACHE_DIR = _env_path("RENDER_CACHE_DIR", PROJECT_ROOT / ".cache" / "render")
+RENDER_CACHE_MAX_MB = _env_int("RENDER_CACHE_MAX_MB", 512)
+RENDER_CACHE_HARDLINK = _env_bool("RENDER_CACHE_HARDLINK", False)
+RENDER_CACHE_MEMORY_MB = _env_int("RENDER_CACHE_MEMORY_MB", 64)
+
+# Асинхронное выполнение инструментов
+RENDER_MAX_CONCURRENCY = _env_int("RENDER_MAX_CONCURRENCY", min(4, os.cpu_count() or 1))
+
+# Кеш ресурсов генерации скриншотов
+RESOURCE_CACHE_SIZE = _env_int("RESOURCE_CACHE_SIZE", 32)
+
+# Полосовой рендеринг больших файлов
+TILED_TILE_LINES = _env_int("TILED_TILE_LINES", 100)
+TILED_MAX_FILE_LINES = _env_int("TILED_MAX_FILE_LINES", 10000)
+# Pillow по умолчанию предупреждает о DecompressionBomb выше 89,5 Мп
+# (Image.MAX_IMAGE_PIXELS), а вдвое больше отказывается открывать
+TILED_STITCH_MAX_MEGAPIXELS = _env_int("TILED_STITCH_MAX_MEGAPIXELS", 89)
+
+# Индекс сущностей Python файлов
+SYMBOL_INDEX_CACHE_SIZE = _env_int("SYMBOL_INDEX_CACHE_SIZE", 64)
+
+# Параллельный рендеринг скриншотов в процессах
+RENDER_PROCESS_WORKERS = _env_int("RENDER_PROCESS_WORKERS", os.cpu_count() or 1)
+
+# Индекс сущностей проекта
+PROJECT_INDEX_DIR = _env_path("PROJECT_INDEX_DIR", PROJECT_ROOT / ".cache" / "index")
+PROJECT_INDEX_REFRESH_INTERVAL = _env_int("PROJECT_INDEX_REFRESH_INTERVAL", 30)
+
+# Параллельная растеризация больших файлов
+PARALLEL_RENDER_MIN_LINES = _env_int("PARALLEL_RENDER_MIN_LINES", 1000)
+PARALLEL_CHUNK_LINES = _env_int("PARALLEL_CHUNK_LINES", 250)
+
+# Ответ изображением без записи на диск
+INLINE_IMAGE_MAX_KB = _env_int("INLINE_IMAGE_MAX_KB", 1024)
+
+# Статистика времени рендеринга
+RENDER_STATS_WINDOW = _env_int("RENDER_STATS_WINDOW", 1000)
+
+# Профили кодировщика изображений
+ENCODE_LATENCY_BUDGET_MS = _env_int("ENCODE_LATENCY_BUDGET_MS", 1000)
+
+# Плитки Deep Zoom для больших диаграмм
+DEEP_ZOOM_MIN_MEGAPIXELS = _env_int("DEEP_ZOOM_MIN_MEGAPIXELS", 64)
+DEEP_ZOOM_TILE_SIZE = _env_int("DEEP_ZOOM_TILE_SIZE", 254)
+DEEP_ZOOM_OVERLAP = _env_int("DEEP_ZOOM_OVERLAP", 1)
+
+# Бюджеты рендеринга (оценка до растеризации, см. render_budget)
+RENDER_MAX_MEGAPIXELS = _env_int("RENDER_MAX_MEGAPIXELS", 100)
+RENDER_MAX_MEMORY_MB = _env_int("RENDER_MAX_MEMORY_MB", 1024)
+RENDER_BUDGET_POLICY = _env_choice(
+    "RENDER_BUDGET_POLICY", "downgrade", ("downgrade", "reject", "off")
+)
+
+# Длинные строки кода (перенос или обрезка до лексинга, см. long_lines)
+LONG_LINE_POLICY = _env_choice("LONG_LINE_POLICY", "wrap", ("wrap", "truncate", "off"))
+MAX_LINE_COLUMNS = _env_int("MAX_LINE_COLUMNS", 200)
+LONG_LINE_MAX_ROWS = _env_int("LONG_LINE_MAX_ROWS", 50)
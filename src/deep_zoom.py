@@ -0,0 +1,322 @@
+"""Плитки Deep Zoom (DZI) для очень больших растровых изображений.
+
+Диаграмма уровня Extreme может занимать сотни мегапикселей: такое
+изображение тяжело декодировать целиком и бесполезно отдавать просмотрщику
+одним файлом. Модуль принимает изображение полосами сверху вниз и пишет
+пирамиду плиток в формате Deep Zoom (OpenSeadragon и совместимые
+просмотрщики загружают только видимые плитки):
+
+    <имя>.dzi                      — описание (размер, плитка, перекрытие)
+    <имя>_files/<уровень>/<x>_<y>.<формат>
+
+Уровень N — полный размер, каждый предыдущий вдвое меньше, уровень 0 — 1x1.
+Каждый уровень держит в памяти только строки одного ряда плиток с
+перекрытием, поэтому пиковая память пропорциональна ширине изображения, а
+не его площади.
+
+Классы:
+    DeepZoomWriter
+        Пишет пирамиду плиток из полос изображения.
+
+Функции:
+    write_deep_zoom(png_bytes, output_path, format, ...) -> dict
+        Строит пирамиду из PNG, декодируя его полосами.
+"""
+
+import logging
+import math
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from src.config import DEEP_ZOOM_OVERLAP, DEEP_ZOOM_TILE_SIZE
+from src.image_utils import (
+    ImageProcessingError,
+    _prepare_for_save,
+    iter_png_strips,
+    read_png_dimensions,
+    resolve_encoder_profile,
+)
+from src.render_stats import stage
+
+logger = logging.getLogger(__name__)
+
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+
+def _stack(top: Image.Image | None, bottom: Image.Image) -> Image.Image:
+    """Склеивает две полосы одной ширины по вертикали."""
+    if top is None:
+        return bottom
+    stacked = Image.new(bottom.mode, (bottom.width, top.height + bottom.height))
+    stacked.paste(top, (0, 0))
+    stacked.paste(bottom, (0, top.height))
+    return stacked
+
+
+class _Level:
+    """Один уровень пирамиды: нарезает строки на плитки и уменьшает их дальше."""
+
+    def __init__(self, writer: "DeepZoomWriter", level: int, width: int, height: int):
+        self.writer = writer
+        self.level = level
+        self.width = width
+        self.height = height
+        self.next = (
+            _Level(writer, level - 1, math.ceil(width / 2), math.ceil(height / 2))
+            if level > 0
+            else None
+        )
+        self._buffer: Image.Image | None = None
+        self._buffer_top = 0
+        self._received = 0
+        self._row = 0
+        self._downsample_pending: Image.Image | None = None
+
+    def feed(self, strip: Image.Image) -> None:
+        """Принимает следующие строки уровня."""
+        self._buffer = _stack(self._buffer, strip)
+        self._received += strip.height
+
+        tile_size, overlap = self.writer.tile_size, self.writer.overlap
+        while self._row * tile_size < self.height:
+            bottom = min(self.height, (self._row + 1) * tile_size + overlap)
+            if self._received < bottom:
+                break
+            self._write_row(bottom)
+            self._row += 1
+            # Следующий ряд начинается с перекрытия над своей границей
+            new_top = max(0, self._row * tile_size - overlap)
+            if self._received > new_top:
+                self._buffer = self._buffer.crop(
+                    (0, new_top - self._buffer_top, self.width, self._received - self._buffer_top)
+                )
+            else:
+                self._buffer = None
+            self._buffer_top = new_top
+
+        if self.next is not None:
+            # Следующему уровню передаются только пары строк
+            pending = _stack(self._downsample_pending, strip)
+            even = pending.height - pending.height % 2
+            if even:
+                with stage("resample"):
+                    self.next.feed(pending.crop((0, 0, self.width, even)).reduce(2))
+            self._downsample_pending = (
+                pending.crop((0, even, self.width, pending.height))
+                if even < pending.height
+                else None
+            )
+
+    def finish(self) -> None:
+        """Передаёт оставшуюся нечётную строку следующему уровню."""
+        if self.next is None:
+            return
+        if self._downsample_pending is not None:
+            self.next.feed(self._downsample_pending.reduce(2))
+            self._downsample_pending = None
+        self.next.finish()
+
+    def _write_row(self, bottom: int) -> None:
+        tile_size, overlap = self.writer.tile_size, self.writer.overlap
+        top = max(0, self._row * tile_size - overlap)
+        for column in range(math.ceil(self.width / tile_size)):
+            left = max(0, column * tile_size - overlap)
+            right = min(self.width, (column + 1) * tile_size + overlap)
+            tile = self._buffer.crop(
+                (left, top - self._buffer_top, right, bottom - self._buffer_top)
+            )
+            self.writer._save_tile(self.level, column, self._row, tile)
+
+
+class DeepZoomWriter:
+    """Пишет пирамиду плиток Deep Zoom из полос изображения.
+
+    Полосы передаются сверху вниз через write() (любой высоты, ширина равна
+    ширине изображения). Плитки уровня записываются, как только готов их ряд.
+
+    Пример:
+        with DeepZoomWriter(path, width, height) as writer:
+            for strip in strips:
+                writer.write(strip)
+
+    Attributes:
+        tiles_written: Число записанных плиток.
+        size_bytes: Суммарный размер плиток и файла .dzi.
+        encode_ms: Время кодирования плиток.
+    """
+
+    def __init__(
+        self,
+        output_path: str | Path,
+        width: int,
+        height: int,
+        format: str = "png",
+        tile_size: int = DEEP_ZOOM_TILE_SIZE,
+        overlap: int = DEEP_ZOOM_OVERLAP,
+        quality: int | None = None,
+        encoder_profile: str = "smallest",
+    ):
+        """
+        Args:
+            output_path: Путь к файлу .dzi (папка плиток — <имя>_files рядом).
+            width: Ширина изображения.
+            height: Высота изображения.
+            format: Формат плиток (png, webp, jpeg).
+            tile_size: Размер плитки без перекрытия.
+            overlap: Перекрытие соседних плиток.
+            quality: Качество для webp/jpeg (None — по умолчанию формата).
+            encoder_profile: Профиль кодировщика из ENCODER_PROFILES (без 'auto').
+        """
+        if tile_size <= 0 or overlap < 0:
+            raise ImageProcessingError(
+                f"Некорректные параметры плиток: tile_size={tile_size}, overlap={overlap}"
+            )
+
+        self.output_path = Path(output_path).with_suffix(".dzi")
+        self.tiles_dir = self.output_path.with_name(f"{self.output_path.stem}_files")
+        self.width = width
+        self.height = height
+        self.format = format.lower()
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.quality = quality
+        self.encoder_profile = encoder_profile
+        self.max_level = math.ceil(math.log2(max(width, height, 1)))
+        self.rows_written = 0
+        self.tiles_written = 0
+        self.size_bytes = 0
+        self.encode_ms = 0.0
+
+        self._top = _Level(self, self.max_level, width, height)
+
+    def _save_tile(self, level: int, column: int, row: int, tile: Image.Image) -> None:
+        path = self.tiles_dir / str(level) / f"{column}_{row}.{self.format}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tile, save_kwargs = _prepare_for_save(
+            tile, self.format, self.quality, self.encoder_profile
+        )
+        start = time.perf_counter()
+        with stage("encode"):
+            tile.save(path, **save_kwargs)
+        self.encode_ms += (time.perf_counter() - start) * 1000
+        self.tiles_written += 1
+        self.size_bytes += path.stat().st_size
+
+    def write(self, strip: Image.Image) -> None:
+        """Добавляет полосу изображения.
+
+        Raises:
+            ImageProcessingError: Если полоса не подходит по ширине или высоте.
+        """
+        if strip.width != self.width:
+            raise ImageProcessingError(
+                f"Полоса {strip.width}px не подходит для изображения {self.width}px"
+            )
+        if self.rows_written + strip.height > self.height:
+            raise ImageProcessingError("Полосы превышают заявленную высоту изображения")
+
+        if strip.mode not in ("RGB", "RGBA"):
+            has_alpha = strip.mode in ("LA", "PA") or "transparency" in strip.info
+            strip = strip.convert("RGBA" if has_alpha else "RGB")
+
+        self._top.feed(strip)
+        self.rows_written += strip.height
+
+    def close(self) -> Path:
+        """Дописывает уменьшенные уровни и файл .dzi.
+
+        Returns:
+            Путь к файлу .dzi.
+
+        Raises:
+            ImageProcessingError: Если переданы не все строки изображения.
+        """
+        if self.rows_written != self.height:
+            raise ImageProcessingError(
+                f"Передано {self.rows_written} строк из {self.height}"
+            )
+
+        self._top.finish()
+        descriptor = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<Image xmlns="{DZI_NAMESPACE}" Format="{self.format}" '
+            f'Overlap="{self.overlap}" TileSize="{self.tile_size}">\n'
+            f'  <Size Width="{self.width}" Height="{self.height}"/>\n'
+            "</Image>\n"
+        )
+        with stage("write"):
+            self.output_path.write_text(descriptor, encoding="utf-8")
+        self.size_bytes += self.output_path.stat().st_size
+
+        logger.info(
+            f"🗺️ Deep Zoom записан: {self.output_path.name} ({self.width}x{self.height}, "
+            f"уровней {self.max_level + 1}, плиток {self.tiles_written}, "
+            f"{self.size_bytes / 1024:.2f} KB)"
+        )
+        return self.output_path
+
+    def __enter__(self) -> "DeepZoomWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+
+def write_deep_zoom(
+    png_bytes: bytes,
+    output_path: str | Path,
+    format: str = "png",
+    tile_size: int = DEEP_ZOOM_TILE_SIZE,
+    overlap: int = DEEP_ZOOM_OVERLAP,
+    encoder_profile: str = "smallest",
+    latency_budget_ms: int | None = None,
+) -> dict:
+    """Строит пирамиду Deep Zoom из PNG, декодируя его полосами.
+
+    Профиль 'auto' выбирается по суммарному числу пикселей всех уровней.
+
+    Args:
+        png_bytes: Байты PNG (например, вывод PlantUML).
+        output_path: Путь к выходному файлу (расширение заменяется на .dzi).
+        format: Формат плиток (png, webp, jpeg).
+        tile_size: Размер плитки без перекрытия.
+        overlap: Перекрытие соседних плиток.
+        encoder_profile: Профиль кодировщика или 'auto'.
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+
+    Returns:
+        {"path", "dimensions", "levels", "tiles", "tile_size", "overlap",
+         "size_bytes", "encoder_profile", "encode_ms"}.
+    """
+    width, height = read_png_dimensions(png_bytes)
+    # Все уменьшенные уровни вместе дают около трети полного размера
+    profile = resolve_encoder_profile(
+        encoder_profile, width * height * 4 // 3, format.lower(), latency_budget_ms
+    )
+
+    with DeepZoomWriter(
+        output_path,
+        width,
+        height,
+        format=format,
+        tile_size=tile_size,
+        overlap=overlap,
+        encoder_profile=profile,
+    ) as writer:
+        for strip in iter_png_strips(png_bytes, tile_size):
+            writer.write(strip)
+
+    return {
+        "path": str(writer.output_path.absolute()),
+        "dimensions": (width, height),
+        "levels": writer.max_level + 1,
+        "tiles": writer.tiles_written,
+        "tile_size": tile_size,
+        "overlap": overlap,
+        "size_bytes": writer.size_bytes,
+        "encoder_profile": profile,
+        "encode_ms": round(writer.encode_ms, 2),
+    }
@@ -9,8 +9,16 @@
         Проверяет наличие Java в системе.
     render_diagram_to_image(diagram_code, format, theme_name, scale_factor) -> Image
         Генерирует диаграмму из PlantUML кода и возвращает PIL Image.
-    render_diagram_from_string(diagram_code, output_path, format, theme_name, scale_factor) -> dict
-        Генерирует диаграмму и сохраняет в файл (legacy, использует image_utils).
+    render_diagram_from_string(diagram_code, output_path, format, theme_name, scale_factor, optimize) -> dict
+        Генерирует диаграмму и сохраняет в файл (с дисковым кешем результатов).
+    render_diagram_to_bytes(diagram_code, format, theme_name, scale_factor) -> dict
+        Генерирует растровую диаграмму в памяти без записи в выходной файл.
+    render_diagrams_batch(items) -> dict
+        Генерирует пакет диаграмм через один процесс PlantUML на формат.
+    render_diagram_variants(diagram_code, output_path, scales, theme_name, include_svg) -> dict
+        Рендерит PNG один раз в наибольшем DPI и сохраняет варианты уровней.
+    shutdown_worker_pool() -> None
+        Останавливает пул постоянных процессов PlantUML.
 
 Классы:
     JavaNotFoundError
@@ -21,17 +29,53 @@
         Синтаксическая ошибка в PlantUML коде.
 """
 
+import atexit
+import hashlib
+import json
 import logging
+import os
 import subprocess
 import sys
+import threading
+import zipfile
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Literal
+from typing import Iterator, Literal
 
 from PIL import Image
 
+from src.config import (
+    DEEP_ZOOM_MIN_MEGAPIXELS,
+    ENCODE_LATENCY_BUDGET_MS,
+    PLANTUML_POOL_SIZE,
+    PLANTUML_RENDER_TIMEOUT,
+    PLANTUML_WORKER_MAX_RENDERS,
+)
+from src.deep_zoom import write_deep_zoom
+from src.font_initializer import JavaNotFoundError as RuntimeJavaNotFoundError
 from src.font_initializer import ensure_fonts_initialized
 from src.font_manager import GOOGLE_FONTS_URLS
-from src.image_utils import save_image, load_image_from_bytes
+from src.image_utils import (
+    IMAGE_MIME_TYPES,
+    EncoderProfile,
+    downsample_image,
+    encode_image_with_info,
+    load_image_from_bytes,
+    read_png_dimensions,
+    recompress_png_async,
+    save_image,
+    save_png_bytes,
+)
+from src.java_runtime import add_invalidation_listener, get_java_runtime
+from src.plantuml_pool import (
+    PlantUMLWorker,
+    PlantUMLWorkerError,
+    PlantUMLWorkerPool,
+    PlantUMLWorkerTimeout,
+)
+from src.render_cache import RenderCache, detach_shared_file, get_render_cache
+from src.render_executor import RenderCancelledError, kill_on_cancel
+from src.render_stats import stage
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +97,22 @@ QUALITY_LEVELS = {
 # Поддерживаемые форматы
 DiagramFormat = Literal["png", "svg", "eps", "pdf"]
 
+# Режим вывода растра: 'auto' — плитки Deep Zoom для диаграмм больше
+# DEEP_ZOOM_MIN_MEGAPIXELS, 'single' — всегда один файл, 'deep_zoom' — всегда плитки
+DIAGRAM_OUTPUT_MODES = ("auto", "single", "deep_zoom")
+DiagramOutputMode = Literal["auto", "single", "deep_zoom"]
+
+# Признаки ошибки в stderr одноразового процесса PlantUML
+_STDERR_ERROR_MARKERS = ["error", "syntax error", "cannot find", "exception"]
+
+_worker_pool: PlantUMLWorkerPool | None = None
+_worker_pool_lock = threading.Lock()
+
+_plantuml_version: tuple[tuple[int, int], str] | None = None
+
+# Воркеры, закреплённые за потоком на время пакетного рендеринга
+_batch_state = threading.local()
+
 
 class JavaNotFoundError(Exception):
     """Java не найдена в системе."""
@@ -191,49 +251,19 @@ class PlantUMLSyntaxError(Exception):
 def ensure_java_environment() -> str:
     """Проверяет наличие Java в системе.
 
+    Проба выполняется один раз на процесс (см. java_runtime), повторные вызовы
+    возвращают закешированную версию.
+
     Returns:
         Версия Java.
 
     Raises:
         JavaNotFoundError: Если Java не найдена или версия некорректна.
     """
-    logger.debug("🔍 Проверка Java окружения")
     try:
-        result = subprocess.run(
-            ["java", "-version"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-
-        version_output = result.stderr or result.stdout
-
-        if not version_output:
-            logger.error("❌ Java установлена, но версия не определена")
-            raise JavaNotFoundError("Java установлена, но не удалось определить версию")
-
-        version_line = version_output.split("\n")[0].strip()
-        logger.info(f"☕ Java обнаружена: {version_line}")
-
-        return version_line
-
-    except FileNotFoundError:
-        logger.error("❌ Java не найдена в PATH")
-        raise JavaNotFoundError(
-            "Java не найдена в системе. "
-            "Установите JRE (Java Runtime Environment) версии 8 или выше.\n"
-            "macOS: brew install openjdk\n"
-            "Windows: https://adoptium.net/\n"
-            "Linux: sudo apt-get install default-jre"
-        )
-    except subprocess.TimeoutExpired:
-        logger.error("❌ Таймаут при проверке Java")
-        raise JavaNotFoundError("Таймаут при проверке Java. Проверьте установку.")
-    except JavaNotFoundError:
-        raise
-    except Exception as e:
-        logger.error(f"❌ Ошибка при проверке Java: {e}")
-        raise JavaNotFoundError(f"Ошибка при проверке Java: {str(e)}")
+        return get_java_runtime().version_line
+    except RuntimeJavaNotFoundError as e:
+        raise JavaNotFoundError(str(e))
 
 
 def _prepare_diagram_code(
@@ -273,23 +303,267 @@ def _prepare_diagram_code(
         return result
 
 
-def render_diagram_to_image(
+def _build_plantuml_command(format: str) -> list[str]:
+    """Собирает команду запуска PlantUML для указанного формата (без режима ввода)."""
+    return [
+        "java",
+        "-Dfile.encoding=UTF-8",
+        "-Dsun.jnu.encoding=UTF-8",
+        "-Dconsole.encoding=UTF-8",
+        "-Dplantuml.include.path=" + str(THEMES_DIR.absolute()),
+        "-Dplantuml.smetana=true",
+        "-Dplantuml.graphviz.use=false",
+        "-DPLANTUML_LIMIT_SIZE=16384",  # Увеличиваем лимит для больших изображений
+        "-jar",
+        str(PLANTUML_JAR.absolute()),
+        f"-t{format}",
+        "-charset",
+        "UTF-8",
+    ]
+
+
+def _build_plantuml_env() -> dict:
+    """Возвращает окружение процесса PlantUML с принудительной UTF-8 кодировкой."""
+    env = os.environ.copy()
+    env["JAVA_TOOL_OPTIONS"] = "-Dfile.encoding=UTF-8"
+    return env
+
+
+def _get_worker_pool() -> PlantUMLWorkerPool | None:
+    """Возвращает общий пул процессов PlantUML (None, если пул отключён)."""
+    global _worker_pool
+
+    if PLANTUML_POOL_SIZE <= 0:
+        return None
+
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = PlantUMLWorkerPool(
+                command_factory=_build_plantuml_command,
+                size=PLANTUML_POOL_SIZE,
+                max_renders=PLANTUML_WORKER_MAX_RENDERS,
+                env=_build_plantuml_env(),
+            )
+            logger.debug(f"🔧 Создан пул PlantUML: size={PLANTUML_POOL_SIZE}")
+        return _worker_pool
+
+
+def shutdown_worker_pool() -> None:
+    """Останавливает пул постоянных процессов PlantUML.
+
+    Следующий рендеринг создаст новый пул.
+    """
+    global _worker_pool
+
+    with _worker_pool_lock:
+        pool, _worker_pool = _worker_pool, None
+
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown_worker_pool)
+# Процессы пула запущены старой Java: при её смене пул пересоздаётся
+add_invalidation_listener(shutdown_worker_pool)
+
+
+def _is_pipe_safe(prepared_code: str) -> bool:
+    """Проверяет, что код содержит ровно одну диаграмму с закрывающей директивой.
+
+    Постоянный процесс читает stdin до первой строки @end...: если её нет или
+    диаграмм несколько, протокол с разделителем рассинхронизируется.
+    """
+    lines = [line.strip() for line in prepared_code.splitlines()]
+    starts = sum(1 for line in lines if line.startswith("@start"))
+    ends = sum(1 for line in lines if line.startswith("@end"))
+    return starts == 1 and ends == 1
+
+
+def _check_pipe_output(output: bytes) -> bytes:
+    """Проверяет вывод постоянного процесса PlantUML на ошибки диаграммы."""
+    if output.lstrip().startswith(b"ERROR"):
+        error_text = output.decode("utf-8", errors="replace").strip()
+        logger.error(f"💥 Синтаксическая ошибка PlantUML: {error_text}")
+        raise PlantUMLSyntaxError(f"PlantUML обнаружил ошибку:\n{error_text}")
+    return output
+
+
+@contextmanager
+def _pin_workers() -> Iterator[None]:
+    """Закрепляет за текущим потоком процесс PlantUML текущего формата.
+
+    Внутри контекста диаграммы потока одного формата идут через один и тот же
+    процесс, без возврата в пул между ними. При смене формата прежний процесс
+    возвращается в пул, оставшийся — при выходе из контекста.
+    """
+    if getattr(_batch_state, "workers", None) is not None:
+        # Вложенный пакет использует процессы внешнего
+        yield
+        return
+
+    _batch_state.workers = {}
+    try:
+        yield
+    finally:
+        pinned, _batch_state.workers = _batch_state.workers, None
+        for lease, _ in pinned.values():
+            lease.__exit__(None, None, None)
+
+
+def _get_pinned_worker(
+    pool: PlantUMLWorkerPool, format: str
+) -> PlantUMLWorker | None:
+    """Возвращает процесс, закреплённый за потоком (None вне пакетного режима)."""
+    pinned = getattr(_batch_state, "workers", None)
+    if pinned is None:
+        return None
+
+    entry = pinned.pop(format, None)
+    if entry is not None:
+        lease, worker = entry
+        if worker.is_alive and not worker.is_exhausted:
+            pinned[format] = entry
+            return worker
+        # Упавший или исчерпанный процесс возвращается в пул на перезапуск
+        lease.__exit__(None, None, None)
+
+    # Процессы других форматов возвращаются в пул до ожидания нового: пакет
+    # не держит процессы, пока ждёт, поэтому не блокирует ни себя при пуле
+    # меньше числа форматов, ни другие пакеты
+    for other_lease, _ in pinned.values():
+        other_lease.__exit__(None, None, None)
+    pinned.clear()
+
+    lease = pool.acquire(format)
+    worker = lease.__enter__()
+    pinned[format] = (lease, worker)
+    return worker
+
+
+def _run_plantuml_oneshot(prepared_code: str, format: str) -> bytes:
+    """Запускает отдельный процесс PlantUML для одной диаграммы."""
+    command = _build_plantuml_command(format)
+    command.insert(command.index("-jar") + 2, "-pipe")
+
+    logger.debug("⚙️ Запуск Java процесса для PlantUML")
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=_build_plantuml_env(),
+    )
+
+    try:
+        with kill_on_cancel(process.kill):
+            stdout_data, stderr_data = process.communicate(
+                input=prepared_code.encode("utf-8"), timeout=PLANTUML_RENDER_TIMEOUT
+            )
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise PlantUMLWorkerTimeout(
+            f"PlantUML не ответил за {PLANTUML_RENDER_TIMEOUT} секунд"
+        )
+
+    stderr_text = stderr_data.decode("utf-8", errors="replace").strip()
+
+    if stderr_text and any(
+        err in stderr_text.lower() for err in _STDERR_ERROR_MARKERS
+    ):
+        logger.error(f"💥 Синтаксическая ошибка PlantUML: {stderr_text}")
+        raise PlantUMLSyntaxError(f"PlantUML обнаружил ошибку:\n{stderr_text}")
+
+    if process.returncode != 0:
+        error_message = stderr_text or "Unknown error"
+        logger.error(f"❌ PlantUML вернул код ошибки: {process.returncode}")
+        raise PlantUMLRenderError(
+            f"PlantUML вернул ошибку (код {process.returncode}):\n{error_message}"
+        )
+
+    return stdout_data
+
+
+def _worker_stage(worker: PlantUMLWorker) -> str:
+    """Этап замера: первая диаграмма процесса включает запуск JVM."""
+    return "plantuml_layout" if worker.render_count else "plantuml_cold"
+
+
+def _run_plantuml(prepared_code: str, format: str) -> bytes:
+    """Рендерит подготовленный код через пул процессов PlantUML.
+
+    Если пул отключён (PLANTUML_POOL_SIZE=0) или код не подходит для постоянного
+    pipe-режима, запускается отдельный процесс Java.
+
+    Этапы замеряются как plantuml_cold (запуск JVM и раскладка: отдельный
+    процесс или первая диаграмма нового воркера) и plantuml_layout (раскладка
+    на прогретом воркере), ожидание свободного воркера — plantuml_acquire.
+
+    Args:
+        prepared_code: Код после _prepare_diagram_code().
+        format: Формат вывода PlantUML (png, svg, eps, pdf).
+
+    Returns:
+        Байты отрендеренной диаграммы.
+
+    Raises:
+        PlantUMLSyntaxError: Если PlantUML нашёл ошибку в коде.
+        PlantUMLRenderError: Если процесс упал или не ответил вовремя.
+    """
+    pool = _get_worker_pool()
+
+    try:
+        if pool is None or not _is_pipe_safe(prepared_code):
+            with stage("plantuml_cold"):
+                return _run_plantuml_oneshot(prepared_code, format)
+
+        pinned_worker = _get_pinned_worker(pool, format)
+        if pinned_worker is not None:
+            logger.debug(
+                f"⚙️ Рендеринг на закреплённом процессе PlantUML (pid={pinned_worker.pid})"
+            )
+            with kill_on_cancel(pinned_worker.kill), stage(_worker_stage(pinned_worker)):
+                return _check_pipe_output(
+                    pinned_worker.render(prepared_code, timeout=PLANTUML_RENDER_TIMEOUT)
+                )
+
+        logger.debug(f"⚙️ Рендеринг через пул PlantUML (формат={format})")
+        with ExitStack() as stack:
+            with stage("plantuml_acquire"):
+                worker = stack.enter_context(pool.acquire(format))
+            with kill_on_cancel(worker.kill), stage(_worker_stage(worker)):
+                return _check_pipe_output(
+                    worker.render(prepared_code, timeout=PLANTUML_RENDER_TIMEOUT)
+                )
+
+    except PlantUMLWorkerTimeout:
+        logger.error(
+            f"❌ Таймаут при рендеринге диаграммы ({PLANTUML_RENDER_TIMEOUT} секунд)"
+        )
+        raise PlantUMLRenderError(
+            f"Таймаут при рендеринге диаграммы ({PLANTUML_RENDER_TIMEOUT} секунд). "
+            "Возможно, диаграмма слишком сложная."
+        )
+    except PlantUMLWorkerError as e:
+        logger.error(f"❌ Процесс PlantUML завершился с ошибкой: {e}")
+        raise PlantUMLRenderError(f"Ошибка процесса PlantUML: {e}")
+
+
+def _render_png_bytes(
     diagram_code: str,
-    format: DiagramFormat = "png",
     theme_name: str | None = "default",
     scale_factor: float = 1.0,
-) -> Image.Image:
-    """Генерирует диаграмму из PlantUML кода и возвращает PIL Image объект.
+) -> bytes:
+    """Рендерит диаграмму в PNG и возвращает байты вывода PlantUML без декодирования.
 
     Args:
         diagram_code: Исходный код PlantUML диаграммы.
-        format: Формат рендеринга (png, svg, eps, pdf, webp).
         theme_name: Имя темы из папки asset/themes или None.
-        scale_factor: Коэффициент масштабирования для увеличения разрешения.
-                     1.0 = 96 DPI (стандарт), 2.0 = 192 DPI, 3.0 = 288 DPI.
+        scale_factor: Коэффициент масштабирования (1.0 = 96 DPI).
 
     Returns:
-        PIL Image объект.
+        Байты PNG файла.
 
     Raises:
         JavaNotFoundError: Если Java не найдена.
@@ -316,7 +590,7 @@ def render_diagram_to_image(
             f"({font_init_result['java_home']})"
         )
 
-    java_version = ensure_java_environment()
+    ensure_java_environment()
 
     if not PLANTUML_JAR.exists():
         logger.error(f"❌ PlantUML JAR не найден: {PLANTUML_JAR}")
@@ -347,94 +621,168 @@ def render_diagram_to_image(
 
     prepared_code = _prepare_diagram_code(diagram_code, theme_path, dpi)
 
-    command = [
-        "java",
-        "-Dfile.encoding=UTF-8",
-        "-Dplantuml.include.path=" + str(THEMES_DIR.absolute()),
-        "-Dplantuml.smetana=true",
-        "-Dplantuml.graphviz.use=false",
-        f"-DPLANTUML_LIMIT_SIZE=16384",  # Увеличиваем лимит для больших изображений
-        "-jar",
-        str(PLANTUML_JAR.absolute()),
-        "-pipe",
-        f"-t{format}",
-        "-charset",
-        "UTF-8",
-    ]
-
-    logger.debug(f"⚙️ Запуск Java процесса для PlantUML")
-
     try:
-        process = subprocess.Popen(
-            command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        stdout_data = _run_plantuml(prepared_code, "png")
+    except (PlantUMLSyntaxError, PlantUMLRenderError, RenderCancelledError):
+        raise
+    except Exception as e:
+        logger.error(f"❌ Ошибка при рендеринге: {e}")
+        raise PlantUMLRenderError(f"Ошибка при рендеринге диаграммы: {str(e)}")
 
-        stdout_data, stderr_data = process.communicate(
-            input=prepared_code.encode("utf-8"), timeout=30
+    if len(stdout_data) < 100:
+        logger.error(
+            f"❌ PlantUML создал слишком маленький файл: {len(stdout_data)} bytes"
+        )
+        raise PlantUMLRenderError(
+            f"PlantUML создал слишком маленький файл ({len(stdout_data)} bytes). "
+            "Возможно, в коде есть ошибки."
         )
 
-        stderr_text = stderr_data.decode("utf-8", errors="replace").strip()
-
-        if stderr_text and any(
-            err in stderr_text.lower()
-            for err in ["error", "syntax error", "cannot find", "exception"]
-        ):
-            logger.error(f"💥 Синтаксическая ошибка PlantUML: {stderr_text}")
-            raise PlantUMLSyntaxError(f"PlantUML обнаружил ошибку:\n{stderr_text}")
-
-        if process.returncode != 0:
-            error_message = stderr_text or "Unknown error"
-            logger.error(f"❌ PlantUML вернул код ошибки: {process.returncode}")
-            raise PlantUMLRenderError(
-                f"PlantUML вернул ошибку (код {process.returncode}):\n{error_message}"
-            )
+    return stdout_data
 
-        if len(stdout_data) < 100:
-            logger.error(
-                f"❌ PlantUML создал слишком маленький файл: {len(stdout_data)} bytes"
-            )
-            raise PlantUMLRenderError(
-                f"PlantUML создал слишком маленький файл ({len(stdout_data)} bytes). "
-                "Возможно, в коде есть ошибки."
-            )
 
-        # Загружаем изображение из байтов только для растровых форматов
-        if format == "png":
-            image = load_image_from_bytes(stdout_data, source_format=format)
+def render_diagram_to_image(
+    diagram_code: str,
+    format: DiagramFormat = "png",
+    theme_name: str | None = "default",
+    scale_factor: float = 1.0,
+) -> Image.Image:
+    """Генерирует диаграмму из PlantUML кода и возвращает PIL Image объект.
 
-            logger.info(
-                f"✅ Диаграмма отрендерена: {image.width}x{image.height}, "
-                f"размер данных: {len(stdout_data) / 1024:.2f} KB"
-            )
+    Args:
+        diagram_code: Исходный код PlantUML диаграммы.
+        format: Формат рендеринга (png, svg, eps, pdf, webp).
+        theme_name: Имя темы из папки asset/themes или None.
+        scale_factor: Коэффициент масштабирования для увеличения разрешения.
+                     1.0 = 96 DPI (стандарт), 2.0 = 192 DPI, 3.0 = 288 DPI.
 
-            return image
-        else:
-            # Для SVG/EPS/PDF возвращаем заглушку (эти форматы не поддерживают PIL Image)
-            logger.warning(
-                f"⚠️ Формат {format} не поддерживается render_diagram_to_image(). "
-                f"Используйте render_diagram_from_string() для векторных форматов."
-            )
-            raise PlantUMLRenderError(
-                f"Формат {format} не поддерживается для возврата PIL Image. "
-                "Используйте только 'png' для render_diagram_to_image()."
-            )
+    Returns:
+        PIL Image объект.
 
-    except subprocess.TimeoutExpired:
-        process.kill()
-        logger.error("❌ Таймаут при рендеринге диаграммы (30 секунд)")
+    Raises:
+        JavaNotFoundError: Если Java не найдена.
+        PlantUMLSyntaxError: Если PlantUML код содержит синтаксические ошибки.
+        PlantUMLRenderError: Если произошла ошибка рендеринга.
+    """
+    if format != "png":
+        # Для SVG/EPS/PDF PIL Image не создаётся
+        logger.warning(
+            f"⚠️ Формат {format} не поддерживается render_diagram_to_image(). "
+            f"Используйте render_diagram_from_string() для векторных форматов."
+        )
         raise PlantUMLRenderError(
-            "Таймаут при рендеринге диаграммы (30 секунд). "
-            "Возможно, диаграмма слишком сложная."
+            f"Формат {format} не поддерживается для возврата PIL Image. "
+            "Используйте только 'png' для render_diagram_to_image()."
         )
-    except (PlantUMLSyntaxError, PlantUMLRenderError):
-        raise
+
+    stdout_data = _render_png_bytes(diagram_code, theme_name, scale_factor)
+
+    try:
+        with stage("decode"):
+            image = load_image_from_bytes(stdout_data, source_format=format)
     except Exception as e:
         logger.error(f"❌ Ошибка при рендеринге: {e}")
         raise PlantUMLRenderError(f"Ошибка при рендеринге диаграммы: {str(e)}")
 
+    logger.info(
+        f"✅ Диаграмма отрендерена: {image.width}x{image.height}, "
+        f"размер данных: {len(stdout_data) / 1024:.2f} KB"
+    )
+
+    return image
+
+
+def _get_plantuml_version() -> str:
+    """Возвращает версию PlantUML JAR для ключа кеша.
+
+    Версия читается из MANIFEST.MF и кешируется по (mtime, size) файла, чтобы
+    обновление JAR автоматически инвалидировало кеш рендеринга.
+    """
+    global _plantuml_version
+
+    try:
+        stat = PLANTUML_JAR.stat()
+    except OSError:
+        return "missing"
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if _plantuml_version is not None and _plantuml_version[0] == signature:
+        return _plantuml_version[1]
+
+    version = f"{stat.st_size}-{stat.st_mtime_ns}"
+    try:
+        with zipfile.ZipFile(PLANTUML_JAR) as jar:
+            manifest = jar.read("META-INF/MANIFEST.MF").decode("utf-8", "replace")
+        for line in manifest.splitlines():
+            key, _, value = line.partition(":")
+            if key.strip() == "Implementation-Version" and value.strip():
+                version = value.strip()
+                break
+    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        logger.debug(f"⚠️ Не удалось прочитать версию PlantUML из MANIFEST: {e}")
+
+    _plantuml_version = (signature, version)
+    return version
+
+
+def _hash_theme(theme_name: str | None) -> str:
+    """Хеширует содержимое файла темы.
+
+    Подготовленный код подключает тему через !include по пути, поэтому
+    правка файла темы меняет ключ кеша только через этот хеш.
+    """
+    if not theme_name:
+        return "none"
+
+    theme_path = THEMES_DIR / f"{theme_name}.puml"
+    try:
+        return hashlib.sha256(theme_path.read_bytes()).hexdigest()
+    except OSError:
+        return "missing"
+
+
+def _diagram_cache_key(
+    diagram_code: str,
+    format: str,
+    save_format: str,
+    theme_name: str | None,
+    scale_factor: float,
+    encoder_profile: str = "smallest",
+    latency_budget_ms: int | None = None,
+    output_mode: str = "auto",
+) -> str:
+    """Строит ключ кеша из всех входных данных, влияющих на результат.
+
+    Хешируется подготовленный код (_prepare_diagram_code) — тот, что получает
+    PlantUML, с подключённой темой, Smetana и DPI, — а не исходник: ключ
+    следует за тем, что на самом деле рендерится.
+    """
+    is_raster = format in ("png", "webp")
+    # Как в _render_png_bytes и _render_diagram_to_file: DPI только для растра
+    dpi = int(96 * scale_factor) if is_raster else None
+    theme_path = THEMES_DIR / f"{theme_name}.puml" if theme_name else None
+    prepared_code = _prepare_diagram_code(diagram_code, theme_path, dpi)
+
+    # Профиль кодировщика влияет только на перекодированный растр (PNG пишется как есть)
+    encoder: tuple = ()
+    if is_raster and save_format != "png":
+        encoder = (encoder_profile.lower(),)
+        if encoder_profile.lower() == "auto":
+            encoder += (latency_budget_ms or ENCODE_LATENCY_BUDGET_MS,)
+    # Плитки Deep Zoom не кешируются, но 'single' и 'auto' дают разный результат
+    if is_raster and output_mode != "auto":
+        encoder += (output_mode,)
+
+    return RenderCache.make_key(
+        "plantuml",
+        _get_plantuml_version(),
+        prepared_code,
+        _hash_theme(theme_name),
+        format,
+        save_format,
+        *encoder,
+    )
+
 
 def render_diagram_from_string(
     diagram_code: str,
@@ -442,11 +790,25 @@ def render_diagram_from_string(
     format: DiagramFormat = "png",
     theme_name: str | None = "default",
     scale_factor: float = 1.0,
+    optimize: bool = False,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+    output_mode: DiagramOutputMode = "auto",
 ) -> dict:
     """Генерирует диаграмму из PlantUML кода и сохраняет в файл.
 
-    LEGACY функция для обратной совместимости. Для PNG использует render_diagram_to_image()
-    и image_utils. Для SVG/EPS/PDF сохраняет напрямую.
+    Результаты кешируются на диске по хешу подготовленного кода (с темой и
+    DPI), содержимого темы, формата и версии PlantUML: повторный запрос
+    отдаётся из кеша без запуска Java.
+    Признак попадания возвращается в поле cache_hit.
+
+    PNG записывается без перекодирования. При optimize=True файл после ответа
+    пережимается в фоне (заменяется атомарно, только если стал меньше);
+    file_size_kb в ответе тогда — размер до пережатия (см. file_size_note).
+
+    Растр больше DEEP_ZOOM_MIN_MEGAPIXELS (output_mode='auto') или при
+    output_mode='deep_zoom' пишется пирамидой плиток Deep Zoom (<имя>.dzi и
+    <имя>_files/) без декодирования PNG целиком; такие результаты не кешируются.
 
     Args:
         diagram_code: Исходный код PlantUML диаграммы.
@@ -455,6 +817,11 @@ def render_diagram_from_string(
         theme_name: Имя темы из папки asset/themes или None.
         scale_factor: Коэффициент масштабирования (1.0 = стандарт, 3.0 = для 4K).
                      Применяется только для PNG.
+        optimize: Пережать PNG в фоне ради меньшего размера файла.
+        encoder_profile: Профиль кодировщика WebP (fast, balanced, smallest
+            или auto); PNG пишется без перекодирования.
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+        output_mode: Режим вывода растра ('auto', 'single', 'deep_zoom').
 
     Returns:
         Словарь с информацией о результате рендеринга.
@@ -465,26 +832,470 @@ def render_diagram_from_string(
         PlantUMLRenderError: Если произошла ошибка рендеринга.
     """
     output_path = Path(output_path)
+    cache = get_render_cache("diagrams")
+
+    encoder = (encoder_profile, latency_budget_ms, output_mode)
+
+    if cache is None:
+        result = _render_diagram_to_file(
+            diagram_code, output_path, format, theme_name, scale_factor, *encoder
+        )
+        result["cache_hit"] = False
+        return _schedule_recompression(result, optimize)
 
-    # Для PNG/WebP используем новую функцию с PIL Image
     if format in ("png", "webp"):
-        # Генерируем изображение через новую функцию
-        image = render_diagram_to_image(
-            diagram_code=diagram_code,
-            format="png",  # PlantUML всегда генерирует PNG, конвертируем потом
-            theme_name=theme_name,
-            scale_factor=scale_factor,
+        save_format = output_path.suffix.lstrip(".").lower() or format
+    else:
+        save_format = format
+
+    key = _diagram_cache_key(
+        diagram_code, format, save_format, theme_name, scale_factor, *encoder
+    )
+
+    cached = cache.fetch(key, output_path)
+    if cached is not None:
+        cached["output_path"] = str(output_path.absolute())
+        cached["cache_hit"] = True
+        return _schedule_recompression(cached, optimize)
+
+    # Файл мог остаться жёсткой ссылкой на запись кеша от прошлого попадания
+    detach_shared_file(output_path)
+
+    result = _render_diagram_to_file(
+        diagram_code, output_path, format, theme_name, scale_factor, *encoder
+    )
+    if result.get("output_mode") != "deep_zoom":
+        cache.store(key, result["output_path"], result)
+    result["cache_hit"] = False
+    return _schedule_recompression(result, optimize)
+
+
+def render_diagram_to_bytes(
+    diagram_code: str,
+    format: Literal["png", "webp"] = "png",
+    theme_name: str | None = "default",
+    scale_factor: float = 1.0,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+) -> dict:
+    """Генерирует растровую диаграмму в памяти, без записи в выходной файл.
+
+    PNG отдаётся как вывод PlantUML без перекодирования, WebP кодируется
+    через image_utils. Кеш общий с render_diagram_from_string (байты
+    совпадают с файлом того же формата).
+
+    Args:
+        diagram_code: Исходный код PlantUML диаграммы.
+        format: Растровый формат результата (png или webp).
+        theme_name: Имя темы из папки asset/themes или None.
+        scale_factor: Коэффициент масштабирования (1.0 = 96 DPI).
+        encoder_profile: Профиль кодировщика WebP или 'auto'.
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+
+    Returns:
+        Метаданные как у render_diagram_from_string (без output_path) и поля
+        data (байты изображения) и mime_type.
+
+    Raises:
+        JavaNotFoundError: Если Java не найдена.
+        PlantUMLSyntaxError: Если PlantUML код содержит синтаксические ошибки.
+        PlantUMLRenderError: Если произошла ошибка рендеринга или формат не растровый.
+    """
+    if format not in ("png", "webp"):
+        raise PlantUMLRenderError(
+            f"Формат {format} не поддерживается для ответа изображением. "
+            "Используйте 'png' или 'webp'."
+        )
+
+    cache = get_render_cache("diagrams")
+    key = None
+    if cache is not None:
+        key = _diagram_cache_key(
+            diagram_code,
+            format,
+            format,
+            theme_name,
+            scale_factor,
+            encoder_profile,
+            latency_budget_ms,
+        )
+        cached = cache.fetch_bytes(key)
+        if cached is not None:
+            data, metadata = cached
+            metadata.pop("output_path", None)
+            return {
+                **metadata,
+                "data": data,
+                "mime_type": IMAGE_MIME_TYPES[format],
+                "cache_hit": True,
+            }
+
+    png_bytes = _render_png_bytes(diagram_code, theme_name, scale_factor)
+    if format == "png":
+        # Вывод PlantUML отдаётся без перекодирования
+        encoded = {
+            "data": png_bytes,
+            "dimensions": read_png_dimensions(png_bytes),
+            "encoder_profile": None,
+            "encode_ms": 0.0,
+        }
+    else:
+        image = load_image_from_bytes(png_bytes, source_format="png")
+        encoded = encode_image_with_info(
+            image,
+            format,
+            encoder_profile=encoder_profile,
+            latency_budget_ms=latency_budget_ms,
+        )
+    data = encoded["data"]
+
+    metadata = {
+        "success": True,
+        "format": format,
+        "file_size_kb": round(len(data) / 1024, 2),
+        "dimensions": encoded["dimensions"],
+        "java_version": ensure_java_environment(),
+        "theme_used": theme_name,
+        "scale_factor": scale_factor,
+        "encoder_profile": encoded["encoder_profile"],
+        "encode_ms": encoded["encode_ms"],
+    }
+    if key is not None:
+        cache.store_bytes(key, data, metadata)
+
+    logger.info(f"🧮 Диаграмма закодирована в памяти: {metadata['file_size_kb']} KB")
+    return {
+        **metadata,
+        "data": data,
+        "mime_type": IMAGE_MIME_TYPES[format],
+        "cache_hit": False,
+    }
+
+
+def _schedule_recompression(result: dict, optimize: bool) -> dict:
+    """Запускает фоновое пережатие PNG, если его запросили.
+
+    Пережатие заканчивается после ответа, поэтому file_size_kb в ответе —
+    размер до пережатия; это явно указывается в поле file_size_note.
+    """
+    result["recompression_scheduled"] = optimize and result["format"] == "png"
+    if result["recompression_scheduled"]:
+        recompress_png_async(result["output_path"])
+        result["file_size_note"] = (
+            "file_size_kb — размер до фонового пережатия; итоговый файл будет не больше"
         )
+    return result
+
+
+def render_diagrams_batch(items: list[dict]) -> dict:
+    """Генерирует пакет диаграмм через один процесс PlantUML на формат.
+
+    Диаграммы рендерятся последовательно на закреплённых процессах пула, поэтому
+    JVM не запускается заново для каждой диаграммы. Ошибка в одной диаграмме
+    не прерывает пакет: результат возвращается для каждого элемента.
+
+    Args:
+        items: Список словарей с ключами diagram_code и output_path, а также
+            необязательными format ("png"), theme_name ("default"),
+            scale_factor (1.0), optimize (False), encoder_profile ("smallest"),
+            latency_budget_ms и output_mode ("auto").
 
+    Returns:
+        Словарь со сводкой (total, succeeded, failed) и списком results
+        в порядке элементов. Каждый результат содержит index.
+    """
+    logger.info(f"📦 Пакетный рендеринг диаграмм: {len(items)} шт.")
+
+    results = []
+    with _pin_workers():
+        for index, item in enumerate(items):
+            output_path = item.get("output_path")
+            try:
+                result = render_diagram_from_string(
+                    diagram_code=item["diagram_code"],
+                    output_path=output_path,
+                    format=item.get("format", "png"),
+                    theme_name=item.get("theme_name", "default"),
+                    scale_factor=item.get("scale_factor", 1.0),
+                    optimize=item.get("optimize", False),
+                    encoder_profile=item.get("encoder_profile", "smallest"),
+                    latency_budget_ms=item.get("latency_budget_ms"),
+                    output_mode=item.get("output_mode", "auto"),
+                )
+            except PlantUMLSyntaxError as e:
+                result = {
+                    "success": False,
+                    "error": "Синтаксическая ошибка в PlantUML коде",
+                    "details": str(e),
+                }
+            except (PlantUMLRenderError, JavaNotFoundError, FileNotFoundError) as e:
+                result = {
+                    "success": False,
+                    "error": "Ошибка рендеринга PlantUML диаграммы",
+                    "details": str(e),
+                }
+            except RenderCancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка диаграммы #{index} в пакете: {e}")
+                result = {"success": False, "error": str(e)}
+
+            result["index"] = index
+            result.setdefault("output_path", output_path)
+            results.append(result)
+
+    succeeded = sum(1 for result in results if result["success"])
+    logger.info(
+        f"✅ Пакет диаграмм готов: успешно {succeeded}, "
+        f"с ошибками {len(results) - succeeded}"
+    )
+
+    return {
+        "success": succeeded == len(results),
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+
+def render_diagram_variants(
+    diagram_code: str,
+    output_path: str | Path,
+    scales: list[float],
+    theme_name: str | None = "default",
+    include_svg: bool = False,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+) -> dict:
+    """Рендерит диаграмму один раз в наибольшем DPI и сохраняет варианты уровней.
+
+    skinparam dpi вшивается в код (_prepare_diagram_code), поэтому каждый
+    DPI — отдельная раскладка в PlantUML. Здесь PlantUML запускается один раз
+    для наибольшего масштаба, меньшие варианты получаются уменьшением
+    (downsample_image). Вариант наибольшего масштаба в PNG пишется без
+    перекодирования. SVG (include_svg) рендерится тем же процессом пула.
+    Кеш результатов не используется.
+
+    Файлы называются <имя>@<масштаб>x.<формат>, рядом пишется манифест
+    <имя>.manifest.json со списком вариантов.
+
+    Args:
+        diagram_code: Исходный код PlantUML диаграммы.
+        output_path: Путь-шаблон: от него берутся папка, имя и расширение
+            (png или webp).
+        scales: Масштабы вариантов (значения QUALITY_LEVELS).
+        theme_name: Имя темы из папки asset/themes или None.
+        include_svg: Дополнительно сохранить <имя>.svg.
+        encoder_profile: Профиль кодировщика для перекодируемых вариантов.
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+
+    Returns:
+        Словарь с manifest_path, variants ([{scale, path, dimensions,
+        file_size_kb, encoder_profile, encode_ms}] по убыванию масштаба)
+        и svg_path (при include_svg).
+
+    Raises:
+        JavaNotFoundError: Если Java не найдена.
+        PlantUMLSyntaxError: Если PlantUML код содержит синтаксические ошибки.
+        PlantUMLRenderError: Если масштабы некорректны, формат не растровый
+            или произошла ошибка рендеринга.
+    """
+    if not scales or min(scales) <= 0:
+        raise PlantUMLRenderError(f"Некорректные масштабы вариантов: {scales}")
+
+    output_path = Path(output_path)
+    save_format = output_path.suffix.lstrip(".").lower() or "png"
+    if save_format not in ("png", "webp"):
+        raise PlantUMLRenderError(
+            f"Варианты плотности поддерживаются только для png и webp (запрошен {save_format})"
+        )
+
+    ordered = sorted(set(scales), reverse=True)
+    largest = ordered[0]
+
+    with _pin_workers():
+        png_bytes = _render_png_bytes(diagram_code, theme_name, largest)
+        svg_result = None
+        if include_svg:
+            svg_result = _render_diagram_to_file(
+                diagram_code, output_path.with_suffix(".svg"), "svg", theme_name
+            )
+
+    with stage("decode"):
+        image = load_image_from_bytes(png_bytes, source_format="png")
+
+    variants = []
+    for scale in ordered:
+        variant_path = output_path.with_name(f"{output_path.stem}@{scale:g}x.{save_format}")
+        if scale == largest and save_format == "png":
+            # Вывод PlantUML пишется без перекодирования
+            save_result = save_png_bytes(png_bytes, variant_path)
+        else:
+            with stage("resample"):
+                variant = downsample_image(image, largest / scale)
+            save_result = save_image(
+                variant,
+                variant_path,
+                format=save_format,  # type: ignore
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+            )
+        variants.append(
+            {
+                "scale": scale,
+                "path": save_result["path"],
+                "dimensions": save_result["dimensions"],
+                "file_size_kb": round(save_result["size_bytes"] / 1024, 2),
+                "encoder_profile": save_result.get("encoder_profile"),
+                "encode_ms": save_result.get("encode_ms", 0.0),
+            }
+        )
+
+    manifest_path = output_path.with_name(f"{output_path.stem}.manifest.json")
+    manifest = {
+        "theme": theme_name,
+        "format": save_format,
+        "rendered_scale": largest,
+        "variants": [
+            {"scale": item["scale"], "path": item["path"], "dimensions": item["dimensions"]}
+            for item in variants
+        ],
+    }
+    if svg_result is not None:
+        manifest["svg"] = svg_result["output_path"]
+    with stage("write"), open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logger.info(
+        f"✅ Варианты диаграммы: {', '.join(f'{scale:g}x' for scale in ordered)} "
+        f"(рендер в {largest:g}x{', + SVG' if svg_result else ''})"
+    )
+
+    result = {
+        "success": True,
+        "format": save_format,
+        "theme_used": theme_name,
+        "java_version": ensure_java_environment(),
+        "manifest_path": str(manifest_path.absolute()),
+        "variants": variants,
+    }
+    if svg_result is not None:
+        result["svg_path"] = svg_result["output_path"]
+    return result
+
+
+def _write_diagram_deep_zoom(
+    png_bytes: bytes,
+    output_path: Path,
+    save_format: str,
+    theme_name: str | None,
+    scale_factor: float,
+    encoder_profile: EncoderProfile,
+    latency_budget_ms: int | None,
+) -> dict:
+    """Пишет вывод PlantUML пирамидой плиток Deep Zoom (см. deep_zoom)."""
+    width, height = read_png_dimensions(png_bytes)
+    logger.info(
+        f"🗺️ Диаграмма {width}x{height} ({width * height / 1_000_000:.0f} Мп) "
+        "записывается плитками Deep Zoom"
+    )
+    tiles = write_deep_zoom(
+        png_bytes,
+        output_path,
+        format=save_format,
+        encoder_profile=encoder_profile,
+        latency_budget_ms=latency_budget_ms,
+    )
+    return {
+        "success": True,
+        "output_path": tiles["path"],
+        "output_mode": "deep_zoom",
+        "format": save_format,
+        "file_size_kb": round(tiles["size_bytes"] / 1024, 2),
+        "dimensions": tiles["dimensions"],
+        "levels": tiles["levels"],
+        "tiles": tiles["tiles"],
+        "tile_size": tiles["tile_size"],
+        "overlap": tiles["overlap"],
+        "java_version": ensure_java_environment(),
+        "theme_used": theme_name,
+        "scale_factor": scale_factor,
+        "encoder_profile": tiles["encoder_profile"],
+        "encode_ms": tiles["encode_ms"],
+    }
+
+
+def _render_diagram_to_file(
+    diagram_code: str,
+    output_path: Path,
+    format: DiagramFormat = "png",
+    theme_name: str | None = "default",
+    scale_factor: float = 1.0,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+    output_mode: DiagramOutputMode = "auto",
+) -> dict:
+    """Рендерит диаграмму и сохраняет в файл, минуя кеш.
+
+    PNG записывается как есть, для WebP изображение декодируется и сохраняется
+    через image_utils. Большой растр (см. output_mode) пишется плитками Deep
+    Zoom. Для SVG/EPS/PDF сохраняет напрямую.
+
+    Args:
+        diagram_code: Исходный код PlantUML диаграммы.
+        output_path: Абсолютный путь к выходному файлу.
+        format: Формат выходного файла (png, svg, eps, pdf, webp).
+        theme_name: Имя темы из папки asset/themes или None.
+        scale_factor: Коэффициент масштабирования (1.0 = стандарт, 3.0 = для 4K).
+                     Применяется только для PNG.
+        encoder_profile: Профиль кодировщика для перекодируемого растра.
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+        output_mode: Режим вывода растра ('auto', 'single', 'deep_zoom').
+
+    Returns:
+        Словарь с информацией о результате рендеринга.
+
+    Raises:
+        JavaNotFoundError: Если Java не найдена.
+        PlantUMLSyntaxError: Если PlantUML код содержит синтаксические ошибки.
+        PlantUMLRenderError: Если произошла ошибка рендеринга.
+    """
+    # Для PNG/WebP PlantUML генерирует PNG
+    if format in ("png", "webp"):
         # Определяем формат для сохранения (из расширения файла или параметра)
         save_format = output_path.suffix.lstrip(".").lower() or format
 
-        # Сохраняем через image_utils
-        save_result = save_image(
-            image=image,
-            output_path=output_path,
-            format=save_format,  # type: ignore
-        )
+        png_bytes = _render_png_bytes(diagram_code, theme_name, scale_factor)
+        width, height = read_png_dimensions(png_bytes)
+        if output_mode == "deep_zoom" or (
+            output_mode == "auto" and width * height > DEEP_ZOOM_MIN_MEGAPIXELS * 1_000_000
+        ):
+            return _write_diagram_deep_zoom(
+                png_bytes,
+                output_path,
+                save_format,
+                theme_name,
+                scale_factor,
+                encoder_profile,
+                latency_budget_ms,
+            )
+
+        if save_format == "png":
+            # Конвертация не нужна: пишем вывод PlantUML без декодирования
+            save_result = save_png_bytes(png_bytes, output_path)
+        else:
+            with stage("decode"):
+                image = load_image_from_bytes(png_bytes, source_format="png")
+
+            # Сохраняем через image_utils
+            save_result = save_image(
+                image=image,
+                output_path=output_path,
+                format=save_format,  # type: ignore
+                encoder_profile=encoder_profile,
+                latency_budget_ms=latency_budget_ms,
+            )
 
         java_version = ensure_java_environment()
 
@@ -497,6 +1308,8 @@ def render_diagram_from_string(
             "java_version": java_version,
             "theme_used": theme_name,
             "scale_factor": scale_factor,
+            "encoder_profile": save_result.get("encoder_profile"),
+            "encode_ms": save_result.get("encode_ms", 0.0),
         }
 
     # Для SVG/EPS/PDF используем прямое сохранение
@@ -525,80 +1338,35 @@ def render_diagram_from_string(
 
         prepared_code = _prepare_diagram_code(diagram_code, theme_path)
 
-        command = [
-            "java",
-            "-Dfile.encoding=UTF-8",
-            "-Dsun.jnu.encoding=UTF-8",
-            "-Dconsole.encoding=UTF-8",
-            "-Dplantuml.include.path=" + str(THEMES_DIR.absolute()),
-            "-Dplantuml.smetana=true",
-            "-Dplantuml.graphviz.use=false",
-            "-jar",
-            str(PLANTUML_JAR.absolute()),
-            "-pipe",
-            f"-t{format}",
-            "-charset",
-            "UTF-8",
-        ]
-
         try:
-            # Установка environment для UTF-8
-            import os
-
-            env = os.environ.copy()
-            env["JAVA_TOOL_OPTIONS"] = "-Dfile.encoding=UTF-8"
-
-            process = subprocess.Popen(
-                command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=env,
-            )
-
-            stdout_data, stderr_data = process.communicate(
-                input=prepared_code.encode("utf-8"), timeout=30
-            )
-
-            stderr_text = stderr_data.decode("utf-8", errors="replace").strip()
-
-            if stderr_text and any(
-                err in stderr_text.lower()
-                for err in ["error", "syntax error", "cannot find", "exception"]
-            ):
-                raise PlantUMLSyntaxError(f"PlantUML обнаружил ошибку:\n{stderr_text}")
-
-            if process.returncode != 0:
-                error_message = stderr_text or "Unknown error"
-                raise PlantUMLRenderError(
-                    f"PlantUML вернул ошибку (код {process.returncode}):\n{error_message}"
-                )
+            stdout_data = _run_plantuml(prepared_code, format)
 
             # Для SVG форма выполняем инъекцию Google Fonts
             if format == "svg":
-                # Извлекаем имя шрифта из темы
-                font_name = _extract_font_from_theme(theme_name)
-
-                # Декодируем SVG из байтов с явным указанием UTF-8
-                # Пробуем разные кодировки на случай проблем PlantUML
-                try:
-                    svg_text = stdout_data.decode("utf-8")
-                except UnicodeDecodeError:
-                    logger.warning("⚠️ UTF-8 декодирование не удалось, пробуем cp1251")
+                with stage("svg_fonts"):
+                    # Извлекаем имя шрифта из темы
+                    font_name = _extract_font_from_theme(theme_name)
+
+                    # Декодируем SVG из байтов с явным указанием UTF-8
+                    # Пробуем разные кодировки на случай проблем PlantUML
                     try:
-                        svg_text = stdout_data.decode("cp1251")
+                        svg_text = stdout_data.decode("utf-8")
                     except UnicodeDecodeError:
-                        logger.error("❌ Не удалось декодировать SVG")
-                        svg_text = stdout_data.decode("utf-8", errors="replace")
+                        logger.warning("⚠️ UTF-8 декодирование не удалось, пробуем cp1251")
+                        try:
+                            svg_text = stdout_data.decode("cp1251")
+                        except UnicodeDecodeError:
+                            logger.error("❌ Не удалось декодировать SVG")
+                            svg_text = stdout_data.decode("utf-8", errors="replace")
 
-                # Внедряем ссылку на Google Fonts
-                svg_text = _inject_web_font_into_svg(svg_text, font_name)
+                    # Внедряем ссылку на Google Fonts
+                    svg_text = _inject_web_font_into_svg(svg_text, font_name)
 
                 # Создаём директорию если нужно
                 output_path.parent.mkdir(parents=True, exist_ok=True)
 
                 # Сохраняем модифицированный SVG с явной UTF-8 кодировкой
-                with open(output_path, "w", encoding="utf-8") as f:
+                with stage("write"), open(output_path, "w", encoding="utf-8") as f:
                     f.write(svg_text)
 
                 file_size = len(svg_text.encode("utf-8"))
@@ -612,7 +1380,7 @@ def render_diagram_from_string(
                 output_path.parent.mkdir(parents=True, exist_ok=True)
 
                 # Сохраняем напрямую
-                with open(output_path, "wb") as f:
+                with stage("write"), open(output_path, "wb") as f:
                     f.write(stdout_data)
 
                 file_size = len(stdout_data)
@@ -632,13 +1400,7 @@ def render_diagram_from_string(
                 "scale_factor": scale_factor if format == "png" else None,
             }
 
-        except subprocess.TimeoutExpired:
-            process.kill()
-            raise PlantUMLRenderError(
-                "Таймаут при рендеринге диаграммы (30 секунд). "
-                "Возможно, диаграмма слишком сложная."
-            )
-        except (PlantUMLSyntaxError, PlantUMLRenderError):
+        except (PlantUMLSyntaxError, PlantUMLRenderError, RenderCancelledError):
             raise
         except Exception as e:
             logger.error(f"❌ Ошибка при рендеринге: {e}")
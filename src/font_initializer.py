@@ -40,9 +40,26 @@ class FontInitializationError(Exception):
     pass
 
 
-def _find_java_home() -> Path:
+def _java_home_from_settings(settings_output: str) -> Path | None:
+    """Извлекает java.home из вывода `java -XshowSettings:properties -version`."""
+    for line in settings_output.split("\n"):
+        if "java.home" in line:
+            # Формат: "    java.home = C:\Path\To\Java"
+            parts = line.split("=")
+            if len(parts) == 2:
+                java_home = Path(parts[1].strip())
+                if java_home.exists():
+                    return java_home
+    return None
+
+
+def _find_java_home(settings_output: str | None = None) -> Path:
     """Находит путь к установке Java JRE/JDK.
 
+    Args:
+        settings_output: Готовый вывод `java -XshowSettings:properties -version`
+            (stderr). Если не передан, Java запускается для его получения.
+
     Returns:
         Path: Путь к корневой директории Java.
 
@@ -52,24 +69,21 @@ def _find_java_home() -> Path:
     logger.debug("🔍 Поиск Java установки...")
 
     try:
-        # Пытаемся получить java.home через Java команду
-        result = subprocess.run(
-            ["java", "-XshowSettings:properties", "-version"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
+        if settings_output is None:
+            # Пытаемся получить java.home через Java команду
+            result = subprocess.run(
+                ["java", "-XshowSettings:properties", "-version"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            )
+            settings_output = result.stderr
 
         # Парсим вывод для поиска java.home
-        for line in result.stderr.split("\n"):
-            if "java.home" in line:
-                # Формат: "    java.home = C:\Path\To\Java"
-                parts = line.split("=")
-                if len(parts) == 2:
-                    java_home = Path(parts[1].strip())
-                    if java_home.exists():
-                        logger.info(f"☕ Найдена Java: {java_home}")
-                        return java_home
+        java_home = _java_home_from_settings(settings_output)
+        if java_home is not None:
+            logger.info(f"☕ Найдена Java: {java_home}")
+            return java_home
 
         # Fallback: пытаемся найти через where/which
         where_cmd = "where" if platform.system() == "Windows" else "which"
@@ -282,8 +296,11 @@ def ensure_fonts_initialized() -> dict:
     logger.info("🚀 Начало установки шрифтов в JRE...")
 
     try:
-        # 1. Находим Java
-        java_home = _find_java_home()
+        # 1. Находим Java по выводу закешированной пробы, без нового запуска
+        # (импорт локальный: java_runtime сам импортирует этот модуль)
+        from src.java_runtime import get_java_runtime
+
+        java_home = _find_java_home(get_java_runtime().settings_output)
 
         # 2. Получаем директорию шрифтов
         jre_fonts_dir = _get_jre_fonts_dir(java_home)
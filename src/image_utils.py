@@ -7,21 +7,53 @@
 он работает только с пикселями (Pillow Image объектами).
 
 Функции:
-    save_image(image, output_path, format, quality) -> dict
+    save_image(image, output_path, format, quality, encoder_profile, latency_budget_ms) -> dict
         Сохраняет изображение в указанном формате с оптимизацией.
+    encode_image(image, format, quality, encoder_profile, latency_budget_ms) -> bytes
+        Кодирует изображение в памяти с теми же параметрами, что save_image.
+    encode_image_with_info(image, format, quality, encoder_profile, latency_budget_ms) -> dict
+        Кодирует изображение в памяти и сообщает профиль и время кодирования.
+    select_encoder_profile(pixel_count, format, latency_budget_ms) -> str
+        Выбирает самый компактный профиль, укладывающийся в бюджет времени.
+    resolve_encoder_profile(encoder_profile, pixel_count, format, latency_budget_ms) -> str
+        Проверяет профиль кодировщика и раскрывает 'auto' по размеру и бюджету.
     resize_image(image, scale_factor) -> Image
         Умное масштабирование с качественным фильтром Lanczos.
+    downsample_image(image, ratio) -> Image
+        Уменьшает изображение в ratio раз (reduce для целых, иначе Lanczos).
     convert_to_webp(image, quality) -> bytes
         Конвертирует изображение в WebP с сжатием.
+    read_png_dimensions(png_bytes) -> tuple[int, int]
+        Читает размеры PNG из заголовка IHDR без декодирования.
+    iter_png_strips(png_bytes, strip_height) -> Iterator[Image]
+        Декодирует PNG полосами, не держа всё изображение в памяти.
+    save_png_bytes(png_bytes, output_path) -> dict
+        Записывает готовый PNG на диск без перекодирования.
+    recompress_png_async(path) -> Future
+        Пережимает PNG в фоне (заменяет файл, только если он стал меньше).
+
+Классы:
+    StreamingPNGWriter
+        Записывает PNG полосами, не держа всё изображение в памяти.
 """
 
 import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Literal
+from typing import Iterator, Literal
 from io import BytesIO
 
 from PIL import Image
 
+from src.config import ENCODE_LATENCY_BUDGET_MS
+from src.render_stats import stage
+
 logger = logging.getLogger(__name__)
 
 # Поддерживаемые форматы
@@ -35,6 +67,63 @@ DEFAULT_QUALITY = {
     "png": None,  # PNG без потерь, но с optimize=True
 }
 
+# Профили кодировщика: от быстрого к самому компактному
+ENCODER_PROFILES = ("fast", "balanced", "smallest")
+
+# Профиль или 'auto' (выбор по числу пикселей и бюджету времени)
+EncoderProfile = Literal["auto", "fast", "balanced", "smallest"]
+
+# Параметры Pillow по профилям (smallest — прежние настройки по умолчанию)
+ENCODER_OPTIONS = {
+    "webp": {
+        "fast": {"method": 0},
+        "balanced": {"method": 4},
+        "smallest": {"method": 6},
+    },
+    "png": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "smallest": {"optimize": True, "compress_level": 6},
+    },
+    "jpeg": {
+        "fast": {},
+        "balanced": {"optimize": True, "progressive": True},
+        "smallest": {"optimize": True, "progressive": True},
+    },
+}
+
+# Lossless WebP по профилям: quality задаёт усилие сжатия, exact сохраняет
+# цвет прозрачных пикселей
+LOSSLESS_WEBP_OPTIONS = {
+    "fast": {"lossless": True, "quality": 10, "method": 1, "exact": True},
+    "balanced": {"lossless": True, "quality": 50, "method": 4, "exact": True},
+    "smallest": {"lossless": True, "quality": 90, "method": 6, "exact": True},
+}
+
+# Больше цветов не помещается в палитру PNG
+PALETTE_MAX_COLORS = 256
+
+# Оценка времени кодирования (мс на мегапиксель) по замерам на скриншотах кода
+ENCODE_COST_MS_PER_MEGAPIXEL = {
+    "webp": {"fast": 50, "balanced": 110, "smallest": 160},
+    "png": {"fast": 35, "balanced": 50, "smallest": 125},
+    "jpeg": {"fast": 5, "balanced": 20, "smallest": 20},
+}
+
+# MIME типы форматов для ответа изображением без записи на диск
+IMAGE_MIME_TYPES = {
+    "webp": "image/webp",
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+}
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_recompress_executor: ThreadPoolExecutor | None = None
+_recompress_executor_lock = threading.Lock()
+
 
 class ImageProcessingError(Exception):
     """Ошибка обработки изображения."""
@@ -42,11 +131,261 @@ class ImageProcessingError(Exception):
     pass
 
 
+def _format_key(format_lower: str) -> str:
+    """Приводит jpg к jpeg для таблиц профилей."""
+    return "jpeg" if format_lower == "jpg" else format_lower
+
+
+def select_encoder_profile(
+    pixel_count: int, format: str, latency_budget_ms: int | None = None
+) -> str:
+    """Выбирает самый компактный профиль, укладывающийся в бюджет времени.
+
+    Время оценивается по ENCODE_COST_MS_PER_MEGAPIXEL. Если не укладывается
+    ни один профиль, выбирается fast.
+
+    Args:
+        pixel_count: Число пикселей изображения.
+        format: Формат (webp, png, jpeg).
+        latency_budget_ms: Бюджет на кодирование в мс (None — ENCODE_LATENCY_BUDGET_MS).
+
+    Returns:
+        Имя профиля из ENCODER_PROFILES.
+    """
+    if latency_budget_ms is None:
+        latency_budget_ms = ENCODE_LATENCY_BUDGET_MS
+
+    costs = ENCODE_COST_MS_PER_MEGAPIXEL.get(_format_key(format.lower()))
+    if costs is None:
+        return "smallest"
+
+    megapixels = pixel_count / 1_000_000
+    for profile in reversed(ENCODER_PROFILES):
+        if costs[profile] * megapixels <= latency_budget_ms:
+            return profile
+    return "fast"
+
+
+def resolve_encoder_profile(
+    encoder_profile: str,
+    pixel_count: int,
+    format: str,
+    latency_budget_ms: int | None = None,
+) -> str:
+    """Проверяет профиль кодировщика и раскрывает 'auto'.
+
+    Args:
+        encoder_profile: 'auto' или имя из ENCODER_PROFILES.
+        pixel_count: Число пикселей изображения (для 'auto').
+        format: Формат (webp, png, jpeg).
+        latency_budget_ms: Бюджет на кодирование для 'auto' в мс.
+
+    Returns:
+        Имя профиля из ENCODER_PROFILES.
+
+    Raises:
+        ImageProcessingError: Если профиль неизвестен.
+    """
+    profile = encoder_profile.lower()
+    if profile == "auto":
+        selected = select_encoder_profile(pixel_count, format, latency_budget_ms)
+        logger.debug(
+            f"🎛️ Профиль кодировщика auto -> {selected} "
+            f"({pixel_count / 1_000_000:.1f} MP, {format})"
+        )
+        return selected
+
+    if profile not in ENCODER_PROFILES:
+        raise ImageProcessingError(
+            f"Неизвестный профиль кодировщика: {encoder_profile}. "
+            f"Доступные: auto, {', '.join(ENCODER_PROFILES)}"
+        )
+    return profile
+
+
+def _prepare_for_save(
+    image: Image.Image,
+    format_lower: str,
+    quality: int | None,
+    encoder_profile: str = "smallest",
+) -> tuple[Image.Image, dict]:
+    """Возвращает изображение и параметры Pillow для сохранения в формате.
+
+    Args:
+        image: Объект изображения Pillow.
+        format_lower: Формат в нижнем регистре.
+        quality: Качество сжатия (None — DEFAULT_QUALITY).
+        encoder_profile: Профиль из ENCODER_PROFILES (уже без 'auto').
+
+    Raises:
+        ImageProcessingError: Если формат не поддерживается.
+    """
+    # Используем качество по умолчанию если не указано
+    if quality is None:
+        quality = DEFAULT_QUALITY.get(format_lower)
+
+    if format_lower == "webp":
+        save_kwargs = {
+            "format": "WEBP",
+            "quality": quality,
+            **ENCODER_OPTIONS["webp"][encoder_profile],
+        }
+
+    elif format_lower == "png":
+        # PNG без потерь, профиль задаёт только степень сжатия
+        save_kwargs = {"format": "PNG", **ENCODER_OPTIONS["png"][encoder_profile]}
+
+    elif format_lower in ("jpeg", "jpg"):
+        # JPEG с конвертацией в RGB если нужно
+        if image.mode in ("RGBA", "LA", "P"):
+            # Конвертируем в RGB для JPEG (не поддерживает прозрачность)
+            rgb_image = Image.new("RGB", image.size, (255, 255, 255))
+            if image.mode == "P":
+                image = image.convert("RGBA")
+            rgb_image.paste(
+                image, mask=image.split()[-1] if image.mode == "RGBA" else None
+            )
+            image = rgb_image
+            logger.debug("🔄 Конвертация RGBA -> RGB для JPEG")
+
+        save_kwargs = {
+            "format": "JPEG",
+            "quality": quality,
+            **ENCODER_OPTIONS["jpeg"][encoder_profile],
+        }
+
+    else:
+        raise ImageProcessingError(
+            f"Неподдерживаемый формат: {format_lower}. "
+            f"Доступные: {', '.join(DEFAULT_QUALITY.keys())}"
+        )
+
+    logger.debug(f"🎨 Параметры кодирования ({encoder_profile}): {save_kwargs}")
+    return image, save_kwargs
+
+
+def _exact_palette_image(
+    image: Image.Image, colors: list[tuple[int, tuple]]
+) -> Image.Image | None:
+    """Переводит изображение с не более чем 256 цветами в режим P без потерь.
+
+    Returns:
+        Изображение с палитрой или None, если перевод не совпал пиксель в пиксель.
+    """
+    if image.mode == "RGB":
+        palette = Image.new("P", (1, 1))
+        palette.putpalette([channel for _, color in colors for channel in color])
+        indexed = image.quantize(palette=palette, dither=Image.Dither.NONE)
+    elif image.mode == "RGBA":
+        indexed = image.quantize(
+            colors=len(colors), method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+        )
+    else:
+        return None
+
+    if indexed.convert(image.mode).tobytes() != image.tobytes():
+        logger.debug("⚠️ Палитра не совпала с исходником пиксель в пиксель")
+        return None
+    return indexed
+
+
+def _encode_lossless_palette(
+    image: Image.Image, format_lower: str, profile: str
+) -> tuple[BytesIO | None, int | None]:
+    """Кодирует изображение без потерь с палитрой (PNG) или lossless WebP.
+
+    PNG с палитрой строится, только если в изображении не больше 256 цветов.
+    Lossless WebP сам переходит на палитру при малом числе цветов и остаётся
+    точным при большом. Результат проверяется декодированием.
+
+    Returns:
+        (буфер или None, число цветов или None, если их больше 256).
+    """
+    colors = image.getcolors(PALETTE_MAX_COLORS)
+    color_count = len(colors) if colors is not None else None
+
+    if format_lower == "png":
+        indexed = _exact_palette_image(image, colors) if colors is not None else None
+        if indexed is None:
+            return None, color_count
+        candidate = indexed
+        save_kwargs = {"format": "PNG", **ENCODER_OPTIONS["png"][profile]}
+    elif format_lower == "webp":
+        candidate = image
+        save_kwargs = {"format": "WEBP", **LOSSLESS_WEBP_OPTIONS[profile]}
+    else:
+        return None, color_count
+
+    buffer = BytesIO()
+    candidate.save(buffer, **save_kwargs)
+
+    # Проверка: декодированный результат совпадает с исходником
+    buffer.seek(0)
+    with Image.open(buffer) as decoded:
+        identical = decoded.convert(image.mode).tobytes() == image.tobytes()
+    if not identical:
+        logger.warning(f"⚠️ Lossless {format_lower} не совпал с исходником, отброшен")
+        return None, color_count
+    return buffer, color_count
+
+
+def _encode_to_buffer(
+    image: Image.Image,
+    format_lower: str,
+    quality: int | None,
+    encoder_profile: str,
+    latency_budget_ms: int | None,
+    lossless_palette: bool = False,
+) -> tuple[BytesIO, Image.Image, dict]:
+    """Кодирует изображение в буфер.
+
+    С lossless_palette дополнительно кодирует вариант без потерь с палитрой
+    (см. _encode_lossless_palette) и оставляет его, если он меньше.
+
+    Returns:
+        (буфер, закодированное изображение, сведения: encoder_profile,
+        encode_ms, для lossless_palette — palette_applied и color_count).
+    """
+    profile = resolve_encoder_profile(
+        encoder_profile, image.width * image.height, format_lower, latency_budget_ms
+    )
+    source = image
+    image, save_kwargs = _prepare_for_save(image, format_lower, quality, profile)
+
+    buffer = BytesIO()
+    start = time.perf_counter()
+    with stage("encode"):
+        image.save(buffer, **save_kwargs)
+        details: dict = {"encoder_profile": profile}
+
+        if lossless_palette:
+            candidate, color_count = _encode_lossless_palette(
+                source, format_lower, profile
+            )
+            # Размер по длине буфера: проверка кандидата сдвигает позицию потока
+            size = buffer.getbuffer().nbytes
+            candidate_size = None if candidate is None else candidate.getbuffer().nbytes
+            applied = candidate_size is not None and candidate_size < size
+            if applied:
+                logger.info(
+                    f"🎨 Lossless с палитрой: {size / 1024:.2f} KB -> "
+                    f"{candidate_size / 1024:.2f} KB (цветов: {color_count or '>256'})"
+                )
+                buffer, image = candidate, source
+            details.update({"palette_applied": applied, "color_count": color_count})
+
+    details["encode_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return buffer, image, details
+
+
 def save_image(
     image: Image.Image,
     output_path: str | Path,
     format: ImageFormat = "webp",
     quality: int | None = None,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+    lossless_palette: bool = False,
 ) -> dict:
     """Сохраняет изображение в указанном формате с оптимизацией.
 
@@ -55,6 +394,13 @@ def save_image(
         output_path: Путь для сохранения файла.
         format: Формат файла (webp, png, jpeg).
         quality: Качество сжатия (1-100). Если None, используется DEFAULT_QUALITY.
+        encoder_profile: Профиль кодировщика (fast, balanced, smallest) или
+            'auto' — выбор по числу пикселей и latency_budget_ms.
+        latency_budget_ms: Бюджет на кодирование для 'auto' (None —
+            ENCODE_LATENCY_BUDGET_MS).
+        lossless_palette: Попробовать PNG с палитрой (не больше 256 цветов)
+            или lossless WebP и сохранить его, если он меньше; результат
+            проверяется на совпадение с исходником пиксель в пиксель.
 
     Returns:
         Словарь с информацией о сохранении:
@@ -63,7 +409,11 @@ def save_image(
                 "path": str,
                 "format": str,
                 "size_bytes": int,
-                "dimensions": tuple[int, int]
+                "dimensions": tuple[int, int],
+                "encoder_profile": str,
+                "encode_ms": float,
+                "palette_applied": bool,  # только при lossless_palette
+                "color_count": int | None  # None — больше 256 цветов
             }
 
     Raises:
@@ -72,10 +422,6 @@ def save_image(
     output_path = Path(output_path)
     format_lower = format.lower()
 
-    # Используем качество по умолчанию если не указано
-    if quality is None:
-        quality = DEFAULT_QUALITY.get(format_lower)
-
     # Создаем директорию если не существует
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -84,64 +430,21 @@ def save_image(
     )
 
     try:
-        # Параметры сохранения в зависимости от формата
-        save_kwargs = {}
-
-        if format_lower == "webp":
-            # WebP с оптимизацией и методом 6 (лучшее сжатие)
-            save_kwargs = {
-                "format": "WEBP",
-                "quality": quality,
-                "method": 6,  # Максимальное качество сжатия (медленнее, но лучше)
-            }
-            logger.debug(f"🎨 WebP параметры: quality={quality}, method=6")
-
-        elif format_lower == "png":
-            # PNG без потерь, но с оптимизацией
-            save_kwargs = {
-                "format": "PNG",
-                "optimize": True,  # Оптимизация размера без потери качества
-                "compress_level": 6,  # Уровень сжатия zlib (0-9)
-            }
-            logger.debug(f"🎨 PNG параметры: optimize=True, compress_level=6")
-
-        elif format_lower in ("jpeg", "jpg"):
-            # JPEG с конвертацией в RGB если нужно
-            if image.mode in ("RGBA", "LA", "P"):
-                # Конвертируем в RGB для JPEG (не поддерживает прозрачность)
-                rgb_image = Image.new("RGB", image.size, (255, 255, 255))
-                if image.mode == "P":
-                    image = image.convert("RGBA")
-                rgb_image.paste(
-                    image, mask=image.split()[-1] if image.mode == "RGBA" else None
-                )
-                image = rgb_image
-                logger.debug("🔄 Конвертация RGBA -> RGB для JPEG")
-
-            save_kwargs = {
-                "format": "JPEG",
-                "quality": quality,
-                "optimize": True,
-                "progressive": True,  # Прогрессивная загрузка
-            }
-            logger.debug(f"🎨 JPEG параметры: quality={quality}, progressive=True")
-
-        else:
-            raise ImageProcessingError(
-                f"Неподдерживаемый формат: {format_lower}. "
-                f"Доступные: {', '.join(DEFAULT_QUALITY.keys())}"
-            )
-
-        # Сохраняем изображение
-        image.save(output_path, **save_kwargs)
+        # Кодирование и запись замеряются отдельно
+        buffer, image, details = _encode_to_buffer(
+            image, format_lower, quality, encoder_profile, latency_budget_ms, lossless_palette
+        )
+        with stage("write"):
+            output_path.write_bytes(buffer.getbuffer())
 
         # Получаем размер файла
-        file_size = output_path.stat().st_size
+        file_size = buffer.getbuffer().nbytes
         size_kb = file_size / 1024
 
         logger.info(
             f"💾 Изображение сохранено: {output_path.name} "
-            f"({image.width}x{image.height}, {size_kb:.2f} KB)"
+            f"({image.width}x{image.height}, {size_kb:.2f} KB, "
+            f"{details['encoder_profile']}, {details['encode_ms']:.0f} мс)"
         )
 
         return {
@@ -150,14 +453,89 @@ def save_image(
             "format": format_lower,
             "size_bytes": file_size,
             "dimensions": (image.width, image.height),
+            **details,
         }
 
+    except ImageProcessingError:
+        raise
     except Exception as e:
         error_msg = f"Ошибка сохранения изображения: {e}"
         logger.error(f"❌ {error_msg}")
         raise ImageProcessingError(error_msg) from e
 
 
+def encode_image_with_info(
+    image: Image.Image,
+    format: ImageFormat = "webp",
+    quality: int | None = None,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+    lossless_palette: bool = False,
+) -> dict:
+    """Кодирует изображение в памяти и сообщает профиль и время кодирования.
+
+    Args:
+        image: Объект изображения Pillow.
+        format: Формат (webp, png, jpeg).
+        quality: Качество сжатия (1-100). Если None, используется DEFAULT_QUALITY.
+        encoder_profile: Профиль кодировщика или 'auto' (см. save_image).
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+        lossless_palette: Вариант без потерь с палитрой (см. save_image).
+
+    Returns:
+        {"data": bytes, "dimensions": (ширина, высота), "encoder_profile": str,
+         "encode_ms": float, ...}; байты совпадают с файлом save_image.
+
+    Raises:
+        ImageProcessingError: Если кодирование не удалось.
+    """
+    try:
+        buffer, image, details = _encode_to_buffer(
+            image, format.lower(), quality, encoder_profile, latency_budget_ms, lossless_palette
+        )
+    except ImageProcessingError:
+        raise
+    except Exception as e:
+        error_msg = f"Ошибка кодирования изображения: {e}"
+        logger.error(f"❌ {error_msg}")
+        raise ImageProcessingError(error_msg) from e
+
+    data = buffer.getvalue()
+    logger.debug(
+        f"🧮 Изображение закодировано в памяти: {image.width}x{image.height}, "
+        f"{len(data) / 1024:.2f} KB ({details['encoder_profile']}, "
+        f"{details['encode_ms']:.0f} мс)"
+    )
+    return {"data": data, "dimensions": (image.width, image.height), **details}
+
+
+def encode_image(
+    image: Image.Image,
+    format: ImageFormat = "webp",
+    quality: int | None = None,
+    encoder_profile: EncoderProfile = "smallest",
+    latency_budget_ms: int | None = None,
+) -> bytes:
+    """Кодирует изображение в памяти с теми же параметрами, что save_image.
+
+    Args:
+        image: Объект изображения Pillow.
+        format: Формат (webp, png, jpeg).
+        quality: Качество сжатия (1-100). Если None, используется DEFAULT_QUALITY.
+        encoder_profile: Профиль кодировщика или 'auto' (см. save_image).
+        latency_budget_ms: Бюджет на кодирование для 'auto'.
+
+    Returns:
+        Байты файла изображения (совпадают с файлом save_image).
+
+    Raises:
+        ImageProcessingError: Если кодирование не удалось.
+    """
+    return encode_image_with_info(
+        image, format, quality, encoder_profile, latency_budget_ms
+    )["data"]
+
+
 def resize_image(
     image: Image.Image,
     scale_factor: float = 1.0,
@@ -207,6 +585,32 @@ def resize_image(
         raise ImageProcessingError(error_msg) from e
 
 
+def downsample_image(image: Image.Image, ratio: float) -> Image.Image:
+    """Уменьшает изображение в ratio раз для вариантов разной плотности.
+
+    Целое отношение (3x -> 1x) уменьшается через Image.reduce: усреднение
+    блоков ratio×ratio быстрее Lanczos и не даёт ореолов вокруг текста.
+    Дробное (3x -> 2x) — через resize_image.
+
+    Args:
+        image: Объект изображения Pillow.
+        ratio: Во сколько раз уменьшить (>= 1).
+
+    Returns:
+        Уменьшенное изображение (или исходное при ratio == 1).
+
+    Raises:
+        ImageProcessingError: Если ratio меньше 1.
+    """
+    if ratio < 1:
+        raise ImageProcessingError(f"Некорректное отношение уменьшения: {ratio}")
+    if ratio == 1:
+        return image
+    if float(ratio).is_integer():
+        return image.reduce(int(ratio))
+    return resize_image(image, 1 / ratio)
+
+
 def convert_to_webp(
     image: Image.Image,
     quality: int = 90,
@@ -282,3 +686,349 @@ def load_image_from_bytes(
         error_msg = f"Ошибка загрузки изображения из байтов: {e}"
         logger.error(f"❌ {error_msg}")
         raise ImageProcessingError(error_msg) from e
+
+
+def read_png_dimensions(png_bytes: bytes) -> tuple[int, int]:
+    """Читает размеры PNG из заголовка IHDR без декодирования пикселей.
+
+    Args:
+        png_bytes: Байты PNG файла (достаточно первых 24 байт).
+
+    Returns:
+        Кортеж (ширина, высота).
+
+    Raises:
+        ImageProcessingError: Если данные не являются PNG.
+    """
+    if len(png_bytes) < 24 or not png_bytes.startswith(PNG_SIGNATURE):
+        raise ImageProcessingError("Данные не являются PNG изображением")
+
+    if png_bytes[12:16] != b"IHDR":
+        raise ImageProcessingError("Некорректный PNG: первый блок не IHDR")
+
+    width, height = struct.unpack(">II", png_bytes[16:24])
+    return width, height
+
+
+# Каналы по типу цвета PNG (8 бит на канал)
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _png_strip(header: bytes, extra_chunks: list[bytes], rows: bytes) -> Image.Image:
+    """Собирает и декодирует PNG из готовых (отфильтрованных) строк."""
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        crc = struct.pack(">I", zlib.crc32(chunk_type + data))
+        return struct.pack(">I", len(data)) + chunk_type + data + crc
+
+    png = (
+        PNG_SIGNATURE
+        + chunk(b"IHDR", header)
+        + b"".join(extra_chunks)
+        + chunk(b"IDAT", zlib.compress(rows, 0))
+        + chunk(b"IEND", b"")
+    )
+    image = Image.open(BytesIO(png))
+    image.load()
+    return image
+
+
+def iter_png_strips(png_bytes: bytes, strip_height: int = 256) -> Iterator[Image.Image]:
+    """Декодирует PNG полосами по strip_height строк сверху вниз.
+
+    Сжатые данные IDAT распаковываются потоково, каждая полоса декодируется
+    Pillow как отдельный PNG: перед её строками ставится последняя строка
+    предыдущей полосы без фильтра, поэтому фильтры Up/Average/Paeth первой
+    строки полосы восстанавливаются верно. Память ограничена одной полосой.
+
+    8-битные PNG без чересстрочной развёртки (вывод PlantUML) декодируются
+    полосами, остальные — целиком с нарезкой на полосы.
+
+    Args:
+        png_bytes: Байты PNG файла.
+        strip_height: Высота полосы в строках.
+
+    Yields:
+        Полосы изображения (режим как у PNG: RGB, RGBA, P, L, LA).
+
+    Raises:
+        ImageProcessingError: Если данные не являются PNG.
+    """
+    width, height = read_png_dimensions(png_bytes)
+    bit_depth, color_type, _, _, interlace = png_bytes[24:29]
+
+    if bit_depth != 8 or interlace or color_type not in _PNG_CHANNELS:
+        logger.debug("⚠️ PNG не декодируется полосами, загружается целиком")
+        image = load_image_from_bytes(png_bytes, source_format="png")
+        for top in range(0, height, strip_height):
+            yield image.crop((0, top, width, min(height, top + strip_height)))
+        return
+
+    stride = width * _PNG_CHANNELS[color_type] + 1
+    extra_chunks: list[bytes] = []
+    decompressor = zlib.decompressobj()
+    pending = bytearray()
+    previous_row: bytes | None = None
+    rows_done = 0
+
+    def decode(rows: bytes, count: int) -> Image.Image:
+        nonlocal previous_row
+        prefix = b"" if previous_row is None else b"\x00" + previous_row
+        lead = 0 if previous_row is None else 1
+        header = struct.pack(">II", width, count + lead) + png_bytes[24:29]
+        strip = _png_strip(header, extra_chunks, prefix + rows)
+        if lead:
+            strip = strip.crop((0, 1, width, strip.height))
+        previous_row = strip.crop((0, strip.height - 1, width, strip.height)).tobytes()
+        return strip
+
+    offset = 8
+    while offset < len(png_bytes) and rows_done < height:
+        length, chunk_type = struct.unpack(">I4s", png_bytes[offset : offset + 8])
+        data = png_bytes[offset + 8 : offset + 8 + length]
+        chunk_end = offset + 12 + length
+        if chunk_type in (b"PLTE", b"tRNS"):
+            extra_chunks.append(png_bytes[offset:chunk_end])
+        elif chunk_type == b"IDAT":
+            # max_length ограничивает распакованный объём на шаг
+            while data and rows_done < height:
+                pending += decompressor.decompress(data, stride * strip_height)
+                data = decompressor.unconsumed_tail
+                while len(pending) >= stride * min(strip_height, height - rows_done):
+                    count = min(strip_height, height - rows_done)
+                    rows = bytes(pending[: stride * count])
+                    del pending[: stride * count]
+                    yield decode(rows, count)
+                    rows_done += count
+                    if rows_done == height:
+                        break
+        elif chunk_type == b"IEND":
+            break
+        offset = chunk_end
+
+    if rows_done != height:
+        raise ImageProcessingError(f"PNG обрывается: декодировано {rows_done} строк из {height}")
+
+
+def save_png_bytes(png_bytes: bytes, output_path: str | Path) -> dict:
+    """Записывает готовый PNG на диск без декодирования и перекодирования.
+
+    Args:
+        png_bytes: Байты PNG файла.
+        output_path: Путь для сохранения файла.
+
+    Returns:
+        Словарь в формате save_image().
+
+    Raises:
+        ImageProcessingError: Если данные не PNG или запись не удалась.
+    """
+    output_path = Path(output_path)
+    dimensions = read_png_dimensions(png_bytes)
+
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with stage("write"):
+            output_path.write_bytes(png_bytes)
+    except OSError as e:
+        error_msg = f"Ошибка сохранения изображения: {e}"
+        logger.error(f"❌ {error_msg}")
+        raise ImageProcessingError(error_msg) from e
+
+    logger.info(
+        f"💾 PNG записан без перекодирования: {output_path.name} "
+        f"({dimensions[0]}x{dimensions[1]}, {len(png_bytes) / 1024:.2f} KB)"
+    )
+
+    return {
+        "success": True,
+        "path": str(output_path.absolute()),
+        "format": "png",
+        "size_bytes": len(png_bytes),
+        "dimensions": dimensions,
+    }
+
+
+def recompress_png(path: str | Path) -> int:
+    """Пережимает PNG с максимальным сжатием без потерь.
+
+    Файл заменяется атомарно и только если результат меньше исходного.
+
+    Args:
+        path: Путь к PNG файлу.
+
+    Returns:
+        Размер файла после пережатия в байтах.
+    """
+    path = Path(path)
+    original_size = path.stat().st_size
+
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".png")
+    os.close(fd)
+    try:
+        with Image.open(path) as image:
+            image.save(tmp_name, format="PNG", optimize=True, compress_level=9)
+
+        new_size = os.path.getsize(tmp_name)
+        if new_size >= original_size:
+            logger.debug(f"⏭️  Пережатие не уменьшило {path.name}, файл оставлен")
+            return original_size
+
+        # os.replace не затрагивает жёсткие ссылки на исходный файл (кеш)
+        os.replace(tmp_name, path)
+        logger.info(
+            f"🗜️ PNG пережат: {path.name} "
+            f"({original_size / 1024:.2f} KB -> {new_size / 1024:.2f} KB)"
+        )
+        return new_size
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+
+def recompress_png_async(path: str | Path) -> Future:
+    """Запускает пережатие PNG в фоновом потоке.
+
+    Ошибки логируются и не влияют на уже записанный файл.
+
+    Args:
+        path: Путь к PNG файлу.
+
+    Returns:
+        Future с размером файла после пережатия.
+    """
+    global _recompress_executor
+
+    with _recompress_executor_lock:
+        if _recompress_executor is None:
+            _recompress_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="png-recompress"
+            )
+        executor = _recompress_executor
+
+    def run() -> int:
+        try:
+            return recompress_png(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось пережать PNG {path}: {e}")
+            raise
+
+    return executor.submit(run)
+
+
+class StreamingPNGWriter:
+    """Записывает PNG полосами, не держа всё изображение в памяти.
+
+    Размер изображения задаётся заранее, затем полосы передаются сверху вниз
+    через write(). Строки сжимаются zlib по мере поступления, поэтому память
+    ограничена размером одной полосы.
+
+    Пример:
+        with StreamingPNGWriter(path, width, height) as writer:
+            for strip in strips:
+                writer.write(strip)
+    """
+
+    _COLOR_TYPES = {"RGB": (2, 3), "RGBA": (6, 4)}
+    _IDAT_CHUNK_SIZE = 1 << 20
+
+    def __init__(
+        self,
+        output_path: str | Path,
+        width: int,
+        height: int,
+        mode: str = "RGB",
+        compress_level: int = 6,
+    ):
+        if mode not in self._COLOR_TYPES:
+            raise ImageProcessingError(f"Неподдерживаемый режим для PNG потока: {mode}")
+
+        self.output_path = Path(output_path)
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_written = 0
+
+        color_type, self._channels = self._COLOR_TYPES[mode]
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.output_path, "wb")
+        self._file.write(PNG_SIGNATURE)
+        self._write_chunk(
+            b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+        )
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+    def _flush_pending(self, force: bool = False) -> None:
+        while len(self._pending) >= self._IDAT_CHUNK_SIZE or (force and self._pending):
+            chunk = bytes(self._pending[: self._IDAT_CHUNK_SIZE])
+            del self._pending[: self._IDAT_CHUNK_SIZE]
+            self._write_chunk(b"IDAT", chunk)
+
+    def write(self, strip: Image.Image) -> None:
+        """Добавляет полосу изображения (ширина должна совпадать).
+
+        Raises:
+            ImageProcessingError: Если полоса не подходит по размеру или режиму.
+        """
+        if strip.width != self.width or strip.mode != self.mode:
+            raise ImageProcessingError(
+                f"Полоса {strip.width}px/{strip.mode} не подходит для "
+                f"изображения {self.width}px/{self.mode}"
+            )
+        if self.rows_written + strip.height > self.height:
+            raise ImageProcessingError("Полосы превышают заявленную высоту PNG")
+
+        raw = strip.tobytes()
+        stride = self.width * self._channels
+        # Фильтр 0 (None) перед каждой строкой
+        filtered = b"".join(
+            b"\x00" + raw[offset : offset + stride]
+            for offset in range(0, len(raw), stride)
+        )
+        self._pending += self._compressor.compress(filtered)
+        self.rows_written += strip.height
+        self._flush_pending()
+
+    def close(self) -> int:
+        """Завершает файл и возвращает его размер в байтах.
+
+        Raises:
+            ImageProcessingError: Если записаны не все строки изображения
+                (недописанный файл удаляется).
+        """
+        if self._file.closed:
+            return self.output_path.stat().st_size
+
+        if self.rows_written != self.height:
+            self._file.close()
+            self.output_path.unlink(missing_ok=True)
+            raise ImageProcessingError(
+                f"Записано {self.rows_written} строк из {self.height}"
+            )
+
+        try:
+            self._pending += self._compressor.flush()
+            self._flush_pending(force=True)
+            self._write_chunk(b"IEND", b"")
+        finally:
+            self._file.close()
+
+        return self.output_path.stat().st_size
+
+    def __enter__(self) -> "StreamingPNGWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self.output_path.unlink(missing_ok=True)
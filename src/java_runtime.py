@@ -0,0 +1,274 @@
+"""Описание Java окружения, определяемое один раз на процесс.
+
+Раньше каждый рендеринг диаграммы несколько раз запускал `java -version`.
+Модуль выполняет одну пробу `java -XshowSettings:properties -version`, из
+которой извлекает версию, java.home и возможности окружения, и кеширует
+результат. Устаревшее описание перепроверяется в фоновом потоке, не блокируя
+запросы. При смене или пропаже Java вызываются зарегистрированные обработчики
+инвалидации (например, остановка пула процессов PlantUML).
+
+Классы:
+    JavaRuntime
+        Описание найденной Java.
+
+Функции:
+    get_java_runtime() -> JavaRuntime
+        Возвращает закешированное описание Java (проба при первом вызове).
+    invalidate_java_runtime() -> None
+        Сбрасывает кеш и уведомляет обработчики инвалидации.
+    add_invalidation_listener(callback) -> None
+        Регистрирует обработчик, вызываемый при инвалидации.
+"""
+
+import logging
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from src.config import JAVA_RUNTIME_RECHECK_INTERVAL
+from src.font_initializer import JavaNotFoundError, _find_java_home
+
+logger = logging.getLogger(__name__)
+
+_PROBE_COMMAND = ["java", "-XshowSettings:properties", "-version"]
+_PROBE_TIMEOUT = 5
+
+_runtime: "JavaRuntime | None" = None
+_runtime_lock = threading.Lock()
+_recheck_thread: threading.Thread | None = None
+_listeners: list[Callable[[], None]] = []
+
+
+@dataclass(frozen=True)
+class JavaRuntime:
+    """Описание найденной Java.
+
+    Attributes:
+        version_line: Первая строка вывода `java -version`.
+        major_version: Основная версия (8, 11, 17, ...), 0 если не распознана.
+        java_home: Корневая директория Java.
+        vendor: Поставщик (java.vendor).
+        arch: Архитектура (os.arch).
+        fonts_dir_writable: Можно ли установить шрифты в JRE без прав администратора.
+        probed_at: Время пробы (time.monotonic()).
+        settings_output: Вывод пробы `java -XshowSettings:properties -version`.
+    """
+
+    version_line: str
+    major_version: int
+    java_home: Path | None
+    vendor: str | None = None
+    arch: str | None = None
+    fonts_dir_writable: bool = False
+    probed_at: float = field(default_factory=time.monotonic, compare=False)
+    settings_output: str = field(default="", compare=False, repr=False)
+
+    @property
+    def capabilities(self) -> dict:
+        return {
+            "major_version": self.major_version,
+            "vendor": self.vendor,
+            "arch": self.arch,
+            "fonts_dir_writable": self.fonts_dir_writable,
+            "supported": self.major_version >= 8,
+        }
+
+    def to_dict(self) -> dict:
+        """Возвращает описание в виде словаря для ответов MCP инструментов."""
+        return {
+            "version": self.version_line,
+            "java_home": str(self.java_home) if self.java_home else None,
+            "capabilities": self.capabilities,
+        }
+
+
+def _parse_major_version(version_line: str) -> int:
+    """Извлекает основную версию: '1.8.0_292' -> 8, '17.0.2' -> 17."""
+    match = re.search(r'version\s+"(\d+)(?:\.(\d+))?', version_line)
+    if not match:
+        return 0
+
+    major = int(match.group(1))
+    if major == 1 and match.group(2):
+        return int(match.group(2))
+    return major
+
+
+def _parse_properties(settings_output: str) -> dict[str, str]:
+    """Парсит строки вида '    key = value' из вывода -XshowSettings:properties."""
+    properties = {}
+    for line in settings_output.splitlines():
+        key, sep, value = line.strip().partition(" = ")
+        if sep and key and " " not in key:
+            properties[key] = value.strip()
+    return properties
+
+
+def _find_version_line(settings_output: str) -> str | None:
+    """Находит строку версии (пропуская 'Picked up JAVA_TOOL_OPTIONS' и свойства)."""
+    for line in settings_output.splitlines():
+        if re.search(r'\bversion\s+"', line):
+            return line.strip()
+    return None
+
+
+def _is_fonts_dir_writable(java_home: Path | None) -> bool:
+    if java_home is None:
+        return False
+
+    for candidate in (java_home / "lib" / "fonts", java_home / "lib"):
+        if candidate.exists():
+            return os.access(candidate, os.W_OK)
+    return False
+
+
+def _build_runtime(settings_output: str) -> JavaRuntime:
+    """Строит описание Java из вывода пробы."""
+    version_line = _find_version_line(settings_output)
+    if not version_line:
+        logger.error("❌ Java установлена, но версия не определена")
+        raise JavaNotFoundError("Java установлена, но не удалось определить версию")
+
+    properties = _parse_properties(settings_output)
+
+    try:
+        java_home = _find_java_home(settings_output=settings_output)
+    except JavaNotFoundError as e:
+        logger.warning(f"☕ Не удалось определить java.home: {e}")
+        java_home = None
+
+    return JavaRuntime(
+        version_line=version_line,
+        major_version=_parse_major_version(version_line),
+        java_home=java_home,
+        vendor=properties.get("java.vendor"),
+        arch=properties.get("os.arch", platform.machine() or None),
+        fonts_dir_writable=_is_fonts_dir_writable(java_home),
+        settings_output=settings_output,
+    )
+
+
+def _probe_java() -> JavaRuntime:
+    """Запускает Java один раз и строит её описание.
+
+    Raises:
+        JavaNotFoundError: Если Java не найдена или проба не удалась.
+    """
+    logger.debug("🔍 Проверка Java окружения")
+    try:
+        result = subprocess.run(
+            _PROBE_COMMAND,
+            capture_output=True,
+            text=True,
+            timeout=_PROBE_TIMEOUT,
+        )
+    except FileNotFoundError:
+        logger.error("❌ Java не найдена в PATH")
+        raise JavaNotFoundError(
+            "Java не найдена в системе. "
+            "Установите JRE (Java Runtime Environment) версии 8 или выше.\n"
+            "macOS: brew install openjdk\n"
+            "Windows: https://adoptium.net/\n"
+            "Linux: sudo apt-get install default-jre"
+        )
+    except subprocess.TimeoutExpired:
+        logger.error("❌ Таймаут при проверке Java")
+        raise JavaNotFoundError("Таймаут при проверке Java. Проверьте установку.")
+    except Exception as e:
+        logger.error(f"❌ Ошибка при проверке Java: {e}")
+        raise JavaNotFoundError(f"Ошибка при проверке Java: {str(e)}")
+
+    runtime = _build_runtime(result.stderr or result.stdout or "")
+    logger.info(
+        f"☕ Java обнаружена: {runtime.version_line} (java.home={runtime.java_home})"
+    )
+    return runtime
+
+
+def _notify_listeners() -> None:
+    for callback in list(_listeners):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка обработчика инвалидации Java: {e}")
+
+
+def _recheck_in_background() -> None:
+    global _runtime, _recheck_thread
+
+    try:
+        fresh = _probe_java()
+    except JavaNotFoundError:
+        fresh = None
+
+    with _runtime_lock:
+        previous = _runtime
+        _runtime = fresh
+        _recheck_thread = None
+
+    changed = fresh is None or previous is None or fresh != previous
+    if changed:
+        logger.warning("☕ Java окружение изменилось, кеш сброшен")
+        _notify_listeners()
+
+
+def get_java_runtime() -> JavaRuntime:
+    """Возвращает описание Java, выполняя пробу только при первом вызове.
+
+    Если описание старше JAVA_RUNTIME_RECHECK_INTERVAL секунд, возвращается
+    закешированное значение, а перепроверка запускается в фоновом потоке.
+
+    Returns:
+        Описание Java окружения.
+
+    Raises:
+        JavaNotFoundError: Если Java не найдена.
+    """
+    global _runtime, _recheck_thread
+
+    with _runtime_lock:
+        runtime = _runtime
+        if runtime is not None:
+            age = time.monotonic() - runtime.probed_at
+            if age > JAVA_RUNTIME_RECHECK_INTERVAL and _recheck_thread is None:
+                logger.debug(f"🔄 Фоновая перепроверка Java (возраст {age:.0f}s)")
+                _recheck_thread = threading.Thread(
+                    target=_recheck_in_background, daemon=True
+                )
+                _recheck_thread.start()
+            return runtime
+
+        # Неудачные пробы не кешируются: установка Java подхватится без перезапуска
+        _runtime = _probe_java()
+        return _runtime
+
+
+def invalidate_java_runtime() -> None:
+    """Сбрасывает закешированное описание Java.
+
+    Следующий вызов get_java_runtime() выполнит новую пробу. Зарегистрированные
+    обработчики вызываются синхронно.
+    """
+    global _runtime
+
+    with _runtime_lock:
+        _runtime = None
+
+    logger.info("🔄 Описание Java сброшено")
+    _notify_listeners()
+
+
+def add_invalidation_listener(callback: Callable[[], None]) -> None:
+    """Регистрирует обработчик, вызываемый при сбросе или смене Java.
+
+    Args:
+        callback: Функция без аргументов.
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
@@ -0,0 +1,179 @@
+"""Политика длинных строк: перенос или обрезка до растеризации.
+
+Одна строка минифицированного JS или JSON при scale_factor 3+ превращает
+скриншот в изображение шириной в десятки тысяч пикселей, а лексинг такой
+строки в Pygments идёт очень медленно. Модуль ограничивает ширину строк
+в колонках до лексинга:
+
+    wrap     - строка переносится по max_columns колонок, строки-продолжения
+               помечаются в колонке номеров знаком CONTINUATION_MARKER;
+               перенос не длиннее max_rows строк, остаток обрезается
+    truncate - строка обрезается до max_columns колонок с многоточием
+    off      - строки не меняются
+
+Строки разбираются так же, как лексер (stripall) и параллельная
+растеризация: края текста обрезаются, табуляция раскрывается в 4 пробела.
+Перенос выполняется до лексинга, поэтому токен, разрезанный переносом
+(например, длинная строка-литерал), может подсветиться иначе.
+
+Классы:
+    LongLines
+        Подготовленный код, подписи колонки номеров и затронутые строки.
+
+Функции:
+    apply_long_line_policy(code, policy, max_columns, max_rows) -> LongLines
+        Применяет политику к коду.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from src.config import LONG_LINE_MAX_ROWS, LONG_LINE_POLICY, MAX_LINE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+LONG_LINE_POLICIES = ("wrap", "truncate", "off")
+
+# Меньше колонок не помещается осмысленный фрагмент кода
+MIN_LINE_COLUMNS = 20
+
+# Знаки есть во всех шрифтах из asset/fonts
+CONTINUATION_MARKER = "→"
+ELLIPSIS = "…"
+
+# Сколько номеров затронутых строк попадает в отчёт
+REPORT_MAX_LINES = 100
+
+
+@dataclass(frozen=True)
+class LongLines:
+    """Код после применения политики длинных строк.
+
+    Attributes:
+        code: Код для лексера (исходный, если строки не менялись).
+        policy: Применённая политика.
+        max_columns: Предел ширины строки в колонках.
+        line_labels: Подписи колонки номеров для каждой строки изображения
+            (номер исходной строки или CONTINUATION_MARKER); None — обычная
+            нумерация.
+        wrapped: Номера перенесённых исходных строк (с 1).
+        truncated: Номера обрезанных исходных строк (с 1).
+    """
+
+    code: str
+    policy: str
+    max_columns: int
+    line_labels: list[str] | None = None
+    wrapped: list[int] = field(default_factory=list)
+    truncated: list[int] = field(default_factory=list)
+
+    @property
+    def affected(self) -> bool:
+        return bool(self.wrapped or self.truncated)
+
+    def source_line(self, row: int) -> int:
+        """Номер исходной строки для строки изображения (обе с 1)."""
+        if self.line_labels is None:
+            return row
+        for label in reversed(self.line_labels[:row]):
+            if label != CONTINUATION_MARKER:
+                return int(label)
+        return row
+
+    def report(self) -> dict:
+        """Поле ответа о затронутых строках (списки — первые REPORT_MAX_LINES)."""
+        return {
+            "policy": self.policy,
+            "max_columns": self.max_columns,
+            "wrapped_lines": self.wrapped[:REPORT_MAX_LINES],
+            "truncated_lines": self.truncated[:REPORT_MAX_LINES],
+            "lines_affected": len(set(self.wrapped) | set(self.truncated)),
+        }
+
+
+def apply_long_line_policy(
+    code: str,
+    policy: str = LONG_LINE_POLICY,
+    max_columns: int = MAX_LINE_COLUMNS,
+    max_rows: int = LONG_LINE_MAX_ROWS,
+) -> LongLines:
+    """Применяет политику длинных строк к коду.
+
+    Args:
+        code: Исходный код.
+        policy: 'wrap', 'truncate' или 'off'.
+        max_columns: Предел ширины строки в колонках.
+        max_rows: Предел строк переноса одной исходной строки (для 'wrap').
+
+    Returns:
+        LongLines; если ни одна строка не превышает предел, code не меняется.
+
+    Raises:
+        ValueError: Если политика неизвестна или max_columns меньше MIN_LINE_COLUMNS.
+    """
+    if policy not in LONG_LINE_POLICIES:
+        raise ValueError(
+            f"Неизвестная политика длинных строк: {policy} "
+            f"(доступны: {', '.join(LONG_LINE_POLICIES)})"
+        )
+    if policy == "off":
+        return LongLines(code, policy, max_columns)
+    if max_columns < MIN_LINE_COLUMNS:
+        raise ValueError(
+            f"max_line_columns={max_columns} меньше минимума {MIN_LINE_COLUMNS}"
+        )
+
+    # Предобработка как в лексере Pygments (stripall)
+    text = code.removeprefix("\ufeff").replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.strip().split("\n")
+
+    def columns(line: str) -> int:
+        return len(line.expandtabs(4)) if "\t" in line else len(line)
+
+    if all(columns(line) <= max_columns for line in lines):
+        return LongLines(code, policy, max_columns)
+
+    output: list[str] = []
+    labels: list[str] = []
+    wrapped: list[int] = []
+    truncated: list[int] = []
+    max_rows = max(1, max_rows)
+
+    for number, line in enumerate(lines, start=1):
+        if columns(line) <= max_columns:
+            output.append(line)
+            labels.append(str(number))
+            continue
+
+        expanded = line.expandtabs(4)
+        if policy == "truncate":
+            output.append(expanded[: max_columns - 1] + ELLIPSIS)
+            labels.append(str(number))
+            truncated.append(number)
+            continue
+
+        limit = max_columns * max_rows
+        rows = [
+            expanded[start : start + max_columns]
+            for start in range(0, min(len(expanded), limit), max_columns)
+        ]
+        if len(expanded) > limit:
+            rows[-1] = rows[-1][: max_columns - 1] + ELLIPSIS
+            truncated.append(number)
+        output.extend(rows)
+        labels.append(str(number))
+        labels.extend([CONTINUATION_MARKER] * (len(rows) - 1))
+        wrapped.append(number)
+
+    logger.info(
+        f"✂️ Длинные строки ({policy}, {max_columns} колонок): "
+        f"перенесено {len(wrapped)}, обрезано {len(truncated)}"
+    )
+    return LongLines(
+        "\n".join(output) + "\n",
+        policy,
+        max_columns,
+        line_labels=labels if wrapped else None,
+        wrapped=wrapped,
+        truncated=truncated,
+    )
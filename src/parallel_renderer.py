@@ -0,0 +1,276 @@
+"""Параллельная растеризация больших файлов кода по фрагментам.
+
+Растеризация большого файла в create_code_image занимает одно ядро. Модуль
+лексит исходник целиком в текущем процессе (доли процента времени рендеринга),
+режет поток токенов на фрагменты по строкам, растеризует их в пуле процессов
+(render_processes) и собирает полосы в итоговое изображение с непрерывной
+нумерацией строк.
+
+Фрагменты не лексятся заново: иначе граница внутри многострочной конструкции
+(блочного комментария, шаблонной строки, heredoc) запускала бы лексер с
+середины токена и меняла подсветку. Границы фрагментов выбираются так, чтобы
+не разрывать определения:
+    Python — начало инструкции верхнего уровня (с декораторами), по ast.
+    Остальные языки — первая непустая строка после пустых строк.
+
+Каждая полоса рисуется с запасом в одну строку сверху и снизу: выносные
+элементы глифов, выходящие за границу строки, переносятся на итоговый холст
+по маске отличий от пустой полосы. Результат совпадает с последовательной
+растеризацией.
+
+Функции:
+    should_rasterize_parallel(line_count) -> bool
+        Решает, выгодна ли параллельная растеризация кода такого размера.
+    split_code_chunks(lines, language, chunk_lines) -> list[tuple[int, int]]
+        Делит строки кода на фрагменты по безопасным границам.
+    rasterize_parallel(code_string, language, **options) -> Image
+        Растеризует код фрагментами в пуле процессов.
+"""
+
+import ast
+import logging
+from typing import Iterable
+
+from PIL import Image, ImageChops
+from pygments.token import _TokenType, string_to_tokentype
+
+import src.render_processes as render_processes
+from src.code_rasterizer import (
+    CodeLayout,
+    draw_lines,
+    iter_lines,
+    new_canvas,
+    paint_line_number_column,
+)
+from src.config import PARALLEL_CHUNK_LINES, PARALLEL_RENDER_MIN_LINES
+from src.resource_cache import get_fonts, get_lexer, get_style
+
+logger = logging.getLogger(__name__)
+
+
+def should_rasterize_parallel(line_count: int) -> bool:
+    """Решает, выгодна ли параллельная растеризация кода такого размера.
+
+    Пул должен иметь больше одного процесса, а сам вызов не должен выполняться
+    в процессе пула (например, при пакетном рендеринге скриншотов).
+    """
+    return (
+        render_processes.RENDER_PROCESS_WORKERS > 1
+        and line_count >= PARALLEL_RENDER_MIN_LINES
+        and not render_processes.in_worker_process()
+    )
+
+
+def _python_boundaries(text: str) -> list[int]:
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+
+    boundaries = []
+    for node in tree.body:
+        decorators = getattr(node, "decorator_list", None)
+        boundaries.append((decorators[0] if decorators else node).lineno - 1)
+    return boundaries
+
+
+def _blank_line_boundaries(lines: list[str]) -> list[int]:
+    return [
+        index
+        for index in range(1, len(lines))
+        if lines[index].strip() and not lines[index - 1].strip()
+    ]
+
+
+def _tokens_by_line(
+    tokens: Iterable[tuple[_TokenType, str]],
+) -> list[list[tuple[str, str]]]:
+    """Раскладывает поток токенов по строкам (каждая строка заканчивается '\\n').
+
+    Тип токена передаётся строкой: так фрагмент передаётся в процесс пула.
+    """
+    lines: list[list[tuple[str, str]]] = [[]]
+    for ttype, value in tokens:
+        name = str(ttype)
+        for part in value.split("\n")[:-1]:
+            lines[-1].append((name, part + "\n"))
+            lines.append([])
+        if not value.endswith("\n"):
+            lines[-1].append((name, value.rsplit("\n", 1)[-1]))
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def split_code_chunks(
+    lines: list[str], language: str, chunk_lines: int = PARALLEL_CHUNK_LINES
+) -> list[tuple[int, int]]:
+    """Делит строки кода на фрагменты, не разрывая определения.
+
+    Args:
+        lines: Строки кода (без переводов строк).
+        language: Язык программирования.
+        chunk_lines: Минимальный размер фрагмента в строках.
+
+    Returns:
+        Диапазоны строк [начало, конец) фрагментов, покрывающие весь код.
+    """
+    if language.lower() in ("python", "py", "python3"):
+        boundaries = _python_boundaries("\n".join(lines))
+    else:
+        boundaries = _blank_line_boundaries(lines)
+
+    chunks = []
+    start = 0
+    for boundary in boundaries:
+        if boundary - start >= chunk_lines and len(lines) - boundary >= chunk_lines // 2:
+            chunks.append((start, boundary))
+            start = boundary
+    chunks.append((start, len(lines)))
+    return chunks
+
+
+def _rasterize_chunk(
+    chunk_tokens: list[tuple[str, str]],
+    first_line: int,
+    margin_top: int,
+    margin_bottom: int,
+    options: dict,
+) -> tuple[str, tuple[int, int], bytes, int]:
+    """Растеризует фрагмент в полосу (выполняется в процессе пула).
+
+    Returns:
+        (режим, размер, байты пикселей, ширина самой длинной строки).
+    """
+    style = get_style(options["style"])
+    fonts = get_fonts(options["font_name"], options["font_size"])
+    layout = CodeLayout.create(
+        fonts, options["image_pad"], options["line_pad"], options["line_numbers"]
+    )
+
+    lines = []
+    max_line_width = 0
+    tokens = ((string_to_tokentype(name), value) for name, value in chunk_tokens)
+    for runs, width in iter_lines(tokens, style, fonts):
+        lines.append(runs)
+        max_line_width = max(max_line_width, width)
+
+    size = (
+        layout.image_width(max_line_width),
+        len(lines) * layout.line_height + margin_top + margin_bottom,
+    )
+    strip = new_canvas(size, style, options["transparent"])
+    line_number_bg = options["line_number_bg"]
+    if line_number_bg is None:
+        line_number_bg = style.background_color
+    paint_line_number_column(strip, layout, line_number_bg, options["line_number_fg"])
+    draw_lines(
+        strip,
+        lines,
+        layout,
+        first_line=first_line,
+        origin_y=margin_top,
+        line_numbers=options["line_numbers"],
+        line_number_fg=options["line_number_fg"],
+        fonts=fonts,
+        line_labels=options["line_labels"],
+    )
+    return strip.mode, strip.size, strip.tobytes(), max_line_width
+
+
+def rasterize_parallel(
+    code_string: str,
+    language: str,
+    style: str = "monokai",
+    font_name: str = "JetBrainsMono",
+    font_size: int = 54,
+    image_pad: int = 75,
+    line_pad: int = 30,
+    line_numbers: bool = True,
+    line_number_bg: str | None = None,
+    line_number_fg: str | None = "#888888",
+    transparent: bool = False,
+    chunk_lines: int = PARALLEL_CHUNK_LINES,
+    line_labels: list[str] | None = None,
+) -> Image.Image:
+    """Растеризует код фрагментами в пуле процессов.
+
+    Параметры совпадают с rasterize_tokens, размеры уже масштабированы
+    (font_size, image_pad и line_pad в пикселях).
+
+    Returns:
+        PIL Image, совпадающий с последовательной растеризацией.
+
+    Raises:
+        Exception: Первая ошибка растеризации фрагмента.
+    """
+    # Предобработка как в лексере Pygments (stripall), фрагменты её не повторяют
+    text = code_string.removeprefix("\ufeff").replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.strip().split("\n")
+
+    style_cls = get_style(style)
+    fonts = get_fonts(font_name, font_size)
+    layout = CodeLayout.create(fonts, image_pad, line_pad, line_numbers)
+    line_height = layout.line_height
+    height = len(lines) * line_height + image_pad * 2
+
+    # Лексинг целиком: фрагменты получают срезы одного потока токенов
+    lexer = get_lexer(language, strip=False)
+    line_tokens = _tokens_by_line(lexer.get_tokens("\n".join(lines) + "\n"))
+
+    chunks = split_code_chunks(lines, language, chunk_lines)
+    logger.info(
+        f"🧵 Параллельная растеризация: {len(lines)} строк, фрагментов {len(chunks)}"
+    )
+
+    options = {
+        "style": style,
+        "font_name": font_name,
+        "font_size": font_size,
+        "image_pad": image_pad,
+        "line_pad": line_pad,
+        "line_numbers": line_numbers,
+        "line_number_bg": line_number_bg,
+        "line_number_fg": line_number_fg,
+        "transparent": transparent,
+        "line_labels": line_labels,
+    }
+    placements = []
+    calls = []
+    for start, end in chunks:
+        top = image_pad + start * line_height
+        bottom = image_pad + end * line_height
+        margin_top = image_pad if start == 0 else min(line_height, top)
+        margin_bottom = image_pad if end == len(lines) else min(line_height, height - bottom)
+        chunk_tokens = [token for line in line_tokens[start:end] for token in line]
+        placements.append(top - margin_top)
+        calls.append(
+            ((chunk_tokens, start + 1, margin_top, margin_bottom, options), {})
+        )
+
+    strips = []
+    max_line_width = 0
+    for result, error in render_processes.map_in_processes(_rasterize_chunk, calls):
+        if error is not None:
+            raise error
+        mode, size, data, width = result
+        strips.append(Image.frombytes(mode, size, data))
+        max_line_width = max(max_line_width, width)
+
+    image = new_canvas((layout.image_width(max_line_width), height), style_cls, transparent)
+    column_bg = line_number_bg
+    if column_bg is None:
+        column_bg = style_cls.background_color
+    paint_line_number_column(image, layout, column_bg, line_number_fg)
+
+    # Переносим только нарисованное: запас полосы пересекается с соседями
+    for strip, y in zip(strips, placements):
+        empty = new_canvas(strip.size, style_cls, transparent)
+        paint_line_number_column(empty, layout, column_bg, line_number_fg)
+        bands = ImageChops.difference(strip, empty).split()
+        changed = bands[0]
+        for band in bands[1:]:
+            changed = ImageChops.lighter(changed, band)
+        image.paste(strip, (0, y), changed.point(lambda value: 255 if value else 0))
+
+    return image
@@ -0,0 +1,413 @@
+"""Пул долгоживущих процессов PlantUML.
+
+Запуск JVM и прогрев JIT занимают 1-3 секунды на каждую диаграмму. Пул держит
+процессы ``java -jar plantuml.jar -pipe`` запущенными и передаёт им диаграммы
+по одной: после каждого результата PlantUML печатает строку-разделитель
+(``-pipedelimitor``), по которой воркер понимает, что ответ получен целиком.
+Ошибки PlantUML выводятся в stdout (``-pipeNoStderr``) вместо изображения.
+
+Воркер перезапускается после PLANTUML_WORKER_MAX_RENDERS диаграмм, при падении
+процесса или по таймауту.
+
+Классы:
+    PlantUMLWorker
+        Один процесс PlantUML в pipe-режиме.
+
+        Методы:
+            render(source, timeout) -> bytes
+                Отправляет диаграмму в процесс и возвращает сырой вывод PlantUML.
+            kill() -> None
+                Принудительно завершает процесс.
+            close() -> None
+                Корректно завершает процесс.
+    PlantUMLWorkerPool
+        Пул воркеров, сгруппированных по формату вывода.
+
+        Методы:
+            acquire(format) -> ContextManager[PlantUMLWorker]
+                Выдаёт свободный воркер и возвращает его в пул после использования.
+            render(source, format, timeout) -> bytes
+                Рендерит одну диаграмму на свободном воркере.
+            shutdown() -> None
+                Останавливает все процессы пула.
+            get_stats() -> dict
+                Возвращает статистику пула.
+
+Исключения:
+    PlantUMLWorkerError
+        Процесс PlantUML упал или недоступен.
+    PlantUMLWorkerTimeout
+        Процесс PlantUML не ответил за отведённое время.
+"""
+
+import logging
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from src.config import (
+    PLANTUML_POOL_SIZE,
+    PLANTUML_RENDER_TIMEOUT,
+    PLANTUML_WORKER_MAX_RENDERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Разделитель между результатами в pipe-режиме (не встречается в PNG/SVG/PDF)
+PIPE_DELIMITER = "___CODE_TO_IMAGE_MCP_END___"
+
+# Аргументы PlantUML для постоянного pipe-режима
+PIPE_ARGS = ["-pipe", "-pipeNoStderr", "-pipedelimitor", PIPE_DELIMITER]
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+class PlantUMLWorkerError(Exception):
+    """Процесс PlantUML упал или недоступен."""
+
+    pass
+
+
+class PlantUMLWorkerTimeout(PlantUMLWorkerError):
+    """Процесс PlantUML не ответил за отведённое время."""
+
+    pass
+
+
+class PlantUMLWorker:
+    """Долгоживущий процесс PlantUML в pipe-режиме.
+
+    Attributes:
+        format: Формат вывода, с которым запущен процесс (-t{format}).
+        max_renders: Количество диаграмм до перезапуска.
+        render_count: Количество отрендеренных диаграмм.
+    """
+
+    def __init__(
+        self,
+        command: list[str],
+        format: str,
+        max_renders: int = PLANTUML_WORKER_MAX_RENDERS,
+        env: dict | None = None,
+    ):
+        self.format = format
+        self.max_renders = max_renders
+        self.render_count = 0
+
+        self._marker = PIPE_DELIMITER.encode("ascii")
+        self._chunks: queue.Queue[bytes] = queue.Queue()
+        self._stderr_tail: deque[str] = deque(maxlen=50)
+
+        logger.info(f"⚙️ Запуск постоянного процесса PlantUML (формат={format})")
+        self._process = subprocess.Popen(
+            command + PIPE_ARGS,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+
+        # Читаем stdout и stderr в фоновых потоках: это переносимо (Windows)
+        # и не даёт процессу заблокироваться на переполненном буфере stderr
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.poll() is None
+
+    @property
+    def is_exhausted(self) -> bool:
+        return self.render_count >= self.max_renders
+
+    @property
+    def stderr_text(self) -> str:
+        return "\n".join(self._stderr_tail)
+
+    def _read_stdout(self) -> None:
+        stream = self._process.stdout
+        try:
+            while True:
+                chunk = stream.read1(_READ_CHUNK_SIZE)
+                self._chunks.put(chunk)
+                if not chunk:
+                    break
+        except (OSError, ValueError):
+            self._chunks.put(b"")
+
+    def _read_stderr(self) -> None:
+        try:
+            for raw_line in self._process.stderr:
+                line = raw_line.decode("utf-8", errors="replace").rstrip()
+                if line:
+                    self._stderr_tail.append(line)
+        except (OSError, ValueError):
+            pass
+
+    def render(self, source: str, timeout: float = PLANTUML_RENDER_TIMEOUT) -> bytes:
+        """Отправляет диаграмму в процесс и возвращает сырой вывод PlantUML.
+
+        Args:
+            source: Подготовленный код диаграммы (@startuml ... @enduml).
+            timeout: Таймаут ожидания ответа в секундах.
+
+        Returns:
+            Байты результата без разделителя. При ошибке в диаграмме PlantUML
+            возвращает текст, начинающийся с "ERROR".
+
+        Raises:
+            PlantUMLWorkerTimeout: Если процесс не ответил за timeout секунд.
+            PlantUMLWorkerError: Если процесс упал или недоступен.
+        """
+        if not self.is_alive:
+            raise PlantUMLWorkerError(
+                f"Процесс PlantUML завершён (код {self._process.returncode})"
+            )
+
+        try:
+            self._process.stdin.write(source.encode("utf-8") + b"\n")
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise PlantUMLWorkerError(f"Не удалось передать диаграмму в PlantUML: {e}")
+
+        buffer = bytearray()
+        tail_size = len(self._marker) + 2
+        deadline = time.monotonic() + timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.kill()
+                raise PlantUMLWorkerTimeout(
+                    f"PlantUML не ответил за {timeout} секунд"
+                )
+
+            try:
+                chunk = self._chunks.get(timeout=remaining)
+            except queue.Empty:
+                continue
+
+            if not chunk:
+                self.kill()
+                raise PlantUMLWorkerError(
+                    "Процесс PlantUML неожиданно завершился"
+                    + (f":\n{self.stderr_text}" if self.stderr_text else "")
+                )
+
+            buffer += chunk
+
+            # Разделитель печатается через println: ждём его вместе с переводом строки
+            if buffer.endswith(b"\n"):
+                tail = bytes(buffer[-tail_size:]).rstrip(b"\r\n")
+                if tail.endswith(self._marker):
+                    newline_size = len(buffer) - len(buffer.rstrip(b"\r\n"))
+                    break
+
+        self.render_count += 1
+        return bytes(buffer[: len(buffer) - newline_size - len(self._marker)])
+
+    def kill(self) -> None:
+        """Принудительно завершает процесс."""
+        if self.is_alive:
+            logger.debug(f"🛑 Принудительная остановка PlantUML (pid={self.pid})")
+            self._process.kill()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def close(self) -> None:
+        """Корректно завершает процесс (закрывает stdin и ждёт выхода)."""
+        if not self.is_alive:
+            return
+
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=2)
+            logger.debug(f"🛑 Процесс PlantUML остановлен (pid={self.pid})")
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class PlantUMLWorkerPool:
+    """Пул долгоживущих процессов PlantUML.
+
+    Воркеры запускаются лениво и группируются по формату вывода, так как формат
+    задаётся при старте процесса. Общее число процессов ограничено size.
+
+    Attributes:
+        size: Максимальное число процессов.
+        max_renders: Количество диаграмм до перезапуска процесса.
+    """
+
+    def __init__(
+        self,
+        command_factory: Callable[[str], list[str]],
+        size: int = PLANTUML_POOL_SIZE,
+        max_renders: int = PLANTUML_WORKER_MAX_RENDERS,
+        env: dict | None = None,
+    ):
+        self.size = max(1, size)
+        self.max_renders = max(1, max_renders)
+
+        self._command_factory = command_factory
+        self._env = env
+        self._idle: dict[str, list[PlantUMLWorker]] = {}
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {"spawned": 0, "recycled": 0}
+
+    def _pop_idle_worker_of_other_format(self, format: str) -> PlantUMLWorker | None:
+        for other_format, workers in self._idle.items():
+            if other_format != format and workers:
+                return workers.pop(0)
+        return None
+
+    def _checkout(self, format: str) -> PlantUMLWorker:
+        victim = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PlantUMLWorkerError("Пул PlantUML остановлен")
+
+                idle_workers = self._idle.setdefault(format, [])
+                while idle_workers:
+                    worker = idle_workers.pop()
+                    if worker.is_alive:
+                        return worker
+                    self._total -= 1
+                    self._stats["recycled"] += 1
+
+                if self._total < self.size:
+                    self._total += 1
+                    break
+
+                # Пул заполнен: освобождаем слот простаивающего воркера другого формата
+                victim = self._pop_idle_worker_of_other_format(format)
+                if victim is not None:
+                    self._stats["recycled"] += 1
+                    break
+
+                self._cond.wait()
+
+        if victim is not None:
+            victim.close()
+
+        try:
+            worker = PlantUMLWorker(
+                self._command_factory(format),
+                format=format,
+                max_renders=self.max_renders,
+                env=self._env,
+            )
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["spawned"] += 1
+
+        return worker
+
+    def _checkin(self, worker: PlantUMLWorker) -> None:
+        with self._cond:
+            keep = not self._closed and worker.is_alive and not worker.is_exhausted
+
+            if keep:
+                self._idle.setdefault(worker.format, []).append(worker)
+            else:
+                self._total -= 1
+                self._stats["recycled"] += 1
+
+            self._cond.notify()
+
+        if not keep:
+            if worker.is_exhausted:
+                logger.debug(
+                    f"🔄 Перезапуск PlantUML после {worker.render_count} диаграмм"
+                )
+            worker.close()
+
+    @contextmanager
+    def acquire(self, format: str) -> Iterator[PlantUMLWorker]:
+        """Выдаёт свободный воркер и возвращает его в пул после использования.
+
+        Args:
+            format: Формат вывода PlantUML (png, svg, eps, pdf).
+
+        Yields:
+            Воркер, закреплённый за вызывающим кодом до выхода из контекста.
+
+        Raises:
+            PlantUMLWorkerError: Если пул остановлен.
+        """
+        worker = self._checkout(format)
+        try:
+            yield worker
+        finally:
+            self._checkin(worker)
+
+    def render(
+        self, source: str, format: str, timeout: float = PLANTUML_RENDER_TIMEOUT
+    ) -> bytes:
+        """Рендерит одну диаграмму на свободном воркере.
+
+        Args:
+            source: Подготовленный код диаграммы.
+            format: Формат вывода PlantUML.
+            timeout: Таймаут рендеринга в секундах.
+
+        Returns:
+            Сырой вывод PlantUML.
+
+        Raises:
+            PlantUMLWorkerTimeout: Если процесс не ответил вовремя.
+            PlantUMLWorkerError: Если процесс упал.
+        """
+        with self.acquire(format) as worker:
+            return worker.render(source, timeout=timeout)
+
+    def shutdown(self) -> None:
+        """Останавливает все простаивающие процессы и закрывает пул.
+
+        Занятые воркеры завершаются при возврате в пул.
+        """
+        with self._cond:
+            self._closed = True
+            workers = [w for idle in self._idle.values() for w in idle]
+            self._idle.clear()
+            self._total -= len(workers)
+            self._cond.notify_all()
+
+        for worker in workers:
+            worker.close()
+
+        if workers:
+            logger.info(f"🛑 Пул PlantUML остановлен, процессов: {len(workers)}")
+
+    def get_stats(self) -> dict:
+        """Возвращает статистику пула.
+
+        Returns:
+            Словарь с размером пула, числом процессов и счётчиками.
+        """
+        with self._cond:
+            return {
+                "size": self.size,
+                "workers": self._total,
+                "idle": {fmt: len(ws) for fmt, ws in self._idle.items() if ws},
+                **self._stats,
+            }
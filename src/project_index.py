@@ -0,0 +1,395 @@
+"""Индекс сущностей Python по всему проекту.
+
+Без индекса generate_entity_screenshot требует точный путь к файлу, и агент
+сначала читает структуру директорий. Модуль хранит на диске (SQLite в
+PROJECT_INDEX_DIR) квалифицированные имена всех функций, классов и методов
+дерева исходников, поэтому сущность находится по ссылке вида
+``package.module:Class.method``, ``package.module.Class.method`` или просто
+``Class.method``.
+
+Индекс обновляется инкрементально: при обходе дерева сравниваются mtime и
+размер файлов, заново разбираются только изменённые, разбор идёт в пуле
+процессов (render_processes). Поиск — запрос к индексу SQLite (доли
+миллисекунды); найденный файл дополнительно сверяется с диском.
+
+Классы:
+    SymbolLocation
+        Расположение сущности в проекте.
+    ProjectIndex
+        Постоянный индекс сущностей одного дерева исходников.
+
+Функции:
+    get_project_index(root) -> ProjectIndex
+        Возвращает общий для процесса индекс дерева.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.code_extractor import SymbolIndex
+from src.config import (
+    PROJECT_INDEX_DIR,
+    PROJECT_INDEX_REFRESH_INTERVAL,
+    RENDER_PROCESS_WORKERS,
+)
+from src.render_processes import map_in_processes
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+# Директории, которые не содержат исходников проекта
+EXCLUDED_DIRS = frozenset(
+    {"__pycache__", "node_modules", "venv", "env", "build", "dist", "site-packages"}
+)
+
+# Файлов на одну задачу пула процессов
+_PARSE_CHUNK_SIZE = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    path TEXT NOT NULL,
+    module TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    lineno INTEGER NOT NULL,
+    end_lineno INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_by_qualname ON symbols (qualname);
+CREATE INDEX IF NOT EXISTS symbols_by_module ON symbols (module, qualname);
+CREATE INDEX IF NOT EXISTS symbols_by_path ON symbols (path);
+"""
+
+_indexes: dict[str, "ProjectIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SymbolLocation:
+    """Расположение сущности в проекте.
+
+    Attributes:
+        module: Имя модуля ("package.module").
+        qualname: Квалифицированное имя в модуле ("Class.method").
+        path: Абсолютный путь к файлу.
+        kind: Вид сущности: function, class или method.
+        lineno: Строка определения.
+        end_lineno: Последняя строка сущности.
+    """
+
+    module: str
+    qualname: str
+    path: str
+    kind: str
+    lineno: int
+    end_lineno: int
+
+    @property
+    def reference(self) -> str:
+        return f"{self.module}:{self.qualname}"
+
+    def to_dict(self) -> dict:
+        return {
+            "reference": self.reference,
+            "module": self.module,
+            "qualname": self.qualname,
+            "file_path": self.path,
+            "kind": self.kind,
+            "lines": [self.lineno, self.end_lineno],
+        }
+
+
+def _module_name(root: Path, path: Path) -> str:
+    parts = list(path.relative_to(root).with_suffix("").parts)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def _parse_files(paths: list[str]) -> list[tuple[str, list[tuple]]]:
+    """Разбирает файлы и возвращает строки таблицы symbols (выполняется в процессе пула).
+
+    Файлы с синтаксическими ошибками или не в UTF-8 получают пустой список,
+    чтобы не разбираться повторно до изменения.
+    """
+    parsed = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = SymbolIndex.build(f.read(), filename=path)
+        except (SyntaxError, ValueError, OSError) as e:
+            logger.debug(f"⚠️ Файл пропущен при индексации {path}: {e}")
+            parsed.append((path, []))
+            continue
+
+        parsed.append(
+            (
+                path,
+                [
+                    (span.qualname, span.kind, span.lineno, span.end_lineno)
+                    for span in index.symbols.values()
+                ],
+            )
+        )
+    return parsed
+
+
+class ProjectIndex:
+    """Постоянный индекс сущностей одного дерева исходников.
+
+    Attributes:
+        root: Корень дерева исходников.
+        db_path: Файл SQLite с индексом.
+        refresh_interval: Через сколько секунд поиск заново обходит дерево.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        db_path: str | Path,
+        refresh_interval: float = PROJECT_INDEX_REFRESH_INTERVAL,
+    ):
+        self.root = Path(os.path.realpath(root))
+        self.db_path = Path(db_path)
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.RLock()
+        self._last_refresh: float | None = None
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS symbols;"
+            )
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.executescript(_SCHEMA)
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if not name.startswith(".") and name not in EXCLUDED_DIRS
+            ]
+            for filename in filenames:
+                if not filename.endswith(".py"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def refresh(self) -> dict:
+        """Обходит дерево и переиндексирует новые и изменённые файлы.
+
+        Returns:
+            Статистика: files, parsed, removed, symbols, seconds.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            on_disk = self._scan()
+            indexed = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in self._db.execute(
+                    "SELECT path, mtime_ns, size FROM files"
+                )
+            }
+
+            changed = [path for path, sig in on_disk.items() if indexed.get(path) != sig]
+            removed = [path for path in indexed if path not in on_disk]
+
+            self._update(changed, removed, on_disk)
+            self._last_refresh = time.monotonic()
+
+            stats = {
+                "files": len(on_disk),
+                "parsed": len(changed),
+                "removed": len(removed),
+                "symbols": self._db.execute("SELECT COUNT(*) FROM symbols").fetchone()[0],
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+
+        if changed or removed:
+            logger.info(
+                f"📇 Индекс проекта {self.root.name} обновлён: разобрано "
+                f"{stats['parsed']}, удалено {stats['removed']}, "
+                f"сущностей {stats['symbols']} ({stats['seconds']}s)"
+            )
+        return stats
+
+    def _update(
+        self,
+        changed: list[str],
+        removed: list[str],
+        signatures: dict[str, tuple[int, int]],
+    ) -> None:
+        chunks = [
+            changed[i : i + _PARSE_CHUNK_SIZE]
+            for i in range(0, len(changed), _PARSE_CHUNK_SIZE)
+        ]
+        if len(changed) < _PARSE_CHUNK_SIZE * 2 or RENDER_PROCESS_WORKERS <= 1:
+            # Для нескольких файлов запуск процессов дороже самого разбора
+            parsed = [_parse_files(changed)] if changed else []
+        else:
+            parsed = []
+            for (result, error), chunk in zip(
+                map_in_processes(_parse_files, [((chunk,), {}) for chunk in chunks]),
+                chunks,
+            ):
+                parsed.append(result if error is None else _parse_files(chunk))
+
+        with self._db:
+            for path in removed + changed:
+                self._db.execute("DELETE FROM symbols WHERE path = ?", (path,))
+                self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+            for chunk in parsed:
+                for path, rows in chunk:
+                    module = _module_name(self.root, Path(path))
+                    mtime_ns, size = signatures[path]
+                    self._db.execute(
+                        "INSERT INTO files VALUES (?, ?, ?, ?)",
+                        (path, module, mtime_ns, size),
+                    )
+                    self._db.executemany(
+                        "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)",
+                        [(path, module, *row) for row in rows],
+                    )
+
+    def _query(self, query: str, limit: int) -> list[SymbolLocation]:
+        columns = "module, qualname, path, kind, lineno, end_lineno"
+
+        if ":" in query:
+            module, qualname = query.split(":", 1)
+            candidates = [(module, qualname)]
+        else:
+            rows = self._db.execute(
+                f"SELECT {columns} FROM symbols WHERE qualname = ? LIMIT ?",
+                (query, limit),
+            ).fetchall()
+            if rows:
+                return [SymbolLocation(*row) for row in rows]
+            # "package.module.Class.method": перебираем границу модуля
+            parts = query.split(".")
+            candidates = [
+                (".".join(parts[:i]), ".".join(parts[i:])) for i in range(1, len(parts))
+            ]
+
+        for module, qualname in candidates:
+            rows = self._db.execute(
+                f"SELECT {columns} FROM symbols WHERE module = ? AND qualname = ? LIMIT ?",
+                (module, qualname, limit),
+            ).fetchall()
+            if rows:
+                return [SymbolLocation(*row) for row in rows]
+        return []
+
+    def _is_stale(self, path: str) -> bool:
+        row = self._db.execute(
+            "SELECT mtime_ns, size FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        return row is None or (stat.st_mtime_ns, stat.st_size) != tuple(row)
+
+    def find(self, query: str, limit: int = 20) -> list[SymbolLocation]:
+        """Находит сущности по ссылке.
+
+        Args:
+            query: "package.module:Class.method", "package.module.Class.method",
+                "Class.method" или "function_name".
+            limit: Максимальное число результатов.
+
+        Returns:
+            Найденные расположения (несколько — если имя неоднозначно).
+        """
+        with self._lock:
+            refreshed = False
+            if (
+                self._last_refresh is None
+                or time.monotonic() - self._last_refresh > self.refresh_interval
+            ):
+                self.refresh()
+                refreshed = True
+
+            locations = self._query(query, limit)
+
+            stale = [loc.path for loc in locations if self._is_stale(loc.path)]
+            if stale and not refreshed:
+                # Найденный файл изменился после обхода — переиндексируем только его
+                signatures = {}
+                for path in stale:
+                    try:
+                        stat = os.stat(path)
+                        signatures[path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        pass
+                self._update(
+                    list(signatures), [p for p in stale if p not in signatures], signatures
+                )
+                locations = self._query(query, limit)
+            elif not locations and not refreshed:
+                self.refresh()
+                locations = self._query(query, limit)
+
+        return locations
+
+    def get_stats(self) -> dict:
+        """Возвращает число файлов и сущностей в индексе."""
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "files": self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+                "symbols": self._db.execute("SELECT COUNT(*) FROM symbols").fetchone()[0],
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def get_project_index(root: str | Path) -> ProjectIndex:
+    """Возвращает общий для процесса индекс дерева исходников.
+
+    Файл индекса лежит в PROJECT_INDEX_DIR и называется по хешу пути корня,
+    поэтому переживает перезапуск сервера.
+
+    Args:
+        root: Корень дерева исходников.
+
+    Raises:
+        NotADirectoryError: Если root не является директорией.
+    """
+    real_root = os.path.realpath(root)
+    if not os.path.isdir(real_root):
+        raise NotADirectoryError(f"Не директория: {root}")
+
+    with _indexes_lock:
+        index = _indexes.get(real_root)
+        if index is None:
+            digest = hashlib.sha256(real_root.encode("utf-8")).hexdigest()[:16]
+            index = ProjectIndex(real_root, PROJECT_INDEX_DIR / f"{digest}.sqlite3")
+            _indexes[real_root] = index
+        return index
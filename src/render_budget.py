@@ -0,0 +1,504 @@
+"""Предварительная оценка стоимости рендеринга и бюджеты сервера.
+
+До растеризации по исходнику считаются размер результата, пиковая память
+процесса и ожидаемое время. Для кода размеры точные: они выводятся из
+числа строк, самой длинной строки и метрик шрифта в масштабе detail_level
+(та же геометрия, что у code_rasterizer.CodeLayout). Для диаграмм PlantUML
+размер оценивается эвристикой по числу элементов и связей в исходнике.
+
+Бюджет (RENDER_MAX_MEGAPIXELS, RENDER_MAX_MEMORY_MB) проверяется политикой:
+    off       - без проверки
+    reject    - запрос сверх бюджета отклоняется
+    downgrade - detail_level понижается до первого уровня, который укладывается
+                в бюджет; если не укладывается и Low, запрос отклоняется
+
+Коэффициенты модели сняты замерами на скриншотах кода (Pillow хранит RGB
+холст по 4 байта на пиксель, WebP кодировщик держит ещё около полутора
+холстов) и служат ориентиром, а не гарантией.
+
+Классы:
+    RenderBudgetError
+        Запрос не укладывается в бюджет.
+
+Функции:
+    estimate_code_render(code, scale_factor, **options) -> dict
+        Оценка скриншота кода.
+    count_diagram_elements(diagram_code) -> dict
+        Элементы, связи и члены классов в исходнике PlantUML.
+    estimate_diagram_render(diagram_code, scale_factor, format, output_mode) -> dict
+        Оценка растра диаграммы PlantUML.
+    check_render_budget(estimate, max_megapixels, max_memory_mb) -> list[str]
+        Превышенные пределы бюджета.
+    fit_render_budget(estimate_for, detail_level, policy, ...) -> dict
+        Подбирает detail_level под бюджет по политике.
+"""
+
+import logging
+import math
+import re
+from typing import Callable
+
+from src.code_rasterizer import CodeLayout
+from src.config import (
+    DEEP_ZOOM_MIN_MEGAPIXELS,
+    DEEP_ZOOM_TILE_SIZE,
+    LONG_LINE_POLICY,
+    MAX_LINE_COLUMNS,
+    RENDER_MAX_MEGAPIXELS,
+    RENDER_MAX_MEMORY_MB,
+)
+from src.diagram_renderer import QUALITY_LEVELS
+from src.image_utils import (
+    ENCODE_COST_MS_PER_MEGAPIXEL,
+    _format_key,
+    select_encoder_profile,
+)
+from src.long_lines import apply_long_line_policy
+from src.resource_cache import get_fonts
+
+logger = logging.getLogger(__name__)
+
+BUDGET_POLICIES = ("off", "reject", "downgrade")
+
+# Предел стороны изображения WebP в libwebp
+WEBP_MAX_SIDE = 16383
+
+# Pillow хранит RGB/RGBA холст по 4 байта на пиксель
+BYTES_PER_PIXEL = 4
+
+# Пиковая память относительно холста: кодировщик WebP держит свои буферы
+PEAK_MEMORY_FACTOR = {"webp": 2.5, "png": 1.1, "jpeg": 1.1}
+
+# Растеризация токенов на холсте (мс на мегапиксель)
+RASTERIZE_MS_PER_MEGAPIXEL = 30
+
+# Модель PlantUML: запуск на прогретом процессе, стоимость элемента и
+# отрисовки растра в JVM, декодирование PNG в Python
+PLANTUML_BASE_MS = 150
+PLANTUML_ELEMENT_MS = 4
+PLANTUML_RASTER_MS_PER_MEGAPIXEL = 40
+DECODE_MS_PER_MEGAPIXEL = 15
+
+# Геометрия диаграммы при 96 DPI (scale_factor=1.0)
+SEQUENCE_PARTICIPANT_WIDTH = 150
+SEQUENCE_MESSAGE_HEIGHT = 30
+SEQUENCE_HEADER_HEIGHT = 120
+NODE_WIDTH = 220
+NODE_BASE_HEIGHT = 60
+NODE_MEMBER_HEIGHT = 18
+NODE_GAP = 60
+DIAGRAM_MARGIN = 40
+
+_ELEMENT_KEYWORDS = (
+    "abstract", "actor", "agent", "annotation", "artifact", "boundary", "card",
+    "class", "cloud", "collections", "component", "control", "database",
+    "entity", "enum", "file", "folder", "frame", "interface", "node", "object",
+    "participant", "queue", "rectangle", "state", "storage", "usecase",
+)
+_CONTAINER_KEYWORDS = ("package", "namespace", "together")
+_SEQUENCE_KEYWORDS = ("participant", "actor", "boundary", "control", "collections", "queue")
+
+_ELEMENT_RE = re.compile(
+    rf"^\s*(?:abstract\s+class|{'|'.join(_ELEMENT_KEYWORDS)})\s+"
+    r"(?:\"(?P<quoted>[^\"]+)\"|(?P<name>[\w.]+))(?:\s+as\s+(?P<alias>[\w.]+))?",
+    re.IGNORECASE,
+)
+_SEQUENCE_RE = re.compile(
+    rf"^\s*(?:{'|'.join(_SEQUENCE_KEYWORDS)})\b|^\s*(?:activate|deactivate|alt|loop)\b",
+    re.IGNORECASE,
+)
+# Связь: "A -> B", "A --|> B", "A ..> B : метка", "A <|-- B"
+_EDGE_RE = re.compile(
+    r"^\s*(?P<source>\"[^\"]+\"|[\w.]+)\s*"
+    r"(?P<arrow>[<|o*#x}]*[-.=]+(?:\[[^\]]*\])?[-.=]*[>|o*#x{]*)\s*"
+    r"(?P<target>\"[^\"]+\"|[\w.]+)"
+)
+
+
+class RenderBudgetError(Exception):
+    """Запрос не укладывается в бюджет рендеринга.
+
+    Attributes:
+        estimate: Оценка наименьшего проверенного уровня.
+        exceeded: Превышенные пределы (см. check_render_budget).
+    """
+
+    def __init__(self, message: str, estimate: dict, exceeded: list[str]):
+        super().__init__(message)
+        self.estimate = estimate
+        self.exceeded = exceeded
+
+
+def _level_name(scale_factor: float) -> str | None:
+    """Имя уровня QUALITY_LEVELS для масштаба (None для нестандартного)."""
+    for name, value in QUALITY_LEVELS.items():
+        if value == scale_factor:
+            return name
+    return None
+
+
+def _raster_estimate(
+    width: int, height: int, format: str, memory_bytes: int, timings: dict
+) -> dict:
+    """Общие поля оценки растра."""
+    pixels = width * height
+    estimate = {
+        "dimensions": (width, height),
+        "megapixels": round(pixels / 1_000_000, 2),
+        "canvas_mb": round(pixels * BYTES_PER_PIXEL / 1024 / 1024, 1),
+        "peak_memory_mb": round(memory_bytes / 1024 / 1024, 1),
+        "estimated_ms": {
+            **{name: round(value, 1) for name, value in timings.items()},
+            "total": round(sum(timings.values()), 1),
+        },
+        "warnings": [],
+    }
+    if format == "webp" and max(width, height) > WEBP_MAX_SIDE:
+        estimate["warnings"].append(
+            f"Сторона {max(width, height)}px превышает предел WebP {WEBP_MAX_SIDE}px"
+        )
+    return estimate
+
+
+def _encode_ms(pixels: int, format: str) -> tuple[str, float]:
+    """Профиль 'auto' и стоимость кодирования для числа пикселей."""
+    format_key = _format_key(format)
+    profile = select_encoder_profile(pixels, format_key)
+    costs = ENCODE_COST_MS_PER_MEGAPIXEL.get(format_key, ENCODE_COST_MS_PER_MEGAPIXEL["png"])
+    return profile, costs[profile] * pixels / 1_000_000
+
+
+def estimate_code_render(
+    code: str,
+    scale_factor: float = 3.0,
+    font_name: str = "JetBrainsMono",
+    font_size: int = 18,
+    pad: int = 25,
+    line_pad: int = 10,
+    line_numbers: bool = True,
+    format: str = "webp",
+    long_lines: str = LONG_LINE_POLICY,
+    max_line_columns: int = MAX_LINE_COLUMNS,
+) -> dict:
+    """Оценивает скриншот кода без растеризации.
+
+    Размеры считаются по геометрии CodeLayout: метрики шрифта в масштабе,
+    число строк после обрезки пустых краёв (как у лексера) и ширина самой
+    длинной строки с табуляцией в 4 пробела. Длинные строки сначала
+    переносятся или обрезаются, как при рендеринге.
+
+    Args:
+        code: Исходный код.
+        scale_factor: Масштаб (см. QUALITY_LEVELS).
+        font_name: Имя шрифта.
+        font_size: Базовый размер шрифта.
+        pad: Отступ вокруг кода до масштабирования.
+        line_pad: Межстрочный интервал до масштабирования.
+        line_numbers: Колонка номеров строк.
+        format: Формат результата (webp, png, jpeg).
+        long_lines: Политика длинных строк ('wrap', 'truncate', 'off').
+        max_line_columns: Предел ширины строки в колонках.
+
+    Returns:
+        {"kind", "scale_factor", "detail_level", "format", "lines",
+         "longest_line", "dimensions", "megapixels", "canvas_mb",
+         "peak_memory_mb", "encoder_profile", "estimated_ms", "warnings"}
+        и "long_lines", если строки переносятся или обрезаются.
+
+    Raises:
+        ValueError: Если политика длинных строк неизвестна.
+    """
+    prepared = apply_long_line_policy(code, long_lines, max_line_columns)
+    code = prepared.code
+
+    format_lower = format.lower()
+    fonts = get_fonts(font_name, int(font_size * scale_factor))
+    scaled_pad = int(pad * scale_factor)
+    layout = CodeLayout.create(fonts, scaled_pad, int(line_pad * scale_factor), line_numbers)
+
+    lines = [line.expandtabs(4) for line in code.strip().splitlines()] or [""]
+    longest = max(lines, key=len)
+    text_width = fonts.get_text_size(longest)[0] if longest else 0
+
+    width = layout.image_width(text_width)
+    height = len(lines) * layout.line_height + scaled_pad * 2
+    pixels = width * height
+
+    profile, encode_ms = _encode_ms(pixels, format_lower)
+    memory = pixels * BYTES_PER_PIXEL * PEAK_MEMORY_FACTOR.get(_format_key(format_lower), 1.1)
+    estimate = {
+        "kind": "code",
+        "scale_factor": scale_factor,
+        "detail_level": _level_name(scale_factor),
+        "format": format_lower,
+        "lines": len(lines),
+        "longest_line": len(longest),
+        "encoder_profile": profile,
+        **_raster_estimate(
+            width,
+            height,
+            format_lower,
+            int(memory),
+            {
+                "rasterize": RASTERIZE_MS_PER_MEGAPIXEL * pixels / 1_000_000,
+                "encode": encode_ms,
+            },
+        ),
+    }
+    if prepared.affected:
+        estimate["long_lines"] = prepared.report()
+    return estimate
+
+
+def _clean_name(name: str) -> str:
+    return name.strip('"')
+
+
+def count_diagram_elements(diagram_code: str) -> dict:
+    """Считает элементы, связи и члены классов в исходнике PlantUML.
+
+    Элементы — объявленные ключевыми словами (class, participant, component...)
+    и упомянутые в связях. Члены — строки внутри фигурных скобок элементов.
+
+    Returns:
+        {"kind": "sequence" | "graph", "nodes", "edges", "members", "containers"}.
+    """
+    nodes: set[str] = set()
+    edges = members = containers = 0
+    sequence = False
+    depth = 0
+    element_depths: list[int] = []
+
+    for raw_line in diagram_code.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith(("'", "@", "!", "skinparam", "title", "note")):
+            continue
+
+        if _SEQUENCE_RE.match(line):
+            sequence = True
+
+        element = _ELEMENT_RE.match(line)
+        if element:
+            nodes.add(element.group("alias") or _clean_name(
+                element.group("quoted") or element.group("name")
+            ))
+        elif line.split(" ", 1)[0].lower() in _CONTAINER_KEYWORDS:
+            containers += 1
+        else:
+            edge = _EDGE_RE.match(line)
+            if edge and any(char in edge.group("arrow") for char in "-.="):
+                edges += 1
+                nodes.add(_clean_name(edge.group("source")))
+                nodes.add(_clean_name(edge.group("target")))
+            elif element_depths and depth == element_depths[-1] and not line.startswith("}"):
+                members += 1
+
+        if line.endswith("{"):
+            depth += 1
+            if element:
+                element_depths.append(depth)
+        if line.startswith("}"):
+            if element_depths and element_depths[-1] == depth:
+                element_depths.pop()
+            depth = max(0, depth - 1)
+
+    return {
+        "kind": "sequence" if sequence else "graph",
+        "nodes": len(nodes),
+        "edges": edges,
+        "members": members,
+        "containers": containers,
+    }
+
+
+def estimate_diagram_render(
+    diagram_code: str,
+    scale_factor: float = 3.0,
+    format: str = "png",
+    output_mode: str = "auto",
+) -> dict:
+    """Оценивает растр диаграммы PlantUML до запуска PlantUML.
+
+    Размер при 96 DPI оценивается по структуре: диаграмма последовательностей —
+    ширина по участникам и высота по сообщениям, остальные — сетка элементов
+    с высотой по числу членов. Растр больше DEEP_ZOOM_MIN_MEGAPIXELS при
+    output_mode='auto' пишется плитками, и память оценивается по полосе.
+    Для svg и pdf растра нет: размеры и память не оцениваются.
+
+    Args:
+        diagram_code: Исходный код PlantUML.
+        scale_factor: Масштаб (см. QUALITY_LEVELS).
+        format: Формат результата (png, webp, svg, pdf).
+        output_mode: Режим вывода растра ('auto', 'single', 'deep_zoom').
+
+    Returns:
+        {"kind", "scale_factor", "detail_level", "format", "structure",
+         "output_mode", "dimensions", "megapixels", "canvas_mb",
+         "peak_memory_mb", "estimated_ms", "warnings"}.
+    """
+    format_lower = format.lower()
+    structure = count_diagram_elements(diagram_code)
+    nodes = max(structure["nodes"], 1)
+    layout_ms = PLANTUML_BASE_MS + PLANTUML_ELEMENT_MS * (nodes + structure["edges"])
+
+    base = {
+        "kind": "diagram",
+        "scale_factor": scale_factor,
+        "detail_level": _level_name(scale_factor),
+        "format": format_lower,
+        "structure": structure,
+    }
+    if format_lower not in ("png", "webp"):
+        return {
+            **base,
+            "output_mode": "vector",
+            "dimensions": None,
+            "megapixels": None,
+            "canvas_mb": None,
+            "peak_memory_mb": None,
+            "estimated_ms": {"plantuml": layout_ms, "total": layout_ms},
+            "warnings": [],
+        }
+
+    if structure["kind"] == "sequence":
+        width = nodes * SEQUENCE_PARTICIPANT_WIDTH + DIAGRAM_MARGIN
+        height = SEQUENCE_HEADER_HEIGHT + structure["edges"] * SEQUENCE_MESSAGE_HEIGHT
+    else:
+        columns = math.ceil(math.sqrt(nodes))
+        rows = math.ceil(nodes / columns)
+        node_height = NODE_BASE_HEIGHT + NODE_MEMBER_HEIGHT * structure["members"] / nodes
+        width = columns * (NODE_WIDTH + NODE_GAP) + DIAGRAM_MARGIN
+        height = int(rows * (node_height + NODE_GAP * 1.5)) + DIAGRAM_MARGIN
+    width, height = int(width * scale_factor), int(height * scale_factor)
+    pixels = width * height
+
+    deep_zoom = output_mode == "deep_zoom" or (
+        output_mode == "auto" and pixels > DEEP_ZOOM_MIN_MEGAPIXELS * 1_000_000
+    )
+    timings = {
+        "plantuml": layout_ms + PLANTUML_RASTER_MS_PER_MEGAPIXEL * pixels / 1_000_000,
+    }
+    if deep_zoom:
+        # Плитки строятся из полос: в памяти ряд плиток с запасом на уровни
+        memory = width * DEEP_ZOOM_TILE_SIZE * 4 * BYTES_PER_PIXEL
+        timings["decode"] = DECODE_MS_PER_MEGAPIXEL * pixels / 1_000_000
+        timings["encode"] = _encode_ms(pixels * 4 // 3, format_lower)[1]
+    elif format_lower == "png":
+        # PNG пишется как есть, без декодирования
+        memory = 0
+    else:
+        memory = pixels * BYTES_PER_PIXEL * PEAK_MEMORY_FACTOR["webp"]
+        timings["decode"] = DECODE_MS_PER_MEGAPIXEL * pixels / 1_000_000
+        timings["encode"] = _encode_ms(pixels, format_lower)[1]
+
+    estimate = {
+        **base,
+        "output_mode": "deep_zoom" if deep_zoom else "single",
+        **_raster_estimate(width, height, format_lower, int(memory), timings),
+    }
+    if deep_zoom:
+        # Предел стороны WebP относится к плиткам, а не ко всему изображению
+        estimate["warnings"] = []
+    return estimate
+
+
+def check_render_budget(
+    estimate: dict,
+    max_megapixels: int = RENDER_MAX_MEGAPIXELS,
+    max_memory_mb: int = RENDER_MAX_MEMORY_MB,
+) -> list[str]:
+    """Возвращает описания превышенных пределов бюджета (пустой список — в бюджете).
+
+    Предел по мегапикселям не применяется к плиткам Deep Zoom: их размер
+    ограничен памятью, а не площадью. Предел 0 отключает проверку.
+    """
+    exceeded = []
+    megapixels = estimate.get("megapixels")
+    if (
+        max_megapixels
+        and megapixels is not None
+        and estimate.get("output_mode") != "deep_zoom"
+        and megapixels > max_megapixels
+    ):
+        exceeded.append(f"{megapixels} MP > {max_megapixels} MP")
+
+    memory = estimate.get("peak_memory_mb")
+    if max_memory_mb and memory is not None and memory > max_memory_mb:
+        exceeded.append(f"{memory} MB > {max_memory_mb} MB")
+
+    if any("WebP" in warning for warning in estimate.get("warnings", [])):
+        exceeded.append(f"сторона > {WEBP_MAX_SIDE}px для WebP")
+    return exceeded
+
+
+def fit_render_budget(
+    estimate_for: Callable[[float], dict],
+    detail_level: str,
+    policy: str = "downgrade",
+    max_megapixels: int = RENDER_MAX_MEGAPIXELS,
+    max_memory_mb: int = RENDER_MAX_MEMORY_MB,
+) -> dict:
+    """Подбирает уровень детализации под бюджет.
+
+    Args:
+        estimate_for: Оценка для масштаба (например, estimate_code_render с
+            зафиксированными остальными параметрами).
+        detail_level: Запрошенный уровень QUALITY_LEVELS.
+        policy: Политика бюджета ('off', 'reject', 'downgrade').
+        max_megapixels: Предел площади растра.
+        max_memory_mb: Предел пиковой памяти.
+
+    Returns:
+        {"policy", "requested_level", "detail_level", "scale_factor",
+         "downgraded", "estimate"} (estimate — None при policy='off').
+
+    Raises:
+        ValueError: Если политика неизвестна.
+        RenderBudgetError: Если запрос не укладывается в бюджет.
+    """
+    if policy not in BUDGET_POLICIES:
+        raise ValueError(
+            f"Неизвестная политика бюджета: {policy} (доступны: {', '.join(BUDGET_POLICIES)})"
+        )
+
+    requested = detail_level.capitalize()
+    if requested not in QUALITY_LEVELS:
+        requested = "High"
+    result = {
+        "policy": policy,
+        "requested_level": requested,
+        "detail_level": requested,
+        "scale_factor": QUALITY_LEVELS[requested],
+        "downgraded": False,
+        "estimate": None,
+    }
+    if policy == "off":
+        return result
+
+    levels = list(QUALITY_LEVELS)
+    candidates = levels[levels.index(requested) :: -1] if policy == "downgrade" else [requested]
+
+    for level in candidates:
+        estimate = estimate_for(QUALITY_LEVELS[level])
+        exceeded = check_render_budget(estimate, max_megapixels, max_memory_mb)
+        if not exceeded:
+            if level != requested:
+                logger.warning(
+                    f"📉 Бюджет рендеринга: {requested} -> {level} "
+                    f"({estimate['megapixels']} MP, {estimate['peak_memory_mb']} MB)"
+                )
+            result.update(
+                detail_level=level,
+                scale_factor=QUALITY_LEVELS[level],
+                downgraded=level != requested,
+                estimate=estimate,
+            )
+            return result
+
+    logger.warning(f"🚫 Запрос {requested} превышает бюджет рендеринга: {', '.join(exceeded)}")
+    raise RenderBudgetError(
+        f"Запрос превышает бюджет рендеринга ({', '.join(exceeded)})"
+        + (" даже на уровне Low" if policy == "downgrade" and requested != "Low" else ""),
+        estimate,
+        exceeded,
+    )
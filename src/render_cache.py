@@ -0,0 +1,432 @@
+"""Content-addressed кеш результатов рендеринга (память + диск).
+
+Ключ записи — SHA-256 от всех входных данных, влияющих на результат
+(подготовленный исходник, хеш темы, DPI, формат, версия инструмента).
+Запись хранится как готовый файл и JSON с метаданными ответа. Попадание
+отдаётся копированием (или жёсткой ссылкой) в output_path, без рендеринга.
+
+Размер каждого раздела (namespace) ограничен RENDER_CACHE_MAX_MB: при
+превышении удаляются записи, к которым дольше всего не обращались (LRU по
+mtime — при попадании mtime обновляется).
+
+Перед диском стоит уровень в памяти (RENDER_CACHE_MEMORY_MB на раздел) с
+готовыми закодированными байтами: частые повторные запросы отдаются без
+чтения файла кеша. Запись при попадании на диск поднимается в память.
+
+Классы:
+    RenderCache
+        Раздел кеша (память + диск) с LRU вытеснением.
+
+        Методы:
+            make_key(*parts) -> str
+                Строит ключ записи из частей.
+            fetch(key, output_path) -> dict | None
+                Отдаёт запись в output_path и возвращает её метаданные.
+            fetch_bytes(key) -> tuple[bytes, dict] | None
+                Возвращает байты записи и её метаданные без записи файла.
+            store(key, file_path, metadata) -> None
+                Сохраняет готовый файл в кеш.
+            store_bytes(key, data, metadata) -> None
+                Сохраняет закодированные в памяти байты в кеш.
+            clear() -> None
+                Удаляет все записи раздела.
+            get_stats() -> dict
+                Возвращает счётчики попаданий и размер раздела.
+
+Функции:
+    get_render_cache(namespace) -> RenderCache | None
+        Возвращает раздел кеша (None, если кеш отключён).
+    detach_shared_file(path) -> None
+        Отвязывает файл от жёсткой ссылки на запись кеша перед перезаписью.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+from src.config import (
+    RENDER_CACHE_DIR,
+    RENDER_CACHE_ENABLED,
+    RENDER_CACHE_HARDLINK,
+    RENDER_CACHE_MAX_MB,
+    RENDER_CACHE_MEMORY_MB,
+)
+
+logger = logging.getLogger(__name__)
+
+_META_SUFFIX = ".json"
+
+_caches: dict[str, "RenderCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def detach_shared_file(path: str | Path) -> None:
+    """Отвязывает файл от жёсткой ссылки на запись кеша перед перезаписью.
+
+    Запись в файл с несколькими ссылками изменила бы и запись кеша, поэтому
+    такой файл удаляется (сама запись кеша остаётся нетронутой).
+    """
+    path = Path(path)
+    try:
+        if path.is_file() and path.stat().st_nlink > 1:
+            path.unlink()
+            logger.debug(f"🔗 Файл отвязан от записи кеша: {path.name}")
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось отвязать файл от кеша {path}: {e}")
+
+
+def _replace_file(output_path: Path, write_data: Callable[[str], object]) -> None:
+    """Пишет файл во временный рядом с output_path и подменяет им output_path.
+
+    Прежний файл заменяется только готовым результатом: если запись не
+    удалась (например, запись кеша вытеснена), он остаётся нетронутым.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, prefix=".tmp-")
+    os.close(fd)
+    try:
+        write_data(tmp_name)
+        os.replace(tmp_name, output_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class RenderCache:
+    """Раздел кеша (память + диск) с LRU вытеснением.
+
+    Attributes:
+        cache_dir: Директория раздела.
+        max_bytes: Предельный суммарный размер файлов раздела.
+        use_hardlinks: Отдавать попадания жёсткой ссылкой.
+        memory_max_bytes: Предельный размер уровня в памяти (0 — отключён).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_bytes: int,
+        use_hardlinks: bool = False,
+        memory_max_bytes: int = 0,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.use_hardlinks = use_hardlinks
+        self.memory_max_bytes = memory_max_bytes
+
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+        self._hits = 0
+        self._misses = 0
+
+        self._memory: OrderedDict[str, tuple[bytes, dict]] = OrderedDict()
+        self._memory_bytes = 0
+        self._memory_hits = 0
+
+    @staticmethod
+    def make_key(*parts: str | bytes | int | float | None) -> str:
+        """Строит ключ записи из частей (порядок важен).
+
+        Returns:
+            Шестнадцатеричный SHA-256.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = repr(part).encode("utf-8")
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{_META_SUFFIX}"
+
+    def _data_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _iter_entries(self) -> list[tuple[Path, Path, os.stat_result]]:
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+
+        for meta_path in self.cache_dir.glob(f"*/*{_META_SUFFIX}"):
+            data_path = meta_path.with_suffix("")
+            try:
+                entries.append((meta_path, data_path, data_path.stat()))
+            except FileNotFoundError:
+                # Осиротевшие метаданные (запись удалена не полностью)
+                meta_path.unlink(missing_ok=True)
+        return entries
+
+    def _ensure_total_bytes(self) -> int:
+        if self._total_bytes is None:
+            self._total_bytes = sum(st.st_size for _, _, st in self._iter_entries())
+        return self._total_bytes
+
+    def _remember(self, key: str, data: bytes, metadata: dict) -> None:
+        """Кладёт запись в уровень памяти (под self._lock)."""
+        if len(data) > self.memory_max_bytes:
+            return
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous[0])
+
+        self._memory[key] = (data, metadata)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _fetch_from_memory(self, key: str, output_path: Path) -> dict | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            self._memory.move_to_end(key)
+
+        data, metadata = entry
+        _replace_file(output_path, lambda tmp_name: Path(tmp_name).write_bytes(data))
+
+        with self._lock:
+            self._hits += 1
+            self._memory_hits += 1
+
+        logger.info(f"⚡ Результат взят из кеша в памяти: {key[:12]} -> {output_path.name}")
+        return dict(metadata)
+
+    def fetch(self, key: str, output_path: str | Path) -> dict | None:
+        """Отдаёт запись в output_path и возвращает её метаданные.
+
+        Сначала проверяется уровень в памяти, затем диск.
+
+        Args:
+            key: Ключ записи.
+            output_path: Куда скопировать (или связать) файл из кеша.
+
+        Returns:
+            Метаданные, сохранённые вместе с записью, или None при промахе.
+        """
+        output_path = Path(output_path)
+        if self.memory_max_bytes > 0:
+            metadata = self._fetch_from_memory(key, output_path)
+            if metadata is not None:
+                return metadata
+
+        meta_path = self._meta_path(key)
+        data_path = self._data_path(key)
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+
+            # Обновляем mtime для LRU (и проверяем, что запись не вытеснена)
+            os.utime(data_path)
+
+            def link_or_copy(tmp_name: str) -> None:
+                if self.use_hardlinks:
+                    try:
+                        os.unlink(tmp_name)
+                        os.link(data_path, tmp_name)
+                        return
+                    except OSError:
+                        pass
+                shutil.copyfile(data_path, tmp_name)
+
+            # Прежний output_path подменяется только готовой копией: при
+            # промахе (запись вытеснена между проверками) он не удаляется
+            _replace_file(output_path, link_or_copy)
+
+            data = None
+            if 0 < os.path.getsize(data_path) <= self.memory_max_bytes:
+                data = data_path.read_bytes()
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self._misses += 1
+            return None
+
+        with self._lock:
+            self._hits += 1
+            if data is not None:
+                self._remember(key, data, metadata)
+
+        logger.info(f"💾 Результат взят из кеша: {key[:12]} -> {output_path.name}")
+        return metadata
+
+    def fetch_bytes(self, key: str) -> tuple[bytes, dict] | None:
+        """Возвращает байты записи и её метаданные без записи файла.
+
+        Args:
+            key: Ключ записи.
+
+        Returns:
+            (байты файла, метаданные) или None при промахе.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                self._memory_hits += 1
+        if entry is not None:
+            logger.info(f"⚡ Результат взят из кеша в памяти: {key[:12]}")
+            return entry[0], dict(entry[1])
+
+        data_path = self._data_path(key)
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            data = data_path.read_bytes()
+            os.utime(data_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self._misses += 1
+            return None
+
+        with self._lock:
+            self._hits += 1
+            if 0 < len(data) <= self.memory_max_bytes:
+                self._remember(key, data, metadata)
+
+        logger.info(f"💾 Результат взят из кеша: {key[:12]}")
+        return data, dict(metadata)
+
+    def store(self, key: str, file_path: str | Path, metadata: dict) -> None:
+        """Сохраняет готовый файл в кеш.
+
+        Ошибки записи не прерывают рендеринг, а только логируются.
+
+        Args:
+            key: Ключ записи.
+            file_path: Готовый файл результата.
+            metadata: JSON-сериализуемые метаданные для ответа при попадании.
+        """
+        self._store_entry(key, metadata, lambda tmp_name: shutil.copyfile(file_path, tmp_name))
+
+    def store_bytes(self, key: str, data: bytes, metadata: dict) -> None:
+        """Сохраняет закодированные в памяти байты результата в кеш.
+
+        Args:
+            key: Ключ записи.
+            data: Байты файла результата.
+            metadata: JSON-сериализуемые метаданные для ответа при попадании.
+        """
+        self._store_entry(key, metadata, lambda tmp_name: Path(tmp_name).write_bytes(data))
+
+    def _store_entry(
+        self, key: str, metadata: dict, write_data: Callable[[str], object]
+    ) -> None:
+        data_path = self._data_path(key)
+        meta_path = self._meta_path(key)
+
+        # Размер раздела считается до записи, иначе новая запись войдёт в него дважды
+        with self._lock:
+            self._ensure_total_bytes()
+
+        try:
+            # Прежняя запись с тем же ключом уже учтена в размере раздела
+            old_size = data_path.stat().st_size if meta_path.exists() else 0
+        except FileNotFoundError:
+            old_size = 0
+
+        try:
+            # Атомарная запись: временный файл + os.replace
+            _replace_file(data_path, write_data)
+            _replace_file(
+                meta_path,
+                lambda tmp_name: Path(tmp_name).write_text(
+                    json.dumps(metadata, ensure_ascii=False), encoding="utf-8"
+                ),
+            )
+
+            size = data_path.stat().st_size
+            data = data_path.read_bytes() if size <= self.memory_max_bytes else None
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить результат в кеш: {e}")
+            return
+
+        with self._lock:
+            if data is not None:
+                # Та же форма, что после чтения JSON с диска (кортежи -> списки)
+                self._remember(key, data, json.loads(json.dumps(metadata)))
+            self._ensure_total_bytes()
+            self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+        logger.debug(f"💾 Результат сохранён в кеш: {key[:12]} ({size / 1024:.2f} KB)")
+
+    def _evict(self) -> None:
+        entries = sorted(self._iter_entries(), key=lambda entry: entry[2].st_mtime)
+        total = sum(st.st_size for _, _, st in entries)
+        removed = 0
+
+        for meta_path, data_path, st in entries:
+            if total <= self.max_bytes:
+                break
+            meta_path.unlink(missing_ok=True)
+            data_path.unlink(missing_ok=True)
+            total -= st.st_size
+            removed += 1
+
+        self._total_bytes = total
+        if removed:
+            logger.info(f"🧹 Вытеснено из кеша записей: {removed}")
+
+    def clear(self) -> None:
+        """Удаляет все записи раздела (в памяти и на диске)."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._total_bytes = 0
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def get_stats(self) -> dict:
+        """Возвращает счётчики попаданий и размер раздела."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "memory_hits": self._memory_hits,
+                "size_bytes": self._ensure_total_bytes(),
+                "max_bytes": self.max_bytes,
+                "memory_entries": len(self._memory),
+                "memory_size_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+            }
+
+
+def get_render_cache(namespace: str) -> RenderCache | None:
+    """Возвращает раздел кеша (None, если кеш отключён).
+
+    Args:
+        namespace: Имя раздела (например, "diagrams").
+
+    Returns:
+        Общий для процесса экземпляр RenderCache или None.
+    """
+    if not RENDER_CACHE_ENABLED or RENDER_CACHE_MAX_MB <= 0:
+        return None
+
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = RenderCache(
+                RENDER_CACHE_DIR / namespace,
+                max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024,
+                use_hardlinks=RENDER_CACHE_HARDLINK,
+                memory_max_bytes=max(0, RENDER_CACHE_MEMORY_MB) * 1024 * 1024,
+            )
+            _caches[namespace] = cache
+        return cache
@@ -0,0 +1,208 @@
+"""Выполнение блокирующего рендеринга вне event loop MCP сервера.
+
+Инструменты сервера рендерят синхронно (PlantUML, Pygments, Pillow). Чтобы
+одна тяжёлая диаграмма не останавливала обработку остальных запросов, работа
+выполняется в ограниченном пуле потоков (RENDER_MAX_CONCURRENCY), а инструменты
+становятся корутинами.
+
+При отмене запроса (клиент отменил вызов или отключился) у задачи срабатывает
+область отмены: зарегистрированные в ней обработчики убивают дочерние процессы
+(например, JVM PlantUML), и поток освобождается, не дожидаясь таймаута.
+
+Классы:
+    CancelScope
+        Область отмены одного вызова.
+    RenderCancelledError
+        Вызов отменён до завершения рендеринга.
+
+Функции:
+    run_in_render_executor(func, *args, **kwargs) -> Any
+        Выполняет функцию в пуле рендеринга (корутина).
+    offload_to_executor(func) -> Callable
+        Декоратор: превращает синхронный инструмент в асинхронный.
+    kill_on_cancel(kill) -> ContextManager
+        Регистрирует обработчик, вызываемый при отмене текущего вызова.
+    current_cancel_scope() -> CancelScope | None
+        Возвращает область отмены текущего вызова.
+    shutdown_render_executor() -> None
+        Останавливает пул потоков рендеринга.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from src.config import RENDER_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+_current_scope: contextvars.ContextVar["CancelScope | None"] = contextvars.ContextVar(
+    "render_cancel_scope", default=None
+)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+class RenderCancelledError(Exception):
+    """Вызов отменён до завершения рендеринга."""
+
+    pass
+
+
+class CancelScope:
+    """Область отмены одного вызова.
+
+    Обработчики вызываются один раз при cancel(); обработчик, добавленный после
+    отмены, вызывается сразу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """Отменяет вызов и выполняет обработчики."""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка обработчика отмены: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        """Прерывает работу, если вызов уже отменён.
+
+        Raises:
+            RenderCancelledError: Если вызов отменён.
+        """
+        if self._cancelled:
+            raise RenderCancelledError("Вызов отменён клиентом")
+
+
+def current_cancel_scope() -> CancelScope | None:
+    """Возвращает область отмены текущего вызова (None вне пула рендеринга)."""
+    return _current_scope.get()
+
+
+@contextmanager
+def kill_on_cancel(kill: Callable[[], None]) -> Iterator[None]:
+    """Регистрирует обработчик, вызываемый при отмене текущего вызова.
+
+    Используется вокруг ожидания дочернего процесса: при отмене процесс
+    убивается, и ожидание завершается ошибкой вместо таймаута.
+
+    Args:
+        kill: Функция без аргументов (например, process.kill).
+
+    Raises:
+        RenderCancelledError: Если вызов отменён до входа в контекст.
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        yield
+        return
+
+    scope.raise_if_cancelled()
+    scope.add_callback(kill)
+    try:
+        yield
+    finally:
+        scope.remove_callback(kill)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, RENDER_MAX_CONCURRENCY)
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="render"
+            )
+            logger.debug(f"🔧 Создан пул рендеринга: {workers} потоков")
+        return _executor
+
+
+async def run_in_render_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Выполняет функцию в пуле рендеринга, не блокируя event loop.
+
+    Одновременно выполняется не больше RENDER_MAX_CONCURRENCY вызовов,
+    остальные ждут в очереди. При отмене ожидающей корутины вызов из очереди
+    снимается, а у выполняющегося срабатывает область отмены.
+
+    Args:
+        func: Синхронная функция.
+        *args: Позиционные аргументы функции.
+        **kwargs: Именованные аргументы функции.
+
+    Returns:
+        Результат функции.
+    """
+    scope = CancelScope()
+    context = contextvars.copy_context()
+    context.run(_current_scope.set, scope)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        _get_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+    try:
+        return await future
+    except asyncio.CancelledError:
+        logger.warning(f"🛑 Вызов {getattr(func, '__name__', func)} отменён")
+        scope.cancel()
+        raise
+
+
+def offload_to_executor(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Декоратор: превращает синхронный инструмент в асинхронный.
+
+    Сигнатура и docstring сохраняются, поэтому схема MCP инструмента
+    не меняется.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_render_executor(func, *args, **kwargs)
+
+    return wrapper
+
+
+def shutdown_render_executor() -> None:
+    """Останавливает пул потоков рендеринга (следующий вызов создаст новый)."""
+    global _executor
+
+    with _executor_lock:
+        executor, _executor = _executor, None
+
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,135 @@
+"""Пул процессов для CPU-ёмкого рендеринга скриншотов.
+
+Лексинг Pygments и растеризация Pillow держат GIL, поэтому пул потоков
+render_executor не ускоряет пакет скриншотов. Модуль распределяет независимые
+вызовы по процессам (RENDER_PROCESS_WORKERS), по одному на ядро.
+
+Процессы запускаются методом spawn (одинаково на Linux и Windows, без fork
+многопоточного сервера) и переиспользуются между вызовами: шрифты и лексеры
+остаются загруженными в кешах ресурсов каждого процесса.
+
+Функции:
+    map_in_processes(func, calls) -> list[tuple[Any, BaseException | None]]
+        Выполняет вызовы параллельно и возвращает результат или ошибку каждого.
+    shutdown_process_pool() -> None
+        Останавливает пул процессов.
+    in_worker_process() -> bool
+        Проверяет, выполняется ли код в процессе пула.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from src.config import RENDER_PROCESS_WORKERS
+from src.render_executor import current_cancel_scope, kill_on_cancel
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+# Устанавливается в процессах пула (вложенный пул там не создаётся)
+_is_worker = False
+
+
+def _mark_worker() -> None:
+    global _is_worker
+    _is_worker = True
+
+
+def in_worker_process() -> bool:
+    """Проверяет, выполняется ли код в процессе пула рендеринга."""
+    return _is_worker
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_mark_worker,
+            )
+            logger.debug(f"🔧 Создан пул процессов рендеринга: {RENDER_PROCESS_WORKERS}")
+        return _pool
+
+
+def _run_inline(
+    func: Callable[..., Any], calls: list[tuple[tuple, dict]]
+) -> list[tuple[Any, BaseException | None]]:
+    scope = current_cancel_scope()
+    results = []
+    for args, kwargs in calls:
+        if scope is not None:
+            scope.raise_if_cancelled()
+        try:
+            results.append((func(*args, **kwargs), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def map_in_processes(
+    func: Callable[..., Any], calls: list[tuple[tuple, dict]]
+) -> list[tuple[Any, BaseException | None]]:
+    """Выполняет вызовы параллельно и возвращает результат или ошибку каждого.
+
+    Ошибка одного вызова не прерывает остальные. Один вызов (или пул из одного
+    процесса) выполняется в текущем процессе без затрат на передачу данных.
+
+    Args:
+        func: Функция верхнего уровня модуля (передаётся в процесс через pickle).
+        calls: Список (args, kwargs) для каждого вызова.
+
+    Returns:
+        Список (результат, None) или (None, исключение) в порядке calls.
+
+    Raises:
+        RenderCancelledError: Если вызов отменён клиентом (ожидающие задачи снимаются).
+    """
+    if len(calls) <= 1 or RENDER_PROCESS_WORKERS <= 1:
+        return _run_inline(func, calls)
+
+    try:
+        pool = _get_pool()
+        futures: list[Future] = [pool.submit(func, *args, **kwargs) for args, kwargs in calls]
+    except BrokenProcessPool:
+        shutdown_process_pool()
+        raise
+
+    def cancel_pending():
+        for future in futures:
+            future.cancel()
+
+    with kill_on_cancel(cancel_pending):
+        wait(futures)
+
+    scope = current_cancel_scope()
+    if scope is not None:
+        scope.raise_if_cancelled()
+
+    results = []
+    for future in futures:
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            logger.error("💥 Процесс рендеринга аварийно завершился, пул пересоздаётся")
+            shutdown_process_pool()
+        results.append((None, error) if error is not None else (future.result(), None))
+    return results
+
+
+def shutdown_process_pool() -> None:
+    """Останавливает пул процессов (следующий вызов создаст новый)."""
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+"""Замеры времени этапов рендеринга и агрегированная статистика.
+
+Инструмент сервера оборачивается в instrument_tool: на время вызова в
+контексте (contextvars) заводится словарь замеров, а функции рендеринга
+отмечают свои этапы через stage() — лексинг, растеризация, кодирование,
+запись на диск, PlantUML, разбор AST. Вне инструмента stage() только
+пополняет общую статистику этапа.
+
+Замеры прикладываются к результату инструмента (поле timings_ms) и копятся
+в скользящих окнах (RENDER_STATS_WINDOW последних значений) по инструменту
+и уровню детализации. Перцентили p50/p95/p99 считаются по окну при запросе.
+
+Классы:
+    LatencyWindow
+        Скользящее окно длительностей с перцентилями.
+
+Функции:
+    stage(name) -> ContextManager
+        Замеряет этап рендеринга в текущем вызове.
+    capture_stages() -> ContextManager[dict]
+        Собирает замеры этапов внутри блока в словарь.
+    instrument_tool(func) -> Callable
+        Декоратор: замеряет вызов инструмента и его этапы.
+    get_render_stats() -> dict
+        Возвращает перцентили по инструментам, уровням детализации и этапам.
+    reset_render_stats() -> None
+        Сбрасывает накопленную статистику.
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from src.config import RENDER_STATS_WINDOW
+
+logger = logging.getLogger(__name__)
+
+_current_timings: contextvars.ContextVar[dict[str, float] | None] = contextvars.ContextVar(
+    "render_stage_timings", default=None
+)
+
+_lock = threading.Lock()
+_tool_windows: dict[tuple[str, str], "LatencyWindow"] = {}
+_tool_stage_windows: dict[tuple[str, str, str], "LatencyWindow"] = {}
+_stage_windows: dict[str, "LatencyWindow"] = {}
+_tool_errors: dict[tuple[str, str], int] = {}
+
+
+class LatencyWindow:
+    """Скользящее окно длительностей с перцентилями.
+
+    Attributes:
+        count: Общее число замеров (не только в окне).
+        total_ms: Суммарная длительность всех замеров.
+    """
+
+    def __init__(self, size: int = RENDER_STATS_WINDOW):
+        self._samples: deque[float] = deque(maxlen=max(1, size))
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, value_ms: float) -> None:
+        """Добавляет замер в миллисекундах."""
+        self._samples.append(value_ms)
+        self.count += 1
+        self.total_ms += value_ms
+
+    def percentile(self, percent: float) -> float:
+        """Возвращает перцентиль окна (ближайший ранг), 0 для пустого окна."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def summary(self) -> dict:
+        """Возвращает число замеров, среднее и p50/p95/p99/max окна."""
+        ordered = sorted(self._samples)
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        }
+
+
+def _window(windows: dict, key) -> LatencyWindow:
+    window = windows.get(key)
+    if window is None:
+        window = windows[key] = LatencyWindow()
+    return window
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Замеряет этап рендеринга в текущем вызове.
+
+    Повторные этапы с тем же именем в одном вызове суммируются.
+
+    Args:
+        name: Имя этапа (например, "lex", "rasterize", "encode").
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed_ms
+        with _lock:
+            _window(_stage_windows, name).add(elapsed_ms)
+
+
+@contextmanager
+def capture_stages() -> Iterator[dict[str, float]]:
+    """Собирает замеры этапов внутри блока в словарь {этап: мс}.
+
+    Вложенный захват перекрывает внешний: этапы внутреннего блока во внешний
+    словарь не попадают.
+    """
+    timings: dict[str, float] = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def _attach_timings(result: Any, timings: dict[str, float]) -> None:
+    """Добавляет замеры в словарь результата (для 'inline' — в метаданные)."""
+    if isinstance(result, list):
+        result = next((item for item in result if isinstance(item, dict)), None)
+    if isinstance(result, dict):
+        result["timings_ms"] = {name: round(value, 2) for name, value in timings.items()}
+
+
+def instrument_tool(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Декоратор: замеряет вызов инструмента и его этапы.
+
+    Ставится под offload_to_executor (на синхронную функцию). Сигнатура
+    сохраняется. Вызов учитывается по имени инструмента и уровню детализации
+    (параметр detail_level, если он есть).
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        detail_level = "-"
+        if "detail_level" in signature.parameters:
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
+            detail_level = str(bound.arguments["detail_level"]).capitalize()
+
+        start = time.perf_counter()
+        try:
+            with capture_stages() as timings:
+                result = func(*args, **kwargs)
+        except BaseException:
+            with _lock:
+                key = (func.__name__, detail_level)
+                _tool_errors[key] = _tool_errors.get(key, 0) + 1
+            raise
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        with _lock:
+            key = (func.__name__, detail_level)
+            _window(_tool_windows, key).add(timings["total"])
+            for name, value in timings.items():
+                if name != "total":
+                    _window(_tool_stage_windows, (*key, name)).add(value)
+            if isinstance(result, dict) and result.get("success") is False:
+                _tool_errors[key] = _tool_errors.get(key, 0) + 1
+
+        logger.debug(
+            f"⏱️ {func.__name__} ({detail_level}): "
+            + ", ".join(f"{name}={value:.1f}ms" for name, value in timings.items())
+        )
+        _attach_timings(result, timings)
+        return result
+
+    return wrapper
+
+
+def get_render_stats() -> dict:
+    """Возвращает перцентили по инструментам, уровням детализации и этапам.
+
+    Returns:
+        {"tools": {инструмент: {уровень: {count, errors, p50_ms, ..., stages}}},
+         "stages": {этап: {count, p50_ms, ...}}, "window": размер окна}
+    """
+    with _lock:
+        tools: dict[str, dict] = {}
+        for (tool, detail_level), window in sorted(_tool_windows.items()):
+            tools.setdefault(tool, {})[detail_level] = {
+                **window.summary(),
+                "errors": _tool_errors.get((tool, detail_level), 0),
+                "stages": {
+                    name: stage_window.summary()
+                    for (stage_tool, stage_level, name), stage_window in sorted(
+                        _tool_stage_windows.items()
+                    )
+                    if (stage_tool, stage_level) == (tool, detail_level)
+                },
+            }
+        stages = {name: window.summary() for name, window in sorted(_stage_windows.items())}
+
+    return {"tools": tools, "stages": stages, "window": RENDER_STATS_WINDOW}
+
+
+def reset_render_stats() -> None:
+    """Сбрасывает накопленную статистику."""
+    with _lock:
+        _tool_windows.clear()
+        _tool_stage_windows.clear()
+        _stage_windows.clear()
+        _tool_errors.clear()
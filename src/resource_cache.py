@@ -0,0 +1,191 @@
+"""Кеш ресурсов генерации скриншотов на уровне процесса.
+
+Лексеры, стили и шрифты Pygments раньше создавались заново для каждого
+скриншота: FontManager перечитывал TTF файлы из asset/fonts при каждом вызове.
+Для небольших фрагментов загрузка ресурсов занимала больше времени, чем
+отрисовка. Модуль хранит их в ограниченных LRU кешах (RESOURCE_CACHE_SIZE
+записей на вид) со счётчиками попаданий и промахов.
+
+Ключи: лексер — (язык, обрезка пробелов), стиль — имя стиля, шрифты —
+(шрифт, размер в пикселях).
+Один FontManager содержит все начертания (обычное, жирное, курсив) шрифта.
+
+Классы:
+    LRUCache
+        Потокобезопасный LRU кеш со счётчиками.
+
+Функции:
+    get_lexer(language, strip) -> Lexer
+        Возвращает лексер для языка (fallback на 'text').
+    get_style(name) -> StyleMeta
+        Возвращает класс стиля Pygments.
+    get_fonts(font_name, size) -> FontManager
+        Возвращает набор начертаний шрифта заданного размера.
+    get_resource_cache_stats() -> dict
+        Возвращает счётчики всех кешей ресурсов.
+    clear_resource_caches() -> None
+        Очищает кеши и обнуляет счётчики.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import pygments.util
+from pygments.formatters.img import FontManager
+from pygments.lexer import Lexer
+from pygments.lexers import get_lexer_by_name
+from pygments.style import StyleMeta
+from pygments.styles import get_style_by_name
+
+from src.config import RESOURCE_CACHE_SIZE
+from src.font_manager import get_font_path
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_FONT = "Consolas"
+
+
+class LRUCache:
+    """Потокобезопасный LRU кеш со счётчиками попаданий и промахов.
+
+    Attributes:
+        name: Имя кеша для логов и статистики.
+        maxsize: Максимальное число записей.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = max(1, maxsize)
+
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Возвращает значение по ключу, создавая его при промахе.
+
+        Args:
+            key: Ключ записи.
+            factory: Функция без аргументов, создающая значение.
+
+        Returns:
+            Закешированное или новое значение.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+
+        # Создание вне блокировки: загрузка шрифта не задерживает другие потоки
+        value = factory()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._evictions += 1
+                logger.debug(f"🧹 Вытеснено из кеша {self.name}: {evicted_key}")
+
+        return value
+
+    def clear(self) -> None:
+        """Удаляет записи и обнуляет счётчики."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def get_stats(self) -> dict:
+        """Возвращает размер кеша и счётчики."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+_lexers = LRUCache("lexers", RESOURCE_CACHE_SIZE)
+_styles = LRUCache("styles", RESOURCE_CACHE_SIZE)
+_fonts = LRUCache("fonts", RESOURCE_CACHE_SIZE)
+
+
+def _load_lexer(language: str, strip: bool) -> Lexer:
+    options = {"stripall": strip, "stripnl": strip}
+    try:
+        return get_lexer_by_name(language, **options)
+    except pygments.util.ClassNotFound:
+        logger.warning(
+            f"🎯 Лексер для языка '{language}' не найден, используется 'text'"
+        )
+        return get_lexer_by_name("text", **options)
+
+
+def _load_fonts(font_name: str, size: int) -> FontManager:
+    try:
+        font_path = get_font_path(font_name)
+    except (ValueError, FileNotFoundError) as e:
+        logger.warning(f"🎯 {e}, используется fallback: {FALLBACK_FONT}")
+        font_path = FALLBACK_FONT
+
+    logger.debug(f"📦 Загрузка шрифта {font_path} (размер {size}px)")
+    return FontManager(font_path, size)
+
+
+def get_lexer(language: str, strip: bool = True) -> Lexer:
+    """Возвращает лексер для языка (fallback на 'text').
+
+    Лексер не хранит состояние между вызовами get_tokens(), поэтому один
+    экземпляр безопасно используется разными запросами.
+
+    Args:
+        language: Язык программирования.
+        strip: Обрезать пробелы и пустые строки по краям кода. Без обрезки
+            лексер нужен для фрагментов файла, разбираемых по отдельности.
+    """
+    return _lexers.get_or_create(
+        (language, strip), lambda: _load_lexer(language, strip)
+    )
+
+
+def get_style(name: str) -> StyleMeta:
+    """Возвращает класс стиля Pygments.
+
+    Raises:
+        pygments.util.ClassNotFound: Если стиль не найден.
+    """
+    return _styles.get_or_create(name, lambda: get_style_by_name(name))
+
+
+def get_fonts(font_name: str, size: int) -> FontManager:
+    """Возвращает набор начертаний шрифта заданного размера.
+
+    Args:
+        font_name: Имя шрифта из font_manager.AVAILABLE_FONTS.
+        size: Размер шрифта в пикселях (уже с учётом масштаба).
+
+    Returns:
+        FontManager Pygments (fallback на Consolas, если шрифт недоступен).
+    """
+    return _fonts.get_or_create(
+        (font_name, size), lambda: _load_fonts(font_name, size)
+    )
+
+
+def get_resource_cache_stats() -> dict:
+    """Возвращает счётчики кешей лексеров, стилей и шрифтов."""
+    return {cache.name: cache.get_stats() for cache in (_lexers, _styles, _fonts)}
+
+
+def clear_resource_caches() -> None:
+    """Очищает кеши ресурсов и обнуляет счётчики."""
+    for cache in (_lexers, _styles, _fonts):
+        cache.clear()
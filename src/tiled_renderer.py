@@ -0,0 +1,339 @@
+"""Полосовой рендеринг скриншотов больших файлов.
+
+Весь файл при scale_factor 3-6 превращается в одно огромное изображение в
+памяти. Модуль лексит код лениво и растеризует его полосами по
+TILED_TILE_LINES строк, поэтому пиковая память ограничена размером полосы,
+а не длиной файла.
+
+Режимы вывода:
+    stitched — одно PNG изображение, полосы дописываются в файл по мере
+        готовности (StreamingPNGWriter). Совпадает с обычным рендерингом.
+        Склейка больше TILED_STITCH_MAX_MEGAPIXELS отклоняется (или с опцией
+        stitch_fallback заменяется страницами): такой PNG не открыть в Pillow.
+    pages — набор самостоятельных изображений-страниц (<имя>_page_001.webp, ...)
+        в любом поддерживаемом формате.
+
+Функции:
+    render_code_tiled(code_string, language, output_file, output_mode, **options) -> dict
+        Рендерит код полосами и сохраняет склейку или страницы.
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Iterator, Literal
+
+from src.code_rasterizer import (
+    LINE_NUMBER_CHARS,
+    CodeLayout,
+    Run,
+    draw_lines,
+    iter_lines,
+    new_canvas,
+    paint_line_number_column,
+)
+from src.config import (
+    LONG_LINE_POLICY,
+    MAX_LINE_COLUMNS,
+    TILED_STITCH_MAX_MEGAPIXELS,
+    TILED_TILE_LINES,
+)
+from src.image_utils import (
+    ENCODER_OPTIONS,
+    ImageProcessingError,
+    StreamingPNGWriter,
+    resolve_encoder_profile,
+    save_image,
+)
+from src.long_lines import apply_long_line_policy
+from src.render_executor import current_cancel_scope
+from src.resource_cache import get_fonts, get_lexer, get_style
+
+logger = logging.getLogger(__name__)
+
+TiledOutputMode = Literal["stitched", "pages"]
+
+
+def _iter_tiles(
+    lines: Iterator[tuple[list[Run], int]], tile_lines: int
+) -> Iterator[tuple[list[Run] | None, list[list[Run]], list[Run] | None]]:
+    """Группирует строки в полосы с соседними строками сверху и снизу.
+
+    Соседние строки нужны, чтобы выносные элементы глифов, выходящие за
+    границу строки, попали в обе полосы.
+
+    Yields:
+        (строка перед полосой или None, строки полосы, строка после полосы или None).
+    """
+    previous = None
+    tile: list[list[Run]] = []
+
+    for runs, _ in lines:
+        if len(tile) == tile_lines:
+            yield previous, tile, runs
+            previous = tile[-1]
+            tile = []
+        tile.append(runs)
+
+    if tile:
+        yield previous, tile, None
+
+
+def render_code_tiled(
+    code_string: str,
+    language: str,
+    output_file: str | Path,
+    output_mode: TiledOutputMode = "stitched",
+    **options,
+) -> dict:
+    """Рендерит код полосами и сохраняет склейку или страницы.
+
+    Args:
+        code_string: Строка с исходным кодом.
+        language: Язык программирования (для лексера Pygments).
+        output_file: Путь к выходному файлу (для pages — шаблон имён страниц).
+        output_mode: 'stitched' (одно PNG) или 'pages' (набор изображений).
+        **options: Параметры как у create_code_screenshot (style, font_name,
+            font_size, pad, scale_factor, line_numbers, line_pad,
+            line_number_bg, line_number_fg, format, quality, encoder_profile,
+            latency_budget_ms, lossless_palette, long_lines, max_line_columns),
+            а также tile_lines — число строк в полосе и stitch_fallback —
+            сохранить страницы вместо склейки больше
+            TILED_STITCH_MAX_MEGAPIXELS (по умолчанию False). Профиль 'auto'
+            выбирается по размеру склейки или одной страницы; lossless_palette
+            применяется только к страницам.
+
+    Returns:
+        Словарь с информацией о результате (для pages — список страниц с
+        номерами исходных строк; long_lines — если строки переносились или
+        обрезались; stitch_fallback — если склейка заменена страницами).
+
+    Raises:
+        ImageProcessingError: Если склейка запрошена не в PNG или превышает
+            TILED_STITCH_MAX_MEGAPIXELS без stitch_fallback.
+        ValueError: Если политика длинных строк неизвестна.
+    """
+    style_name = options.get("style", "monokai")
+    font_name = options.get("font_name", "JetBrainsMono")
+    scale_factor = options.get("scale_factor", 3.0)
+    line_numbers = options.get("line_numbers", True)
+    line_number_bg = options.get("line_number_bg", None)
+    line_number_fg = options.get("line_number_fg", "#888888")
+    save_format = options.get("format", "png").lower()
+    tile_lines = max(1, options.get("tile_lines", TILED_TILE_LINES))
+    encoder_profile = options.get("encoder_profile", "smallest")
+    latency_budget_ms = options.get("latency_budget_ms")
+    lossless_palette = options.get("lossless_palette", False)
+
+    if output_mode == "stitched" and save_format != "png":
+        raise ImageProcessingError(
+            f"Склейка полос поддерживается только для PNG (запрошен {save_format})"
+        )
+
+    prepared = apply_long_line_policy(
+        code_string,
+        options.get("long_lines", LONG_LINE_POLICY),
+        options.get("max_line_columns", MAX_LINE_COLUMNS),
+    )
+    code_string = prepared.code
+
+    lexer = get_lexer(language)
+    style = get_style(style_name)
+    fonts = get_fonts(font_name, int(options.get("font_size", 18) * scale_factor))
+    image_pad = int(options.get("pad", 25) * scale_factor)
+    line_pad = int(options.get("line_pad", 10) * scale_factor)
+    if line_number_bg is None:
+        line_number_bg = style.background_color
+
+    # Первый проход: число строк и ширина самой длинной строки
+    total_lines = 0
+    max_line_width = 0
+    for _, width in iter_lines(lexer.get_tokens(code_string), style, fonts):
+        total_lines += 1
+        max_line_width = max(max_line_width, width)
+
+    # Номера строк не должны заезжать на код в длинных файлах
+    line_number_chars = max(LINE_NUMBER_CHARS, len(str(total_lines)))
+    layout = CodeLayout.create(
+        fonts, image_pad, line_pad, line_numbers, line_number_chars
+    )
+    width = layout.image_width(max_line_width)
+    line_height = layout.line_height
+
+    stitch_fallback = None
+    if output_mode == "stitched":
+        height = total_lines * line_height + image_pad * 2
+        megapixels = width * height / 1_000_000
+        if megapixels > TILED_STITCH_MAX_MEGAPIXELS:
+            message = (
+                f"Склейка {width}x{height} ({megapixels:.1f} Мп) превышает предел "
+                f"{TILED_STITCH_MAX_MEGAPIXELS} Мп: такой PNG не открывается в Pillow"
+            )
+            if not options.get("stitch_fallback", False):
+                raise ImageProcessingError(
+                    f"{message}. Используйте output_mode='pages' или уменьшите "
+                    "detail_level"
+                )
+            logger.warning(f"⚠️ {message}, сохраняются страницы")
+            output_mode = "pages"
+            stitch_fallback = {
+                "dimensions": (width, height),
+                "megapixels": round(megapixels, 1),
+                "max_megapixels": TILED_STITCH_MAX_MEGAPIXELS,
+            }
+
+    logger.info(
+        f"🧩 Полосовой рендеринг: {total_lines} строк, полосы по {tile_lines}, "
+        f"режим {output_mode}, ширина {width}px"
+    )
+
+    draw_options = {
+        "line_numbers": line_numbers,
+        "line_number_fg": line_number_fg,
+        "line_number_chars": line_number_chars,
+        "fonts": fonts,
+        "line_labels": prepared.line_labels,
+    }
+    tiles = _iter_tiles(
+        iter_lines(lexer.get_tokens(code_string), style, fonts), tile_lines
+    )
+    output_path = Path(output_file)
+    # Отменённый клиентом вызов прерывается между полосами
+    scope = current_cancel_scope()
+
+    if output_mode == "stitched":
+        first_line = 0
+        profile = resolve_encoder_profile(
+            encoder_profile, width * height, "png", latency_budget_ms
+        )
+        # Потоковый PNG поддерживает только уровень сжатия zlib
+        compress_level = ENCODER_OPTIONS["png"][profile]["compress_level"]
+        encode_ms = 0.0
+
+        with StreamingPNGWriter(
+            output_path, width, height, compress_level=compress_level
+        ) as writer:
+            for index, (previous, tile, following) in enumerate(tiles):
+                if scope is not None:
+                    scope.raise_if_cancelled()
+                last_line = first_line + len(tile)
+                top = 0 if index == 0 else image_pad + first_line * line_height
+                bottom = (
+                    height
+                    if last_line == total_lines
+                    else image_pad + last_line * line_height
+                )
+                origin_y = image_pad + first_line * line_height - top
+
+                strip = new_canvas((width, bottom - top), style)
+                paint_line_number_column(strip, layout, line_number_bg, line_number_fg)
+                if previous is not None:
+                    draw_lines(
+                        strip, [previous], layout, first_line,
+                        origin_y - line_height, **draw_options,
+                    )
+                draw_lines(strip, tile, layout, first_line + 1, origin_y, **draw_options)
+                if following is not None:
+                    draw_lines(
+                        strip, [following], layout, last_line + 1,
+                        origin_y + len(tile) * line_height, **draw_options,
+                    )
+
+                start = time.perf_counter()
+                writer.write(strip)
+                encode_ms += (time.perf_counter() - start) * 1000
+                first_line = last_line
+
+        file_size = output_path.stat().st_size
+        logger.info(
+            f"✅ Склейка сохранена: {output_path.name} ({width}x{height}, "
+            f"{file_size / 1024:.2f} KB)"
+        )
+
+        result = {
+            "success": True,
+            "output_path": str(output_path.absolute()),
+            "output_mode": "stitched",
+            "format": "png",
+            "file_size_kb": round(file_size / 1024, 2),
+            "dimensions": (width, height),
+            "lines_rendered": total_lines,
+            "tile_lines": tile_lines,
+            "scale_factor": scale_factor,
+            "language": language,
+            "style": style_name,
+            "encoder_profile": profile,
+            "encode_ms": round(encode_ms, 2),
+        }
+        if prepared.affected:
+            result["long_lines"] = prepared.report()
+        return result
+
+    # Страницы: каждая полоса — самостоятельное изображение с отступами
+    pages = []
+    total_size = 0
+    encode_ms = 0.0
+    palette_pages = 0
+    first_line = 0
+    # Профиль один на все страницы: выбирается по размеру полной страницы
+    profile = resolve_encoder_profile(
+        encoder_profile,
+        width * (min(tile_lines, total_lines) * line_height + image_pad * 2),
+        save_format,
+        latency_budget_ms,
+    )
+    for index, (_, tile, _) in enumerate(tiles, 1):
+        if scope is not None:
+            scope.raise_if_cancelled()
+        page = new_canvas((width, len(tile) * line_height + image_pad * 2), style)
+        paint_line_number_column(page, layout, line_number_bg, line_number_fg)
+        draw_lines(page, tile, layout, first_line + 1, image_pad, **draw_options)
+
+        page_path = output_path.with_name(
+            f"{output_path.stem}_page_{index:03d}{output_path.suffix}"
+        )
+        save_result = save_image(
+            page,
+            page_path,
+            format=save_format,
+            quality=options.get("quality"),
+            encoder_profile=profile,
+            lossless_palette=lossless_palette,
+        )
+        pages.append(
+            {
+                "path": save_result["path"],
+                "first_line": prepared.source_line(first_line + 1),
+                "last_line": prepared.source_line(first_line + len(tile)),
+                "dimensions": save_result["dimensions"],
+            }
+        )
+        total_size += save_result["size_bytes"]
+        encode_ms += save_result["encode_ms"]
+        palette_pages += save_result.get("palette_applied", False)
+        first_line += len(tile)
+
+    logger.info(f"✅ Сохранено страниц: {len(pages)}")
+
+    result = {
+        "success": True,
+        "output_path": pages[0]["path"] if pages else None,
+        "output_mode": "pages",
+        "format": save_format,
+        "file_size_kb": round(total_size / 1024, 2),
+        "pages": pages,
+        "lines_rendered": total_lines,
+        "tile_lines": tile_lines,
+        "scale_factor": scale_factor,
+        "language": language,
+        "style": style_name,
+        "encoder_profile": profile,
+        "encode_ms": round(encode_ms, 2),
+    }
+    if lossless_palette:
+        result["palette_pages"] = palette_pages
+    if stitch_fallback is not None:
+        result["stitch_fallback"] = stitch_fallback
+    if prepared.affected:
+        result["long_lines"] = prepared.report()
+    return result
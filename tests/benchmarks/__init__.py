@@ -0,0 +1,7 @@
+"""Бенчмарки рендеринга (запускаются вручную, не собираются pytest).
+
+Модули:
+    harness - запуск замеров в изолированных процессах, JSON базовая линия, сравнение
+    bench_code_screenshots - скриншоты кода по уровням качества, форматам и размерам
+    bench_plantuml - конвейер PlantUML по диаграммам, темам и форматам с разбивкой по этапам
+"""
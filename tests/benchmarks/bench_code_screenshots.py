@@ -0,0 +1,155 @@
+"""Бенчмарк скриншотов кода: уровни качества, форматы, размеры и языки.
+
+Замеряются create_code_image (рендеринг без кодирования) и
+create_code_screenshot (с кодированием и записью) для каждого уровня
+QUALITY_LEVELS, формата (webp, png, jpeg), размера фрагмента и языка.
+Кеш результатов отключён, чтобы повторы рендерили заново.
+
+Случаи, изображение которых больше --max-megapixels (например, 5000 строк
+на уровне Extreme), пропускаются, как и WebP выше предела формата
+(16383 пикселя по стороне).
+
+Запуск из корня проекта:
+    python -m tests.benchmarks.bench_code_screenshots --update-baseline
+    python -m tests.benchmarks.bench_code_screenshots
+    python -m tests.benchmarks.bench_code_screenshots --levels Low --sizes 10,100 --repeat 5
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import src.render_cache as render_cache
+from src.code_to_image import create_code_image, create_code_screenshot
+from src.diagram_renderer import QUALITY_LEVELS
+from tests.benchmarks.harness import BenchmarkCase, run_suite
+
+FORMATS = ("webp", "png", "jpeg")
+SIZES = (10, 100, 1000, 5000)
+LANGUAGES = ("python", "javascript", "sql")
+
+FONT_SIZE = 18
+
+# Предел стороны изображения в WebP
+WEBP_MAX_SIDE = 16383
+
+# Блоки кода, повторяемые до нужного числа строк
+SNIPPETS = {
+    "python": '''@dataclass
+class Order{n}:
+    """Заказ покупателя."""
+
+    items: list[str]
+    total: float = 0.0
+
+    def add(self, name: str, price: float) -> None:
+        self.items.append(name)
+        self.total += price * 1.2  # налог
+
+''',
+    "javascript": """export async function loadOrder{n}(id) {{
+  const response = await fetch(`/api/orders/${{id}}`);
+  if (!response.ok) {{
+    throw new Error("Order not found: " + id);
+  }}
+  const order = await response.json();
+  return {{ ...order, total: order.items.reduce((a, b) => a + b.price, 0) }};
+}}
+
+""",
+    "sql": """-- Выручка по клиентам {n}
+SELECT c.id, c.name, SUM(o.total) AS revenue
+FROM customers AS c
+JOIN orders AS o ON o.customer_id = c.id
+WHERE o.created_at >= DATE '2024-01-01'
+GROUP BY c.id, c.name
+HAVING SUM(o.total) > 1000
+ORDER BY revenue DESC;
+
+""",
+}
+
+
+def make_snippet(language: str, lines: int) -> str:
+    """Строит детерминированный фрагмент кода из lines строк."""
+    template = SNIPPETS[language]
+    result: list[str] = []
+    block = 0
+    while len(result) < lines:
+        result.extend(template.format(n=block).splitlines())
+        block += 1
+    return "\n".join(result[:lines]) + "\n"
+
+
+def estimate_size(lines: int, scale_factor: float) -> tuple[float, float]:
+    """Грубая оценка ширины и высоты изображения (до 90 символов в строке)."""
+    font_px = FONT_SIZE * scale_factor
+    return 90 * font_px * 0.6, lines * font_px * 1.3
+
+
+def measure(
+    operation: str, language: str, lines: int, scale_factor: float, format: str | None
+) -> dict:
+    """Выполняет одну операцию и возвращает сведения о результате."""
+    # Кеш результатов отключён: повторы должны рендерить заново
+    render_cache.RENDER_CACHE_ENABLED = False
+    code = make_snippet(language, lines)
+
+    if operation == "image":
+        image = create_code_image(code, language, scale_factor=scale_factor)
+        return {"output_bytes": None, "dimensions": list(image.size)}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = create_code_screenshot(
+            code,
+            language,
+            Path(tmp_dir) / f"bench.{format}",
+            scale_factor=scale_factor,
+            format=format,
+        )
+        output_bytes = Path(result["output_path"]).stat().st_size
+    return {"output_bytes": output_bytes, "dimensions": list(result["dimensions"])}
+
+
+def configure_parser(parser) -> None:
+    """Аргументы матрицы случаев."""
+    parser.add_argument("--levels", default=",".join(QUALITY_LEVELS), help="Уровни качества")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Форматы изображений")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Размеры в строках")
+    parser.add_argument("--languages", default=",".join(LANGUAGES), help="Языки")
+    parser.add_argument(
+        "--max-megapixels", type=float, default=150.0, help="Пропускать большие изображения"
+    )
+
+
+def build_cases(args) -> list[BenchmarkCase]:
+    """Строит случаи по матрице из аргументов."""
+    cases = []
+    for level in args.levels.split(","):
+        scale_factor = QUALITY_LEVELS[level]
+        for lines in map(int, args.sizes.split(",")):
+            width, height = estimate_size(lines, scale_factor)
+            if width * height / 1_000_000 > args.max_megapixels:
+                continue
+            for language in args.languages.split(","):
+                base = {"language": language, "lines": lines, "scale_factor": scale_factor}
+                cases.append(
+                    BenchmarkCase(
+                        f"image/{level}/{lines}/{language}",
+                        {"operation": "image", "format": None, **base},
+                    )
+                )
+                for format in args.formats.split(","):
+                    if format == "webp" and height > WEBP_MAX_SIDE:
+                        continue
+                    cases.append(
+                        BenchmarkCase(
+                            f"screenshot/{level}/{format}/{lines}/{language}",
+                            {"operation": "screenshot", "format": format, **base},
+                        )
+                    )
+    return cases
+
+
+if __name__ == "__main__":
+    sys.exit(run_suite("code_screenshots", build_cases, measure, configure_parser=configure_parser))
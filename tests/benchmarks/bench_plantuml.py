@@ -0,0 +1,219 @@
+"""Бенчмарк конвейера PlantUML: диаграммы, темы, форматы и уровни качества.
+
+Замеряется render_diagram_from_string на диаграммах из tests/conftest.py и
+больших сгенерированных диаграммах классов и последовательностей, для всех
+тем из asset/themes, форматов png, svg, pdf и уровней качества (только для
+png: векторные форматы от DPI не зависят). Кеш результатов отключён.
+
+Для каждого случая сохраняются медианы этапов (stages_ms, см. render_stats):
+    plantuml_cold / plantuml_layout - PlantUML с запуском JVM / на прогретом процессе
+    decode, encode - декодирование и кодирование растра в Python
+    svg_fonts - извлечение шрифта темы и _inject_web_font_into_svg
+    write - запись файла (save_image, save_png_bytes, SVG/PDF)
+
+Режимы:
+    pool - постоянные процессы PlantUML (прогрев запускает JVM, замеры — без неё)
+    oneshot - отдельный процесс Java на каждую диаграмму (пул отключён)
+
+Режим oneshot строится для первой темы и первого уровня из аргументов. Сводка
+отчёта (summary) содержит время запуска JVM как разницу plantuml_cold в
+oneshot и plantuml_layout в pool для одного и того же случая.
+
+Запуск из корня проекта:
+    python -m tests.benchmarks.bench_plantuml --update-baseline
+    python -m tests.benchmarks.bench_plantuml --output bench_plantuml.json
+    python -m tests.benchmarks.bench_plantuml --diagrams simple,class --formats png --levels Low
+"""
+
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+import src.diagram_renderer as diagram_renderer
+import src.render_cache as render_cache
+from src.config import PLANTUML_POOL_SIZE
+from src.diagram_renderer import QUALITY_LEVELS, THEMES_DIR, render_diagram_from_string
+from src.render_stats import capture_stages
+from tests.benchmarks.harness import BenchmarkCase, run_suite
+from tests.conftest import CYRILLIC_SEQUENCE_DIAGRAM, SIMPLE_SEQUENCE_DIAGRAM
+
+FORMATS = ("png", "svg", "pdf")
+DIAGRAMS = ("simple", "cyrillic", "class", "sequence")
+MODES = ("pool", "oneshot")
+
+CLASS_DIAGRAM_SIZE = 60
+SEQUENCE_DIAGRAM_SIZE = 150
+
+
+def make_class_diagram(classes: int) -> str:
+    """Диаграмма классов: пакеты по 10 классов, наследование и ассоциации."""
+    lines = ["@startuml"]
+    for index in range(classes):
+        if index % 10 == 0:
+            if index:
+                lines.append("}")
+            lines.append(f"package module{index // 10} {{")
+        lines.extend(
+            [
+                f"  class Service{index} {{",
+                f"    - repository: Repository{index}",
+                "    - cache: dict[str, Any]",
+                f"    + handle(request: Request{index}) : Response",
+                "    + validate(payload: dict) : bool",
+                "  }",
+            ]
+        )
+    lines.append("}")
+    for index in range(1, classes):
+        arrow = "--|>" if index % 3 == 0 else "-->"
+        lines.append(f"Service{index} {arrow} Service{index // 2} : uses")
+    lines.append("@enduml")
+    return "\n".join(lines) + "\n"
+
+
+def make_sequence_diagram(messages: int) -> str:
+    """Диаграмма последовательностей: 8 участников, активации и блоки alt."""
+    participants = [f"Service{index}" for index in range(8)]
+    lines = ["@startuml"]
+    lines.extend(f'participant "{name}" as {name}' for name in participants)
+    for index in range(messages):
+        source = participants[index % len(participants)]
+        target = participants[(index * 3 + 1) % len(participants)]
+        if index % 20 == 0:
+            lines.append(f"alt запрос {index} успешен")
+        lines.append(f"{source} -> {target}: Запрос #{index} (payload={index * 7})")
+        lines.append(f"activate {target}")
+        lines.append(f"{target} --> {source}: Ответ #{index}")
+        lines.append(f"deactivate {target}")
+        if index % 20 == 19 or index == messages - 1:
+            lines.append("else ошибка")
+            lines.append(f"{source} -> {source}: Повтор #{index}")
+            lines.append("end")
+    lines.append("@enduml")
+    return "\n".join(lines) + "\n"
+
+
+def make_diagram(diagram: str, size: int) -> str:
+    """Возвращает код диаграммы по имени."""
+    if diagram == "simple":
+        return SIMPLE_SEQUENCE_DIAGRAM
+    if diagram == "cyrillic":
+        return CYRILLIC_SEQUENCE_DIAGRAM
+    if diagram == "class":
+        return make_class_diagram(size)
+    return make_sequence_diagram(size)
+
+
+def measure(
+    diagram: str, size: int, theme: str, format: str, scale_factor: float, mode: str
+) -> dict:
+    """Рендерит одну диаграмму в файл и возвращает размер и этапы."""
+    # Кеш результатов отключён: повторы должны рендерить заново
+    render_cache.RENDER_CACHE_ENABLED = False
+    diagram_renderer.PLANTUML_POOL_SIZE = PLANTUML_POOL_SIZE if mode == "pool" else 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = Path(tmp_dir) / f"bench.{format}"
+        with capture_stages() as stages:
+            result = render_diagram_from_string(
+                make_diagram(diagram, size),
+                output_path,
+                format=format,
+                theme_name=theme,
+                scale_factor=scale_factor,
+            )
+        output_bytes = output_path.stat().st_size
+
+    return {
+        "output_bytes": output_bytes,
+        "dimensions": list(result["dimensions"]) if result["dimensions"] else None,
+        "stages_ms": {name: round(value, 2) for name, value in stages.items()},
+    }
+
+
+def configure_parser(parser) -> None:
+    """Аргументы матрицы случаев."""
+    # Тема default первой: на ней строится режим oneshot
+    stems = (path.stem for path in THEMES_DIR.glob("*.puml"))
+    themes = sorted(stems, key=lambda stem: (stem != "default", stem))
+    parser.add_argument("--diagrams", default=",".join(DIAGRAMS), help="Диаграммы")
+    parser.add_argument("--themes", default=",".join(themes), help="Темы из asset/themes")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Форматы")
+    parser.add_argument("--levels", default=",".join(QUALITY_LEVELS), help="Уровни для png")
+    parser.add_argument("--modes", default=",".join(MODES), help="Режимы PlantUML")
+    parser.add_argument(
+        "--class-size", type=int, default=CLASS_DIAGRAM_SIZE, help="Классов в диаграмме"
+    )
+    parser.add_argument(
+        "--sequence-size",
+        type=int,
+        default=SEQUENCE_DIAGRAM_SIZE,
+        help="Сообщений в диаграмме последовательностей",
+    )
+
+
+def build_cases(args) -> list[BenchmarkCase]:
+    """Строит случаи по матрице из аргументов."""
+    sizes = {"class": args.class_size, "sequence": args.sequence_size}
+    themes = args.themes.split(",")
+    levels = args.levels.split(",")
+
+    cases = []
+    for mode in args.modes.split(","):
+        for diagram in args.diagrams.split(","):
+            for theme in themes if mode == "pool" else themes[:1]:
+                for format in args.formats.split(","):
+                    if format != "png":
+                        variants = [("-", 1.0)]
+                    else:
+                        selected = levels if mode == "pool" else levels[:1]
+                        variants = [(level, QUALITY_LEVELS[level]) for level in selected]
+                    for level, scale_factor in variants:
+                        cases.append(
+                            BenchmarkCase(
+                                f"{mode}/{diagram}/{theme}/{format}/{level}",
+                                {
+                                    "diagram": diagram,
+                                    "size": sizes.get(diagram, 0),
+                                    "theme": theme,
+                                    "format": format,
+                                    "scale_factor": scale_factor,
+                                    "mode": mode,
+                                },
+                            )
+                        )
+    return cases
+
+
+def summarize(results: dict[str, dict]) -> dict:
+    """Оценивает время запуска JVM по парам случаев oneshot и pool."""
+    jvm_startup = {}
+    for name, oneshot in results.items():
+        if not name.startswith("oneshot/") or "error" in oneshot:
+            continue
+        case = name.removeprefix("oneshot/")
+        pooled = results.get(f"pool/{case}", {})
+        cold = oneshot.get("stages_ms", {}).get("plantuml_cold")
+        warm = pooled.get("stages_ms", {}).get("plantuml_layout")
+        if cold is not None and warm is not None:
+            jvm_startup[case] = round(cold - warm, 2)
+
+    if not jvm_startup:
+        return {}
+    return {
+        "jvm_startup_ms": jvm_startup,
+        "jvm_startup_median_ms": round(statistics.median(jvm_startup.values()), 2),
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(
+        run_suite(
+            "plantuml",
+            build_cases,
+            measure,
+            configure_parser=configure_parser,
+            summarize=summarize,
+        )
+    )
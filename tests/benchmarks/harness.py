@@ -0,0 +1,352 @@
+"""Общая обвязка бенчмарков: замеры, базовая линия и сравнение.
+
+Каждый случай выполняется в свежем процессе (spawn, один случай на процесс):
+так пиковый RSS относится к одному случаю, а прогрев кешей ресурсов не
+перетекает между случаями. В процессе случай прогоняется один раз для
+прогрева и repeat раз с замером, в результат идёт медиана.
+
+Результаты сохраняются в JSON (окружение, замеры по имени случая и
+необязательная сводка набора) и сравниваются с базовой линией по порогам
+регрессии для времени, пикового RSS и размера результата.
+
+Классы:
+    BenchmarkCase
+        Описание одного случая: имя и параметры функции замера.
+    Thresholds
+        Допустимый относительный рост метрик.
+
+Функции:
+    run_cases(measure, cases, repeat, isolate) -> dict
+        Выполняет случаи и возвращает замеры по имени.
+    compare_with_baseline(results, baseline, thresholds) -> list[dict]
+        Находит регрессии относительно базовой линии.
+    run_suite(suite, build_cases, measure, argv, configure_parser, summarize) -> int
+        Командная строка бенчмарка (замер, сохранение, сравнение).
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import PIL
+import pygments
+
+logger = logging.getLogger(__name__)
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    """Описание одного случая бенчмарка.
+
+    Attributes:
+        name: Уникальное имя (ключ в базовой линии).
+        params: Именованные аргументы функции замера.
+    """
+
+    name: str
+    params: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Thresholds:
+    """Допустимый относительный рост метрик (0.15 — на 15%).
+
+    Attributes:
+        wall_time: Рост медианного времени.
+        peak_rss: Рост пикового RSS.
+        output_bytes: Рост размера результата.
+        min_wall_ms: Случаи быстрее не сравниваются по времени (шум таймера).
+    """
+
+    wall_time: float = 0.15
+    peak_rss: float = 0.10
+    output_bytes: float = 0.02
+    min_wall_ms: float = 5.0
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _run_case(
+    measure: Callable[..., dict], case: BenchmarkCase, repeat: int
+) -> dict:
+    """Прогревает и замеряет случай (выполняется в процессе замера).
+
+    Сведения берутся из последнего замера, кроме этапов (stages_ms):
+    по ним считается медиана каждого этапа.
+    """
+    measure(**case.params)
+
+    timings = []
+    stages: dict[str, list[float]] = {}
+    info: dict = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        info = measure(**case.params)
+        timings.append((time.perf_counter() - start) * 1000)
+        for name, value in info.get("stages_ms", {}).items():
+            stages.setdefault(name, []).append(value)
+
+    result = {
+        "wall_ms": round(statistics.median(timings), 2),
+        "wall_ms_min": round(min(timings), 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        **info,
+    }
+    if stages:
+        result["stages_ms"] = {
+            name: round(statistics.median(values), 2) for name, values in stages.items()
+        }
+    return result
+
+
+def _case_process(connection, measure: Callable[..., dict], case: BenchmarkCase, repeat: int):
+    try:
+        connection.send(_run_case(measure, case, repeat))
+    except Exception as e:
+        connection.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        connection.close()
+
+
+def _run_isolated(measure: Callable[..., dict], case: BenchmarkCase, repeat: int) -> dict:
+    """Выполняет случай в свежем процессе (не демон: рендеринг может запускать свой пул)."""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_case_process, args=(sender, measure, case, repeat))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+
+    if result is None:
+        return {"error": f"Процесс замера завершился с кодом {process.exitcode}"}
+    return result
+
+
+def run_cases(
+    measure: Callable[..., dict],
+    cases: list[BenchmarkCase],
+    repeat: int = 3,
+    isolate: bool = True,
+) -> dict[str, dict]:
+    """Выполняет случаи и возвращает замеры по имени.
+
+    Args:
+        measure: Функция верхнего уровня модуля; выполняет одну операцию и
+            возвращает сведения о результате (например, output_bytes).
+        cases: Случаи бенчмарка.
+        repeat: Число замеров после прогрева.
+        isolate: Выполнять каждый случай в свежем процессе.
+
+    Returns:
+        {имя случая: {wall_ms, wall_ms_min, peak_rss_mb, ...}}, для упавшего
+        случая — {"error": текст}.
+    """
+    results = {}
+    for index, case in enumerate(cases, start=1):
+        if isolate:
+            result = _run_isolated(measure, case, repeat)
+        else:
+            result = _run_case(measure, case, repeat)
+        results[case.name] = result
+        logger.info(f"⏱️ [{index}/{len(cases)}] {case.name}")
+    return results
+
+
+def describe_environment() -> dict:
+    """Сведения об окружении, влияющие на сравнимость замеров."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "pygments": pygments.__version__,
+    }
+
+
+def compare_with_baseline(
+    results: dict[str, dict], baseline: dict[str, dict], thresholds: Thresholds
+) -> list[dict]:
+    """Находит регрессии относительно базовой линии.
+
+    Случаи, которых нет в одной из сторон или которые упали, пропускаются.
+
+    Returns:
+        Список {case, metric, baseline, current, change} для превышенных порогов.
+    """
+    limits = {
+        "wall_ms": thresholds.wall_time,
+        "peak_rss_mb": thresholds.peak_rss,
+        "output_bytes": thresholds.output_bytes,
+    }
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or "error" in current or "error" in previous:
+            continue
+
+        for metric, limit in limits.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            if metric == "wall_ms" and old < thresholds.min_wall_ms:
+                continue
+
+            change = (new - old) / old
+            if change > limit:
+                regressions.append(
+                    {
+                        "case": name,
+                        "metric": metric,
+                        "baseline": old,
+                        "current": new,
+                        "change": round(change, 3),
+                    }
+                )
+    return regressions
+
+
+def _load_results(path: Path) -> dict[str, dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def _save_results(
+    path: Path, suite: str, results: dict[str, dict], summary: dict | None = None
+) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {"suite": suite, "environment": describe_environment(), "results": results}
+    if summary:
+        report["summary"] = summary
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def run_suite(
+    suite: str,
+    build_cases: Callable[[argparse.Namespace], list[BenchmarkCase]],
+    measure: Callable[..., dict],
+    argv: list[str] | None = None,
+    configure_parser: Callable[[argparse.ArgumentParser], None] | None = None,
+    summarize: Callable[[dict[str, dict]], dict] | None = None,
+) -> int:
+    """Командная строка бенчмарка: замер, сохранение и сравнение.
+
+    Args:
+        suite: Имя набора (имя файла базовой линии по умолчанию).
+        build_cases: Строит случаи по разобранным аргументам.
+        measure: Функция замера одного случая.
+        argv: Аргументы командной строки (по умолчанию sys.argv).
+        configure_parser: Добавляет аргументы набора (матрица случаев).
+        summarize: Строит сводку по замерам (поле summary отчёта).
+
+    Returns:
+        Код выхода: 1 при регрессиях или упавших случаях, иначе 0.
+    """
+    parser = argparse.ArgumentParser(description=f"Бенчмарк {suite}")
+    if configure_parser is not None:
+        configure_parser(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="Замеров после прогрева")
+    parser.add_argument("--filter", default="", help="Подстрока имени случая")
+    parser.add_argument(
+        "--no-isolate", action="store_true", help="Выполнять случаи в текущем процессе"
+    )
+    parser.add_argument("--output", type=Path, help="Куда сохранить результаты (JSON)")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BASELINES_DIR / f"{suite}.json",
+        help="Файл базовой линии",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Записать результаты как базовую линию"
+    )
+    parser.add_argument("--max-time-regression", type=float, default=Thresholds.wall_time)
+    parser.add_argument("--max-rss-regression", type=float, default=Thresholds.peak_rss)
+    parser.add_argument("--max-size-regression", type=float, default=Thresholds.output_bytes)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    cases = [case for case in build_cases(args) if args.filter in case.name]
+    print(f"📊 {suite}: {len(cases)} случаев, repeat={args.repeat}")
+
+    results = run_cases(measure, cases, repeat=args.repeat, isolate=not args.no_isolate)
+    failed = [name for name, result in results.items() if "error" in result]
+
+    for name, result in results.items():
+        if "error" in result:
+            print(f"❌ {name}: {result['error']}")
+            continue
+        print(
+            f"   {name}: {result['wall_ms']} ms, RSS {result['peak_rss_mb']} MB, "
+            f"{result.get('output_bytes')} B"
+        )
+        if result.get("stages_ms"):
+            print(
+                "      "
+                + ", ".join(f"{stage}={value} ms" for stage, value in result["stages_ms"].items())
+            )
+
+    summary = summarize(results) if summarize is not None else None
+    if summary:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    if args.output:
+        _save_results(args.output, suite, results, summary)
+        print(f"💾 Результаты: {args.output}")
+
+    if args.update_baseline:
+        merged = _load_results(args.baseline) if args.baseline.exists() else {}
+        merged.update(results)
+        _save_results(args.baseline, suite, merged)
+        print(f"💾 Базовая линия обновлена: {args.baseline}")
+        return 1 if failed else 0
+
+    if not args.baseline.exists():
+        print(f"⚠️ Базовая линия не найдена: {args.baseline} (используйте --update-baseline)")
+        return 1 if failed else 0
+
+    thresholds = Thresholds(
+        wall_time=args.max_time_regression,
+        peak_rss=args.max_rss_regression,
+        output_bytes=args.max_size_regression,
+    )
+    regressions = compare_with_baseline(results, _load_results(args.baseline), thresholds)
+    for regression in regressions:
+        print(
+            f"🐢 {regression['case']}: {regression['metric']} "
+            f"{regression['baseline']} -> {regression['current']} "
+            f"(+{regression['change']:.1%})"
+        )
+    if not regressions:
+        print("✅ Регрессий нет")
+
+    return 1 if regressions or failed else 0
@@ -3,30 +3,15 @@
 import pytest
 from pathlib import Path
 
-
-@pytest.fixture
-def output_dir():
-    """Директория для сохранения результатов тестов."""
-    output = Path(__file__).parent / "output"
-    output.mkdir(exist_ok=True)
-    return output
-
-
-@pytest.fixture
-def test_plantuml_code():
-    """Простой тестовый код PlantUML."""
-    return """
+# Тестовые диаграммы (используются и бенчмарком PlantUML)
+SIMPLE_SEQUENCE_DIAGRAM = """
 @startuml
 Alice -> Bob: Authentication Request
 Bob --> Alice: Authentication Response
 @enduml
 """
 
-
-@pytest.fixture
-def test_plantuml_code_cyrillic():
-    """Тестовый код PlantUML с кириллицей."""
-    return """
+CYRILLIC_SEQUENCE_DIAGRAM = """
 @startuml
 participant "Пользователь" as User
 participant "Сервер" as Server
@@ -44,3 +29,43 @@ Server --> User: Токен доступа
 deactivate Server
 @enduml
 """
+
+
+@pytest.fixture(autouse=True)
+def isolated_render_cache(tmp_path, monkeypatch):
+    """Изолирует дисковый кеш рендеринга во временной директории теста."""
+    import src.render_cache as render_cache
+
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", tmp_path / "render_cache")
+    monkeypatch.setattr(render_cache, "_caches", {})
+    return tmp_path / "render_cache"
+
+
+@pytest.fixture(autouse=True)
+def isolated_project_index(tmp_path, monkeypatch):
+    """Изолирует постоянные индексы проектов во временной директории теста."""
+    import src.project_index as project_index
+
+    monkeypatch.setattr(project_index, "PROJECT_INDEX_DIR", tmp_path / "project_index")
+    monkeypatch.setattr(project_index, "_indexes", {})
+    return tmp_path / "project_index"
+
+
+@pytest.fixture
+def output_dir():
+    """Директория для сохранения результатов тестов."""
+    output = Path(__file__).parent / "output"
+    output.mkdir(exist_ok=True)
+    return output
+
+
+@pytest.fixture
+def test_plantuml_code():
+    """Простой тестовый код PlantUML."""
+    return SIMPLE_SEQUENCE_DIAGRAM
+
+
+@pytest.fixture
+def test_plantuml_code_cyrillic():
+    """Тестовый код PlantUML с кириллицей."""
+    return CYRILLIC_SEQUENCE_DIAGRAM
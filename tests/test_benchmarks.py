@@ -0,0 +1,91 @@
+"""Тесты для обвязки бенчмарков."""
+
+from tests.benchmarks.bench_code_screenshots import make_snippet
+from tests.benchmarks.bench_plantuml import make_class_diagram, summarize
+from tests.benchmarks.harness import (
+    BenchmarkCase,
+    Thresholds,
+    compare_with_baseline,
+    run_cases,
+)
+
+
+def measure_length(text: str) -> dict:
+    """Функция замера для тестов."""
+    return {"output_bytes": len(text), "stages_ms": {"encode": float(len(text))}}
+
+
+class TestCompareWithBaseline:
+    """Тесты поиска регрессий."""
+
+    def test_regressions_over_thresholds(self):
+        """Рост метрики сверх порога считается регрессией."""
+        baseline = {"case": {"wall_ms": 100.0, "peak_rss_mb": 50.0, "output_bytes": 1000}}
+        results = {"case": {"wall_ms": 130.0, "peak_rss_mb": 52.0, "output_bytes": 1100}}
+
+        regressions = compare_with_baseline(results, baseline, Thresholds())
+
+        assert [item["metric"] for item in regressions] == ["wall_ms", "output_bytes"]
+        assert regressions[0]["change"] == 0.3
+
+    def test_fast_missing_and_failed_cases_skipped(self):
+        """Быстрые по времени, новые и упавшие случаи не сравниваются."""
+        baseline = {
+            "fast": {"wall_ms": 1.0},
+            "failed": {"wall_ms": 100.0},
+        }
+        results = {
+            "fast": {"wall_ms": 3.0},
+            "failed": {"error": "boom"},
+            "new": {"wall_ms": 500.0},
+        }
+
+        assert compare_with_baseline(results, baseline, Thresholds()) == []
+
+
+class TestRunCases:
+    """Тесты выполнения случаев."""
+
+    def test_inline_run(self):
+        """Замер возвращает медиану времени и сведения функции."""
+        results = run_cases(
+            measure_length, [BenchmarkCase("short", {"text": "abc"})], repeat=2, isolate=False
+        )
+
+        assert results["short"]["output_bytes"] == 3
+        assert results["short"]["wall_ms"] >= 0
+        assert results["short"]["stages_ms"] == {"encode": 3.0}
+
+
+class TestSnippets:
+    """Тесты генерации фрагментов кода."""
+
+    def test_exact_line_count(self):
+        """Фрагмент содержит ровно запрошенное число строк."""
+        for language in ("python", "javascript", "sql"):
+            assert make_snippet(language, 137).count("\n") == 137
+
+
+class TestPlantUMLBenchmark:
+    """Тесты генерации диаграмм и сводки бенчмарка PlantUML."""
+
+    def test_class_diagram_structure(self):
+        """Диаграмма классов сбалансирована по скобкам и содержит все классы."""
+        code = make_class_diagram(25)
+
+        assert code.startswith("@startuml") and code.rstrip().endswith("@enduml")
+        assert code.count("{") == code.count("}")
+        assert code.count("  class Service") == 25
+
+    def test_jvm_startup_from_case_pairs(self):
+        """Запуск JVM оценивается по парам oneshot/pool одного случая."""
+        results = {
+            "pool/simple/default/png/Low": {"stages_ms": {"plantuml_layout": 80.0}},
+            "oneshot/simple/default/png/Low": {"stages_ms": {"plantuml_cold": 1580.0}},
+            "oneshot/simple/default/svg/-": {"error": "Java не найдена"},
+        }
+
+        summary = summarize(results)
+
+        assert summary["jvm_startup_ms"] == {"simple/default/png/Low": 1500.0}
+        assert summary["jvm_startup_median_ms"] == 1500.0
@@ -2,11 +2,18 @@
 Тесты для модуля code_extractor.py
 """
 
+import os
+
 import pytest
 from pathlib import Path
 from src.code_extractor import (
+    SymbolIndex,
+    clear_symbol_index_cache,
     extract_code_entity,
+    get_symbol_index,
+    get_symbol_index_cache_stats,
     list_entities,
+    resolve_entity_patterns,
     EntityNotFoundError,
 )
 
@@ -238,6 +245,83 @@ class TestListEntities:
             list_entities("/nonexistent/file.py")
 
 
+class TestResolveEntityPatterns:
+    """Тесты для resolve_entity_patterns()."""
+
+    def test_method_pattern(self, sample_python_file):
+        """Шаблон 'Class.*' раскрывается в методы класса по порядку."""
+        resolved = resolve_entity_patterns(sample_python_file, ["SimpleClass.*"])
+
+        assert resolved["SimpleClass.*"] == [
+            "SimpleClass.__init__",
+            "SimpleClass.method_one",
+            "SimpleClass.decorated_method",
+        ]
+
+    def test_top_level_pattern_and_plain_names(self, sample_python_file):
+        """Шаблон без точки ищет среди верхнего уровня, имена возвращаются как есть."""
+        resolved = resolve_entity_patterns(
+            sample_python_file, ["*_function", "missing", "Nope*"]
+        )
+
+        assert resolved["*_function"] == [
+            "simple_function",
+            "decorated_function",
+            "async_function",
+        ]
+        assert resolved["missing"] == ["missing"]
+        assert resolved["Nope*"] == []
+
+
+class TestSymbolIndex:
+    """Тесты индекса сущностей и его кеша."""
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        clear_symbol_index_cache()
+        yield
+        clear_symbol_index_cache()
+
+    def test_qualified_names(self):
+        """Вложенные сущности индексируются по квалифицированным именам."""
+        index = SymbolIndex.build(
+            "class Outer:\n"
+            "    class Inner:\n"
+            "        def run(self):\n"
+            "            def helper():\n"
+            "                pass\n"
+        )
+
+        assert index.symbols["Outer"].kind == "class"
+        assert index.symbols["Outer.Inner.run"].kind == "method"
+        assert index.symbols["Outer.Inner.run.helper"].kind == "function"
+        assert index.symbols["Outer.Inner.run.helper"].lineno == 4
+        assert index.top_level == ["Outer"]
+
+    def test_index_is_cached(self, sample_python_file):
+        """Повторные извлечения не разбирают файл заново."""
+        extract_code_entity(sample_python_file, "simple_function")
+        extract_code_entity(sample_python_file, "SimpleClass.method_one")
+        list_entities(sample_python_file)
+
+        stats = get_symbol_index_cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+
+    def test_modified_file_is_reindexed(self, tmp_path):
+        """Изменённый файл (mtime, размер) получает новый индекс."""
+        module = tmp_path / "module.py"
+        module.write_text("def first():\n    pass\n", encoding="utf-8")
+        assert "first" in get_symbol_index(module).symbols
+
+        module.write_text("def second():\n    return 2\n", encoding="utf-8")
+        stat = module.stat()
+        os.utime(module, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert "return 2" in extract_code_entity(str(module), "second")
+        assert get_symbol_index_cache_stats()["misses"] == 2
+
+
 class TestIntegration:
     """Интеграционные тесты."""
 
@@ -0,0 +1,88 @@
+"""Тесты для прямой растеризации токенов Pygments."""
+
+import io
+
+import pygments
+import pytest
+from PIL import Image, ImageChops
+from pygments.formatters import ImageFormatter
+from pygments.formatters.img import FontManager
+from pygments.lexers import get_lexer_by_name
+from pygments.styles import get_style_by_name
+
+from src.code_rasterizer import rasterize_tokens
+from src.font_manager import get_font_path
+
+CODE = '''@dataclass
+class Order:
+\t"""Заказ с табуляцией."""
+
+    def total(self) -> int:
+        return sum(item.price for item in self.items)  # комментарий
+'''
+
+
+def _render_with_image_formatter(style, font_path, **options) -> Image.Image:
+    formatter = ImageFormatter(
+        style=style,
+        font_name=font_path,
+        font_size=30,
+        image_pad=20,
+        line_pad=8,
+        line_number_fg="#888888",
+        line_number_bg=style.background_color,
+        image_format="PNG",
+        **options,
+    )
+    lexer = get_lexer_by_name("python", stripall=True)
+    return Image.open(io.BytesIO(pygments.highlight(CODE, lexer, formatter)))
+
+
+@pytest.fixture
+def font_path():
+    return get_font_path("JetBrainsMono")
+
+
+class TestRasterizeTokens:
+    """Тесты совпадения с ImageFormatter и прозрачного фона."""
+
+    @pytest.mark.parametrize("style_name", ["monokai", "friendly"])
+    @pytest.mark.parametrize("line_numbers", [True, False])
+    def test_matches_image_formatter(self, font_path, style_name, line_numbers):
+        """Изображение совпадает с выводом ImageFormatter попиксельно."""
+        style = get_style_by_name(style_name)
+        expected = _render_with_image_formatter(
+            style, font_path, line_numbers=line_numbers
+        )
+
+        lexer = get_lexer_by_name("python", stripall=True)
+        actual = rasterize_tokens(
+            lexer.get_tokens(CODE),
+            style=style,
+            fonts=FontManager(font_path, 30),
+            image_pad=20,
+            line_pad=8,
+            line_numbers=line_numbers,
+            line_number_fg="#888888",
+        )
+
+        assert actual.size == expected.size
+        assert actual.mode == "RGB"
+        assert ImageChops.difference(actual, expected.convert("RGB")).getbbox() is None
+
+    def test_transparent_background(self, font_path):
+        """Прозрачный фон даёт RGBA без изменения стиля Pygments."""
+        style = get_style_by_name("monokai")
+        original_background = style.background_color
+
+        lexer = get_lexer_by_name("python", stripall=True)
+        image = rasterize_tokens(
+            lexer.get_tokens(CODE),
+            style=style,
+            fonts=FontManager(font_path, 30),
+            transparent=True,
+        )
+
+        assert image.mode == "RGBA"
+        assert image.getpixel((image.width - 1, image.height - 1))[3] == 0
+        assert style.background_color == original_background
@@ -0,0 +1,82 @@
+"""Тесты для модуля deep_zoom."""
+
+import io
+import math
+
+import pytest
+from PIL import Image
+
+from src.deep_zoom import DeepZoomWriter, write_deep_zoom
+from src.image_utils import ImageProcessingError
+
+
+def _png_bytes(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestWriteDeepZoom:
+    """Тесты построения пирамиды плиток."""
+
+    def test_tiles_match_reduced_levels(self, tmp_path):
+        """Каждая плитка совпадает с областью уровня, уменьшенного через reduce."""
+        image = Image.effect_noise((301, 170), 50).convert("RGB")
+
+        result = write_deep_zoom(
+            _png_bytes(image), tmp_path / "big.png", tile_size=64, overlap=1
+        )
+
+        assert result["levels"] == 10
+        assert result["path"].endswith("big.dzi")
+        level_image = image
+        tiles = 0
+        for level in range(result["levels"] - 1, -1, -1):
+            width, height = level_image.size
+            for row in range(math.ceil(height / 64)):
+                for column in range(math.ceil(width / 64)):
+                    box = (
+                        max(0, column * 64 - 1),
+                        max(0, row * 64 - 1),
+                        min(width, (column + 1) * 64 + 1),
+                        min(height, (row + 1) * 64 + 1),
+                    )
+                    path = tmp_path / "big_files" / str(level) / f"{column}_{row}.png"
+                    with Image.open(path) as tile:
+                        assert tile.tobytes() == level_image.crop(box).tobytes()
+                    tiles += 1
+            level_image = level_image.reduce(2)
+        assert result["tiles"] == tiles
+
+    def test_descriptor(self, tmp_path):
+        """Файл .dzi описывает размер, плитку, перекрытие и формат."""
+        write_deep_zoom(
+            _png_bytes(Image.new("RGBA", (40, 30), (0, 0, 0, 0))),
+            tmp_path / "small.webp",
+            format="webp",
+            tile_size=16,
+        )
+
+        descriptor = (tmp_path / "small.dzi").read_text(encoding="utf-8")
+        assert 'Format="webp"' in descriptor and 'TileSize="16"' in descriptor
+        assert '<Size Width="40" Height="30"/>' in descriptor
+        assert (tmp_path / "small_files" / "0" / "0_0.webp").exists()
+
+
+class TestDeepZoomWriter:
+    """Тесты проверок потоковой записи."""
+
+    def test_incomplete_image(self, tmp_path):
+        """Закрытие до получения всех строк — ошибка."""
+        writer = DeepZoomWriter(tmp_path / "x.dzi", 10, 10, tile_size=4)
+        writer.write(Image.new("RGB", (10, 5)))
+
+        with pytest.raises(ImageProcessingError, match="5 строк из 10"):
+            writer.close()
+
+    def test_strip_width_mismatch(self, tmp_path):
+        """Полоса другой ширины отклоняется."""
+        writer = DeepZoomWriter(tmp_path / "x.dzi", 10, 10)
+
+        with pytest.raises(ImageProcessingError, match="не подходит"):
+            writer.write(Image.new("RGB", (8, 5)))
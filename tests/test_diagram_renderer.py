@@ -534,3 +534,307 @@ class TestScaleFactorIntegration:
         assert results["Extreme"]["width"] / low_width >= 5.8, (
             "Extreme должен быть ~6x от Low"
         )
+
+
+class TestPipeProtocolHelpers:
+    """Тесты вспомогательных функций постоянного pipe-режима."""
+
+    def test_single_diagram_is_pipe_safe(self, test_plantuml_code):
+        """Одна диаграмма с @enduml подходит для постоянного процесса."""
+        from src.diagram_renderer import _is_pipe_safe, _prepare_diagram_code
+
+        assert _is_pipe_safe(_prepare_diagram_code(test_plantuml_code)) is True
+
+    def test_unterminated_or_multiple_diagrams_not_pipe_safe(self):
+        """Без @enduml или с несколькими диаграммами используется отдельный процесс."""
+        from src.diagram_renderer import _is_pipe_safe
+
+        assert _is_pipe_safe("@startuml\nA -> B") is False
+        assert (
+            _is_pipe_safe("@startuml\nA -> B\n@enduml\n@startuml\nB -> C\n@enduml")
+            is False
+        )
+
+    def test_error_output_raises_syntax_error(self):
+        """Текст ERROR от PlantUML превращается в PlantUMLSyntaxError."""
+        from src.diagram_renderer import _check_pipe_output
+
+        with pytest.raises(PlantUMLSyntaxError, match="Syntax Error"):
+            _check_pipe_output(b"ERROR\n3\nSyntax Error?\n")
+
+        assert _check_pipe_output(b"\x89PNG data") == b"\x89PNG data"
+
+
+class TestRenderCache:
+    """Тесты дискового кеша результатов рендеринга диаграмм."""
+
+    def test_cache_key_depends_on_inputs(self, test_plantuml_code):
+        """Ключ меняется при изменении исходника, масштаба и формата."""
+        from src.diagram_renderer import _diagram_cache_key
+
+        base = _diagram_cache_key(test_plantuml_code, "png", "png", "default", 1.0)
+
+        assert base == _diagram_cache_key(
+            test_plantuml_code, "png", "png", "default", 1.0
+        )
+        assert base != _diagram_cache_key(
+            test_plantuml_code + "\nnote", "png", "png", "default", 1.0
+        )
+        assert base != _diagram_cache_key(
+            test_plantuml_code, "png", "png", "default", 2.0
+        )
+        assert base != _diagram_cache_key(
+            test_plantuml_code, "png", "webp", "default", 1.0
+        )
+
+    def test_cache_key_follows_prepared_code(self):
+        """Ключ строится по подготовленному коду: обёртка @startuml его не меняет."""
+        from src.diagram_renderer import _diagram_cache_key
+
+        bare = _diagram_cache_key("A -> B", "png", "png", "default", 2.0)
+
+        assert bare == _diagram_cache_key(
+            "@startuml\nA -> B\n@enduml", "png", "png", "default", 2.0
+        )
+        assert bare != _diagram_cache_key("A -> B", "png", "png", None, 2.0)
+        # Векторный вывод не получает DPI, масштаб на ключ не влияет
+        assert _diagram_cache_key("A -> B", "svg", "svg", "default", 1.0) == (
+            _diagram_cache_key("A -> B", "svg", "svg", "default", 3.0)
+        )
+
+    def test_cache_hit_served_without_rendering(
+        self, test_plantuml_code, tmp_path, monkeypatch
+    ):
+        """Попадание отдаётся из кеша без запуска PlantUML."""
+        import src.diagram_renderer as diagram_renderer
+        from src.render_cache import get_render_cache
+
+        source = tmp_path / "rendered.png"
+        Image.new("RGB", (10, 10), "white").save(source)
+
+        key = diagram_renderer._diagram_cache_key(
+            test_plantuml_code, "png", "png", "default", 1.0
+        )
+        get_render_cache("diagrams").store(
+            key, source, {"success": True, "format": "png", "dimensions": [10, 10]}
+        )
+
+        def fail_render(*args, **kwargs):
+            raise AssertionError("Рендеринг не должен запускаться при попадании")
+
+        monkeypatch.setattr(diagram_renderer, "_render_diagram_to_file", fail_render)
+
+        output = tmp_path / "out" / "diagram.png"
+        result = render_diagram_from_string(
+            test_plantuml_code, output, format="png", theme_name="default"
+        )
+
+        assert result["cache_hit"] is True
+        assert result["output_path"] == str(output.absolute())
+        assert output.read_bytes() == source.read_bytes()
+
+
+class TestBatchRendering:
+    """Тесты пакетного рендеринга диаграмм."""
+
+    @pytest.fixture
+    def fake_pool(self, tmp_path, monkeypatch):
+        """Пул с эмулятором PlantUML вместо JVM."""
+        import src.diagram_renderer as diagram_renderer
+        from src.plantuml_pool import PlantUMLWorkerPool
+        from tests.test_plantuml_pool import FAKE_PLANTUML
+
+        script = tmp_path / "fake_plantuml.py"
+        script.write_text(FAKE_PLANTUML, encoding="utf-8")
+
+        pool = PlantUMLWorkerPool(
+            lambda format: [sys.executable, str(script), f"-t{format}"], size=2
+        )
+        monkeypatch.setattr(diagram_renderer, "_get_worker_pool", lambda: pool)
+        yield pool
+        pool.shutdown()
+
+    def test_pinned_worker_reused_across_diagrams(self, fake_pool):
+        """Внутри пакета диаграммы идут через один закреплённый процесс."""
+        from src.diagram_renderer import _pin_workers, _run_plantuml
+
+        code = "@startuml\nA -> B\n@enduml"
+        with _pin_workers():
+            first = _run_plantuml(code, "png")
+            second = _run_plantuml(code, "png")
+            # Процесс не возвращается в пул до конца пакета
+            assert fake_pool.get_stats()["idle"] == {}
+
+        assert first.split(b":")[1] == second.split(b":")[1]
+        assert fake_pool.get_stats()["idle"] == {"png": 1}
+
+    def test_more_formats_than_pool_size(self, fake_pool):
+        """Пакет из трёх форматов при пуле из двух процессов не зависает."""
+        import threading
+
+        from src.diagram_renderer import _pin_workers, _run_plantuml
+
+        code = "@startuml\nA -> B\n@enduml"
+        formats = []
+
+        def run_batch():
+            with _pin_workers():
+                for format in ("png", "svg", "pdf", "png"):
+                    formats.append(_run_plantuml(code, format).split(b":")[0])
+
+        thread = threading.Thread(target=run_batch, daemon=True)
+        thread.start()
+        thread.join(timeout=30)
+
+        assert not thread.is_alive(), "пакет ждёт процесс, закреплённый за ним же"
+        assert formats == [b"png", b"svg", b"pdf", b"png"]
+        assert fake_pool.get_stats()["workers"] <= 2
+
+    def test_error_in_one_diagram_does_not_fail_batch(self, monkeypatch, tmp_path):
+        """Синтаксическая ошибка отражается только в результате своей диаграммы."""
+        import src.diagram_renderer as diagram_renderer
+
+        def fake_render(diagram_code, output_path, **kwargs):
+            if "BAD" in diagram_code:
+                raise PlantUMLSyntaxError("Syntax Error?")
+            return {"success": True, "output_path": str(output_path)}
+
+        monkeypatch.setattr(diagram_renderer, "render_diagram_from_string", fake_render)
+
+        batch = diagram_renderer.render_diagrams_batch(
+            [
+                {"diagram_code": "A -> B", "output_path": tmp_path / "a.png"},
+                {"diagram_code": "BAD", "output_path": tmp_path / "b.png"},
+                {"diagram_code": "C -> D", "output_path": tmp_path / "c.png"},
+            ]
+        )
+
+        assert (batch["total"], batch["succeeded"], batch["failed"]) == (3, 2, 1)
+        assert batch["success"] is False
+        assert [r["success"] for r in batch["results"]] == [True, False, True]
+        assert batch["results"][1]["index"] == 1
+        assert "Syntax Error" in batch["results"][1]["details"]
+
+
+class TestDiagramVariants:
+    """Тесты вариантов диаграммы для нескольких уровней качества."""
+
+    @pytest.fixture
+    def fake_render(self, monkeypatch):
+        """PlantUML подменён: PNG 120x60 на единицу масштаба, вызовы записываются."""
+        import io
+
+        import src.diagram_renderer as diagram_renderer
+
+        calls = []
+
+        def render_png(diagram_code, theme_name, scale_factor):
+            calls.append(scale_factor)
+            size = (int(120 * scale_factor), int(60 * scale_factor))
+            buffer = io.BytesIO()
+            Image.new("RGB", size, (250, 250, 250)).save(buffer, format="PNG")
+            return buffer.getvalue()
+
+        monkeypatch.setattr(diagram_renderer, "_render_png_bytes", render_png)
+        monkeypatch.setattr(diagram_renderer, "ensure_java_environment", lambda: "fake")
+        return calls
+
+    def test_single_render_for_all_levels(self, fake_render, tmp_path):
+        """PlantUML запускается один раз, меньшие уровни получаются уменьшением."""
+        import json
+
+        from src.diagram_renderer import render_diagram_variants
+
+        result = render_diagram_variants("A -> B", tmp_path / "flow.png", [2.0, 3.0, 4.0])
+
+        assert fake_render == [4.0]
+        assert [item["dimensions"] for item in result["variants"]] == [
+            (480, 240),
+            (360, 180),
+            (240, 120),
+        ]
+        # Наибольший вариант — вывод PlantUML без перекодирования
+        assert result["variants"][0]["encoder_profile"] is None
+        assert Path(result["variants"][2]["path"]).name == "flow@2x.png"
+
+        manifest = json.loads(Path(result["manifest_path"]).read_text(encoding="utf-8"))
+        assert manifest["rendered_scale"] == 4.0
+        assert len(manifest["variants"]) == 3
+
+    def test_vector_format_rejected(self, fake_render, tmp_path):
+        """Варианты плотности строятся только для растровых форматов."""
+        from src.diagram_renderer import render_diagram_variants
+
+        with pytest.raises(PlantUMLRenderError, match="png и webp"):
+            render_diagram_variants("A -> B", tmp_path / "flow.pdf", [1.0, 2.0])
+
+        assert fake_render == []
+
+
+class TestDeepZoomFallback:
+    """Тесты автоматического перехода на плитки Deep Zoom."""
+
+    @pytest.fixture
+    def fake_render(self, monkeypatch):
+        """PlantUML подменён PNG 300x200, кеш результатов отключён."""
+        import io
+
+        import src.diagram_renderer as diagram_renderer
+        import src.render_cache as render_cache
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (300, 200), (250, 250, 250)).save(buffer, format="PNG")
+        monkeypatch.setattr(
+            diagram_renderer, "_render_png_bytes", lambda *args: buffer.getvalue()
+        )
+        monkeypatch.setattr(diagram_renderer, "ensure_java_environment", lambda: "fake")
+        monkeypatch.setattr(render_cache, "RENDER_CACHE_ENABLED", False)
+        return diagram_renderer
+
+    def test_auto_switches_over_threshold(self, fake_render, monkeypatch, tmp_path):
+        """Диаграмма больше порога пишется плитками, меньше — одним файлом."""
+        monkeypatch.setattr(fake_render, "DEEP_ZOOM_MIN_MEGAPIXELS", 0)
+
+        result = render_diagram_from_string("A -> B", tmp_path / "big.png")
+
+        assert result["output_mode"] == "deep_zoom"
+        assert result["output_path"].endswith("big.dzi")
+        assert result["dimensions"] == (300, 200)
+        assert (tmp_path / "big_files" / "0" / "0_0.png").exists()
+
+        single = render_diagram_from_string(
+            "A -> B", tmp_path / "single.png", output_mode="single"
+        )
+        assert "output_mode" not in single
+        assert (tmp_path / "single.png").exists()
+
+    def test_small_diagram_stays_single(self, fake_render, tmp_path):
+        """Ниже порога режим auto сохраняет один файл."""
+        result = render_diagram_from_string("A -> B", tmp_path / "small.webp")
+
+        assert "output_mode" not in result
+        assert result["format"] == "webp"
+
+
+class TestRecompression:
+    """Тесты фонового пережатия PNG."""
+
+    def test_size_marked_before_recompression(self, monkeypatch):
+        """При запланированном пережатии ответ указывает, что размер — до него."""
+        import src.diagram_renderer as diagram_renderer
+
+        scheduled = []
+        monkeypatch.setattr(diagram_renderer, "recompress_png_async", scheduled.append)
+
+        result = diagram_renderer._schedule_recompression(
+            {"format": "png", "output_path": "/tmp/d.png", "file_size_kb": 10.0}, True
+        )
+        skipped = diagram_renderer._schedule_recompression(
+            {"format": "png", "output_path": "/tmp/d.png", "file_size_kb": 10.0}, False
+        )
+
+        assert scheduled == ["/tmp/d.png"]
+        assert result["recompression_scheduled"] is True
+        assert "до фонового пережатия" in result["file_size_note"]
+        assert skipped["recompression_scheduled"] is False
+        assert "file_size_note" not in skipped
@@ -89,3 +89,33 @@ class TestFontInitializer:
 
         assert any("JetBrains" in name for name in font_names)
         assert any("Fira" in name for name in font_names)
+
+
+class TestJavaProbeReuse:
+    """Тесты повторного использования пробы Java."""
+
+    def test_uses_memoized_settings(self, tmp_path, monkeypatch):
+        """java.home берётся из закешированной пробы, Java не запускается."""
+        import src.font_initializer as font_initializer
+        import src.java_runtime as java_runtime
+
+        runtime = java_runtime.JavaRuntime(
+            version_line='openjdk version "17.0.9"',
+            major_version=17,
+            java_home=tmp_path,
+            settings_output=f"Property settings:\n    java.home = {tmp_path}\n",
+        )
+
+        def fail_run(*args, **kwargs):
+            raise AssertionError("Java не должна запускаться повторно")
+
+        monkeypatch.setattr(java_runtime, "get_java_runtime", lambda: runtime)
+        monkeypatch.setattr(font_initializer.subprocess, "run", fail_run)
+        monkeypatch.setattr(font_initializer, "_check_marker_file", lambda: None)
+        monkeypatch.setattr(font_initializer, "_copy_fonts_to_jre", lambda fonts_dir: [])
+        monkeypatch.setattr(font_initializer, "_create_marker_file", lambda *args: None)
+
+        result = ensure_fonts_initialized()
+
+        assert result["success"] is True
+        assert result["java_home"] == str(tmp_path)
@@ -5,6 +5,11 @@
 - resize_image() - изменение размера изображений
 - convert_to_webp() - конверсия в WebP
 - load_image_from_bytes() - загрузка изображений из байтов
+- read_png_dimensions(), save_png_bytes(), recompress_png() - PNG без перекодирования
+- StreamingPNGWriter - потоковая запись PNG полосами
+- iter_png_strips() - потоковое декодирование PNG полосами
+- select_encoder_profile(), resolve_encoder_profile() - профили кодировщика
+- save_image(lossless_palette=True) - PNG с палитрой и lossless WebP
 """
 
 import io
@@ -15,10 +20,19 @@ from PIL import Image
 
 from src.image_utils import (
     ImageProcessingError,
+    StreamingPNGWriter,
     convert_to_webp,
+    encode_image,
+    iter_png_strips,
     load_image_from_bytes,
+    read_png_dimensions,
+    recompress_png,
+    recompress_png_async,
     resize_image,
+    resolve_encoder_profile,
     save_image,
+    save_png_bytes,
+    select_encoder_profile,
 )
 
 
@@ -108,6 +122,120 @@ class TestSaveImage:
         assert loaded.mode == "RGB"
 
 
+class TestEncodeImage:
+    """Тесты кодирования изображения в памяти."""
+
+    @pytest.mark.parametrize("format", ["webp", "png", "jpeg"])
+    def test_matches_saved_file(self, test_image, output_dir, format):
+        """Байты совпадают с файлом save_image с теми же параметрами."""
+        output_path = output_dir / f"test.{format}"
+        save_image(test_image, output_path, format=format)
+
+        assert encode_image(test_image, format) == output_path.read_bytes()
+
+    def test_unsupported_format(self, test_image):
+        """Неподдерживаемый формат вызывает ImageProcessingError."""
+        with pytest.raises(ImageProcessingError):
+            encode_image(test_image, "bmp")
+
+
+class TestEncoderProfiles:
+    """Тесты профилей кодировщика."""
+
+    def test_auto_fits_budget(self):
+        """auto выбирает самый компактный профиль в пределах бюджета."""
+        assert select_encoder_profile(1_000_000, "webp", 1000) == "smallest"
+        assert select_encoder_profile(8_000_000, "webp", 1000) == "balanced"
+        assert select_encoder_profile(50_000_000, "webp", 1000) == "fast"
+        assert select_encoder_profile(8_000_000, "jpg", 1000) == "smallest"
+
+    def test_unknown_profile(self):
+        """Неизвестный профиль отклоняется."""
+        with pytest.raises(ImageProcessingError, match="профиль"):
+            resolve_encoder_profile("turbo", 100, "png")
+
+    @pytest.mark.parametrize("profile", ["fast", "balanced", "smallest"])
+    def test_png_profiles_lossless(self, profile, tmp_path):
+        """Все профили PNG сохраняют пиксели без потерь и сообщают профиль."""
+        image = Image.effect_noise((64, 64), 40).convert("RGB")
+
+        result = save_image(image, tmp_path / "noise.png", "png", encoder_profile=profile)
+
+        assert result["encoder_profile"] == profile
+        assert result["encode_ms"] >= 0
+        with Image.open(result["path"]) as saved:
+            assert saved.tobytes() == image.tobytes()
+
+    def test_auto_resolved_in_result(self, test_image, tmp_path):
+        """Для auto в результате указан выбранный профиль."""
+        result = save_image(test_image, tmp_path / "auto.webp", "webp", encoder_profile="auto")
+
+        assert result["encoder_profile"] == "smallest"
+
+
+class TestLosslessPalette:
+    """Тесты вывода без потерь с палитрой."""
+
+    @staticmethod
+    def _flat_image() -> Image.Image:
+        """Изображение из нескольких цветов, как фон и текст без сглаживания."""
+        image = Image.new("RGB", (300, 200), (39, 40, 34))
+        for row in range(0, 200, 20):
+            image.paste((248, 248, 242), (10, row, 250, row + 8))
+            image.paste((166, 226, 46), (10, row + 10, 120, row + 14))
+        return image
+
+    def test_palette_png_identical_and_smaller(self, tmp_path):
+        """PNG с палитрой совпадает с исходником и меньше обычного."""
+        image = self._flat_image()
+        plain = save_image(image, tmp_path / "plain.png", "png")
+
+        result = save_image(image, tmp_path / "palette.png", "png", lossless_palette=True)
+
+        assert result["palette_applied"] is True
+        assert result["color_count"] == 3
+        assert result["size_bytes"] < plain["size_bytes"]
+        with Image.open(result["path"]) as saved:
+            assert saved.mode == "P"
+            assert saved.convert("RGB").tobytes() == image.tobytes()
+
+    def test_size_matches_written_bytes(self, tmp_path):
+        """size_bytes равен длине записанного файла, а не позиции потока."""
+        result = save_image(
+            self._flat_image(), tmp_path / "palette.png", "png", lossless_palette=True
+        )
+
+        assert result["palette_applied"] is True
+        assert result["size_bytes"] == len((tmp_path / "palette.png").read_bytes())
+
+    def test_webp_lossless_exact_for_many_colors(self, tmp_path):
+        """Lossless WebP точен и при числе цветов больше 256."""
+        image = Image.merge(
+            "RGB", [Image.effect_noise((64, 64), sigma) for sigma in (20, 40, 60)]
+        )
+
+        result = save_image(image, tmp_path / "noise.webp", "webp", lossless_palette=True)
+
+        assert result["color_count"] is None
+        if result["palette_applied"]:
+            with Image.open(result["path"]) as saved:
+                assert saved.convert("RGB").tobytes() == image.tobytes()
+
+    def test_jpeg_not_applicable(self, tmp_path):
+        """Для JPEG вариант без потерь не строится."""
+        result = save_image(
+            self._flat_image(), tmp_path / "flat.jpg", "jpeg", lossless_palette=True
+        )
+
+        assert result["palette_applied"] is False
+
+    def test_fields_absent_by_default(self, test_image, tmp_path):
+        """Без lossless_palette поля палитры не возвращаются."""
+        result = save_image(test_image, tmp_path / "plain.png", "png")
+
+        assert "palette_applied" not in result
+
+
 class TestResizeImage:
     """Тесты для функции resize_image."""
 
@@ -242,6 +370,122 @@ class TestLoadImageFromBytes:
             load_image_from_bytes(b"", source_format="png")
 
 
+class TestPngPassthrough:
+    """Тесты записи PNG без декодирования."""
+
+    @staticmethod
+    def _png_bytes(image: Image.Image, **save_kwargs) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", **save_kwargs)
+        return buffer.getvalue()
+
+    def test_read_png_dimensions(self):
+        """Размеры читаются из заголовка IHDR."""
+        png_bytes = self._png_bytes(Image.new("RGB", (123, 45)))
+
+        assert read_png_dimensions(png_bytes) == (123, 45)
+        assert read_png_dimensions(png_bytes[:24]) == (123, 45)
+
+    def test_read_png_dimensions_invalid(self):
+        """Не-PNG данные отклоняются."""
+        with pytest.raises(ImageProcessingError):
+            read_png_dimensions(b"GIF89a" + b"\x00" * 30)
+
+    def test_save_png_bytes_writes_bytes_as_is(self, test_image, tmp_path):
+        """Файл совпадает с исходными байтами побайтно."""
+        png_bytes = self._png_bytes(test_image)
+        output_path = tmp_path / "nested" / "diagram.png"
+
+        result = save_png_bytes(png_bytes, output_path)
+
+        assert output_path.read_bytes() == png_bytes
+        assert result["dimensions"] == (100, 100)
+        assert result["size_bytes"] == len(png_bytes)
+        assert result["format"] == "png"
+
+    def test_recompress_png_shrinks_losslessly(self, tmp_path):
+        """Пережатие уменьшает несжатый PNG и сохраняет пиксели."""
+        image = Image.new("RGB", (200, 200), color=(10, 20, 30))
+        path = tmp_path / "raw.png"
+        path.write_bytes(self._png_bytes(image, compress_level=0))
+        original_size = path.stat().st_size
+
+        new_size = recompress_png_async(path).result(timeout=10)
+
+        assert new_size < original_size
+        with Image.open(path) as recompressed:
+            assert recompressed.tobytes() == image.tobytes()
+
+    def test_recompress_png_keeps_smaller_original(self, tmp_path):
+        """Если пережатие не помогает, исходный файл не меняется."""
+        path = tmp_path / "optimized.png"
+        path.write_bytes(
+            self._png_bytes(Image.new("RGB", (50, 50)), optimize=True)
+        )
+        original = path.read_bytes()
+
+        recompress_png(path)
+
+        assert path.read_bytes() == original
+
+
+class TestIterPngStrips:
+    """Тесты декодирования PNG полосами."""
+
+    @pytest.mark.parametrize("mode", ["RGB", "RGBA", "P", "L"])
+    def test_strips_match_full_decode(self, mode):
+        """Полосы совпадают с изображением при всех фильтрах строк."""
+        image = Image.merge(
+            "RGB", [Image.effect_noise((97, 203), sigma) for sigma in (20, 40, 60)]
+        )
+        image = image.quantize(64) if mode == "P" else image.convert(mode)
+        buffer = io.BytesIO()
+        # optimize подбирает фильтры Up/Average/Paeth, зависящие от строки выше
+        image.save(buffer, format="PNG", optimize=True)
+
+        strips = list(iter_png_strips(buffer.getvalue(), strip_height=50))
+
+        assert [strip.height for strip in strips] == [50, 50, 50, 50, 3]
+        top = 0
+        for strip in strips:
+            expected = image.crop((0, top, image.width, top + strip.height))
+            assert strip.convert("RGBA").tobytes() == expected.convert("RGBA").tobytes()
+            top += strip.height
+
+
+class TestStreamingPNGWriter:
+    """Тесты потоковой записи PNG."""
+
+    def test_strips_round_trip(self, tmp_path):
+        """Склеенные полосы читаются как исходное изображение."""
+        source = Image.radial_gradient("L").convert("RGB").resize((40, 30))
+        output_path = tmp_path / "stream.png"
+
+        with StreamingPNGWriter(output_path, 40, 30) as writer:
+            for top, bottom in ((0, 7), (7, 20), (20, 30)):
+                writer.write(source.crop((0, top, 40, bottom)))
+
+        with Image.open(output_path) as result:
+            assert result.size == (40, 30)
+            assert list(result.convert("RGB").getdata()) == list(source.getdata())
+
+    def test_incomplete_image_removed(self, tmp_path):
+        """При ошибке недописанный файл удаляется."""
+        output_path = tmp_path / "partial.png"
+
+        with pytest.raises(ImageProcessingError):
+            with StreamingPNGWriter(output_path, 10, 10) as writer:
+                writer.write(Image.new("RGB", (10, 4)))
+
+        assert not output_path.exists()
+
+    def test_strip_width_mismatch(self, tmp_path):
+        """Полоса другой ширины отклоняется."""
+        with pytest.raises(ImageProcessingError):
+            with StreamingPNGWriter(tmp_path / "bad.png", 10, 10) as writer:
+                writer.write(Image.new("RGB", (9, 10)))
+
+
 class TestIntegration:
     """Интеграционные тесты для комбинации функций."""
 
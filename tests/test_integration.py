@@ -9,13 +9,14 @@
 - Интеграцию всех модулей системы
 """
 
+import json
 import pytest
 from pathlib import Path
 import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.code_to_image import create_code_image
+from src.code_to_image import create_code_image, create_code_screenshot_variants
 from src.code_extractor import extract_code_entity
 from src.diagram_renderer import render_diagram_from_string
 from src.image_utils import convert_to_webp
@@ -146,6 +147,40 @@ class TestCodeScreenshotsWorkflow:
         assert "def create_order" in code
 
 
+class TestCodeScreenshotVariants:
+    """Тесты вариантов скриншота для нескольких плотностей."""
+
+    CODE = "def add(a, b):\n    return a + b\n"
+
+    def test_variants_from_single_render(self, tmp_path):
+        """Варианты @1x/@2x/@3x и манифест из одного рендера."""
+        result = create_code_screenshot_variants(
+            self.CODE, "python", tmp_path / "add.png", [1.0, 3.0, 2.0], format="png"
+        )
+
+        assert [item["scale"] for item in result["variants"]] == [3.0, 2.0, 1.0]
+        largest, middle, smallest = (item["dimensions"] for item in result["variants"])
+        # 3x -> 1x через reduce: ровно в 3 раза с округлением вверх
+        assert smallest == (-(-largest[0] // 3), -(-largest[1] // 3))
+        assert middle == (int(largest[0] * 2 / 3), int(largest[1] * 2 / 3))
+
+        for item in result["variants"]:
+            with Image.open(item["path"]) as saved:
+                assert saved.size == item["dimensions"]
+        assert Path(result["variants"][2]["path"]).name == "add@1x.png"
+
+        manifest = json.loads(Path(result["manifest_path"]).read_text(encoding="utf-8"))
+        assert manifest["rendered_scale"] == 3.0
+        assert [item["path"] for item in manifest["variants"]] == [
+            item["path"] for item in result["variants"]
+        ]
+
+    def test_invalid_scales(self, tmp_path):
+        """Пустой список масштабов отклоняется."""
+        with pytest.raises(ValueError, match="масштабы"):
+            create_code_screenshot_variants(self.CODE, "python", tmp_path / "add.png", [])
+
+
 class TestPlantUMLDiagramsWorkflow:
     """Интеграционные тесты PlantUML диаграмм."""
 
@@ -0,0 +1,123 @@
+"""Тесты для модуля java_runtime."""
+
+import pytest
+
+import src.java_runtime as java_runtime
+from src.java_runtime import (
+    JavaRuntime,
+    _build_runtime,
+    _parse_major_version,
+    add_invalidation_listener,
+    get_java_runtime,
+    invalidate_java_runtime,
+)
+
+SETTINGS_OUTPUT = """Picked up JAVA_TOOL_OPTIONS: -Dfile.encoding=UTF-8
+Property settings:
+    file.encoding = UTF-8
+    java.home = {java_home}
+    java.vendor = Eclipse Adoptium
+    os.arch = amd64
+
+openjdk version "17.0.9" 2023-10-17
+OpenJDK Runtime Environment Temurin-17.0.9+9 (build 17.0.9+9)
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_runtime_cache():
+    """Сбрасывает глобальный кеш до и после каждого теста."""
+    java_runtime._runtime = None
+    java_runtime._recheck_thread = None
+    yield
+    java_runtime._runtime = None
+    java_runtime._recheck_thread = None
+
+
+@pytest.fixture
+def probe_calls(monkeypatch):
+    """Подменяет пробу Java и считает её вызовы."""
+    calls = []
+
+    def fake_probe():
+        calls.append(1)
+        return JavaRuntime(
+            version_line=f'openjdk version "17.0.{len(calls)}"',
+            major_version=17,
+            java_home=None,
+        )
+
+    monkeypatch.setattr(java_runtime, "_probe_java", fake_probe)
+    return calls
+
+
+class TestParsing:
+    """Тесты разбора вывода пробы."""
+
+    @pytest.mark.parametrize(
+        "version_line, expected",
+        [
+            ('java version "1.8.0_292"', 8),
+            ('openjdk version "11.0.21" 2023-10-17', 11),
+            ('openjdk version "21" 2023-09-19', 21),
+            ("garbage", 0),
+        ],
+    )
+    def test_parse_major_version(self, version_line, expected):
+        """Основная версия извлекается для старой и новой схемы нумерации."""
+        assert _parse_major_version(version_line) == expected
+
+    def test_build_runtime_from_settings(self, tmp_path):
+        """Версия, java.home и возможности извлекаются из одной пробы."""
+        runtime = _build_runtime(SETTINGS_OUTPUT.format(java_home=tmp_path))
+
+        assert runtime.version_line.startswith('openjdk version "17.0.9"')
+        assert runtime.major_version == 17
+        assert runtime.java_home == tmp_path
+        assert runtime.capabilities["vendor"] == "Eclipse Adoptium"
+        assert runtime.capabilities["arch"] == "amd64"
+        assert runtime.capabilities["supported"] is True
+
+    def test_build_runtime_without_version_fails(self):
+        """Вывод без строки версии считается ошибкой окружения."""
+        with pytest.raises(java_runtime.JavaNotFoundError):
+            _build_runtime("Property settings:\n    os.arch = amd64\n")
+
+
+class TestCaching:
+    """Тесты кеширования описания Java."""
+
+    def test_probe_runs_once(self, probe_calls):
+        """Повторные вызовы не запускают Java."""
+        first = get_java_runtime()
+        second = get_java_runtime()
+
+        assert first is second
+        assert len(probe_calls) == 1
+
+    def test_invalidate_reprobes_and_notifies(self, probe_calls):
+        """Инвалидация вызывает обработчики и новую пробу."""
+        notified = []
+        add_invalidation_listener(lambda: notified.append(1))
+
+        get_java_runtime()
+        invalidate_java_runtime()
+        runtime = get_java_runtime()
+
+        assert notified
+        assert len(probe_calls) == 2
+        assert runtime.version_line.endswith('17.0.2"')
+
+    def test_stale_runtime_rechecked_in_background(self, probe_calls, monkeypatch):
+        """Устаревшее описание возвращается сразу, проба идёт в фоне."""
+        first = get_java_runtime()
+        monkeypatch.setattr(java_runtime, "JAVA_RUNTIME_RECHECK_INTERVAL", -1)
+
+        assert get_java_runtime() is first
+        recheck_thread = java_runtime._recheck_thread
+        if recheck_thread is not None:
+            recheck_thread.join(timeout=5)
+
+        monkeypatch.setattr(java_runtime, "JAVA_RUNTIME_RECHECK_INTERVAL", 300)
+        assert len(probe_calls) == 2
+        assert get_java_runtime().version_line.endswith('17.0.2"')
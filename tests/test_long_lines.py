@@ -0,0 +1,156 @@
+"""Тесты для переноса и обрезки длинных строк кода."""
+
+import pytest
+
+from src.code_to_image import create_code_image, create_code_screenshot_bytes
+from src.long_lines import (
+    CONTINUATION_MARKER,
+    ELLIPSIS,
+    REPORT_MAX_LINES,
+    apply_long_line_policy,
+)
+from src.tiled_renderer import render_code_tiled
+
+# Минифицированная строка: 30 * 7 = 210 колонок
+MINIFIED = "var a=[" + ",".join(f"{i:05d}" for i in range(30)) + "];"
+CODE = f"// bundle\n{MINIFIED}\nconsole.log(a);\n"
+
+
+class TestApplyLongLinePolicy:
+    """Тесты подготовки кода."""
+
+    def test_wrap_splits_and_labels(self):
+        """Строка переносится по колонкам, продолжения помечаются в подписях."""
+        prepared = apply_long_line_policy(CODE, "wrap", 80)
+        lines = prepared.code.splitlines()
+
+        assert all(len(line) <= 80 for line in lines)
+        assert "".join(lines[1:4]) == MINIFIED
+        assert prepared.line_labels == [
+            "1",
+            "2",
+            CONTINUATION_MARKER,
+            CONTINUATION_MARKER,
+            "3",
+        ]
+        assert prepared.wrapped == [2]
+        assert prepared.truncated == []
+
+    def test_truncate_with_ellipsis(self):
+        """Строка обрезается до предела с многоточием, нумерация не меняется."""
+        prepared = apply_long_line_policy(CODE, "truncate", 80)
+        lines = prepared.code.splitlines()
+
+        assert len(lines) == 3
+        assert len(lines[1]) == 80
+        assert lines[1].endswith(ELLIPSIS)
+        assert prepared.line_labels is None
+        assert prepared.report() == {
+            "policy": "truncate",
+            "max_columns": 80,
+            "wrapped_lines": [],
+            "truncated_lines": [2],
+            "lines_affected": 1,
+        }
+
+    def test_short_code_and_off_unchanged(self):
+        """Короткий код и политика off не меняются."""
+        for policy, columns in (("wrap", 400), ("truncate", 400), ("off", 20)):
+            prepared = apply_long_line_policy(CODE, policy, columns)
+
+            assert prepared.code == CODE
+            assert not prepared.affected
+
+    def test_wrap_row_limit(self):
+        """Перенос ограничен max_rows строками, остаток обрезается."""
+        prepared = apply_long_line_policy("x = '" + "a" * 1000 + "'", "wrap", 50, max_rows=4)
+        lines = prepared.code.splitlines()
+
+        assert len(lines) == 4
+        assert lines[-1].endswith(ELLIPSIS)
+        assert prepared.wrapped == [1]
+        assert prepared.truncated == [1]
+        assert prepared.report()["lines_affected"] == 1
+
+    def test_tabs_counted_as_columns(self):
+        """Табуляция считается по 4 колонки."""
+        # Края строки обрезаются как в лексере, поэтому табуляция внутри
+        code = "x" + "\t" * 10 + "y" * 15
+
+        assert not apply_long_line_policy(code, "wrap", 55).affected
+        assert apply_long_line_policy(code, "truncate", 54).truncated == [1]
+
+    def test_source_line(self):
+        """Строки изображения сопоставляются с исходными строками."""
+        prepared = apply_long_line_policy(CODE, "wrap", 80)
+
+        assert [prepared.source_line(row) for row in range(1, 6)] == [1, 2, 2, 2, 3]
+        assert apply_long_line_policy(CODE, "truncate", 80).source_line(3) == 3
+
+    def test_report_limit(self):
+        """Отчёт содержит не больше REPORT_MAX_LINES номеров строк."""
+        code = "\n".join([MINIFIED] * (REPORT_MAX_LINES + 5))
+
+        report = apply_long_line_policy(code, "truncate", 80).report()
+
+        assert len(report["truncated_lines"]) == REPORT_MAX_LINES
+        assert report["lines_affected"] == REPORT_MAX_LINES + 5
+
+    @pytest.mark.parametrize("policy, columns", [("fold", 80), ("wrap", 5)])
+    def test_invalid_arguments(self, policy, columns):
+        """Неизвестная политика и слишком узкий предел — ошибка."""
+        with pytest.raises(ValueError):
+            apply_long_line_policy(CODE, policy, columns)
+
+
+class TestRendering:
+    """Тесты ширины изображения и ответа с затронутыми строками."""
+
+    def test_width_bounded(self):
+        """Ширина с переносом и обрезкой равна ширине строки в max_columns колонок."""
+        reference = create_code_image("x" * 80, "javascript", scale_factor=1.0)
+
+        wrapped = create_code_image(CODE, "javascript", scale_factor=1.0, max_line_columns=80)
+        truncated = create_code_image(
+            CODE, "javascript", scale_factor=1.0, long_lines="truncate", max_line_columns=80
+        )
+        unbounded = create_code_image(CODE, "javascript", scale_factor=1.0, long_lines="off")
+
+        assert wrapped.width == truncated.width == reference.width
+        assert unbounded.width > reference.width
+        assert wrapped.height > truncated.height == unbounded.height
+
+    def test_screenshot_reports_lines(self):
+        """Скриншот возвращает затронутые строки."""
+        screenshot = create_code_screenshot_bytes(
+            code_string=CODE,
+            language="javascript",
+            scale_factor=1.0,
+            format="png",
+            max_line_columns=80,
+        )
+
+        assert screenshot["long_lines"]["wrapped_lines"] == [2]
+        assert "long_lines" not in create_code_screenshot_bytes(
+            code_string="x = 1", language="python", scale_factor=1.0, format="png"
+        )
+
+    def test_tiled_pages_use_source_lines(self, tmp_path):
+        """Страницы полосового рендеринга нумеруются исходными строками."""
+        result = render_code_tiled(
+            CODE,
+            "javascript",
+            tmp_path / "bundle.png",
+            "pages",
+            format="png",
+            scale_factor=1.0,
+            tile_lines=2,
+            max_line_columns=80,
+        )
+
+        assert [(page["first_line"], page["last_line"]) for page in result["pages"]] == [
+            (1, 2),
+            (2, 2),
+            (3, 3),
+        ]
+        assert result["long_lines"]["wrapped_lines"] == [2]
@@ -0,0 +1,112 @@
+"""Тесты для параллельной растеризации больших файлов."""
+
+import pytest
+from PIL import ImageChops
+
+import src.render_processes as render_processes
+from src.code_to_image import create_code_image
+from src.parallel_renderer import rasterize_parallel, split_code_chunks
+from src.render_processes import shutdown_process_pool
+
+
+@pytest.fixture
+def pool_of_two(monkeypatch):
+    """Пул на два процесса, останавливаемый после теста."""
+    shutdown_process_pool()
+    monkeypatch.setattr(render_processes, "RENDER_PROCESS_WORKERS", 2)
+    yield
+    shutdown_process_pool()
+
+
+PYTHON_CODE = "\n\n".join(
+    f"@decorator\ndef func_{i}(value):\n"
+    f'    """Строка документации\n\n    в несколько строк."""\n'
+    f"    return value + {i}\n"
+    for i in range(12)
+)
+
+JS_CODE = "\n\n".join(
+    f"function f{i}(a) {{\n  /* комментарий\n\n  */\n  return `t${{a}}`;\n}}"
+    for i in range(12)
+)
+
+# Блочный комментарий с пустыми строками: граница фрагмента попадает внутрь него
+JS_COMMENT_CODE = (
+    "/*\n" + "\n\n".join(f"let x{i} = {i};" for i in range(40)) + "\n*/\nlet y = 1;"
+)
+
+
+class TestSplitCodeChunks:
+    """Тесты деления кода на фрагменты."""
+
+    def test_python_splits_at_decorators(self):
+        """Python делится по началу определения верхнего уровня с декоратором."""
+        lines = PYTHON_CODE.split("\n")
+        chunks = split_code_chunks(lines, "python", chunk_lines=20)
+
+        assert len(chunks) > 1
+        assert chunks[0][0] == 0 and chunks[-1][1] == len(lines)
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            assert end == start
+            assert lines[start] == "@decorator"
+
+    def test_python_ignores_blank_lines_in_strings(self):
+        """Пустые строки внутри docstring не считаются границей."""
+        lines = PYTHON_CODE.split("\n")
+
+        for start, _ in split_code_chunks(lines, "python", chunk_lines=1)[1:]:
+            assert lines[start] == "@decorator"
+
+    def test_other_languages_split_after_blank_lines(self):
+        """Прочие языки делятся по первой непустой строке после пустых."""
+        lines = JS_CODE.split("\n")
+        chunks = split_code_chunks(lines, "javascript", chunk_lines=20)
+
+        assert len(chunks) > 1
+        for start, _ in chunks[1:]:
+            assert not lines[start - 1].strip() and lines[start].strip()
+
+    def test_small_code_single_chunk(self):
+        """Код меньше размера фрагмента не делится."""
+        lines = PYTHON_CODE.split("\n")
+
+        assert split_code_chunks(lines, "python", chunk_lines=1000) == [(0, len(lines))]
+
+
+class TestRasterizeParallel:
+    """Тесты сборки изображения из полос."""
+
+    @pytest.mark.parametrize(
+        "code, language, transparent",
+        [
+            (PYTHON_CODE, "python", False),
+            (JS_CODE, "javascript", False),
+            (JS_COMMENT_CODE, "javascript", False),
+            ("\ufeff\n\nx = 1\r\ny = 2\n\n\n" + PYTHON_CODE, "python", True),
+        ],
+        ids=["python", "javascript", "block_comment", "bom_crlf"],
+    )
+    def test_matches_serial_rendering(self, pool_of_two, code, language, transparent):
+        """Параллельная растеризация совпадает с последовательной попиксельно."""
+        serial = create_code_image(
+            code, language, scale_factor=1.0, transparent=transparent, parallel=False
+        )
+        parallel = rasterize_parallel(
+            code,
+            language,
+            font_size=18,
+            image_pad=25,
+            line_pad=10,
+            transparent=transparent,
+            chunk_lines=20,
+        )
+
+        assert parallel.size == serial.size
+        assert ImageChops.difference(serial, parallel).getbbox() is None
+
+    def test_line_numbers_continue_across_chunks(self):
+        """Нумерация не сбрасывается на границе фрагментов (без пула)."""
+        chunked = rasterize_parallel(JS_CODE, "javascript", font_size=18, chunk_lines=20)
+        single = rasterize_parallel(JS_CODE, "javascript", font_size=18, chunk_lines=1000)
+
+        assert ImageChops.difference(chunked, single).getbbox() is None
@@ -0,0 +1,161 @@
+"""Тесты для пула постоянных процессов PlantUML.
+
+Вместо JVM используется небольшой Python-скрипт, который реализует тот же
+pipe-протокол: читает диаграмму до строки @enduml и печатает результат
+и разделитель из аргумента -pipedelimitor.
+"""
+
+import sys
+import textwrap
+
+import pytest
+
+from src.plantuml_pool import (
+    PlantUMLWorkerError,
+    PlantUMLWorkerPool,
+    PlantUMLWorkerTimeout,
+)
+
+FAKE_PLANTUML = textwrap.dedent(
+    """
+    import os
+    import sys
+    import time
+
+    args = sys.argv[1:]
+    delimiter = args[args.index("-pipedelimitor") + 1]
+    fmt = [a for a in args if a.startswith("-t")][0][2:]
+    rendered = 0
+    lines = []
+
+    for raw in sys.stdin.buffer:
+        line = raw.decode("utf-8").rstrip("\\n")
+        lines.append(line)
+        if not line.startswith("@end"):
+            continue
+
+        source = "\\n".join(lines)
+        lines = []
+        if "CRASH" in source:
+            sys.exit(3)
+        if "HANG" in source:
+            time.sleep(60)
+        rendered += 1
+        if "BAD" in source:
+            out = b"ERROR\\n2\\nSyntax Error?\\n"
+        else:
+            out = f"{fmt}:{os.getpid()}:{rendered}:".encode() + b"\\x89PNG\\r\\n" * 3
+        sys.stdout.buffer.write(out)
+        sys.stdout.buffer.write(delimiter.encode() + b"\\n")
+        sys.stdout.buffer.flush()
+    """
+)
+
+DIAGRAM = "@startuml\nAlice -> Bob\n@enduml"
+
+
+@pytest.fixture
+def fake_command_factory(tmp_path):
+    """Фабрика команд, запускающая эмулятор PlantUML."""
+    script = tmp_path / "fake_plantuml.py"
+    script.write_text(FAKE_PLANTUML, encoding="utf-8")
+
+    def factory(format: str) -> list[str]:
+        return [sys.executable, str(script), f"-t{format}"]
+
+    return factory
+
+
+@pytest.fixture
+def pool(fake_command_factory):
+    """Пул из двух воркеров с перезапуском после трёх диаграмм."""
+    worker_pool = PlantUMLWorkerPool(fake_command_factory, size=2, max_renders=3)
+    yield worker_pool
+    worker_pool.shutdown()
+
+
+def _parse(output: bytes) -> tuple[str, int, int]:
+    fmt, pid, count, _ = output.split(b":", 3)
+    return fmt.decode(), int(pid), int(count)
+
+
+class TestWorkerProtocol:
+    """Тесты pipe-протокола с разделителем."""
+
+    def test_render_returns_output_without_delimiter(self, pool):
+        """Результат не содержит разделитель и перевод строки после него."""
+        output = pool.render(DIAGRAM, "png")
+
+        assert output.endswith(b"\x89PNG\r\n")
+        assert b"CODE_TO_IMAGE" not in output
+
+    def test_worker_is_reused(self, pool):
+        """Последовательные рендеры выполняются одним процессом."""
+        _, first_pid, first_count = _parse(pool.render(DIAGRAM, "png"))
+        _, second_pid, second_count = _parse(pool.render(DIAGRAM, "png"))
+
+        assert first_pid == second_pid
+        assert (first_count, second_count) == (1, 2)
+        assert pool.get_stats()["spawned"] == 1
+
+    def test_error_output_is_returned(self, pool):
+        """Ошибка диаграммы возвращается как текст, процесс остаётся живым."""
+        output = pool.render("@startuml\nBAD\n@enduml", "png")
+
+        assert output.startswith(b"ERROR")
+        assert pool.get_stats()["idle"] == {"png": 1}
+
+    def test_workers_grouped_by_format(self, pool):
+        """Формат вывода задаётся при старте процесса."""
+        png_fmt, png_pid, _ = _parse(pool.render(DIAGRAM, "png"))
+        svg_fmt, svg_pid, _ = _parse(pool.render(DIAGRAM, "svg"))
+
+        assert (png_fmt, svg_fmt) == ("png", "svg")
+        assert png_pid != svg_pid
+
+
+class TestWorkerRecycling:
+    """Тесты перезапуска воркеров."""
+
+    def test_recycled_after_max_renders(self, pool):
+        """После max_renders диаграмм запускается новый процесс."""
+        pids = [_parse(pool.render(DIAGRAM, "png"))[1] for _ in range(4)]
+
+        assert len(set(pids[:3])) == 1
+        assert pids[3] != pids[0]
+
+    def test_recovers_after_crash(self, pool):
+        """Упавший процесс заменяется новым."""
+        with pytest.raises(PlantUMLWorkerError):
+            pool.render("@startuml\nCRASH\n@enduml", "png")
+
+        fmt, _, count = _parse(pool.render(DIAGRAM, "png"))
+        assert fmt == "png"
+        assert count == 1
+
+    def test_timeout_kills_worker(self, pool):
+        """Зависший процесс убивается по таймауту."""
+        with pytest.raises(PlantUMLWorkerTimeout):
+            pool.render("@startuml\nHANG\n@enduml", "png", timeout=0.5)
+
+        assert pool.get_stats()["workers"] == 0
+        assert _parse(pool.render(DIAGRAM, "png"))[2] == 1
+
+    def test_pool_size_limits_processes(self, pool):
+        """При заполненном пуле простаивающий воркер другого формата освобождается."""
+        pool.render(DIAGRAM, "png")
+        pool.render(DIAGRAM, "svg")
+        pool.render(DIAGRAM, "pdf")
+
+        stats = pool.get_stats()
+        assert stats["workers"] == 2
+        assert stats["recycled"] == 1
+
+    def test_shutdown_rejects_new_renders(self, pool):
+        """Остановленный пул не принимает новые диаграммы."""
+        pool.render(DIAGRAM, "png")
+        pool.shutdown()
+
+        assert pool.get_stats()["workers"] == 0
+        with pytest.raises(PlantUMLWorkerError):
+            pool.render(DIAGRAM, "png")
@@ -0,0 +1,107 @@
+"""Тесты для индекса сущностей проекта."""
+
+import os
+
+import pytest
+
+from src.code_extractor import extract_code_entity
+from src.project_index import ProjectIndex, get_project_index
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Небольшое дерево исходников с пакетом и вложенными классами."""
+    root = tmp_path / "project"
+    (root / "shop" / "models").mkdir(parents=True)
+    (root / "shop" / "__init__.py").write_text("", encoding="utf-8")
+    (root / "shop" / "models" / "order.py").write_text(
+        "class Order:\n"
+        "    def validate(self):\n"
+        "        return True\n"
+        "\n"
+        "    class Line:\n"
+        "        def total(self):\n"
+        "            return 0\n",
+        encoding="utf-8",
+    )
+    (root / "shop" / "cart.py").write_text(
+        "def validate(cart):\n    return bool(cart)\n", encoding="utf-8"
+    )
+    (root / ".venv").mkdir()
+    (root / ".venv" / "hidden.py").write_text("class Order:\n    pass\n", encoding="utf-8")
+    return root
+
+
+class TestFind:
+    """Тесты поиска сущностей."""
+
+    def test_reference_forms(self, project):
+        """Сущность находится по ссылке с модулем и по короткому имени."""
+        index = get_project_index(project)
+
+        for query in (
+            "shop.models.order:Order.validate",
+            "shop.models.order.Order.validate",
+            "Order.validate",
+        ):
+            (location,) = index.find(query)
+            assert location.reference == "shop.models.order:Order.validate"
+            assert location.kind == "method"
+            assert (location.lineno, location.end_lineno) == (2, 3)
+
+    def test_hidden_dirs_skipped(self, project):
+        """Скрытые директории (виртуальные окружения) не индексируются."""
+        locations = get_project_index(project).find("Order")
+
+        assert [location.module for location in locations] == ["shop.models.order"]
+
+    def test_nested_qualname_extractable(self, project):
+        """Найденное вложенное имя извлекается из файла."""
+        (location,) = get_project_index(project).find("Order.Line.total")
+
+        code = extract_code_entity(location.path, location.qualname)
+        assert code.strip().startswith("def total(self):")
+
+    def test_ambiguous_name(self, project):
+        """Короткое имя может найти несколько сущностей, ссылка с модулем — одну."""
+        (project / "shop" / "legacy.py").write_text(
+            "def validate(cart):\n    return True\n", encoding="utf-8"
+        )
+        index = get_project_index(project)
+
+        references = {location.reference for location in index.find("validate")}
+
+        assert references == {"shop.cart:validate", "shop.legacy:validate"}
+        assert len(index.find("shop.cart:validate")) == 1
+
+class TestIncrementalUpdate:
+    """Тесты постоянного хранения и инкрементального обновления."""
+
+    def test_only_changed_files_reparsed(self, project, tmp_path):
+        """Повторный обход разбирает только изменённые и новые файлы."""
+        db_path = tmp_path / "index.sqlite3"
+        assert ProjectIndex(project, db_path).refresh()["parsed"] == 3
+
+        cart = project / "shop" / "cart.py"
+        cart.write_text("def checkout(cart):\n    return cart\n", encoding="utf-8")
+        stat = cart.stat()
+        os.utime(cart, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        # Новый экземпляр читает индекс с диска
+        index = ProjectIndex(project, db_path)
+        stats = index.refresh()
+
+        assert stats["parsed"] == 1
+        assert index.find("shop.cart:checkout")
+        assert not index.find("shop.cart:validate")
+
+    def test_stale_result_refreshed(self, project):
+        """Изменённый после обхода файл переиндексируется при поиске."""
+        index = get_project_index(project)
+        index.find("Order")
+
+        order = project / "shop" / "models" / "order.py"
+        order.write_text("\n\nclass Order:\n    pass\n", encoding="utf-8")
+
+        (location,) = index.find("Order")
+        assert location.lineno == 3
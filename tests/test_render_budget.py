@@ -0,0 +1,164 @@
+"""Тесты для предварительной оценки стоимости рендеринга и бюджетов."""
+
+import pytest
+
+from src.code_to_image import create_code_screenshot_bytes
+from src.render_budget import (
+    RenderBudgetError,
+    check_render_budget,
+    count_diagram_elements,
+    estimate_code_render,
+    estimate_diagram_render,
+    fit_render_budget,
+)
+from tests.benchmarks.bench_code_screenshots import make_snippet
+from tests.benchmarks.bench_plantuml import make_class_diagram, make_sequence_diagram
+
+
+class TestEstimateCodeRender:
+    """Тесты оценки скриншота кода."""
+
+    @pytest.mark.parametrize(
+        "language, lines, scale_factor, line_numbers",
+        [("python", 40, 2.0, True), ("javascript", 25, 1.0, False), ("sql", 30, 3.0, True)],
+    )
+    def test_dimensions_match_render(self, language, lines, scale_factor, line_numbers):
+        """Размеры оценки совпадают с размерами отрисованного изображения."""
+        code = make_snippet(language, lines) + "\tvalue = 1\t# табуляция\n"
+
+        estimate = estimate_code_render(
+            code, scale_factor, line_numbers=line_numbers, format="png"
+        )
+        screenshot = create_code_screenshot_bytes(
+            code_string=code,
+            language=language,
+            scale_factor=scale_factor,
+            line_numbers=line_numbers,
+            format="png",
+        )
+
+        assert estimate["dimensions"] == screenshot["dimensions"]
+
+    def test_memory_and_time_grow_with_level(self):
+        """Память и время растут с уровнем детализации."""
+        code = make_snippet("python", 50)
+
+        low = estimate_code_render(code, 1.0)
+        high = estimate_code_render(code, 3.0)
+
+        assert high["megapixels"] > low["megapixels"] * 8
+        assert high["peak_memory_mb"] > low["peak_memory_mb"]
+        assert high["estimated_ms"]["total"] > low["estimated_ms"]["total"]
+        assert high["detail_level"] == "High"
+
+    def test_webp_side_limit_warning(self):
+        """Сторона больше предела WebP попадает в предупреждения и бюджет."""
+        estimate = estimate_code_render(make_snippet("python", 400), 3.0, format="webp")
+
+        assert estimate["warnings"]
+        assert check_render_budget(estimate, max_megapixels=0, max_memory_mb=0)
+        assert not estimate_code_render(make_snippet("python", 400), 3.0, format="png")[
+            "warnings"
+        ]
+
+
+class TestEstimateDiagramRender:
+    """Тесты оценки диаграмм PlantUML."""
+
+    def test_count_class_diagram(self):
+        """Классы, связи и члены считаются по исходнику."""
+        structure = count_diagram_elements(make_class_diagram(12))
+
+        assert structure["kind"] == "graph"
+        assert structure["nodes"] == 12
+        assert structure["edges"] == 11
+        assert structure["members"] == 12 * 4
+        assert structure["containers"] == 2
+
+    def test_count_sequence_diagram(self):
+        """Участники и сообщения диаграммы последовательностей."""
+        structure = count_diagram_elements(make_sequence_diagram(10))
+
+        assert structure["kind"] == "sequence"
+        assert structure["nodes"] == 8
+        assert structure["edges"] >= 20
+
+    def test_size_grows_with_structure(self):
+        """Больше сообщений — выше диаграмма."""
+        small = estimate_diagram_render(make_sequence_diagram(10), 1.0)
+        large = estimate_diagram_render(make_sequence_diagram(100), 1.0)
+
+        assert large["dimensions"][1] > small["dimensions"][1] * 5
+        assert large["dimensions"][0] == small["dimensions"][0]
+
+    def test_png_and_deep_zoom_memory(self):
+        """PNG пишется без декодирования, плитки Deep Zoom — полосами."""
+        code = make_sequence_diagram(150)
+
+        png = estimate_diagram_render(code, 6.0, "png", "single")
+        webp = estimate_diagram_render(code, 6.0, "webp", "single")
+        tiles = estimate_diagram_render(code, 6.0, "webp", "auto")
+
+        assert png["peak_memory_mb"] == 0
+        assert webp["peak_memory_mb"] > webp["canvas_mb"]
+        assert tiles["output_mode"] == "deep_zoom"
+        assert tiles["peak_memory_mb"] < webp["peak_memory_mb"] / 10
+        assert check_render_budget(tiles, max_megapixels=1, max_memory_mb=1024) == []
+
+    def test_vector_formats(self):
+        """Для svg размеры и память не оцениваются."""
+        estimate = estimate_diagram_render(make_class_diagram(5), 3.0, "svg")
+
+        assert estimate["dimensions"] is None
+        assert check_render_budget(estimate, max_megapixels=1, max_memory_mb=1) == []
+
+
+class TestFitRenderBudget:
+    """Тесты подбора уровня под бюджет."""
+
+    @staticmethod
+    def _estimate_for(scale: float) -> dict:
+        return {"megapixels": 10 * scale * scale, "peak_memory_mb": 40 * scale * scale}
+
+    def test_downgrade_to_first_fitting_level(self):
+        """Уровень понижается до первого, который укладывается в бюджет."""
+        budget = fit_render_budget(
+            self._estimate_for, "Extreme", "downgrade", max_megapixels=50, max_memory_mb=0
+        )
+
+        assert budget["downgraded"] is True
+        assert budget["requested_level"] == "Extreme"
+        assert budget["detail_level"] == "Medium"
+        assert budget["scale_factor"] == 2.0
+
+    def test_reject(self):
+        """Политика reject не понижает уровень."""
+        with pytest.raises(RenderBudgetError) as error:
+            fit_render_budget(
+                self._estimate_for, "High", "reject", max_megapixels=50, max_memory_mb=0
+            )
+
+        assert error.value.exceeded == ["90.0 MP > 50 MP"]
+
+    def test_rejected_even_at_low(self):
+        """Запрос, не укладывающийся и в Low, отклоняется."""
+        with pytest.raises(RenderBudgetError):
+            fit_render_budget(
+                self._estimate_for, "High", "downgrade", max_megapixels=0, max_memory_mb=20
+            )
+
+    def test_off_skips_estimate(self):
+        """Политика off не оценивает запрос."""
+
+        def fail(scale: float) -> dict:
+            raise AssertionError("оценка не нужна")
+
+        budget = fit_render_budget(fail, "ultra", "off")
+
+        assert budget["detail_level"] == "Ultra"
+        assert budget["estimate"] is None
+
+    def test_unknown_policy(self):
+        """Неизвестная политика — ошибка."""
+        with pytest.raises(ValueError):
+            fit_render_budget(self._estimate_for, "High", "maybe")
@@ -0,0 +1,289 @@
+"""Тесты для кеша результатов рендеринга (память + диск)."""
+
+import os
+
+import pytest
+
+from src.code_to_image import (
+    create_code_screenshot,
+    create_code_screenshot_bytes,
+    create_code_screenshots_batch,
+)
+from src.render_cache import RenderCache, detach_shared_file, get_render_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Раздел кеша на 1 KB."""
+    return RenderCache(tmp_path / "cache", max_bytes=1024)
+
+
+def _make_file(path, size: int, fill: bytes = b"x"):
+    path.write_bytes(fill * size)
+    return path
+
+
+class TestKeys:
+    """Тесты построения ключей."""
+
+    def test_key_is_stable_and_order_sensitive(self):
+        """Одинаковые части дают одинаковый ключ, порядок важен."""
+        assert RenderCache.make_key("a", 1) == RenderCache.make_key("a", 1)
+        assert RenderCache.make_key("a", 1) != RenderCache.make_key(1, "a")
+
+    def test_parts_are_not_concatenated(self):
+        """Границы частей учитываются: ('ab', 'c') != ('a', 'bc')."""
+        assert RenderCache.make_key("ab", "c") != RenderCache.make_key("a", "bc")
+
+
+class TestStoreAndFetch:
+    """Тесты сохранения и выдачи записей."""
+
+    def test_miss_returns_none(self, cache, tmp_path):
+        """Отсутствующая запись считается промахом."""
+        assert cache.fetch("0" * 64, tmp_path / "out.png") is None
+        assert cache.get_stats()["misses"] == 1
+
+    def test_roundtrip(self, cache, tmp_path):
+        """Сохранённый файл и метаданные возвращаются при попадании."""
+        source = _make_file(tmp_path / "src.png", 100)
+        key = RenderCache.make_key("diagram")
+        cache.store(key, source, {"format": "png"})
+
+        output = tmp_path / "nested" / "out.png"
+        metadata = cache.fetch(key, output)
+
+        assert metadata == {"format": "png"}
+        assert output.read_bytes() == source.read_bytes()
+        assert cache.get_stats()["hits"] == 1
+
+    def test_fetch_replaces_existing_output(self, cache, tmp_path):
+        """Существующий выходной файл перезаписывается."""
+        key = RenderCache.make_key("diagram")
+        cache.store(key, _make_file(tmp_path / "src.png", 10, b"a"), {})
+        output = _make_file(tmp_path / "out.png", 50, b"b")
+
+        cache.fetch(key, output)
+
+        assert output.read_bytes() == b"a" * 10
+
+    def test_miss_keeps_existing_output(self, cache, tmp_path):
+        """Промах из-за вытесненного файла записи не удаляет прежний выходной файл."""
+        key = RenderCache.make_key("diagram")
+        cache.store(key, _make_file(tmp_path / "src.png", 10, b"a"), {})
+        cache._data_path(key).unlink()
+        output = _make_file(tmp_path / "out.png", 50, b"b")
+
+        assert cache.fetch(key, output) is None
+        assert output.read_bytes() == b"b" * 50
+        assert [path.name for path in tmp_path.iterdir() if path.name.startswith(".tmp-")] == []
+
+    def test_size_counted_once(self, cache, tmp_path):
+        """Первая запись и перезапись ключа учитываются в размере раздела один раз."""
+        key = RenderCache.make_key("diagram")
+        cache.store(key, _make_file(tmp_path / "a.png", 100), {})
+        assert cache.get_stats()["size_bytes"] == 100
+
+        cache.store(key, _make_file(tmp_path / "b.png", 200), {})
+        cache.store(RenderCache.make_key("other"), _make_file(tmp_path / "c.png", 50), {})
+
+        assert cache.get_stats()["size_bytes"] == 250
+
+    def test_failed_store_leaves_no_temp_files(self, cache, tmp_path):
+        """Ошибка записи не оставляет временных файлов в директории кеша."""
+        key = RenderCache.make_key("diagram")
+        cache.store(key, tmp_path / "missing.png", {})
+
+        assert [path for path in cache.cache_dir.rglob("*") if path.is_file()] == []
+        assert cache.fetch(key, tmp_path / "out.png") is None
+
+    def test_lru_eviction(self, cache, tmp_path):
+        """При превышении лимита удаляются давно не использованные записи."""
+        keys = [RenderCache.make_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.store(key, _make_file(tmp_path / f"{i}.bin", 400), {})
+            # Разносим mtime записей, чтобы порядок LRU был детерминированным
+            data_path = cache._data_path(key)
+            os.utime(data_path, (1000 + i, 1000 + i))
+            if i == 1:
+                # Обращение к первой записи делает её свежей
+                cache.fetch(keys[0], tmp_path / "touch.bin")
+
+        assert cache.fetch(keys[1], tmp_path / "a.bin") is None
+        assert cache.fetch(keys[0], tmp_path / "b.bin") is not None
+        assert cache.fetch(keys[2], tmp_path / "c.bin") is not None
+        assert cache.get_stats()["size_bytes"] <= 1024
+
+
+class TestMemoryTier:
+    """Тесты уровня кеша в памяти."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Раздел кеша на 1 KB диска и 500 байт памяти."""
+        return RenderCache(tmp_path / "cache", max_bytes=1024, memory_max_bytes=500)
+
+    def test_hit_served_from_memory(self, cache, tmp_path):
+        """Свежая запись отдаётся из памяти, даже если файл на диске удалён."""
+        key = RenderCache.make_key("screenshot")
+        cache.store(key, _make_file(tmp_path / "src.webp", 100), {"dimensions": (1, 2)})
+        cache._data_path(key).unlink()
+
+        output = tmp_path / "out.webp"
+        metadata = cache.fetch(key, output)
+
+        assert metadata == {"dimensions": [1, 2]}
+        assert output.read_bytes() == b"x" * 100
+        assert cache.get_stats()["memory_hits"] == 1
+
+    def test_memory_budget(self, cache, tmp_path):
+        """Память ограничена бюджетом, вытесненная запись берётся с диска."""
+        keys = [RenderCache.make_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.store(key, _make_file(tmp_path / f"{i}.bin", 200), {})
+
+        stats = cache.get_stats()
+        assert stats["memory_entries"] == 2
+        assert stats["memory_size_bytes"] <= 500
+
+        assert cache.fetch(keys[0], tmp_path / "out.bin") is not None
+        assert cache.get_stats()["memory_hits"] == 0
+        # Запись с диска поднимается в память
+        assert cache.fetch(keys[0], tmp_path / "out.bin") is not None
+        assert cache.get_stats()["memory_hits"] == 1
+
+    def test_clear_drops_memory(self, cache, tmp_path):
+        """Очистка удаляет записи и из памяти."""
+        key = RenderCache.make_key("screenshot")
+        cache.store(key, _make_file(tmp_path / "src.webp", 10), {})
+
+        cache.clear()
+
+        assert cache.fetch(key, tmp_path / "out.webp") is None
+        assert cache.get_stats()["memory_entries"] == 0
+
+
+class TestBytesEntries:
+    """Тесты записей, сохраняемых и отдаваемых байтами."""
+
+    def test_bytes_roundtrip_and_file_fetch(self, cache, tmp_path):
+        """Записанные байты отдаются байтами и файлом."""
+        key = RenderCache.make_key("inline")
+        cache.store_bytes(key, b"image", {"format": "png"})
+
+        assert cache.fetch_bytes(key) == (b"image", {"format": "png"})
+        assert cache.fetch(key, tmp_path / "out.png") == {"format": "png"}
+        assert (tmp_path / "out.png").read_bytes() == b"image"
+
+    def test_fetch_bytes_miss(self, cache):
+        """Промах считается и возвращает None."""
+        assert cache.fetch_bytes(RenderCache.make_key("missing")) is None
+        assert cache.get_stats()["misses"] == 1
+
+
+class TestScreenshotCache:
+    """Тесты кеша скриншотов кода."""
+
+    def test_repeated_screenshot_is_cache_hit(self, tmp_path):
+        """Повторный запрос с теми же параметрами отдаётся из кеша."""
+        options = {"scale_factor": 1.0, "format": "png"}
+
+        first = create_code_screenshot("x = 1", "python", tmp_path / "a.png", **options)
+        second = create_code_screenshot("x = 1", "python", tmp_path / "b.png", **options)
+
+        assert first["cache_hit"] is False
+        assert second["cache_hit"] is True
+        assert second["output_path"] == str(tmp_path / "b.png")
+        assert (tmp_path / "a.png").read_bytes() == (tmp_path / "b.png").read_bytes()
+
+    def test_output_path_same_on_hit_and_miss(self, tmp_path, monkeypatch):
+        """Относительный путь возвращается абсолютным и при попадании, и при промахе."""
+        monkeypatch.chdir(tmp_path)
+        options = {"scale_factor": 1.0, "format": "png"}
+
+        miss = create_code_screenshot("x = 1", "python", "out.png", **options)
+        hit = create_code_screenshot("x = 1", "python", "out.png", **options)
+        job = {"code_string": "x = 1", "language": "python", "output_file": "out.png"}
+        batch_hit = create_code_screenshots_batch([{**job, **options}])[0]
+
+        assert hit["cache_hit"] is True
+        assert batch_hit["cache_hit"] is True
+        assert miss["output_path"] == hit["output_path"] == batch_hit["output_path"]
+        assert miss["output_path"] == str((tmp_path / "out.png").resolve())
+
+    def test_options_change_key(self, tmp_path):
+        """Изменение параметров рендеринга даёт промах."""
+        create_code_screenshot("x = 1", "python", tmp_path / "a.png", scale_factor=1.0)
+        result = create_code_screenshot(
+            "x = 1", "python", tmp_path / "b.png", scale_factor=1.0, line_numbers=False
+        )
+
+        assert result["cache_hit"] is False
+
+    def test_bytes_share_entry_with_file(self, tmp_path):
+        """Скриншот в памяти совпадает с файлом и берётся из той же записи."""
+        options = {"scale_factor": 1.0, "format": "webp"}
+
+        inline = create_code_screenshot_bytes("x = 1", "python", **options)
+        saved = create_code_screenshot("x = 1", "python", tmp_path / "a.webp", **options)
+        inline_again = create_code_screenshot_bytes("x = 1", "python", **options)
+
+        assert inline["cache_hit"] is False
+        assert inline["mime_type"] == "image/webp"
+        assert saved["cache_hit"] is True
+        assert (tmp_path / "a.webp").read_bytes() == inline["data"]
+        assert inline_again["cache_hit"] is True
+        assert "output_path" not in inline_again
+
+    def test_encoder_profile_changes_key(self, tmp_path):
+        """Профиль кодировщика входит в ключ и сообщается в результате."""
+        options = {"scale_factor": 1.0, "format": "png"}
+
+        create_code_screenshot("x = 1", "python", tmp_path / "a.png", **options)
+        fast = create_code_screenshot(
+            "x = 1", "python", tmp_path / "b.png", encoder_profile="fast", **options
+        )
+
+        assert fast["cache_hit"] is False
+        assert fast["encoder_profile"] == "fast"
+        assert fast["encode_ms"] >= 0
+
+
+class TestHardlinks:
+    """Тесты выдачи попаданий жёсткой ссылкой."""
+
+    def test_hardlink_and_detach(self, tmp_path):
+        """Попадание связывается жёсткой ссылкой, перед перезаписью — отвязывается."""
+        cache = RenderCache(tmp_path / "cache", max_bytes=1024, use_hardlinks=True)
+        key = RenderCache.make_key("diagram")
+        cache.store(key, _make_file(tmp_path / "src.png", 10), {})
+
+        output = tmp_path / "out.png"
+        cache.fetch(key, output)
+        if output.stat().st_nlink < 2:
+            pytest.skip("Файловая система не поддерживает жёсткие ссылки")
+
+        detach_shared_file(output)
+
+        assert not output.exists()
+        assert cache._data_path(key).read_bytes() == b"x" * 10
+
+
+class TestGetRenderCache:
+    """Тесты получения разделов кеша."""
+
+    def test_namespace_is_shared(self, isolated_render_cache):
+        """Один раздел на процесс, разделы лежат в отдельных директориях."""
+        diagrams = get_render_cache("diagrams")
+
+        assert diagrams is get_render_cache("diagrams")
+        assert diagrams.cache_dir == isolated_render_cache / "diagrams"
+        assert get_render_cache("screenshots").cache_dir != diagrams.cache_dir
+
+    def test_disabled_cache(self, monkeypatch):
+        """Отключённый кеш не создаётся."""
+        import src.render_cache as render_cache
+
+        monkeypatch.setattr(render_cache, "RENDER_CACHE_ENABLED", False)
+
+        assert get_render_cache("diagrams") is None
@@ -0,0 +1,136 @@
+"""Тесты для асинхронного выполнения рендеринга."""
+
+import asyncio
+import inspect
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import src.render_executor as render_executor
+from src.render_executor import (
+    CancelScope,
+    RenderCancelledError,
+    current_cancel_scope,
+    kill_on_cancel,
+    offload_to_executor,
+    run_in_render_executor,
+    shutdown_render_executor,
+)
+
+
+@pytest.fixture(autouse=True)
+def executor_of_two(monkeypatch):
+    """Пул рендеринга на два потока, пересоздаваемый для каждого теста."""
+    shutdown_render_executor()
+    monkeypatch.setattr(render_executor, "RENDER_MAX_CONCURRENCY", 2)
+    yield
+    shutdown_render_executor()
+
+
+class TestCancelScope:
+    """Тесты области отмены."""
+
+    def test_callbacks_run_once(self):
+        """Обработчики вызываются один раз, поздний обработчик — сразу."""
+        scope = CancelScope()
+        calls = []
+        scope.add_callback(lambda: calls.append("early"))
+
+        scope.cancel()
+        scope.cancel()
+        scope.add_callback(lambda: calls.append("late"))
+
+        assert calls == ["early", "late"]
+        with pytest.raises(RenderCancelledError):
+            scope.raise_if_cancelled()
+
+    def test_kill_on_cancel_outside_executor_is_noop(self):
+        """Вне пула рендеринга контекст ничего не регистрирует."""
+        assert current_cancel_scope() is None
+        with kill_on_cancel(lambda: pytest.fail("не должен вызываться")):
+            pass
+
+
+class TestExecutor:
+    """Тесты выполнения в пуле рендеринга."""
+
+    def test_event_loop_not_blocked(self):
+        """Пока идёт блокирующий рендеринг, event loop обрабатывает другие задачи."""
+
+        async def scenario():
+            ticks = []
+
+            async def ticker():
+                for _ in range(5):
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(run_in_render_executor(time.sleep, 0.2), ticker())
+            return ticks
+
+        ticks = asyncio.run(scenario())
+        assert len(ticks) == 5
+        assert ticks[-1] - ticks[0] < 0.2
+
+    def test_concurrency_is_bounded(self):
+        """Одновременно выполняется не больше RENDER_MAX_CONCURRENCY вызовов."""
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        async def scenario():
+            await asyncio.gather(*(run_in_render_executor(work) for _ in range(6)))
+
+        asyncio.run(scenario())
+        assert peak == 2
+
+    def test_cancellation_kills_child_process(self):
+        """Отмена вызова убивает дочерний процесс, не дожидаясь его завершения."""
+        started = threading.Event()
+        finished = threading.Event()
+
+        def render():
+            process = subprocess.Popen(
+                [sys.executable, "-c", "import time; time.sleep(30)"]
+            )
+            with kill_on_cancel(process.kill):
+                started.set()
+                process.wait()
+            finished.set()
+
+        async def scenario():
+            task = asyncio.create_task(run_in_render_executor(render))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        assert finished.wait(timeout=5)
+
+    def test_offload_preserves_signature(self):
+        """Декоратор сохраняет сигнатуру и docstring инструмента."""
+
+        def tool(code: str, scale: int = 2) -> dict:
+            """Документация инструмента."""
+            return {"code": code, "scale": scale}
+
+        wrapped = offload_to_executor(tool)
+
+        assert inspect.iscoroutinefunction(wrapped)
+        assert inspect.signature(wrapped) == inspect.signature(tool)
+        assert wrapped.__doc__ == tool.__doc__
+        assert asyncio.run(wrapped("x")) == {"code": "x", "scale": 2}
@@ -0,0 +1,61 @@
+"""Тесты для параллельного рендеринга в процессах."""
+
+import pytest
+from PIL import Image
+
+import src.render_processes as render_processes
+from src.code_to_image import create_code_screenshots_batch
+from src.render_processes import map_in_processes, shutdown_process_pool
+
+
+@pytest.fixture(autouse=True)
+def pool_of_two(monkeypatch):
+    """Пул на два процесса, останавливаемый после теста."""
+    shutdown_process_pool()
+    monkeypatch.setattr(render_processes, "RENDER_PROCESS_WORKERS", 2)
+    yield
+    shutdown_process_pool()
+
+
+class TestMapInProcesses:
+    """Тесты распределения вызовов по процессам."""
+
+    def test_results_in_order_with_errors(self):
+        """Результаты возвращаются по порядку, ошибка не прерывает остальные."""
+        results = map_in_processes(int, [(("1",), {}), (("x",), {}), (("3",), {})])
+
+        assert [result for result, _ in results] == [1, None, 3]
+        assert isinstance(results[1][1], ValueError)
+
+    def test_single_call_runs_inline(self, monkeypatch):
+        """Один вызов выполняется в текущем процессе без пула."""
+        results = map_in_processes(lambda value: value * 2, [((21,), {})])
+
+        assert results == [(42, None)]
+        assert render_processes._pool is None
+
+
+class TestScreenshotsBatch:
+    """Тесты пакетного рендеринга скриншотов."""
+
+    def test_batch_with_partial_failure(self, tmp_path):
+        """Пакет рендерится параллельно, ошибка одного задания отдельная."""
+        jobs = [
+            {
+                "code_string": f"def f{i}():\n    return {i}\n",
+                "language": "python",
+                "output_file": tmp_path / f"f{i}.png",
+                "scale_factor": 1.0,
+                "format": "png",
+            }
+            for i in range(3)
+        ]
+        jobs[1]["format"] = "bmp"
+
+        results = create_code_screenshots_batch(jobs)
+
+        assert [result["success"] for result in results] == [True, False, True]
+        assert Image.open(tmp_path / "f2.png").size == results[2]["dimensions"]
+
+        again = create_code_screenshots_batch([jobs[0]])
+        assert again[0]["cache_hit"] is True
@@ -0,0 +1,121 @@
+"""Тесты для замеров времени этапов рендеринга."""
+
+import pytest
+
+from src.code_to_image import create_code_image
+from src.render_stats import (
+    LatencyWindow,
+    capture_stages,
+    get_render_stats,
+    instrument_tool,
+    reset_render_stats,
+    stage,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    """Пустая статистика для каждого теста."""
+    reset_render_stats()
+    yield
+    reset_render_stats()
+
+
+@instrument_tool
+def fake_tool(code: str, detail_level: str = "High") -> dict:
+    """Инструмент с двумя этапами."""
+    with stage("lex"):
+        pass
+    with stage("rasterize"):
+        pass
+    return {"success": code != "bad"}
+
+
+class TestLatencyWindow:
+    """Тесты скользящего окна длительностей."""
+
+    def test_percentiles(self):
+        """Перцентили считаются по ближайшему рангу."""
+        window = LatencyWindow(size=100)
+        for value in range(1, 101):
+            window.add(float(value))
+
+        summary = window.summary()
+        assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50, 95, 99)
+        assert summary["max_ms"] == 100
+        assert summary["mean_ms"] == 50.5
+
+    def test_window_keeps_last_samples(self):
+        """Окно хранит последние замеры, счётчик — все."""
+        window = LatencyWindow(size=2)
+        for value in (100.0, 1.0, 2.0):
+            window.add(value)
+
+        assert window.count == 3
+        assert window.summary()["max_ms"] == 2.0
+
+
+class TestInstrumentTool:
+    """Тесты замеров вызовов инструментов."""
+
+    def test_timings_attached_to_result(self):
+        """Результат получает замеры этапов и общего времени."""
+        result = fake_tool("x = 1")
+
+        assert set(result["timings_ms"]) == {"lex", "rasterize", "total"}
+
+    def test_grouped_by_detail_level(self):
+        """Статистика копится по инструменту и уровню детализации."""
+        fake_tool("x = 1")
+        fake_tool("x = 1", detail_level="low")
+        fake_tool("bad", "Low")
+
+        tools = get_render_stats()["tools"]["fake_tool"]
+        assert tools["High"]["count"] == 1
+        assert tools["Low"]["count"] == 2
+        assert tools["Low"]["errors"] == 1
+        assert tools["Low"]["stages"]["lex"]["count"] == 2
+
+    def test_inline_result_gets_timings_in_metadata(self):
+        """Для ответа списком замеры добавляются в словарь метаданных."""
+
+        @instrument_tool
+        def inline_tool() -> list:
+            return ["image", {"success": True}]
+
+        assert "timings_ms" in inline_tool()[1]
+
+    def test_code_image_stages(self):
+        """Генерация изображения кода замеряет лексинг и растеризацию."""
+
+        @instrument_tool
+        def render() -> dict:
+            create_code_image("x = 1", "python", scale_factor=1.0, parallel=False)
+            return {"success": True}
+
+        assert {"lex", "rasterize"} <= set(render()["timings_ms"])
+
+    def test_stage_outside_tool(self):
+        """Этап вне инструмента учитывается только в общей статистике."""
+        with stage("encode"):
+            pass
+
+        stats = get_render_stats()
+        assert stats["stages"]["encode"]["count"] == 1
+        assert stats["tools"] == {}
+
+
+class TestCaptureStages:
+    """Тесты сбора замеров этапов в блоке."""
+
+    def test_nested_capture_isolated(self):
+        """Внутренний захват не пополняет внешний словарь."""
+        with capture_stages() as outer:
+            with stage("decode"):
+                pass
+            with capture_stages() as inner:
+                with stage("encode"):
+                    pass
+
+        assert set(outer) == {"decode"}
+        assert set(inner) == {"encode"}
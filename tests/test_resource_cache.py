@@ -0,0 +1,79 @@
+"""Тесты для кеша ресурсов генерации скриншотов."""
+
+import pytest
+
+from src.code_to_image import create_code_image
+from src.resource_cache import (
+    LRUCache,
+    clear_resource_caches,
+    get_fonts,
+    get_lexer,
+    get_resource_cache_stats,
+    get_style,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    """Каждый тест начинает с пустых кешей."""
+    clear_resource_caches()
+    yield
+    clear_resource_caches()
+
+
+class TestLRUCache:
+    """Тесты LRU кеша."""
+
+    def test_hits_and_misses(self):
+        """Повторный запрос берётся из кеша без вызова фабрики."""
+        cache = LRUCache("test", maxsize=2)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return object()
+
+        first = cache.get_or_create("a", factory)
+        second = cache.get_or_create("a", factory)
+
+        assert first is second
+        assert len(calls) == 1
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    def test_least_recently_used_evicted(self):
+        """При переполнении вытесняется давно не использованная запись."""
+        cache = LRUCache("test", maxsize=2)
+        cache.get_or_create("a", lambda: "A")
+        cache.get_or_create("b", lambda: "B")
+        cache.get_or_create("a", lambda: "A2")
+        cache.get_or_create("c", lambda: "C")
+
+        assert cache.get_or_create("a", lambda: "new") == "A"
+        assert cache.get_or_create("b", lambda: "new") == "new"
+        assert cache.get_stats()["evictions"] == 2
+
+
+class TestResourceGetters:
+    """Тесты кеширования лексеров, стилей и шрифтов."""
+
+    def test_resources_are_reused(self):
+        """Ресурсы создаются один раз на ключ."""
+        assert get_lexer("python") is get_lexer("python")
+        assert get_style("monokai") is get_style("monokai")
+        assert get_fonts("JetBrainsMono", 54) is get_fonts("JetBrainsMono", 54)
+        assert get_fonts("JetBrainsMono", 54) is not get_fonts("JetBrainsMono", 36)
+
+    def test_unknown_language_falls_back_to_text(self):
+        """Неизвестный язык даёт лексер 'text'."""
+        assert get_lexer("no-such-language").name == "Text only"
+
+    def test_screenshots_hit_cache(self):
+        """Второй скриншот с теми же параметрами не загружает ресурсы заново."""
+        create_code_image("x = 1", "python", scale_factor=1.0)
+        create_code_image("y = 2", "python", scale_factor=1.0)
+
+        stats = get_resource_cache_stats()
+        for name in ("lexers", "styles", "fonts"):
+            assert stats[name]["misses"] == 1
+            assert stats[name]["hits"] == 1
@@ -0,0 +1,183 @@
+"""Тесты для инструментов MCP сервера."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+
+import server  # noqa: E402
+import src.render_budget as render_budget  # noqa: E402
+
+
+class TestFontErrors:
+    """Тесты ответа инструментов скриншотов кода на ошибку шрифта."""
+
+    @pytest.fixture(autouse=True)
+    def missing_font(self, monkeypatch):
+        """Загрузка шрифта падает, как поиск через fc-list без fontconfig."""
+
+        def fail(font_name, size):
+            raise FileNotFoundError(f"Шрифт '{font_name}' не найден")
+
+        monkeypatch.setattr(render_budget, "get_fonts", fail)
+
+    def _assert_font_error(self, result):
+        assert result["success"] is False
+        assert "Unknown" in result["error"]
+        assert result["available_fonts"] == server.list_available_fonts()
+
+    def test_code_screenshot(self):
+        """generate_code_screenshot возвращает ошибку со списком шрифтов."""
+        result = asyncio.run(
+            server.generate_code_screenshot(
+                code="x = 1", language="python", return_mode="base64", font_name="Unknown"
+            )
+        )
+
+        self._assert_font_error(result)
+
+    def test_file_and_entity_screenshots(self, tmp_path):
+        """generate_file_screenshot и generate_entity_screenshot — так же."""
+        source = tmp_path / "module.py"
+        source.write_text("def add(a, b):\n    return a + b\n", encoding="utf-8")
+
+        file_result = asyncio.run(
+            server.generate_file_screenshot(
+                file_path=str(source), return_mode="base64", font_name="Unknown"
+            )
+        )
+        entity_result = asyncio.run(
+            server.generate_entity_screenshot(
+                file_path=str(source),
+                entity_name="add",
+                return_mode="base64",
+                font_name="Unknown",
+            )
+        )
+
+        self._assert_font_error(file_result)
+        self._assert_font_error(entity_result)
+
+
+class TestFileScreenshotStitchLimit:
+    """Тесты предела склейки в generate_file_screenshot."""
+
+    @pytest.fixture
+    def large_file(self, tmp_path, monkeypatch):
+        """Файл длиннее 200 строк и предел склейки, которому он не соответствует."""
+        import src.tiled_renderer as tiled_renderer
+
+        monkeypatch.setattr(tiled_renderer, "TILED_STITCH_MAX_MEGAPIXELS", 0)
+        source = tmp_path / "module.py"
+        source.write_text("".join(f"x_{i} = {i}\n" for i in range(250)), encoding="utf-8")
+        return source
+
+    def test_auto_falls_back_to_pages(self, large_file, tmp_path):
+        """В режиме auto вместо склейки сохраняются страницы."""
+        result = asyncio.run(
+            server.generate_file_screenshot(
+                file_path=str(large_file),
+                output_path=str(tmp_path / "out" / "module.png"),
+                detail_level="Low",
+                image_format="png",
+            )
+        )
+
+        assert result["success"] is True
+        assert result["output_mode"] == "pages"
+        assert "stitch_fallback" in result
+
+    def test_explicit_stitched_rejected(self, large_file, tmp_path):
+        """Явная склейка сверх предела отклоняется с понятной ошибкой."""
+        result = asyncio.run(
+            server.generate_file_screenshot(
+                file_path=str(large_file),
+                output_path=str(tmp_path / "out" / "module.png"),
+                detail_level="Low",
+                image_format="png",
+                output_mode="stitched",
+            )
+        )
+
+        assert result["success"] is False
+        assert "output_mode='pages'" in result["suggestion"]
+
+
+def _fake_estimate(source, scale, *args, **kwargs):
+    """Оценка, при которой в бюджет (100 Мп) укладываются уровни до High."""
+    return {"megapixels": scale * 30, "peak_memory_mb": 1, "warnings": []}
+
+
+class TestBatchBudget:
+    """Тесты бюджета рендеринга в пакетных инструментах."""
+
+    def test_entity_batch(self, tmp_path, monkeypatch):
+        """Сущность сверх бюджета понижается или отклоняется отдельно от пакета."""
+        monkeypatch.setattr(server, "estimate_code_render", _fake_estimate)
+        source = tmp_path / "module.py"
+        source.write_text("def add(a, b):\n    return a + b\n", encoding="utf-8")
+
+        def run(budget_policy):
+            return asyncio.run(
+                server.generate_entity_screenshots_batch(
+                    file_path=str(source),
+                    entities=["add"],
+                    output_dir=str(tmp_path / budget_policy),
+                    detail_level="Extreme",
+                    image_format="png",
+                    budget_policy=budget_policy,
+                )
+            )
+
+        downgraded = run("downgrade")["results"][0]
+        rejected = run("reject")
+
+        assert downgraded["success"] is True
+        assert downgraded["render_budget"]["detail_level"] == "High"
+        assert rejected["failed"] == 1
+        assert rejected["results"][0]["entity"] == "add"
+        assert rejected["results"][0]["exceeded"]
+
+    def test_diagram_batch(self, tmp_path, monkeypatch):
+        """Диаграмма сверх бюджета отклоняется, остальные рендерятся."""
+        rendered = []
+
+        def fake_batch(items):
+            rendered.extend(items)
+            results = [{"success": True, "output_path": item["output_path"]} for item in items]
+            return {"results": results, "succeeded": len(items), "failed": 0}
+
+        monkeypatch.setattr(server, "estimate_diagram_render", _fake_estimate)
+        monkeypatch.setattr(server, "ensure_java_environment", lambda: "fake")
+        monkeypatch.setattr(server, "render_diagrams_batch", fake_batch)
+
+        result = asyncio.run(
+            server.generate_diagrams_batch(
+                diagrams=[
+                    {"diagram_code": "A -> B", "output_path": str(tmp_path / "a.png")},
+                    {
+                        "diagram_code": "A -> B",
+                        "output_path": str(tmp_path / "b.png"),
+                        "detail_level": "Low",
+                    },
+                ],
+                detail_level="Extreme",
+                budget_policy="reject",
+            )
+        )
+
+        assert [item["scale_factor"] for item in rendered] == [1.0]
+        assert result["succeeded"] == 1
+        assert result["failed"] == 1
+        assert result["results"][0]["exceeded"]
+        assert result["results"][1]["success"] is True
+
+    def test_invalid_policy(self, tmp_path):
+        """Неизвестная политика бюджета отклоняется до рендеринга."""
+        result = asyncio.run(
+            server.generate_diagrams_batch(diagrams=[], budget_policy="maybe")
+        )
+
+        assert result["success"] is False
+        assert "maybe" in result["error"]
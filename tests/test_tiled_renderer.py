@@ -0,0 +1,85 @@
+"""Тесты для полосового рендеринга больших файлов."""
+
+import pytest
+from PIL import Image, ImageChops
+
+from src.code_to_image import create_code_image
+from src.image_utils import ImageProcessingError
+from src.resource_cache import get_fonts
+from src.tiled_renderer import render_code_tiled
+
+CODE = "\n".join(
+    f"def function_{i}(value: int) -> int:  # строка {i}\n    return value * {i}"
+    for i in range(20)
+)
+
+OPTIONS = {"scale_factor": 1.0, "tile_lines": 7}
+
+
+class TestStitched:
+    """Тесты склейки полос в одно PNG."""
+
+    def test_matches_single_image(self, tmp_path):
+        """Склейка совпадает попиксельно с обычным рендерингом."""
+        output_path = tmp_path / "stitched.png"
+
+        result = render_code_tiled(CODE, "python", output_path, "stitched", **OPTIONS)
+        expected = create_code_image(CODE, "python", scale_factor=1.0)
+
+        with Image.open(output_path) as stitched:
+            assert stitched.size == expected.size
+            assert ImageChops.difference(stitched.convert("RGB"), expected).getbbox() is None
+        assert result["lines_rendered"] == 40
+        assert result["dimensions"] == expected.size
+
+    def test_requires_png(self, tmp_path):
+        """Склейка в форматы кроме PNG отклоняется."""
+        with pytest.raises(ImageProcessingError):
+            render_code_tiled(
+                CODE, "python", tmp_path / "out.webp", "stitched", format="webp"
+            )
+
+    def test_size_limit(self, tmp_path, monkeypatch):
+        """Склейка сверх предела отклоняется или заменяется страницами."""
+        import src.tiled_renderer as tiled_renderer
+
+        monkeypatch.setattr(tiled_renderer, "TILED_STITCH_MAX_MEGAPIXELS", 0)
+
+        with pytest.raises(ImageProcessingError, match="Мп"):
+            render_code_tiled(CODE, "python", tmp_path / "big.png", "stitched", **OPTIONS)
+        assert not (tmp_path / "big.png").exists()
+
+        result = render_code_tiled(
+            CODE, "python", tmp_path / "big.png", "stitched", stitch_fallback=True, **OPTIONS
+        )
+
+        assert result["output_mode"] == "pages"
+        assert len(result["pages"]) == 6
+        assert result["stitch_fallback"]["max_megapixels"] == 0
+
+    def test_line_number_column_grows(self, tmp_path):
+        """Для файлов от 100 строк колонка номеров расширяется на символ."""
+        long_code = "\n".join(f"x = {i}" for i in range(120))
+        char_width = get_fonts("JetBrainsMono", 18).get_char_size()[0]
+
+        result = render_code_tiled(long_code, "python", tmp_path / "long.png", **OPTIONS)
+        expected = create_code_image(long_code, "python", scale_factor=1.0)
+
+        assert result["dimensions"][0] == expected.width + char_width
+
+
+class TestPages:
+    """Тесты вывода набором страниц."""
+
+    def test_pages_split_lines(self, tmp_path):
+        """Страницы покрывают все строки и названы по порядку."""
+        result = render_code_tiled(
+            CODE, "python", tmp_path / "module.webp", "pages", format="webp", **OPTIONS
+        )
+
+        pages = result["pages"]
+        assert [page["first_line"] for page in pages] == [1, 8, 15, 22, 29, 36]
+        assert pages[-1]["last_line"] == 40
+        assert [Image.open(page["path"]).format for page in pages] == ["WEBP"] * 6
+        assert pages[0]["path"].endswith("module_page_001.webp")
+        assert result["output_path"] == pages[0]["path"]